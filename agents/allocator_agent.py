@@ -1,11 +1,55 @@
+import asyncio
 import os
-import requests
+import json
 import google.generativeai as genai
 from typing import Dict, Any, Optional, List
 import uuid
 from datetime import datetime, timezone
 import re
 import random
+import time
+
+from utils.warmup import get_model, get_http_session
+from agents.resource_ledger import ResourceLedger, haversine_km
+from tools.road_graph import shared_router
+from utils.places_cache import PlacesCache
+from utils.single_flight import single_flight
+from agents.recommendation_batcher import RecommendationBatcher
+from utils.rate_limiter import call_with_quota, call_with_quota_async, priority_for_severity, request_priority
+from tools.gazetteer import shared_gazetteer
+from utils.session_recorder import ReplayMiss, session_recorder
+
+try:
+    import aiohttp  # async serving mode only (asgi_app.py)
+except ImportError:
+    aiohttp = None
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+PLACES_SEARCH_URL = "https://places.googleapis.com/v1/places:searchText"
+MAPS_TIMEOUT_S = 10
+# Geocoding statuses that are answers; anything else means the API is not serving us
+GEOCODE_ANSWERED = ("OK", "ZERO_RESULTS")
+# Half-width in degrees of the box a named city or area biases geocoding towards
+GEOCODE_BIAS_DEG = {"city": 0.3, "area": 0.05}
+
+# Places query per incident type; anything else is sent to general emergency services
+SERVICE_KEYWORDS = {
+    "Medical": "hospital emergency room",
+    "Crime": "police station",
+    "Disaster": "emergency management agency",
+    "Fire": "fire station brigade",
+    "Accident": "traffic police emergency services",
+}
+DEFAULT_SERVICE_KEYWORD = "emergency services"
+
+# Dispatch order used when Gemini is unavailable: incident type -> (units, tactical note)
+FALLBACK_ORDERS = {
+    "Medical": ("ambulance with paramedic crew", "Keep the caller on the line and alert the receiving ER."),
+    "Crime": ("police patrol unit", "Approach with caution, secure the scene and hold witnesses."),
+    "Disaster": ("rescue team and ambulance", "Set up a safe staging area and coordinate with PDMA."),
+    "Fire": ("fire tender and ambulance", "Cut power and gas supply and evacuate adjacent buildings."),
+    "Accident": ("traffic police and ambulance", "Divert traffic and secure the lane before extraction."),
+}
 
 class AllocatorAgent:
     """
@@ -19,8 +63,27 @@ class AllocatorAgent:
         
         # Configure Gemini
         genai.configure(api_key=api_key)
-        self.llm_model = genai.GenerativeModel('gemini-2.0-flash')
+        self.llm_model = get_model(None)
         self.maps_api_key = maps_api_key
+        self.http = get_http_session("maps")
+        self._aio_http = None  # aiohttp session, created on first async call inside the event loop
+
+        # Same-area searches for the same service share one Places call
+        self.places_cache = PlacesCache()
+        self.geocode_flight = single_flight("geocode")
+
+        # Known areas and cities resolve locally; Google geocodes the rest
+        self.gazetteer = shared_gazetteer()
+        self.llm_flight = single_flight("allocator_llm")
+
+        # Recommendations requested close together share one Gemini call
+        self.recommender = RecommendationBatcher(self._generate_batch_recommendations, self._single_recommendation)
+
+        # Offline road graph for drive times (straight-line estimate if none is configured)
+        self.router = shared_router()
+
+        # Tracks which facilities' units are already committed to open incidents
+        self.ledger = ResourceLedger(travel_time_fn=self.router.eta_minutes)
         
         # Predefined dummy data for reporters
         self.dummy_reporters = [
@@ -31,30 +94,82 @@ class AllocatorAgent:
         ]
 
     def _geocode_location(self, location_text: str) -> Optional[Dict[str, float]]:
-        """Geocode location using Google Geocoding API."""
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        """
+        Geocode location with Google, biased towards any known place the text
+        names; concurrent requests for the same place share one API call. The
+        offline gazetteer answers alone only when the text is nothing but
+        known places, and stands in when Google has no answer.
+        """
+        place = self.gazetteer.find(location_text)
+        if self._explains(place):
+            return self._gazetteer_location(place)
+        key = " ".join(location_text.lower().split())
+        location = self.geocode_flight.do(key, lambda: self._request_geocode(location_text, place))
+        if location is None and place:
+            return self._gazetteer_location(place, "fallback")
+        return location
+
+    @staticmethod
+    def _explains(place: Optional[Dict[str, Any]]) -> bool:
+        # "Gulshan-e-Iqbal, Karachi" is fully known; "Jail Road, Lahore" is a street only Google can place
+        return place is not None and not place['fuzzy'] and not place['unmatched']
+
+    @staticmethod
+    def _gazetteer_location(place: Dict[str, Any], reason: str = "known place") -> Dict[str, float]:
+        print(f"Allocator    - Gazetteer ({reason}): {place['name']}{' (fuzzy)' if place['fuzzy'] else ''}")
+        return {"lat": place["lat"], "lng": place["lng"]}
+
+    def _geocode_params(self, location_text: str, near: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
         params = {
             'address': f"{location_text}, Pakistan",
             'key': self.maps_api_key
         }
+        if near:
+            # Prefer results around the place the caller named over same-named streets elsewhere
+            span = GEOCODE_BIAS_DEG.get(near['kind'], GEOCODE_BIAS_DEG['city'])
+            params['bounds'] = f"{near['lat'] - span},{near['lng'] - span}|{near['lat'] + span},{near['lng'] + span}"
+        return params
+
+    @staticmethod
+    def _parse_geocode(data: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        if data['status'] == 'OK' and data['results']:
+            location = data['results'][0]['geometry']['location']
+            print(f"Allocator  - Geocoded: {location}")
+            return location
+        print(f"Allocator    - Geocoding failed: {data.get('status')}")
+        return None
+
+    def _request_geocode(self, location_text: str, near: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, float]]:
+        """Geocode location using Google Geocoding API."""
+        params = self._geocode_params(location_text, near)
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            if data['status'] == 'OK' and data['results']:
-                location = data['results'][0]['geometry']['location']
-                print(f"Allocator  - Geocoded: {location}")
-                return location
-            else:
-                print(f"Allocator    - Geocoding failed: {data.get('status')}")
-                return None
+            data = session_recorder.call("maps.geocode", location_text, lambda: self._fetch_geocode(params))
+            return self._parse_geocode(data)
         except Exception as e:
             print(f"Allocator    - Geocoding error: {e}")
             return None
 
-    def _search_places_nearby(self, query: str, location: Dict[str, float], location_text: str, max_results: int = 5) -> List[Dict]:
-        """Search for places using the New Places API with location bias."""
-        url = "https://places.googleapis.com/v1/places:searchText"
+    def _fetch_geocode(self, params: Dict[str, str]) -> Dict[str, Any]:
+        def send():
+            # Inside the quota call, so 5xx and 429 answers reach the limiter and the breaker
+            response = self.http.get(GEOCODE_URL, params=params, timeout=MAPS_TIMEOUT_S)
+            response.raise_for_status()
+            return response.json()
+        # Without coordinates there is no dispatch, so geocoding waits out throttling
+        return call_with_quota("geocoding", send, is_throttled=self._geocode_throttled,
+                               is_failure=self._geocode_failed, timeout=30)
+
+    @staticmethod
+    def _geocode_throttled(data: Dict[str, Any]) -> bool:
+        return data.get('status') == 'OVER_QUERY_LIMIT'
+
+    @staticmethod
+    def _geocode_failed(data: Dict[str, Any]) -> bool:
+        # REQUEST_DENIED, UNKNOWN_ERROR and the like come back as HTTP 200
+        return data.get('status') not in GEOCODE_ANSWERED
+
+    def _places_request(self, query: str, location: Dict[str, float], location_text: str, max_results: int):
+        """Headers and body for a Places text search with location bias."""
         headers = {
             'Content-Type': 'application/json',
             'X-Goog-Api-Key': self.maps_api_key,
@@ -64,54 +179,130 @@ class AllocatorAgent:
             "circle": {"center": {"latitude": location['lat'], "longitude": location['lng']}, "radius": 10000.0}
         }
         payload = {"textQuery": f"{query} near {location_text}, Pakistan", "maxResultCount": max_results, "locationBias": location_bias}
+        return headers, payload
+
+    def _search_places_nearby(self, query: str, location: Dict[str, float], location_text: str, max_results: int = 5) -> List[Dict]:
+        """Search for places using the New Places API with location bias."""
+        headers, payload = self._places_request(query, location, location_text, max_results)
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
+            data = session_recorder.call("maps.places", payload['textQuery'], lambda: self._fetch_places(headers, payload))
             return data.get('places', [])
         except Exception as e:
             print(f"Allocator    - Places search error: {e}")
             return []
 
+    def _fetch_places(self, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        def send():
+            response = self.http.post(PLACES_SEARCH_URL, headers=headers, json=payload, timeout=MAPS_TIMEOUT_S)
+            response.raise_for_status()
+            return response.json()
+        return call_with_quota("places", send, timeout=30)
+
     def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate approximate distance between two points (in km)."""
         return ((lat1 - lat2) ** 2 + (lng1 - lng2) ** 2) ** 0.5 * 111.32
 
-    def _find_nearest_facility(self, service_keyword: str, location_text: str) -> Optional[Dict[str, Any]]:
-        """Find nearest facility using New Places API with location-based sorting."""
+    def _quickest_place(self, places: List[Dict], target_lat: float, target_lng: float, k: int = 5) -> Optional[Dict]:
+        """Re-ranks the k nearest places by straight line using estimated drive time."""
+        located = [place for place in places if 'location' in place]
+        located.sort(key=lambda p: self._calculate_distance(target_lat, target_lng, p['location']['latitude'], p['location']['longitude']))
+        return min(
+            located[:k],
+            key=lambda p: self.router.eta_minutes(target_lat, target_lng, p['location']['latitude'], p['location']['longitude']),
+            default=None
+        )
+
+    def _facility_info_from_ledger(self, reservation: Dict[str, Any], target_lat: float, target_lng: float) -> Dict[str, Any]:
+        """Builds facility_info for a ledger reservation."""
+        facility = self.ledger.facilities[reservation['facility_id']]
+        return {
+            "name": facility['name'],
+            "address": facility['address'],
+            "distance_km": round(haversine_km(target_lat, target_lng, facility['lat'], facility['lng']), 2),
+            "rating": facility['rating'],
+            "total_ratings": facility['total_ratings'],
+            "location": {"latitude": facility['lat'], "longitude": facility['lng']},
+            "assigned_unit": reservation['unit_name'],
+            "eta_minutes": reservation['eta_minutes'],
+            "available_units": self.ledger.free_units(facility['id']),
+        }
+
+    def _register_places(self, places: List[Dict], incident_type: str) -> List[Dict]:
+        """Adds Places results to the resource ledger; returns those with a location."""
+        located = [place for place in places if 'location' in place]
+        for place in located:
+            self.ledger.upsert_facility(place, incident_type)
+        return located
+
+    def _find_nearest_facility(self, service_keyword: str, location_text: str, coordinates: Optional[Dict[str, float]] = None,
+                               incident_type: Optional[str] = None, incident_id: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the facility to dispatch from using the New Places API.
+
+        With an incident_type and incident_id, a unit is reserved in the resource
+        ledger so facilities saturated by earlier incidents are skipped.
+        """
         print(f"Allocator -  Autonomous Tool Use: Engaging New Places API.")
-        coordinates = self._geocode_location(location_text)
+        coordinates = coordinates or self._geocode_location(location_text)
         if not coordinates:
             return None
 
-        places = self._search_places_nearby(service_keyword, coordinates, location_text)
+        places = self.places_cache.get(
+            service_keyword, coordinates['lat'], coordinates['lng'],
+            lambda: self._search_places_nearby(service_keyword, coordinates, location_text)
+        )
+        return self._select_facility(places, coordinates, incident_type, incident_id)
+
+    def _select_facility(self, places: List[Dict], coordinates: Dict[str, float], incident_type: Optional[str] = None,
+                         incident_id: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """Reserve a unit from the ledger, or fall back to the quickest place found."""
+        reserving = bool(incident_type) and incident_id is not None
+        reservation = None
+        if reserving:
+            self._register_places(places, incident_type)
+            reservation = self.ledger.reserve(str(incident_id), coordinates['lat'], coordinates['lng'], incident_type)
+        return self._facility_for(reservation, places, coordinates, incident_type, reserving)
+
+    def _facility_for(self, reservation: Optional[Dict[str, Any]], places: List[Dict], coordinates: Dict[str, float],
+                      incident_type: Optional[str] = None, reserving: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        facility_info for one incident once the ledger has answered: the
+        reserved unit, else the quickest place found (marked saturated when a
+        reservation was attempted). Shared by the single and batch paths.
+        """
+        target_lat, target_lng = coordinates['lat'], coordinates['lng']
+        if reservation:
+            facility_info = self._facility_info_from_ledger(reservation, target_lat, target_lng)
+            print(f"Allocator     - Reserved: {facility_info['assigned_unit']} (ETA {facility_info['eta_minutes']} min)")
+            return facility_info
+        if reserving:
+            print(f"Allocator     - All known {incident_type} facilities are saturated")
+
         if not places:
             return None
 
-        target_lat, target_lng = coordinates['lat'], coordinates['lng']
-        closest_place = min(
-            (place for place in places if 'location' in place),
-            key=lambda p: self._calculate_distance(target_lat, target_lng, p['location']['latitude'], p['location']['longitude']),
-            default=None
-        )
+        closest_place = self._quickest_place(places, target_lat, target_lng)
 
         if closest_place:
             distance = self._calculate_distance(target_lat, target_lng, closest_place['location']['latitude'], closest_place['location']['longitude'])
+            eta = self.router.eta_minutes(target_lat, target_lng, closest_place['location']['latitude'], closest_place['location']['longitude'])
             facility_info = {
                 "name": closest_place['displayName']['text'],
                 "address": closest_place.get('formattedAddress', 'Address not available'),
                 "distance_km": round(distance, 2),
                 "rating": closest_place.get('rating', 'N/A'),
                 "total_ratings": closest_place.get('userRatingCount', 0),
-                "location": closest_place.get('location')
+                "location": closest_place.get('location'),
+                "eta_minutes": round(eta, 1)
             }
+            if reserving:
+                facility_info["capacity_status"] = "saturated"
             print(f"Allocator     - Found: {facility_info['name']} ({facility_info['distance_km']} km)")
             return facility_info
         return None
 
-    def _generate_llm_recommendation(self, incident_type: str, summary: str, location: str, facility_info: Optional[Dict]) -> str:
-        """Generate contextual recommendation using Gemini LLM."""
-        print(f"Allocator -  Autonomous Tool Use: Engaging Gemini LLM.")
+    @staticmethod
+    def _facility_context(facility_info: Optional[Dict]) -> str:
         facility_context = "- *Facility Status:* No specific facility identified. Use standard emergency protocols."
         if facility_info:
             facility_context = f"""
@@ -120,6 +311,16 @@ class AllocatorAgent:
 - *Distance:* {facility_info['distance_km']} km from incident
 - *Rating:* {facility_info.get('rating', 'N/A')} ({facility_info.get('total_ratings', 0)} reviews)
 """
+            if facility_info.get('assigned_unit'):
+                facility_context += f"""- *Reserved Unit:* {facility_info['assigned_unit']} (ETA {facility_info['eta_minutes']} min, {facility_info['available_units']} units still free)
+"""
+            elif facility_info.get('capacity_status') == 'saturated':
+                facility_context += """- *Capacity:* All units at nearby facilities are already committed. Request mutual aid.
+"""
+        return facility_context
+
+    def _recommendation_prompt(self, incident_type: str, summary: str, location: str, facility_info: Optional[Dict]) -> str:
+        facility_context = self._facility_context(facility_info)
         prompt = f"""
 You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
 
@@ -133,23 +334,145 @@ You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
 
 *TASK:* Create a concise emergency dispatch instruction (max 40 words) that includes:
 1. Priority level (CRITICAL/HIGH/MEDIUM/LOW)
-2. Units to dispatch 
+2. Units to dispatch (use the reserved unit if one is given)
 3. Destination
 4. Brief tactical note
 
 *FORMAT:* Direct command style, no extra formatting.
 """
+        return prompt
+
+    @staticmethod
+    def _fallback_recommendation(incident_type: str, location: str, facility_info: Optional[Dict],
+                                 severity: Optional[float] = None) -> str:
+        """Deterministic dispatch order in the LLM's format, from the incident type, severity and facility."""
+        units, note = FALLBACK_ORDERS.get(incident_type, ("emergency units", "Assess on arrival and report back."))
+        if isinstance(severity, (int, float)):
+            priority = "CRITICAL" if severity >= 8 else "HIGH" if severity >= 6 else "MEDIUM" if severity >= 4 else "LOW"
+        else:
+            priority = "HIGH"
+        facility_info = facility_info or {}
+        if facility_info.get('assigned_unit'):
+            units = facility_info['assigned_unit']
+        recommendation = f"{priority} PRIORITY: Dispatch {units} to {location}."
+        if facility_info.get('name'):
+            eta = f" (ETA {round(facility_info['eta_minutes'])} min)" if facility_info.get('eta_minutes') else ""
+            recommendation += f" Respond from {facility_info['name']}{eta}."
+        if facility_info.get('capacity_status') == 'saturated':
+            recommendation += " Nearby units are committed, request mutual aid."
+        return f"{recommendation} {note}"
+
+    def _batch_recommendation_prompt(self, requests: List[Dict[str, Any]]) -> str:
+        incidents = "\n".join(
+            f"""
+*INCIDENT {request['id']}:*
+- *Type:* {request['incident_type']}
+- *Location:* {request['location']}
+- *Details:* {request['summary']}
+{self._facility_context(request['facility_info'])}"""
+            for request in requests
+        )
+        return f"""
+You are an emergency dispatcher for Pakistan. Generate a precise call-to-action for each incident below.
+{incidents}
+
+*TASK:* For every incident, create a concise emergency dispatch instruction (max 40 words) that includes:
+1. Priority level (CRITICAL/HIGH/MEDIUM/LOW)
+2. Units to dispatch (use the reserved unit if one is given)
+3. Destination
+4. Brief tactical note
+
+*FORMAT:* Only a JSON array, one object per incident: [{{"id": "<incident id>", "recommendation": "<direct command style text>"}}]
+"""
+
+    @staticmethod
+    def _parse_batch_recommendations(text: str) -> Dict[str, str]:
+        """{incident id: recommendation} from the model's JSON array (tolerates a code fence)."""
+        start, end = text.find('['), text.rfind(']')
+        if start < 0 or end < start:
+            raise ValueError("No JSON array in batch response")
+        answers = {}
+        for item in json.loads(text[start:end + 1]):
+            if isinstance(item, dict) and item.get('id') is not None and isinstance(item.get('recommendation'), str):
+                answers[str(item['id'])] = item['recommendation'].strip().replace('*', '')
+        return answers
+
+    def _generate_batch_recommendations(self, requests: List[Dict[str, Any]]) -> Dict[str, str]:
+        """One Gemini call for several incidents; ids missing from the answer are retried singly."""
+        if session_recorder.replaying:
+            return self._replayed_recommendations(requests)
+        print(f"Allocator -  Autonomous Tool Use: Engaging Gemini LLM for {len(requests)} incidents.")
+        prompt = self._batch_recommendation_prompt(requests)
+        started = time.time()
+        response = call_with_quota("gemini", lambda: self.llm_model.generate_content(prompt))
+        answers = self._parse_batch_recommendations(response.text)
+        print(f"Allocator    - Generated {len(answers)}/{len(requests)} recommendations in one call")
+        # Recorded per incident: a replay batches its own way
+        for request in requests:
+            if str(request['id']) in answers:
+                session_recorder.record_call("gemini.recommendation", self._recommendation_key(request),
+                                             answers[str(request['id'])], time.time() - started)
+        return answers
+
+    def _replayed_recommendations(self, requests: List[Dict[str, Any]]) -> Dict[str, str]:
+        answers = {}
+        for request in requests:
+            try:
+                answers[str(request['id'])] = session_recorder.replayed("gemini.recommendation", self._recommendation_key(request))
+            except ReplayMiss:
+                pass
+        return answers
+
+    def _generate_llm_recommendation(self, incident_type: str, summary: str, location: str, facility_info: Optional[Dict],
+                                     severity: Optional[float] = None) -> str:
+        """Generate contextual recommendation using Gemini LLM (micro-batched with concurrent incidents)."""
+        return self.recommender.recommend(
+            self._recommendation_request(incident_type, summary, location, facility_info, severity=severity)
+        )
+
+    def _recommendation_request(self, incident_type: str, summary: str, location: str, facility_info: Optional[Dict],
+                                incident_id: Optional[Any] = None, severity: Optional[float] = None) -> Dict[str, Any]:
+        return {
+            "id": str(incident_id if incident_id is not None else uuid.uuid4().hex[:8]),
+            "incident_type": incident_type,
+            "summary": summary,
+            "location": location,
+            "facility_info": facility_info,
+            "severity": severity,
+        }
+
+    @staticmethod
+    def _recommendation_key(request: Dict[str, Any]) -> str:
+        """Identifies a recommendation across runs (prompts also carry ledger state that differs on replay)."""
+        return f"{request['incident_type']}|{request['location']}|{request['summary']}"
+
+    @staticmethod
+    def _flight_key(incident_type: str, summary: str, location: str, facility_info: Optional[Dict]) -> tuple:
+        """
+        What makes two concurrent recommendations the same: the incident and
+        the facility and unit sent, not the prompt (it carries live unit counts).
+        """
+        facility_info = facility_info or {}
+        return (incident_type, (summary or "").strip(), (location or "").strip().lower(),
+                facility_info.get("name"), facility_info.get("assigned_unit"))
+
+    def _single_recommendation(self, request: Dict[str, Any]) -> str:
+        incident_type, location, facility_info = request['incident_type'], request['location'], request['facility_info']
+        print(f"Allocator -  Autonomous Tool Use: Engaging Gemini LLM.")
+        prompt = self._recommendation_prompt(incident_type, request['summary'], location, facility_info)
         try:
-            response = self.llm_model.generate_content(prompt)
-            recommendation = response.text.strip().replace('*', '')
+            # The same incident reported by several callers at once shares one call
+            # Deferred past the wait budget under load, the fallback below is used
+            flight_key = self._flight_key(incident_type, request['summary'], location, facility_info)
+            text = session_recorder.call("gemini.recommendation", self._recommendation_key(request), lambda: self.llm_flight.do(
+                flight_key, lambda: call_with_quota("gemini", lambda: self.llm_model.generate_content(prompt))
+            ).text)
+            recommendation = text.strip().replace('*', '')
             print(f"Allocator    - Generated recommendation")
             return recommendation
         except Exception as e:
             print(f"Allocator    - LLM error: {e}")
-            fallback = f"HIGH PRIORITY: Dispatch emergency units to {incident_type.lower()} at {location}."
-            if facility_info:
-                fallback += f" Route to {facility_info['name']}."
-            return fallback
+            return self._fallback_recommendation(incident_type, location, facility_info, request.get('severity'))
 
     def _map_priority(self, recommendation: str) -> str:
         """Maps priority from recommendation to UI format."""
@@ -161,11 +484,11 @@ You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
         return "Medium"
 
     def _map_severity_from_priority(self, priority: str) -> int:
-        """Assigns a severity score based on the priority level."""
-        if priority == "Critical": return random.choice([9, 10])
-        if priority == "High": return random.choice([7, 8])
-        if priority == "Medium": return random.choice([4, 5, 6])
-        if priority == "Low": return random.choice([1, 2, 3])
+        """Assigns a deterministic severity score based on the priority level."""
+        if priority == "Critical": return 9
+        if priority == "High": return 7
+        if priority == "Medium": return 5
+        if priority == "Low": return 2
         return 5
 
     def _extract_assigned_units(self, recommendation: str) -> List[str]:
@@ -183,11 +506,12 @@ You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
         }
         return type_map.get(incident_type, "other")
 
-    def transform_to_ui_format(self, incident_data: Dict[str, Any], processing_result: Dict[str, Any], geocoded_location: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    def transform_to_ui_format(self, incident_data: Dict[str, Any], processing_result: Dict[str, Any], geocoded_location: Optional[Dict[str, float]], incident_id: Optional[int] = None) -> Dict[str, Any]:
         """Transforms the processing result into the desired UI format with dummy data."""
         now_iso = datetime.now(timezone.utc).isoformat()
         recommendation = processing_result.get("ai_recommendation", "")
         priority = self._map_priority(recommendation)
+        facility = processing_result.get("nearest_facility", {})
         
         # Add dummy media with a 50% chance of an image
         images, audio, video = [], None, None
@@ -195,18 +519,18 @@ You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
             images.append(f"https://picsum.photos/seed/{uuid.uuid4()}/800/600")
         
         ui_result = {
-            "id": uuid.uuid4().int & (1<<31)-1,  # Keep it within a 32-bit integer range
+            "id": incident_id if incident_id is not None else self._new_incident_id(),
             "title": f"{incident_data.get('incident_type', 'Incident')} at {incident_data.get('location')}",
             "priority": priority,
             "location": geocoded_location if geocoded_location else {"lat": 0.0, "lng": 0.0},
-            "address": processing_result.get("nearest_facility", {}).get("address") or incident_data.get("location", "Unknown address"),
+            "address": facility.get("address") or incident_data.get("location", "Unknown address"),
             "description": incident_data.get("summary", "No details provided."),
             "timestamp": now_iso,
             "type": self._map_incident_type(incident_data.get("incident_type")),
             "status": 'active',
-            "severity": self._map_severity_from_priority(priority),
-            "estimatedDuration": "30 minutes",
-            "assignedUnits": self._extract_assigned_units(recommendation),
+            "severity": round(incident_data["severity"]) if isinstance(incident_data.get("severity"), (int, float)) else self._map_severity_from_priority(priority),
+            "estimatedDuration": f"{round(facility['eta_minutes'])} minutes" if facility.get("eta_minutes") else "30 minutes",
+            "assignedUnits": [facility["assigned_unit"]] if facility.get("assigned_unit") else self._extract_assigned_units(recommendation),
             "contactInfo": {},
             "createdAt": now_iso,
             "updatedAt": now_iso,
@@ -217,32 +541,40 @@ You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
         }
         return ui_result
 
+    @staticmethod
+    def _new_incident_id() -> int:
+        return uuid.uuid4().int & (1<<31)-1  # Keep it within a 32-bit integer range
+
+    def _service_keyword(self, incident_type: str) -> str:
+        """Maps an incident type to the Places query for its responding facility."""
+        service_keyword = SERVICE_KEYWORDS.get(incident_type)
+        if not service_keyword:
+            print(f"Allocator    - No service mapped for incident type {incident_type!r}; using {DEFAULT_SERVICE_KEYWORD!r}")
+            return DEFAULT_SERVICE_KEYWORD
+        return service_keyword
+
     def process_incident(self, incident_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Main incident processing workflow."""
+        """Main incident processing workflow; API quota is granted by incident severity."""
+        with request_priority(priority_for_severity(incident_data.get("severity"))), session_recorder.allocation([incident_data]):
+            return self._process_incident(incident_data)
+
+    def _process_incident(self, incident_data: Dict[str, Any]) -> Dict[str, Any]:
         incident_type = incident_data.get("incident_type")
         summary = incident_data.get("summary")  
         location_text = incident_data.get("location")
+        incident_id = incident_data.get("id") or self._new_incident_id()
 
         print(f"\nAllocator - Processing {incident_type} incident at '{location_text}'")
         
         geocoded_location = self._geocode_location(location_text)
+        service_keyword = self._service_keyword(incident_type)
 
-        service_mapping = {
-            "Medical": "hospital emergency room",
-            "Crime": "police station",
-            "Disaster": "emergency management agency",
-            "Fire": "fire station brigade",
-            "Accident": "traffic police emergency services"
-        }
-        
-        service_keyword = service_mapping.get(incident_type)
-        if not service_keyword:
-            raise ValueError(f"Unsupported incident type: {incident_type}")
-
-        facility_info = self._find_nearest_facility(service_keyword, location_text) if geocoded_location else None
+        facility_info = self._find_nearest_facility(
+            service_keyword, location_text, geocoded_location, incident_type, incident_id
+        ) if geocoded_location else None
         
         call_to_action = self._generate_llm_recommendation(
-            incident_type, summary, location_text, facility_info
+            incident_type, summary, location_text, facility_info, incident_data.get("severity")
         )
 
         processing_result = {
@@ -250,4 +582,192 @@ You are an emergency dispatcher for Pakistan. Generate a precise call-to-action.
             "nearest_facility": facility_info or {"status": "none_found"},
         }
         
-        return self.transform_to_ui_format(incident_data, processing_result, geocoded_location)
\ No newline at end of file
+        return self.transform_to_ui_format(incident_data, processing_result, geocoded_location, incident_id)
+
+    async def _http_async(self):
+        if aiohttp is None:
+            raise RuntimeError("Async allocation needs aiohttp (pip install aiohttp)")
+        if self._aio_http is None or self._aio_http.closed:
+            self._aio_http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        return self._aio_http
+
+    async def _geocode_location_async(self, location_text: str, priority: str) -> Optional[Dict[str, float]]:
+        place = self.gazetteer.find(location_text)
+        if self._explains(place):
+            return self._gazetteer_location(place)
+        key = " ".join(location_text.lower().split())
+
+        async def request():
+            http = await self._http_async()
+            params = self._geocode_params(location_text, place)
+
+            async def send():
+                async with http.get(GEOCODE_URL, params=params) as response:
+                    response.raise_for_status()
+                    return await response.json()
+            try:
+                data = await session_recorder.call_async("maps.geocode", location_text, lambda: call_with_quota_async(
+                    "geocoding", send, is_throttled=self._geocode_throttled, is_failure=self._geocode_failed,
+                    timeout=30, priority=priority
+                ))
+                return self._parse_geocode(data)
+            except Exception as e:
+                print(f"Allocator    - Geocoding error: {e}")
+                return None
+        location = await self.geocode_flight.do_async(key, request)
+        if location is None and place:
+            return self._gazetteer_location(place, "fallback")
+        return location
+
+    async def _search_places_nearby_async(self, query: str, location: Dict[str, float], location_text: str,
+                                          priority: str, max_results: int = 5) -> List[Dict]:
+        headers, payload = self._places_request(query, location, location_text, max_results)
+        http = await self._http_async()
+
+        async def send():
+            async with http.post(PLACES_SEARCH_URL, headers=headers, json=payload) as response:
+                response.raise_for_status()
+                return await response.json()
+        try:
+            data = await session_recorder.call_async(
+                "maps.places", payload['textQuery'], lambda: call_with_quota_async("places", send, timeout=30, priority=priority)
+            )
+            return data.get('places', [])
+        except Exception as e:
+            print(f"Allocator    - Places search error: {e}")
+            return []
+
+    async def _generate_llm_recommendation_async(self, incident_type: str, summary: str, location: str,
+                                                 facility_info: Optional[Dict], priority: str,
+                                                 severity: Optional[float] = None) -> str:
+        prompt = self._recommendation_prompt(incident_type, summary, location, facility_info)
+        flight_key = self._flight_key(incident_type, summary, location, facility_info)
+
+        async def generate():
+            response = await self.llm_flight.do_async(flight_key, lambda: call_with_quota_async(
+                "gemini", lambda: self.llm_model.generate_content_async(prompt), priority=priority
+            ))
+            return response.text
+        try:
+            key = self._recommendation_key({"incident_type": incident_type, "location": location, "summary": summary})
+            text = await session_recorder.call_async("gemini.recommendation", key, generate)
+            return text.strip().replace('*', '')
+        except Exception as e:
+            print(f"Allocator    - LLM error: {e}")
+            return self._fallback_recommendation(incident_type, location, facility_info, severity)
+
+    async def process_incident_async(self, incident_data: Dict[str, Any]) -> Dict[str, Any]:
+        """process_incident() for the asyncio serving mode: Maps and Gemini calls are awaited."""
+        with session_recorder.allocation([incident_data]):
+            return await self._process_incident_async(incident_data)
+
+    async def _process_incident_async(self, incident_data: Dict[str, Any]) -> Dict[str, Any]:
+        priority = priority_for_severity(incident_data.get("severity"))
+        incident_type = incident_data.get("incident_type")
+        location_text = incident_data.get("location")
+        incident_id = incident_data.get("id") or self._new_incident_id()
+
+        geocoded_location = await self._geocode_location_async(location_text, priority)
+        service_keyword = self._service_keyword(incident_type)
+
+        facility_info = None
+        if geocoded_location:
+            places = await self.places_cache.get_async(
+                service_keyword, geocoded_location['lat'], geocoded_location['lng'],
+                lambda: self._search_places_nearby_async(service_keyword, geocoded_location, location_text, priority)
+            )
+            # Ledger locking, the assignment and road-graph ETAs are CPU work; keep them off the event loop
+            facility_info = await asyncio.to_thread(self._select_facility, places, geocoded_location, incident_type, incident_id)
+
+        call_to_action = await self._generate_llm_recommendation_async(
+            incident_type, incident_data.get("summary"), location_text, facility_info, priority, incident_data.get("severity")
+        )
+        processing_result = {
+            "ai_recommendation": call_to_action,
+            "nearest_facility": facility_info or {"status": "none_found"},
+        }
+        return self.transform_to_ui_format(incident_data, processing_result, geocoded_location, incident_id)
+
+    def process_incidents(self, incidents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Allocates a burst of incidents together. Units are assigned jointly
+        (min-cost over incident x facility) so two incidents never both count on
+        a facility's last ambulance. One result per incident, in order; an
+        incident that could not be allocated gets {"id", "error"} instead of
+        failing the rest of the burst.
+        """
+        with session_recorder.allocation(incidents):
+            return self._process_incidents(incidents)
+
+    def _process_incidents(self, incidents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        prepared = []
+        batch = []
+        failed = {}
+        for index, incident_data in enumerate(incidents):
+            incident_type = incident_data.get("incident_type")
+            location_text = incident_data.get("location")
+            incident_id = incident_data.get("id") or self._new_incident_id()
+            try:
+                with request_priority(priority_for_severity(incident_data.get("severity"))):
+                    geocoded_location = self._geocode_location(location_text)
+                service_keyword = self._service_keyword(incident_type)
+                places = []
+                if geocoded_location:
+                    with request_priority(priority_for_severity(incident_data.get("severity"))):
+                        places = self.places_cache.get(
+                            service_keyword, geocoded_location['lat'], geocoded_location['lng'],
+                            lambda: self._search_places_nearby(service_keyword, geocoded_location, location_text)
+                        )
+                    self._register_places(places, incident_type)
+                    batch.append({
+                        "id": str(incident_id),
+                        "lat": geocoded_location['lat'],
+                        "lng": geocoded_location['lng'],
+                        "incident_type": incident_type,
+                    })
+            except Exception as e:
+                print(f"Allocator    - Incident {incident_id} not allocated: {e}")
+                failed[index] = {"id": incident_id, "error": str(e)}
+                continue
+            prepared.append((incident_data, incident_id, geocoded_location, places))
+
+        reservations = self.ledger.reserve_batch(batch)
+        print(f"Allocator - Batch assigned {sum(1 for r in reservations.values() if r)}/{len(incidents)} incidents")
+
+        facilities = []
+        for incident_data, incident_id, geocoded_location, places in prepared:
+            facility_info = None
+            if geocoded_location:
+                facility_info = self._facility_for(reservations.get(str(incident_id)), places, geocoded_location,
+                                                   incident_data.get("incident_type"),
+                                                   reserving=bool(incident_data.get("incident_type")))
+            facilities.append(facility_info)
+
+        # The whole burst asks for its recommendations at once, at the most urgent incident's priority
+        severities = [incident_data["severity"] for incident_data in incidents if isinstance(incident_data.get("severity"), (int, float))]
+        most_severe = max(severities) if severities else None
+        with request_priority(priority_for_severity(most_severe)):
+            recommendations = self.recommender.recommend_many([
+                self._recommendation_request(incident_data.get("incident_type"), incident_data.get("summary"),
+                                             incident_data.get("location"), facility_info, incident_id,
+                                             incident_data.get("severity"))
+                for (incident_data, incident_id, _, _), facility_info in zip(prepared, facilities)
+            ])
+
+        allocated = iter(zip(prepared, facilities, recommendations))
+        results = []
+        for index in range(len(incidents)):
+            if index in failed:
+                results.append(failed[index])
+                continue
+            (incident_data, incident_id, geocoded_location, _), facility_info, call_to_action = next(allocated)
+            processing_result = {
+                "ai_recommendation": call_to_action,
+                "nearest_facility": facility_info or {"status": "none_found"},
+            }
+            results.append(self.transform_to_ui_format(incident_data, processing_result, geocoded_location, incident_id))
+        return results
+
+    def release_incident(self, incident_id: Any) -> bool:
+        """Frees the unit reserved for an incident once it is resolved."""
+        return self.ledger.release(str(incident_id))
@@ -0,0 +1,260 @@
+"""
+Bulk incident intake for integrations (SMS gateways, call-center systems).
+
+A batch is a JSON array or NDJSON, one report per element or line. A report
+is either a pre-structured incident
+
+    {"incident_type": "Fire", "location": "Clifton block 5", "summary": "...", "priority": "High", "id": "<your ref>"}
+
+or free text
+
+    {"message": "my neighbour collapsed, Johar Town Lahore", "id": "<your ref>"}   (or a bare JSON string)
+
+Reports are parsed and validated in the same single pass that enqueues
+them; one bad report is rejected on its own and does not fail the batch.
+Structured incidents go straight onto the dispatch queue. Free text is
+triaged (routing and specialist turns, at low quota priority so live callers
+go first) on a small pool and queued when it produces an incident. Every
+accepted report gets a tracking id whose status moves
+triaging -> queued -> dispatched (or unrouted / error).
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agents.dispatch_scheduler import BASE_SEVERITY, PRIORITY_SEVERITY
+from agents.sentiment_agent import SessionSeverity, attach_severity
+from utils.rate_limiter import request_priority
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+BULK_TRIAGE_WORKERS = int(os.getenv("BULK_TRIAGE_WORKERS", "8"))
+MAX_TEXT_CHARS = 4000
+# Tracking records kept for status lookups; the oldest are dropped first
+MAX_TRACKED = 100_000
+
+INCIDENT_TYPES = {name.lower(): name for name in BASE_SEVERITY}
+PRIORITIES = {name.lower(): name for name in PRIORITY_SEVERITY}
+
+
+class BadBatch(ValueError):
+    """The body is not a JSON array or NDJSON at all."""
+
+
+def parse_batch(body: bytes) -> Iterator[Tuple[Any, Optional[str]]]:
+    """
+    (report, None) per element, or (None, error) for an NDJSON line that is
+    not JSON. Lazy for NDJSON, so parsing happens in the caller's pass.
+    """
+    text = body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body
+    stripped = text.lstrip()
+    if not stripped:
+        raise BadBatch("Empty body")
+    if stripped.startswith("["):
+        try:
+            reports = json.loads(stripped)
+        except ValueError as e:
+            raise BadBatch(f"Invalid JSON array: {e}")
+        return ((report, None) for report in reports)
+    return _parse_lines(text)
+
+
+def _parse_lines(text: str) -> Iterator[Tuple[Any, Optional[str]]]:
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+
+
+def validate_report(report: Any) -> Tuple[Optional[str], Any, List[str]]:
+    """
+    (kind, normalized, errors): kind "structured" with an incident dict,
+    "text" with the message, or None with what is wrong.
+    """
+    if isinstance(report, str):
+        report = {"message": report}
+    if not isinstance(report, dict):
+        return None, None, ["Report must be an object or a string"]
+
+    errors = []
+    if "incident_type" in report:
+        incident_type = INCIDENT_TYPES.get(str(report["incident_type"]).strip().lower())
+        if incident_type is None:
+            errors.append(f"incident_type must be one of {', '.join(sorted(BASE_SEVERITY))}")
+        location = report.get("location")
+        if not isinstance(location, str) or not location.strip():
+            errors.append("location is required")
+        for field in ("summary", "details"):
+            if field in report and not isinstance(report[field], str):
+                errors.append(f"{field} must be a string")
+        priority = report.get("priority")
+        if priority is not None and str(priority).lower() not in PRIORITIES:
+            errors.append(f"priority must be one of {', '.join(PRIORITY_SEVERITY)}")
+        severity = report.get("severity")
+        if severity is not None and (isinstance(severity, bool) or not isinstance(severity, (int, float))
+                                     or not 1 <= severity <= 10):
+            errors.append("severity must be a number from 1 to 10")
+        if errors:
+            return None, None, errors
+
+        incident = {
+            "incident_type": incident_type,
+            "location": location.strip(),
+            "summary": (report.get("summary") or f"{incident_type} incident at {location.strip()}")[:MAX_TEXT_CHARS],
+            "details": (report.get("details") or "")[:MAX_TEXT_CHARS],
+        }
+        if priority is not None:
+            incident["priority"] = PRIORITIES[str(priority).lower()]
+        if severity is not None:
+            incident["severity"] = float(severity)
+        return "structured", incident, []
+
+    message = report.get("message") or report.get("text")
+    if not isinstance(message, str) or not message.strip():
+        return None, None, ["Provide incident_type and location, or a message"]
+    if len(message) > MAX_TEXT_CHARS:
+        return None, None, [f"message is longer than {MAX_TEXT_CHARS} characters"]
+    return "text", message.strip(), []
+
+
+class BulkIntake:
+    """
+    Tracks every accepted report by tracking id. triage is a callable
+    (message, tracking_id) -> TriagePipeline.triage result; it is only
+    needed for free-text reports.
+    """
+
+    def __init__(self, scheduler, triage: Optional[Callable[[str, str], Dict[str, Any]]] = None,
+                 workers: int = BULK_TRIAGE_WORKERS, max_items: int = BULK_MAX_ITEMS):
+        self.scheduler = scheduler
+        self.triage = triage
+        self.max_items = max_items
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-triage")
+        self._lock = threading.Lock()
+        self._tracked: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_incident: Dict[Any, str] = {}
+        self.counters = {
+            "batches": 0, "reports": 0, "accepted": 0, "rejected": 0, "structured": 0, "text": 0,
+            "queued": 0, "dispatched": 0, "unrouted": 0, "error": 0,
+        }
+
+    def _track(self, record: Dict[str, Any]):
+        with self._lock:
+            self._tracked[record["tracking_id"]] = record
+            while len(self._tracked) > MAX_TRACKED:
+                _, dropped = self._tracked.popitem(last=False)
+                self._by_incident.pop(dropped.get("incident_id"), None)
+
+    def _set(self, tracking_id: str, **changes):
+        with self._lock:
+            record = self._tracked.get(tracking_id)
+            if record is None:
+                return
+            record.update(changes, updated_at=time.time())
+            if "status" in changes and changes["status"] in self.counters:
+                self.counters[changes["status"]] += 1
+
+    def _enqueue(self, tracking_id: str, incident: Dict[str, Any]) -> float:
+        incident_id = incident.setdefault("id", uuid.uuid4().int & (1 << 31) - 1)
+        incident["tracking_id"] = tracking_id
+        with self._lock:
+            self._by_incident[incident_id] = tracking_id
+        severity = self.scheduler.submit(incident_id, incident)
+        self._set(tracking_id, status="queued", incident_id=incident_id, severity=severity)
+        return severity
+
+    def submit(self, reports: Iterable[Tuple[Any, Optional[str]]]) -> Dict[str, Any]:
+        """Validate and enqueue a parsed batch (parse_batch) in one pass."""
+        started = time.perf_counter()
+        batch_id = uuid.uuid4().hex[:12]
+        items, accepted, rejected = [], 0, 0
+        for index, (report, parse_error) in enumerate(reports):
+            ref = report.get("id") if isinstance(report, dict) else None
+            if index >= self.max_items:
+                errors = [f"Batch limit of {self.max_items} reports exceeded"]
+            elif parse_error:
+                errors = [parse_error]
+            else:
+                kind, value, errors = validate_report(report)
+                if kind == "text" and self.triage is None:
+                    errors = ["Free-text reports are not accepted here"]
+            if errors:
+                rejected += 1
+                items.append({"index": index, "ref": ref, "status": "rejected", "errors": errors})
+                continue
+
+            tracking_id = f"bulk_{uuid.uuid4().hex[:16]}"
+            now = time.time()
+            record = {"tracking_id": tracking_id, "batch_id": batch_id, "ref": ref, "kind": kind,
+                      "status": "triaging", "incident_id": None, "submitted_at": now, "updated_at": now}
+            self._track(record)
+            accepted += 1
+            if kind == "structured":
+                if "severity" not in value and "priority" not in value:
+                    signal = SessionSeverity()
+                    signal.update(f"{value['summary']} {value['details']}")
+                    attach_severity(value, signal)
+                severity = self._enqueue(tracking_id, value)
+                items.append({"index": index, "ref": ref, "tracking_id": tracking_id, "status": "queued",
+                              "incident_id": value["id"], "severity": severity})
+            else:
+                self._pool.submit(self._triage, tracking_id, value)
+                items.append({"index": index, "ref": ref, "tracking_id": tracking_id, "status": "triaging"})
+
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["reports"] += len(items)
+            self.counters["accepted"] += accepted
+            self.counters["rejected"] += rejected
+            for item in items:
+                if item["status"] != "rejected":
+                    self.counters["structured" if "incident_id" in item else "text"] += 1
+        return {"batch_id": batch_id, "accepted": accepted, "rejected": rejected, "items": items,
+                "elapsed_ms": round(1000 * (time.perf_counter() - started), 2)}
+
+    def _triage(self, tracking_id: str, message: str):
+        try:
+            # A backlog must not take quota from callers on the line
+            with request_priority("low"):
+                result = self.triage(message, tracking_id)
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        if result.get("status") == "triaged":
+            self._set(tracking_id, route=result.get("route"))
+            self._enqueue(tracking_id, result["incident"])
+        elif result.get("status") == "unrouted":
+            self._set(tracking_id, status="unrouted", reply=result.get("reply"))
+        else:
+            self._set(tracking_id, status="error", error=result.get("error"))
+
+    def mark_dispatched(self, incident_id: Any, allocation: Dict[str, Any]):
+        """Called by the dispatch worker once the allocator has handled a bulk incident."""
+        with self._lock:
+            tracking_id = self._by_incident.pop(incident_id, None)
+        if tracking_id:
+            self._set(tracking_id, status="dispatched", priority=allocation.get("priority"),
+                      units=allocation.get("assignedUnits"), eta=allocation.get("estimatedDuration"))
+
+    def mark_failed(self, incident_id: Any, error: str):
+        with self._lock:
+            tracking_id = self._by_incident.pop(incident_id, None)
+        if tracking_id:
+            self._set(tracking_id, status="error", error=error)
+
+    def status(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._tracked.get(tracking_id)
+            return dict(record) if record else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(1 for record in self._tracked.values() if record["status"] in ("triaging", "queued"))
+            return {**self.counters, "tracked": len(self._tracked), "pending": pending}
@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.indexed_heap import IndexedHeap
+
+# Starting severity (1-10) by incident type before any other signal arrives
+BASE_SEVERITY = {
+    "Medical": 6.0,
+    "Fire": 7.0,
+    "Disaster": 7.0,
+    "Accident": 6.0,
+    "Crime": 5.0,
+}
+
+PRIORITY_SEVERITY = {"Critical": 9.5, "High": 7.5, "Medium": 5.0, "Low": 2.0}
+
+# Severity points an incident gains per minute it waits, so low-severity
+# reports cannot starve behind a steady stream of urgent ones.
+AGING_PER_MINUTE = 0.2
+
+
+def severity_score(incident_data: Dict[str, Any]) -> float:
+    """Deterministic 1-10 severity for an incident from the data we already have."""
+    severity = incident_data.get("severity")
+    if isinstance(severity, (int, float)):
+        return float(min(10.0, max(1.0, severity)))
+    priority = incident_data.get("priority")
+    if isinstance(priority, str) and priority.title() in PRIORITY_SEVERITY:
+        return PRIORITY_SEVERITY[priority.title()]
+    return BASE_SEVERITY.get(incident_data.get("incident_type"), 5.0)
+
+
+class DispatchScheduler:
+    """
+    Pending incidents ordered by severity plus aging.
+
+    Aging is linear and identical for every incident, so the heap key
+    severity - rate * enqueued_at orders incidents exactly like their
+    effective priority at any moment; time passing never requires touching
+    the heap. Only real severity changes do, and those are O(log n) key
+    updates applied by the background observe loop.
+    """
+
+    def __init__(self, aging_per_minute: float = AGING_PER_MINUTE, clock=time.time):
+        self.aging_per_second = aging_per_minute / 60.0
+        self.clock = clock
+        self._heap = IndexedHeap()
+        self._cond = threading.Condition()
+        self._updates = queue.Queue()
+        self._observer = None
+        self._running = False
+        self.listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _key(self, severity: float, enqueued_at: float) -> float:
+        # Min-heap: more negative = dispatched first
+        return -(severity - self.aging_per_second * enqueued_at)
+
+    def effective_priority(self, entry: Dict[str, Any], now: Optional[float] = None) -> float:
+        now = self.clock() if now is None else now
+        return entry["severity"] + self.aging_per_second * (now - entry["enqueued_at"])
+
+    def submit(self, incident_id: Any, incident_data: Dict[str, Any], severity: Optional[float] = None) -> float:
+        """Queue an incident for allocation; returns the severity it was queued with."""
+        severity = severity_score(incident_data) if severity is None else severity
+        entry = {
+            "incident_id": incident_id,
+            "incident": incident_data,
+            "severity": severity,
+            "enqueued_at": self.clock(),
+        }
+        with self._cond:
+            self._heap.push(incident_id, self._key(severity, entry["enqueued_at"]), entry)
+            self._cond.notify()
+        return severity
+
+    def reprioritize(self, incident_id: Any, severity: float) -> bool:
+        """Apply a new severity to a pending incident immediately (O(log n))."""
+        with self._cond:
+            if incident_id not in self._heap:
+                return False
+            entry = self._heap.value_of(incident_id)
+            entry["severity"] = severity
+            self._heap.update(incident_id, self._key(severity, entry["enqueued_at"]))
+            self._cond.notify()
+        return True
+
+    def observe(self, incident_id: Any, severity: float):
+        """Hand a severity signal to the background reprioritize loop."""
+        self._updates.put((incident_id, severity))
+
+    def cancel(self, incident_id: Any) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            if incident_id not in self._heap:
+                return None
+            return self._heap.remove(incident_id)
+
+    def next(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until an incident is pending and return the most urgent one."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not len(self._heap):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            _, _, entry = self._heap.pop()
+        entry["waited_s"] = round(self.clock() - entry["enqueued_at"], 3)
+        return entry
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Pending incidents in dispatch order (for dashboards; O(n log n))."""
+        now = self.clock()
+        with self._cond:
+            items = self._heap.items()
+        return [
+            {
+                "incident_id": entry["incident_id"],
+                "incident_type": entry["incident"].get("incident_type"),
+                "location": entry["incident"].get("location"),
+                "severity": round(entry["severity"], 2),
+                "effective_priority": round(self.effective_priority(entry, now), 2),
+                "waiting_s": round(now - entry["enqueued_at"], 1),
+            }
+            for _, _, entry in items
+        ]
+
+    # --- Observe -> reprioritize loop ------------------------------------
+
+    def start(self, publish_interval: float = 5.0):
+        """Start the background loop that applies observed severity signals."""
+        if self._observer is not None:
+            return
+        self._running = True
+        self._observer = threading.Thread(target=self._observe_loop, args=(publish_interval,), daemon=True)
+        self._observer.start()
+
+    def stop(self):
+        self._running = False
+        self._updates.put(None)
+        if self._observer is not None:
+            self._observer.join(timeout=2)
+            self._observer = None
+
+    def _observe_loop(self, publish_interval: float):
+        last_publish = 0.0
+        while self._running:
+            try:
+                update = self._updates.get(timeout=publish_interval)
+            except queue.Empty:
+                update = None
+            changed = False
+            while update is not None:
+                changed |= self.reprioritize(*update)
+                try:
+                    update = self._updates.get_nowait()
+                except queue.Empty:
+                    update = None
+            now = time.monotonic()
+            if self.listeners and (changed or now - last_publish >= publish_interval):
+                last_publish = now
+                snapshot = self.snapshot()
+                for listener in self.listeners:
+                    try:
+                        listener(snapshot)
+                    except Exception as e:
+                        print(f"Scheduler    - Listener error: {e}")
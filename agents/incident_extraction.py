@@ -0,0 +1,37 @@
+import re
+
+from tools.gazetteer import shared_gazetteer
+
+# The caller's own words after one of these are taken as the location
+_LOCATION_KEYWORD = re.compile(r"\b(?:at|on|near|in)\b", re.IGNORECASE)
+
+
+def extract_incident_data(agent_response, agent_type, user_message):
+    """Extract incident data from agent response"""
+    # This is a simplified extraction - in reality, you might want more sophisticated parsing
+    incident_types = {
+        'medical': 'Medical',
+        'crime': 'Crime', 
+        'disaster': 'Disaster'
+    }
+    
+    # Try to extract location from user message (simple keyword matching)
+    location = "Unknown location"
+    match = _LOCATION_KEYWORD.search(user_message)
+    if match and user_message[match.end():].strip():
+        location = user_message[match.end():].strip().title()
+    else:
+        # No address in the caller's words; a neighbourhood they named is better than nothing.
+        # A city alone is not ("skardu road", "swat team"): the allocator would dispatch to its centre.
+        place = shared_gazetteer().find(user_message, fuzzy=False)
+        if place and place["kind"] == "area":
+            location = place["name"]
+    
+    incident_data = {
+        "incident_type": incident_types.get(agent_type, "Unknown"),
+        "location": location,
+        "summary": f"{agent_type.title()} incident: {agent_response}",
+        "details": user_message
+    }
+    
+    return incident_data
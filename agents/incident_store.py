@@ -0,0 +1,337 @@
+import copy
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from agents.resource_ledger import haversine_km
+from utils.places_cache import geohash
+
+DELTA_LOG_SIZE = 10000
+
+# Geohash precisions indexed; a box query uses the finest one that covers it
+# in at most MAX_QUERY_CELLS cells (p3 ~150 km, p4 ~20 km, p5 ~5 km, p6 ~1 km)
+INDEX_PRECISIONS = (3, 4, 5, 6)
+MAX_QUERY_CELLS = 256
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Fields the store manages itself; changes to them alone are not a delta
+_BOOKKEEPING = ("updatedAt", "version")
+_INDEXED = ("status", "priority", "location")
+# Incident lifecycle; a stored status never moves back to an earlier one
+STATUS_ORDER = ("active", "responding", "resolved")
+
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    """(lat, lng) degrees spanned by one geohash cell."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def _coordinates(incident: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    location = incident.get("location") or {}
+    lat, lng = location.get("lat"), location.get("lng")
+    if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
+        return None
+    if lat == 0.0 and lng == 0.0:   # geocoding failed
+        return None
+    return float(lat), float(lng)
+
+
+class IncidentStore:
+    """
+    Dispatched incidents in UI format, versioned with a global sequence
+    number. Every change is recorded as a delta of JSON-patch-style ops
+    (add / replace / remove with paths like /incidents/<id>/status), so a
+    dashboard that knows the last seq it applied can catch up with since()
+    instead of refetching every incident.
+
+    Incidents are indexed by status, priority and geohash cell (several
+    precisions), so box, nearest and filtered listings touch only the
+    matching cells and sets instead of scanning every incident.
+    """
+
+    def __init__(self, log_size: int = DELTA_LOG_SIZE):
+        self.log_size = log_size
+        self._incidents: Dict[str, Dict[str, Any]] = {}
+        self._log: List[Dict[str, Any]] = []
+        self._log_start = 1          # seq of self._log[0]
+        self.seq = 0
+        self._created: Dict[str, int] = {}      # incident -> seq it was added at (paging order)
+        self._by_status: Dict[Any, Set[str]] = {}
+        self._by_priority: Dict[Any, Set[str]] = {}
+        self._by_cell: Dict[str, Set[str]] = {}
+        self._coords: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.RLock()
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def __len__(self):
+        return len(self._incidents)
+
+    @staticmethod
+    def _key(incident_id: Any) -> str:
+        return str(incident_id)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    # --- indexes -------------------------------------------------------------
+
+    def _index(self, key: str, incident: Dict[str, Any]):
+        self._by_status.setdefault(incident.get("status"), set()).add(key)
+        self._by_priority.setdefault(incident.get("priority"), set()).add(key)
+        coords = _coordinates(incident)
+        if coords:
+            self._coords[key] = coords
+            cell = geohash(coords[0], coords[1], INDEX_PRECISIONS[-1])
+            for precision in INDEX_PRECISIONS:
+                self._by_cell.setdefault(cell[:precision], set()).add(key)
+
+    def _unindex(self, key: str, incident: Dict[str, Any]):
+        for index, value in ((self._by_status, incident.get("status")), (self._by_priority, incident.get("priority"))):
+            members = index.get(value)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del index[value]
+        coords = self._coords.pop(key, None)
+        if coords:
+            cell = geohash(coords[0], coords[1], INDEX_PRECISIONS[-1])
+            for precision in INDEX_PRECISIONS:
+                members = self._by_cell.get(cell[:precision])
+                if members is not None:
+                    members.discard(key)
+                    if not members:
+                        del self._by_cell[cell[:precision]]
+
+    def _record(self, incident_id: str, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.seq += 1
+        delta = {"seq": self.seq, "incident_id": incident_id, "ops": ops, "at": time.time()}
+        self._log.append(delta)
+        # Trim in chunks so appends stay amortized O(1)
+        if len(self._log) > 2 * self.log_size:
+            drop = len(self._log) - self.log_size
+            del self._log[:drop]
+            self._log_start += drop
+        return delta
+
+    def _publish(self, delta: Optional[Dict[str, Any]]):
+        if delta is None:
+            return
+        for listener in self.listeners:
+            try:
+                listener(delta)
+            except Exception as e:
+                print(f"IncidentStore - Listener error: {e}")
+
+    def get(self, incident_id: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            incident = self._incidents.get(self._key(incident_id))
+            return copy.deepcopy(incident) if incident else None
+
+    @staticmethod
+    def _status_regresses(current: Any, status: Any) -> bool:
+        if current not in STATUS_ORDER or status not in STATUS_ORDER:
+            return False
+        return STATUS_ORDER.index(status) < STATUS_ORDER.index(current)
+
+    def _changes(self, current: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+        changes = {field: value for field, value in fields.items()
+                   if field not in _BOOKKEEPING and current.get(field) != value}
+        if "status" in changes and self._status_regresses(current.get("status"), changes["status"]):
+            # A late or replayed report must not reopen an incident responders moved on
+            del changes["status"]
+        return changes
+
+    def upsert(self, incident: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Add an incident or merge it into the stored one; returns the delta
+        (None if unchanged). Fields missing from incident are kept, and the
+        status only moves forward along STATUS_ORDER.
+        """
+        key = self._key(incident["id"])
+        with self._lock:
+            current = self._incidents.get(key)
+            if current is None:
+                stored = copy.deepcopy(incident)
+                stored["version"] = 1
+                stored.setdefault("updatedAt", self._now())
+                self._incidents[key] = stored
+                self._created[key] = self.seq + 1
+                self._index(key, stored)
+                delta = self._record(key, [{"op": "add", "path": f"/incidents/{key}", "value": copy.deepcopy(stored)}])
+            else:
+                delta = self._apply(key, current, self._changes(current, incident))
+        self._publish(delta)
+        return delta
+
+    def update(self, incident_id: Any, **fields) -> Optional[Dict[str, Any]]:
+        """Change some fields of a stored incident (e.g. status, priority, assignedUnits)."""
+        key = self._key(incident_id)
+        with self._lock:
+            current = self._incidents.get(key)
+            if current is None:
+                raise KeyError(incident_id)
+            delta = self._apply(key, current, self._changes(current, fields))
+        self._publish(delta)
+        return delta
+
+    def _apply(self, key: str, current: Dict[str, Any], changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not changes:
+            return None
+        reindex = any(field in _INDEXED for field in changes)
+        if reindex:
+            self._unindex(key, current)
+        ops = []
+        for field, value in changes.items():
+            op = "replace" if field in current else "add"
+            current[field] = copy.deepcopy(value)
+            ops.append({"op": op, "path": f"/incidents/{key}/{field}", "value": copy.deepcopy(value)})
+        if reindex:
+            self._index(key, current)
+        current["version"] += 1
+        current["updatedAt"] = self._now()
+        ops.append({"op": "replace", "path": f"/incidents/{key}/version", "value": current["version"]})
+        ops.append({"op": "replace", "path": f"/incidents/{key}/updatedAt", "value": current["updatedAt"]})
+        return self._record(key, ops)
+
+    def remove(self, incident_id: Any) -> Optional[Dict[str, Any]]:
+        key = self._key(incident_id)
+        with self._lock:
+            incident = self._incidents.pop(key, None)
+            if incident is None:
+                return None
+            self._unindex(key, incident)
+            del self._created[key]
+            delta = self._record(key, [{"op": "remove", "path": f"/incidents/{key}"}])
+        self._publish(delta)
+        return delta
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every incident plus the seq it is consistent with."""
+        with self._lock:
+            return {"seq": self.seq, "incidents": copy.deepcopy(list(self._incidents.values()))}
+
+    def since(self, seq: int) -> Dict[str, Any]:
+        """
+        Deltas after seq. If seq is older than the retained log (or from a
+        different server run), a full snapshot is returned with reset=True.
+        """
+        with self._lock:
+            if seq > self.seq or seq < self._log_start - 1:
+                return {"reset": True, **self.snapshot()}
+            deltas = self._log[seq - self._log_start + 1:]
+            return {"reset": False, "seq": self.seq, "deltas": copy.deepcopy(deltas)}
+
+    # --- queries -------------------------------------------------------------
+
+    def _filtered(self, keys: Optional[Iterable[str]], status: Any = None, priority: Any = None) -> Set[str]:
+        """keys (None = all) narrowed by the status/priority indexes, smallest set first."""
+        sets = []
+        if status is not None:
+            sets.append(self._by_status.get(status, set()))
+        if priority is not None:
+            sets.append(self._by_priority.get(priority, set()))
+        if keys is not None:
+            sets.append(keys if isinstance(keys, set) else set(keys))
+        if not sets:
+            return set(self._incidents)
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+        return result
+
+    def _page(self, keys: Iterable[str], limit: int, cursor: Optional[int]) -> Dict[str, Any]:
+        """Newest first; cursor is the add-seq of the last incident on the previous page."""
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        created = self._created
+        if cursor is not None:
+            keys = [key for key in keys if created[key] < cursor]
+        else:
+            keys = list(keys)
+        # Only the page is sorted, so a viewport holding most incidents stays cheap
+        top = heapq.nlargest(limit + 1, keys, key=created.__getitem__)
+        page = top[:limit]
+        return {
+            "seq": self.seq,
+            "total": len(keys),
+            "incidents": [copy.deepcopy(self._incidents[key]) for key in page],
+            "next_cursor": created[page[-1]] if len(top) > limit else None,
+        }
+
+    def _cells_for_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Optional[List[str]]:
+        """Geohash cells covering the box at the finest precision within MAX_QUERY_CELLS; None = too big."""
+        for precision in reversed(INDEX_PRECISIONS):
+            dlat, dlng = _cell_size(precision)
+            rows = math.floor(max_lat / dlat) - math.floor(min_lat / dlat) + 1
+            cols = math.floor(max_lng / dlng) - math.floor(min_lng / dlng) + 1
+            if rows * cols > MAX_QUERY_CELLS:
+                continue
+            cells = set()
+            for row in range(rows):
+                lat = min(max_lat, (math.floor(min_lat / dlat) + row + 0.5) * dlat)
+                for col in range(cols):
+                    lng = min(max_lng, (math.floor(min_lng / dlng) + col + 0.5) * dlng)
+                    cells.add(geohash(max(lat, min_lat), max(lng, min_lng), precision))
+            return list(cells)
+        return None
+
+    def _keys_in_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Set[str]:
+        cells = self._cells_for_box(min_lat, min_lng, max_lat, max_lng)
+        if cells is None:
+            candidates = [key for cell, members in self._by_cell.items()
+                          if len(cell) == INDEX_PRECISIONS[0] for key in members]
+        else:
+            candidates = [key for cell in cells for key in self._by_cell.get(cell, ())]
+        coords = self._coords
+        return {key for key in candidates
+                if min_lat <= coords[key][0] <= max_lat and min_lng <= coords[key][1] <= max_lng}
+
+    def query(self, status: Any = None, priority: Any = None, limit: int = DEFAULT_PAGE_SIZE,
+              cursor: Optional[int] = None) -> Dict[str, Any]:
+        """Incidents filtered by status and/or priority, paged newest first."""
+        with self._lock:
+            return self._page(self._filtered(None, status, priority), limit, cursor)
+
+    def in_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float, status: Any = None,
+               priority: Any = None, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None) -> Dict[str, Any]:
+        """Incidents inside a lat/lng bounding box (e.g. the responder map viewport)."""
+        if min_lat > max_lat or min_lng > max_lng:
+            raise ValueError("bounding box min must not exceed max")
+        with self._lock:
+            keys = self._filtered(self._keys_in_box(min_lat, min_lng, max_lat, max_lng), status, priority)
+            return self._page(keys, limit, cursor)
+
+    def nearest(self, lat: float, lng: float, k: int = 10, status: Any = None, priority: Any = None,
+                max_km: float = 50.0, offset: int = 0) -> Dict[str, Any]:
+        """
+        The k nearest incidents to a point within max_km, closest first. The
+        search box doubles from 1 km until it holds offset + k matches (plus
+        one, to know whether there is a next page) whose distances are all
+        within the box's inscribed radius.
+        """
+        k = max(1, min(k, MAX_PAGE_SIZE))
+        wanted = offset + k
+        radius = 1.0
+        with self._lock:
+            while True:
+                dlat = radius / 111.0
+                dlng = radius / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+                keys = self._filtered(self._keys_in_box(lat - dlat, lng - dlng, lat + dlat, lng + dlng), status, priority)
+                ranked = sorted((haversine_km(lat, lng, *self._coords[key]), key) for key in keys)
+                within = [(km, key) for km, key in ranked if km <= radius]
+                if len(within) > wanted or radius >= max_km:
+                    within = [(km, key) for km, key in within if km <= max_km]
+                    break
+                radius = min(radius * 2, max_km)
+            page = within[offset:wanted]
+            return {
+                "seq": self.seq,
+                "incidents": [dict(copy.deepcopy(self._incidents[key]), distance_km=round(km, 3)) for km, key in page],
+                "next_offset": wanted if len(within) > wanted else None,
+            }
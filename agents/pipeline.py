@@ -0,0 +1,199 @@
+"""
+Non-interactive routing -> specialist -> allocator pipeline.
+
+The terminal agents (run_*_agent) and the web server both wait for a live
+caller between turns. A queued report (an SMS backlog after an outage, a
+bulk upload) is complete as it stands, so here it goes through one routing
+turn, one specialist turn and the allocator with no follow-up questions.
+main.py --batch runs many of these on a worker pool (run_batch).
+"""
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Tuple
+
+from agents.incident_extraction import extract_incident_data
+from agents.sentiment_agent import attach_severity
+from agents.speculation import guess_specialist
+from mesh.main_simulation import mesh_bridge
+from utils.global_history import GlobalHistoryManager
+
+SPECIALISTS = ("medical", "crime", "disaster")
+PROGRESS_EVERY_S = 2.0
+
+_JSON_BLOCK = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+
+
+def parse_incident(agent_response: Any) -> Optional[Dict[str, Any]]:
+    """The specialist's structured incident (a JSON object, bare or in a ```json block), if it gave one."""
+    if isinstance(agent_response, dict):
+        candidate = agent_response
+    else:
+        candidate = None
+        match = _JSON_BLOCK.search(agent_response or "")
+        for text in ([match.group(1)] if match else []) + [agent_response or ""]:
+            try:
+                candidate = json.loads(text)
+                break
+            except ValueError:
+                continue
+    if isinstance(candidate, dict) and 'incident_type' in candidate and 'summary' in candidate:
+        return candidate
+    return None
+
+
+class TriagePipeline:
+    """
+    Runs one report at a time per call; safe to call from many threads, as
+    every report gets its own history and chat.
+    """
+
+    def __init__(self, prompts: Dict[str, str], allocator=None, network_type: str = "wifi"):
+        self.prompts = prompts
+        self.allocator = allocator
+        self.network_type = network_type
+
+    def _turn(self, history: GlobalHistoryManager, agent: str, message: str) -> str:
+        chat = history.get_or_create_shared_chat(self.prompts[agent], agent)
+        # Concurrent reports on the relay route share batch frames instead of one frame each
+        response = mesh_bridge({"data": message}, chat.send_message, agent, self.network_type,
+                               batched=True, history=history)
+        return response['data']
+
+    def run(self, message: str, report_id: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        {"id", "status", "route", "incident", "dispatch", "timings"}; status is
+        "dispatched", "unrouted" (neither routing nor keywords name a
+        specialist) or "error".
+        """
+        result = self.triage(message, report_id)
+        if result["status"] != "triaged":
+            return result
+        try:
+            started = time.perf_counter()
+            result["dispatch"] = self.allocator.process_incident(result["incident"])
+            result["timings"]["allocation_s"] = round(time.perf_counter() - started, 3)
+            result["status"] = "dispatched"
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        return result
+
+    def triage(self, message: str, report_id: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Routing and specialist turns only; status "triaged" with a scored
+        incident ready for the allocator (or a dispatch queue), else as run().
+        """
+        history = GlobalHistoryManager()
+        history.start_session(f"batch_{uuid.uuid4().hex[:12]}")
+        result = {"id": report_id, "status": "error", "route": None, "incident": None, "dispatch": None, "timings": {}}
+        timings = result["timings"]
+        try:
+            started = time.perf_counter()
+            routing_response = self._turn(history, "routing", message)
+            timings["routing_s"] = round(time.perf_counter() - started, 3)
+
+            route = routing_response.split("ROUTE:")[-1].strip().lower() if "ROUTE:" in routing_response else None
+            if route not in SPECIALISTS:
+                # Nobody can answer the routing agent's follow-up question; fall back to the keyword guess
+                route = guess_specialist(message)
+                result["routed_by"] = "keywords"
+            if route is None:
+                result.update(status="unrouted", reply=routing_response)
+                return result
+            result["route"] = route
+            history.add_agent_transition("routing", route, "Batch routing")
+
+            started = time.perf_counter()
+            specialist_response = self._turn(history, route, message)
+            timings["specialist_s"] = round(time.perf_counter() - started, 3)
+
+            incident = parse_incident(specialist_response) or extract_incident_data(specialist_response, route, message)
+            incident.setdefault('id', uuid.uuid4().int & (1 << 31) - 1)
+            attach_severity(incident, history.severity)
+            result.update(status="triaged", incident=incident)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+
+def read_reports(source: IO[str]) -> Iterator[Tuple[int, Any, str]]:
+    """
+    (line number, id, message) per input line. A line is a JSON object with
+    "message" (or "text"/"data") and an optional "id", or plain text.
+    """
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        report_id, message = None, line
+        if line.startswith("{"):
+            try:
+                report = json.loads(line)
+                report_id = report.get("id")
+                message = report.get("message") or report.get("text") or report.get("data") or ""
+            except ValueError:
+                pass
+        yield number, report_id, message
+
+
+def run_batch(pipeline: TriagePipeline, reports: Iterable[Tuple[int, Any, str]], sink: IO[str], workers: int = 8,
+              progress: Optional[IO[str]] = sys.stderr) -> Dict[str, Any]:
+    """
+    Run reports through the pipeline on a worker pool, writing one JSON line
+    per result to sink as soon as it is ready (completion order). Reading is
+    lazy and at most 2 x workers reports are in flight, so stdin can stream.
+    """
+    counts = {"reports": 0, "dispatched": 0, "unrouted": 0, "error": 0}
+    latencies = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    last_progress = [started]
+
+    def report_progress(final: bool = False):
+        elapsed = time.perf_counter() - started
+        ordered = sorted(latencies)
+        p50 = ordered[len(ordered) // 2] if ordered else 0.0
+        p95 = ordered[int(len(ordered) * 0.95)] if ordered else 0.0
+        line = (f"[batch] {counts['reports']} done ({counts['dispatched']} dispatched, {counts['unrouted']} unrouted, "
+                f"{counts['error']} errors) in {elapsed:.1f}s, {counts['reports'] / elapsed if elapsed else 0:.2f} reports/s, "
+                f"latency p50 {p50:.1f}s p95 {p95:.1f}s")
+        if progress is not None:
+            print(line + (" - finished" if final else ""), file=progress, flush=True)
+
+    def process(number: int, report_id: Any, message: str) -> Dict[str, Any]:
+        began = time.perf_counter()
+        result = pipeline.run(message, report_id)
+        result["line"] = number
+        result["elapsed_s"] = round(time.perf_counter() - began, 3)
+        return result
+
+    def collect(future):
+        result = future.result()
+        with lock:
+            counts["reports"] += 1
+            counts[result["status"]] += 1
+            latencies.append(result["elapsed_s"])
+            sink.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            sink.flush()
+            if time.perf_counter() - last_progress[0] >= PROGRESS_EVERY_S:
+                last_progress[0] = time.perf_counter()
+                report_progress()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        in_flight = set()
+        for number, report_id, message in reports:
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            in_flight.add(pool.submit(process, number, report_id, message))
+        for future in as_completed(in_flight):
+            collect(future)
+
+    report_progress(final=True)
+    elapsed = time.perf_counter() - started
+    return {**counts, "elapsed_s": round(elapsed, 2), "reports_per_s": round(counts["reports"] / elapsed, 2) if elapsed else 0.0}
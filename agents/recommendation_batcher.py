@@ -0,0 +1,133 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from utils.rate_limiter import current_priority, request_priority
+
+# How long the first request of a batch waits for company while a call slot
+# is free. Requests that arrive while every slot is busy keep accumulating
+# until one frees, so batches grow with load without delaying a lone incident.
+WINDOW_S = float(os.getenv("RECOMMENDATION_BATCH_WINDOW_MS", "20")) / 1000
+MAX_BATCH = int(os.getenv("RECOMMENDATION_BATCH_MAX", "12"))
+MAX_IN_FLIGHT = 2
+
+
+class _Pending:
+    __slots__ = ("request", "level", "context", "done", "result")
+
+    def __init__(self, request: Dict[str, Any], level: int, context: contextvars.Context):
+        self.request = request
+        self.level = level
+        # The submitter's context vars (e.g. the session recorder's allocation), for the pool thread
+        self.context = context
+        self.done = threading.Event()
+        self.result = None
+
+
+class RecommendationBatcher:
+    """
+    Micro-batches dispatch recommendations. Requests are dicts with an "id";
+    generate_batch(requests) returns {id: recommendation} from one LLM call
+    and generate_single(request) is used for a batch of one and for any
+    request the batch answer did not cover (parse failure, missing id, error).
+    """
+
+    def __init__(self, generate_batch: Callable[[List[Dict[str, Any]]], Dict[str, str]],
+                 generate_single: Callable[[Dict[str, Any]], str],
+                 window_s: float = WINDOW_S, max_batch: int = MAX_BATCH, max_in_flight: int = MAX_IN_FLIGHT):
+        self.generate_batch = generate_batch
+        self.generate_single = generate_single
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._pending: List[_Pending] = []
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight + 4, thread_name_prefix="recommend")
+        self.counters = {"requests": 0, "llm_calls": 0, "batches": 0, "batched_requests": 0,
+                         "single_calls": 0, "fallbacks": 0}
+        threading.Thread(target=self._flush_loop, daemon=True, name="recommendation-batcher").start()
+
+    def recommend(self, request: Dict[str, Any]) -> str:
+        return self.recommend_many([request])[0]
+
+    def recommend_many(self, requests: List[Dict[str, Any]]) -> List[str]:
+        """Submit together (so they can share a call) and wait for every recommendation."""
+        level = current_priority()
+        pending = [_Pending(request, level, contextvars.copy_context()) for request in requests]
+        with self._cond:
+            self._pending.extend(pending)
+            self.counters["requests"] += len(pending)
+            self._cond.notify()
+        for item in pending:
+            item.done.wait()
+        return [item.result for item in pending]
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Linger for company, then wait for a free call slot; arrivals keep piling up meanwhile
+            time.sleep(self.window_s)
+            self._slots.acquire()
+            with self._cond:
+                # Most urgent first when the backlog exceeds one batch
+                self._pending.sort(key=lambda item: item.level)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch: List[_Pending]):
+        try:
+            with request_priority(min(item.level for item in batch)):
+                if len(batch) == 1:
+                    self._single(batch[0])
+                    return
+                answers: Dict[str, str] = {}
+                try:
+                    # A batch can span callers; it runs in the most urgent one's context
+                    answers = batch[0].context.run(self.generate_batch, [item.request for item in batch]) or {}
+                except Exception as e:
+                    print(f"Recommender  - Batch of {len(batch)} failed, falling back to single calls: {e}")
+                with self._cond:
+                    self.counters["llm_calls"] += 1
+                    self.counters["batches"] += 1
+                    self.counters["batched_requests"] += len(batch)
+                missing = []
+                for item in batch:
+                    text = answers.get(str(item.request["id"]))
+                    if text:
+                        item.result = text
+                        item.done.set()
+                    else:
+                        missing.append(item)
+                if missing:
+                    with self._cond:
+                        self.counters["fallbacks"] += len(missing)
+                    # Callers are waiting; run the leftovers side by side
+                    for _ in self._pool.map(self._single, missing):
+                        pass
+        finally:
+            self._slots.release()
+            for item in batch:
+                item.done.set()
+
+    def _single(self, item: _Pending):
+        with request_priority(item.level):
+            try:
+                item.result = item.context.run(self.generate_single, item.request)
+            finally:
+                with self._cond:
+                    self.counters["llm_calls"] += 1
+                    self.counters["single_calls"] += 1
+                item.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            counters = dict(self.counters)
+            counters["pending"] = len(self._pending)
+        counters["avg_batch_size"] = round(counters["batched_requests"] / counters["batches"], 2) if counters["batches"] else 0.0
+        counters["calls_per_request"] = round(counters["llm_calls"] / counters["requests"], 3) if counters["requests"] else 0.0
+        return counters
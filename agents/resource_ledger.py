@@ -0,0 +1,372 @@
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Units each facility type can field when we know nothing else about it
+DEFAULT_UNITS = {
+    "Medical": ("Ambulance", 4),
+    "Crime": ("Police Mobile", 3),
+    "Disaster": ("Rescue Team", 2),
+    "Fire": ("Fire Tender", 3),
+    "Accident": ("Traffic Rescue Unit", 3),
+}
+
+AVERAGE_SPEED_KMH = 25.0      # urban Karachi average, lights and sirens
+DISPATCH_OVERHEAD_MIN = 2.0   # crew turnout time
+SATURATION_PENALTY_MIN = 10.0 # extra cost for taking a facility's last units
+GRID_DEG = 0.05               # ~5.5 km spatial index cells
+CANDIDATES_PER_INCIDENT = 5
+RESERVE_ATTEMPTS = 3          # re-rank when the shortlist filled up while its drive times were computed
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in km."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def straight_line_eta(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Estimated minutes to drive between two points without a road graph."""
+    return DISPATCH_OVERHEAD_MIN + haversine_km(lat1, lng1, lat2, lng2) / AVERAGE_SPEED_KMH * 60
+
+
+def min_cost_assignment(cost: List[List[float]]) -> List[int]:
+    """
+    Hungarian algorithm (shortest augmenting path with potentials) for an
+    n x m cost matrix with n <= m. Returns the column assigned to each row.
+    O(n^2 * m).
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    if n > m:
+        raise ValueError("min_cost_assignment needs at least as many columns as rows")
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)     # p[j] = row matched to column j (1-based, 0 = free)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+class ResourceLedger:
+    """
+    In-memory ledger of facilities and their response units.
+
+    Facilities are registered from Places results as they are discovered and
+    get a default unit roster for their incident type. A place that serves
+    several incident types (a police station found for Crime and Accident)
+    is kept once per type, each with its own units. Every dispatch reserves
+    a concrete unit, so later incidents see which facilities are saturated.
+    Facilities are bucketed in a lat/lng grid so candidate lookup only
+    touches nearby cells.
+    """
+
+    def __init__(self, travel_time_fn: Callable[[float, float, float, float], float] = straight_line_eta):
+        self.travel_time_fn = travel_time_fn
+        self.facilities = {}
+        self.units = {}
+        self.reservations = {}
+        self._grid = {}
+        self._lock = threading.RLock()
+
+    # --- facilities ------------------------------------------------------
+
+    @staticmethod
+    def facility_id_for(place: Dict[str, Any], incident_type: str) -> str:
+        name = place.get("displayName", {}).get("text") or place.get("name", "unknown")
+        return f"{name}|{place.get('formattedAddress') or place.get('address', '')}|{incident_type}"
+
+    def upsert_facility(self, place: Dict[str, Any], incident_type: str, capacity: Optional[int] = None) -> str:
+        """Register a Places result (or facility_info dict) for one incident type and return its ledger id."""
+        facility_id = self.facility_id_for(place, incident_type)
+        with self._lock:
+            if facility_id in self.facilities:
+                return facility_id
+            location = place.get("location") or {}
+            lat = location.get("latitude", location.get("lat"))
+            lng = location.get("longitude", location.get("lng"))
+            unit_kind, default_capacity = DEFAULT_UNITS.get(incident_type, ("Response Unit", 2))
+            capacity = capacity if capacity is not None else default_capacity
+            name = place.get("displayName", {}).get("text") or place.get("name", "Unknown facility")
+            self.facilities[facility_id] = {
+                "id": facility_id,
+                "name": name,
+                "address": place.get("formattedAddress") or place.get("address", "Address not available"),
+                "incident_type": incident_type,
+                "lat": lat,
+                "lng": lng,
+                "rating": place.get("rating", "N/A"),
+                "total_ratings": place.get("userRatingCount", place.get("total_ratings", 0)),
+                "capacity": capacity,
+                "in_use": 0,
+                "unit_ids": [],
+            }
+            for n in range(1, capacity + 1):
+                unit_id = f"{facility_id}#{n}"
+                self.units[unit_id] = {
+                    "id": unit_id,
+                    "name": f"{unit_kind} {n} ({name})",
+                    "facility_id": facility_id,
+                    "status": "available",
+                    "incident_id": None,
+                    "eta_minutes": None,
+                }
+                self.facilities[facility_id]["unit_ids"].append(unit_id)
+            if lat is not None and lng is not None:
+                self._grid.setdefault(self._cell(lat, lng), []).append(facility_id)
+            return facility_id
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / GRID_DEG)), int(math.floor(lng / GRID_DEG))
+
+    def free_units(self, facility_id: str) -> int:
+        facility = self.facilities[facility_id]
+        return facility["capacity"] - facility["in_use"]
+
+    def candidates(self, lat: float, lng: float, incident_type: str, k: int = CANDIDATES_PER_INCIDENT,
+                   max_rings: int = 6) -> List[Tuple[float, str]]:
+        """
+        Up to k (eta_minutes, facility_id) with free units, quickest first. The
+        k nearest by straight line are re-ranked by travel_time_fn.
+        """
+        found = []
+        seen = set()
+        cy, cx = self._cell(lat, lng)
+        with self._lock:
+            for ring in range(max_rings + 1):
+                for dy in range(-ring, ring + 1):
+                    for dx in range(-ring, ring + 1):
+                        if max(abs(dy), abs(dx)) != ring:
+                            continue
+                        for facility_id in self._grid.get((cy + dy, cx + dx), ()):
+                            if facility_id in seen:
+                                continue
+                            seen.add(facility_id)
+                            facility = self.facilities[facility_id]
+                            if facility["incident_type"] != incident_type or self.free_units(facility_id) <= 0:
+                                continue
+                            km = haversine_km(lat, lng, facility["lat"], facility["lng"])
+                            found.append((km, facility_id))
+                # Anything in a further ring is at least `ring` cells away
+                if len(found) >= k and ring >= 1:
+                    break
+            found.sort()
+            shortlist = [(facility_id, self.facilities[facility_id]["lat"], self.facilities[facility_id]["lng"])
+                         for _, facility_id in found[:k]]
+        # Drive time only for the straight-line shortlist, outside the lock: it may need a route query
+        ranked = [(self.travel_time_fn(lat, lng, f_lat, f_lng), facility_id) for facility_id, f_lat, f_lng in shortlist]
+        ranked.sort()
+        return ranked
+
+    # --- reservations ------------------------------------------------------
+
+    def _saturation_penalty(self, facility_id: str, slot: int) -> float:
+        facility = self.facilities[facility_id]
+        used_after = facility["in_use"] + slot + 1
+        return SATURATION_PENALTY_MIN * (used_after / facility["capacity"]) ** 2
+
+    def _book(self, incident_id: str, facility_id: str, eta: float) -> Dict[str, Any]:
+        facility = self.facilities[facility_id]
+        unit_id = next(uid for uid in facility["unit_ids"] if self.units[uid]["status"] == "available")
+        unit = self.units[unit_id]
+        unit.update(status="assigned", incident_id=incident_id, eta_minutes=round(eta, 1))
+        facility["in_use"] += 1
+        reservation = {
+            "incident_id": incident_id,
+            "facility_id": facility_id,
+            "facility_name": facility["name"],
+            "unit_id": unit_id,
+            "unit_name": unit["name"],
+            "eta_minutes": round(eta, 1),
+            "reserved_at": time.time(),
+        }
+        self.reservations[incident_id] = reservation
+        return reservation
+
+    def _still_free(self, options: List[Tuple[float, str]]) -> List[Tuple[float, str]]:
+        """Options whose facility kept a free unit while drive times were computed (lock held)."""
+        return [option for option in options if self.free_units(option[1]) > 0]
+
+    def reserve(self, incident_id: str, lat: float, lng: float, incident_type: str) -> Optional[Dict[str, Any]]:
+        """Reserve the best available unit for one incident (O(nearby facilities))."""
+        for _ in range(RESERVE_ATTEMPTS):
+            with self._lock:
+                if incident_id in self.reservations:
+                    return self.reservations[incident_id]
+            # Ranked without the lock: drive times may need a route query
+            ranked = self.candidates(lat, lng, incident_type)
+            if not ranked:
+                return None
+            with self._lock:
+                if incident_id in self.reservations:
+                    return self.reservations[incident_id]
+                options = self._still_free(ranked)
+                if not options:
+                    continue
+                eta, facility_id = min(
+                    options, key=lambda option: option[0] + self._saturation_penalty(option[1], 0)
+                )
+                return self._book(incident_id, facility_id, eta)
+        return None
+
+    def reserve_batch(self, incidents: List[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Jointly assign units to incidents that arrived together.
+
+        Each incident only considers its k nearest facilities with free units.
+        Incidents that share no candidate facility are solved independently,
+        and a component where every incident can get its first choice skips
+        the Hungarian step entirely. Each incident dict needs id, lat, lng
+        and incident_type.
+        """
+        with self._lock:
+            pending = [incident for incident in incidents if incident["id"] not in self.reservations]
+        # Ranked without the lock: drive times may need a route query
+        ranked = {incident["id"]: self.candidates(incident["lat"], incident["lng"], incident["incident_type"])
+                  for incident in pending}
+
+        results = {}
+        with self._lock:
+            options = {}
+            for incident in incidents:
+                if incident["id"] in self.reservations:
+                    results[incident["id"]] = self.reservations[incident["id"]]
+                    continue
+                options[incident["id"]] = self._still_free(ranked.get(incident["id"], []))
+                if not options[incident["id"]]:
+                    results[incident["id"]] = None
+                    del options[incident["id"]]
+
+            for component in self._components(options):
+                results.update(self._assign_component(component, options))
+        return results
+
+    @staticmethod
+    def _components(options: Dict[str, List[Tuple[float, str]]]) -> List[List[str]]:
+        """Group incidents that compete for at least one facility (union-find)."""
+        parent = {incident_id: incident_id for incident_id in options}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        owner = {}
+        for incident_id, choices in options.items():
+            for _, facility_id in choices:
+                if facility_id in owner:
+                    parent[find(incident_id)] = find(owner[facility_id])
+                else:
+                    owner[facility_id] = incident_id
+
+        groups = {}
+        for incident_id in options:
+            groups.setdefault(find(incident_id), []).append(incident_id)
+        return list(groups.values())
+
+    def _assign_component(self, component: List[str], options) -> Dict[str, Optional[Dict[str, Any]]]:
+        # Fast path: nobody is contending for their first choice
+        demand = {}
+        for incident_id in component:
+            first = options[incident_id][0][1]
+            demand[first] = demand.get(first, 0) + 1
+        if all(self.free_units(facility_id) >= count for facility_id, count in demand.items()):
+            return {
+                incident_id: self._book(incident_id, options[incident_id][0][1], options[incident_id][0][0])
+                for incident_id in component
+            }
+
+        # One column per free unit slot, capped by how many incidents could use it
+        slots = []
+        for facility_id in {fid for incident_id in component for _, fid in options[incident_id]}:
+            for slot in range(min(self.free_units(facility_id), len(component))):
+                slots.append((facility_id, slot))
+        unreachable = 1e6
+        # Dummy columns let incidents stay unassigned when units run out
+        n_dummy = len(component)
+        cost = []
+        for incident_id in component:
+            etas = {facility_id: eta for eta, facility_id in options[incident_id]}
+            row = [
+                etas[facility_id] + self._saturation_penalty(facility_id, slot) if facility_id in etas else unreachable
+                for facility_id, slot in slots
+            ]
+            cost.append(row + [unreachable / 2] * n_dummy)
+
+        assignment = min_cost_assignment(cost)
+        results = {}
+        for row, (incident_id, column) in enumerate(zip(component, assignment)):
+            if column >= len(slots) or cost[row][column] >= unreachable:
+                results[incident_id] = None
+                continue
+            facility_id = slots[column][0]
+            eta = next(eta for eta, fid in options[incident_id] if fid == facility_id)
+            results[incident_id] = self._book(incident_id, facility_id, eta)
+        return results
+
+    def release(self, incident_id: str) -> bool:
+        """Return an incident's unit to its facility."""
+        with self._lock:
+            reservation = self.reservations.pop(incident_id, None)
+            if reservation is None:
+                return False
+            unit = self.units[reservation["unit_id"]]
+            unit.update(status="available", incident_id=None, eta_minutes=None)
+            self.facilities[reservation["facility_id"]]["in_use"] -= 1
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Facility utilisation summary for dashboards."""
+        with self._lock:
+            return {
+                "facilities": [
+                    {key: facility[key] for key in ("id", "name", "incident_type", "capacity", "in_use")}
+                    for facility in self.facilities.values()
+                ],
+                "open_reservations": len(self.reservations),
+            }
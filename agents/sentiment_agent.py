@@ -0,0 +1,189 @@
+import math
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from agents.dispatch_scheduler import BASE_SEVERITY
+
+# Lexicon: term -> feature. Multi-word phrases are matched before single
+# tokens so "not breathing" is read as a life threat rather than a negation.
+# Includes common Roman Urdu used by callers in Pakistan.
+LEXICON = {
+    # Immediate threat to life
+    "not breathing": "critical", "not responding": "critical", "not conscious": "critical",
+    "no pulse": "critical", "heart attack": "critical", "cardiac arrest": "critical",
+    "chest pain": "critical", "can't breathe": "critical", "cannot breathe": "critical",
+    "mar gaya": "critical", "saans nahi": "critical",
+    "unconscious": "critical", "unresponsive": "critical", "dying": "critical", "dead": "critical",
+    "killed": "critical", "shot": "critical", "stabbed": "critical", "trapped": "critical",
+    "drowning": "critical", "collapsed": "critical", "seizure": "critical", "overdose": "critical",
+    "behosh": "critical", "khoon": "critical",
+    # Injury
+    "bleeding": "injury", "blood": "injury", "injured": "injury", "injury": "injury",
+    "hurt": "injury", "wound": "injury", "wounded": "injury", "broken": "injury",
+    "fracture": "injury", "burn": "injury", "burns": "injury", "burned": "injury",
+    "pain": "injury", "fainted": "injury", "vomiting": "injury", "zakhmi": "injury", "chot": "injury",
+    # Environmental hazard
+    "fire": "hazard", "smoke": "hazard", "explosion": "hazard", "blast": "hazard",
+    "flood": "hazard", "flooding": "hazard", "gas leak": "hazard", "earthquake": "hazard",
+    "building collapse": "hazard", "electrocuted": "hazard", "aag": "hazard", "selaab": "hazard",
+    # Violence / weapons
+    "gun": "weapon", "guns": "weapon", "gunshot": "weapon", "shooting": "weapon", "firing": "weapon",
+    "knife": "weapon", "armed": "weapon", "weapon": "weapon", "robbery": "weapon",
+    "kidnapped": "weapon", "attack": "weapon", "attacked": "weapon", "goli": "weapon", "dakaiti": "weapon",
+    # Caller distress
+    "help": "distress", "please": "distress", "hurry": "distress", "quickly": "distress",
+    "urgent": "distress", "emergency": "distress", "scared": "distress", "panic": "distress",
+    "screaming": "distress", "crying": "distress", "fast": "distress",
+    "madad": "distress", "jaldi": "distress", "bachao": "distress",
+    # Multiple victims
+    "people": "victims", "children": "victims", "kids": "victims", "many": "victims",
+    "several": "victims", "everyone": "victims", "family": "victims", "log": "victims", "bachay": "victims",
+    # De-escalation
+    "minor": "calm", "small": "calm", "fine": "calm", "okay": "calm", "ok": "calm",
+    "stable": "calm", "safe": "calm", "under control": "calm", "no longer": "calm",
+    "theek": "calm",
+}
+
+NEGATORS = {"no", "not", "never", "without", "isn't", "wasn't", "nobody", "nahi", "nahin"}
+
+# Linear model over log-damped feature counts; sigmoid(z) maps to 1..10.
+WEIGHTS = {
+    "critical": 1.7,
+    "injury": 0.8,
+    "hazard": 0.9,
+    "weapon": 1.0,
+    "distress": 0.35,
+    "victims": 0.45,
+    "calm": -0.9,
+    "negated": -0.5,
+    "exclaim": 0.3,
+    "shouting": 1.0,
+}
+BIAS = -1.4
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_PHRASES = {term: feature for term, feature in LEXICON.items() if " " in term}
+_WORDS = {term: feature for term, feature in LEXICON.items() if " " not in term}
+
+
+class SentimentScorer:
+    """
+    Lexicon plus linear-model severity scorer for caller turns. Pure Python,
+    no model download or network; scoring one turn costs tens of microseconds.
+    """
+
+    def __init__(self, weights: Dict[str, float] = None, bias: float = BIAS):
+        self.weights = dict(WEIGHTS if weights is None else weights)
+        self.bias = bias
+
+    def features(self, text: str) -> Dict[str, float]:
+        counts = defaultdict(int)
+        terms = []
+        tokens = _TOKEN_RE.findall(text.lower())
+        i = 0
+        while i < len(tokens):
+            if i + 1 < len(tokens):
+                phrase = f"{tokens[i]} {tokens[i + 1]}"
+                feature = _PHRASES.get(phrase)
+                if feature:
+                    counts[feature] += 1
+                    terms.append(phrase)
+                    i += 2
+                    continue
+            feature = _WORDS.get(tokens[i])
+            if feature:
+                # "no blood", "not injured": the caller is ruling something out
+                negated = feature != "calm" and any(t in NEGATORS for t in tokens[max(0, i - 2):i])
+                counts["negated" if negated else feature] += 1
+                terms.append(tokens[i])
+            i += 1
+
+        words = [w for w in text.split() if len(w) > 2 and any(c.isalpha() for c in w)]
+        shouted = sum(1 for w in words if w.isupper())
+        values = {name: math.log1p(count) for name, count in counts.items()}
+        values["exclaim"] = math.log1p(min(text.count("!"), 5))
+        values["shouting"] = shouted / len(words) if words else 0.0
+        values["_terms"] = terms
+        return values
+
+    def score(self, text: str) -> Dict[str, Any]:
+        """Severity (1-10) and matched terms for a single turn."""
+        values = self.features(text or "")
+        z = self.bias + sum(self.weights.get(name, 0.0) * value
+                            for name, value in values.items() if name != "_terms")
+        probability = 1.0 / (1.0 + math.exp(-z))
+        return {"severity": round(1.0 + 9.0 * probability, 2), "terms": values["_terms"]}
+
+    def score_batch(self, texts: Iterable[str]) -> List[Dict[str, Any]]:
+        return [self.score(text) for text in texts]
+
+    def score_sessions(self, messages: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Score user turns from many sessions in one pass (history entries as
+        stored by GlobalHistoryManager); returns severity per session_id.
+        """
+        sessions: Dict[str, SessionSeverity] = {}
+        for message in messages:
+            if message.get("role") != "user":
+                continue
+            session_id = message.get("session_id")
+            if session_id not in sessions:
+                sessions[session_id] = SessionSeverity(self)
+            sessions[session_id].update(message.get("content", ""))
+        return {session_id: state.summary() for session_id, state in sessions.items()}
+
+
+class SessionSeverity:
+    """
+    Running severity for one conversation, updated in O(1) per user turn.
+    Blends the worst turn seen so far with a recency-weighted average, so a
+    single alarming report is not forgotten but later calm turns still count.
+    """
+
+    def __init__(self, scorer: Optional[SentimentScorer] = None, alpha: float = 0.5):
+        self.scorer = scorer or default_scorer
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.turns = 0
+        self.peak = 0.0
+        self.recent = 0.0
+        self.terms: List[str] = []
+
+    def update(self, text: str) -> float:
+        result = self.scorer.score(text)
+        severity = result["severity"]
+        self.recent = severity if not self.turns else self.alpha * severity + (1 - self.alpha) * self.recent
+        self.peak = max(self.peak, severity)
+        self.turns += 1
+        self.terms.extend(t for t in result["terms"] if t not in self.terms)
+        return self.severity
+
+    @property
+    def severity(self) -> float:
+        if not self.turns:
+            return 0.0
+        return round(0.6 * self.peak + 0.4 * self.recent, 2)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"severity": self.severity, "peak": self.peak, "turns": self.turns, "terms": self.terms[:20]}
+
+
+def attach_severity(incident_data: Dict[str, Any], session: Optional[SessionSeverity]) -> Dict[str, Any]:
+    """
+    Set incident_data["severity"] from the incident type and what the caller
+    said, before the incident is queued for the allocator.
+    """
+    base = BASE_SEVERITY.get(incident_data.get("incident_type"), 5.0)
+    if session is None or not session.turns:
+        incident_data["severity"] = base
+        return incident_data
+    severity = 0.4 * base + 0.6 * session.severity
+    incident_data["severity"] = round(min(10.0, max(1.0, severity)), 2)
+    incident_data["severity_signal"] = session.summary()
+    return incident_data
+
+
+default_scorer = SentimentScorer()
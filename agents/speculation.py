@@ -0,0 +1,176 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from utils.warmup import get_model
+from utils.rate_limiter import call_with_quota, current_priority, request_priority
+
+# Keyword evidence for each specialist, including Roman Urdu. Multi-word
+# phrases are matched as substrings, single words as tokens.
+SPECIALIST_KEYWORDS = {
+    "medical": {
+        "heart attack", "chest pain", "not breathing", "can't breathe", "cardiac", "unconscious", "fainted",
+        "bleeding", "blood", "injured", "injury", "hurt", "fracture", "broken", "seizure", "pregnant", "labour",
+        "labor", "overdose", "vomiting", "fever", "diabetic", "stroke", "ambulance", "hospital", "doctor",
+        "pain", "burns", "behosh", "khoon", "zakhmi", "chot", "dard", "bemar", "saans",
+    },
+    "crime": {
+        "robbery", "robbed", "thief", "stolen", "theft", "snatched", "mugged", "gun", "gunshot", "shooting",
+        "firing", "knife", "stabbed", "armed", "kidnapped", "kidnapping", "assault", "attacked", "fight",
+        "harassment", "burglary", "break in", "broke in", "police", "threat", "extortion", "dakaiti", "chor",
+        "goli", "choori", "aghwa",
+    },
+    "disaster": {
+        "flood", "flooding", "earthquake", "building collapse", "collapsed building", "landslide", "cyclone",
+        "storm", "fire", "smoke", "explosion", "blast", "gas leak", "electrocuted", "trapped", "rubble",
+        "heatwave", "drowning", "water level", "aag", "selaab", "zalzala", "toofan",
+    },
+}
+
+MIN_SCORE = 1           # at least one keyword
+MIN_MARGIN = 1          # and ahead of the runner-up
+SPECULATION_WORKERS = 4
+# Sessions that never reach triage (hung up, unrouted) stop being timed after this
+TRIAGE_CLOCK_TTL_S = 30 * 60
+MAX_TRACKED_SESSIONS = 10000
+TRIAGE_SAMPLES = 1000   # recent time-to-triage samples kept per mode for the percentiles
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+
+def guess_specialist(message: str) -> Optional[str]:
+    """Cheap local guess of the routing decision; None when the evidence is thin or split."""
+    text = message.lower()
+    tokens = set(_TOKEN_RE.findall(text))
+    scores = {}
+    for specialist, keywords in SPECIALIST_KEYWORDS.items():
+        scores[specialist] = sum(1 for kw in keywords if (kw in text if " " in kw else kw in tokens))
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, top), (_, runner_up) = ranked[0], ranked[1]
+    if top >= MIN_SCORE and top - runner_up >= MIN_MARGIN:
+        return best
+    return None
+
+
+class Speculation:
+    """A specialist turn started before routing has decided."""
+
+    def __init__(self, specialist: str, future):
+        self.specialist = specialist
+        self.future = future
+        self.resolved = False
+
+
+class SpeculativeSpecialist:
+    """
+    While the routing agent classifies the first message, the most likely
+    specialist answers the same message on its own chat (seeded with the
+    conversation so far). If routing picks that specialist, its chat and
+    reply are adopted and the caller gets the first triage question one
+    round-trip sooner; otherwise the reply is dropped.
+    """
+
+    def __init__(self, prompts: Dict[str, str], workers: int = SPECULATION_WORKERS):
+        self.prompts = prompts
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        # Oldest first, so expiry and the size cap only look at the front
+        self._first_message_at: "OrderedDict[str, float]" = OrderedDict()
+        self._triaged: "OrderedDict[str, None]" = OrderedDict()
+        self.counters = {"routing_turns": 0, "speculated": 0, "adopted": 0, "wasted": 0, "not_guessed": 0,
+                         "speculative_calls": 0}
+        self.time_to_triage_s = {"speculative": deque(maxlen=TRIAGE_SAMPLES),
+                                 "sequential": deque(maxlen=TRIAGE_SAMPLES)}
+
+    def start(self, message: str, history: List[Dict[str, Any]]) -> Optional[Speculation]:
+        """Begin the likely specialist's turn; None when there is no confident guess."""
+        with self._lock:
+            self.counters["routing_turns"] += 1
+        specialist = guess_specialist(message)
+        if specialist is None or specialist not in self.prompts:
+            with self._lock:
+                self.counters["not_guessed"] += 1
+            return None
+        with self._lock:
+            self.counters["speculated"] += 1
+        level = current_priority()
+        future = self._pool.submit(self._answer, specialist, message, list(history), level)
+        return Speculation(specialist, future)
+
+    def _answer(self, specialist: str, message: str, history: List[Dict[str, Any]], level: int):
+        chat = get_model(self.prompts[specialist]).start_chat(history=history)
+        with request_priority(level):
+            response = call_with_quota("gemini", lambda: chat.send_message(message))
+        return chat, response.text
+
+    def resolve(self, speculation: Optional[Speculation], route: Optional[str], timeout: float = 30.0):
+        """(chat, reply) if routing chose the speculated specialist, else None (the call was wasted)."""
+        if speculation is None or speculation.resolved:
+            return None
+        speculation.resolved = True
+        with self._lock:
+            self.counters["speculative_calls"] += 1
+        if route != speculation.specialist:
+            with self._lock:
+                self.counters["wasted"] += 1
+            print(f"Speculation  - Routed to {route}, dropping {speculation.specialist} answer")
+            return None
+        try:
+            result = speculation.future.result(timeout=timeout)
+        except Exception as e:
+            print(f"Speculation  - {speculation.specialist} answer failed: {e}")
+            with self._lock:
+                self.counters["wasted"] += 1
+            return None
+        with self._lock:
+            self.counters["adopted"] += 1
+        return result
+
+    def _expire(self, now: float):
+        """Drop triage clocks past TRIAGE_CLOCK_TTL_S and keep both session maps under the cap (lock held)."""
+        clocks = self._first_message_at
+        while clocks and (len(clocks) > MAX_TRACKED_SESSIONS or now - next(iter(clocks.values())) > TRIAGE_CLOCK_TTL_S):
+            clocks.popitem(last=False)
+        while len(self._triaged) > MAX_TRACKED_SESSIONS:
+            self._triaged.popitem(last=False)
+
+    def note_message(self, session_id: str):
+        """Start the triage clock on the session's first message."""
+        now = time.time()
+        with self._lock:
+            if session_id not in self._first_message_at and session_id not in self._triaged:
+                self._first_message_at[session_id] = now
+            self._expire(now)
+
+    def note_triage(self, session_id: str, speculative: bool):
+        """The session's first specialist reply reached the caller."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if session_id in self._triaged or session_id not in self._first_message_at:
+                return
+            self._triaged[session_id] = None
+            elapsed = now - self._first_message_at.pop(session_id)
+            self.time_to_triage_s["speculative" if speculative else "sequential"].append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routing_llm_calls = self.counters["routing_turns"] + self.counters["speculative_calls"]
+            triage = {}
+            for mode, samples in self.time_to_triage_s.items():
+                ordered = sorted(samples)
+                triage[mode] = {
+                    "sessions": len(ordered),
+                    "p50_s": round(ordered[len(ordered) // 2], 2) if ordered else None,
+                    "p95_s": round(ordered[int(len(ordered) * 0.95)], 2) if ordered else None,
+                }
+            return {
+                **self.counters,
+                "hit_ratio": round(self.counters["adopted"] / self.counters["speculative_calls"], 3) if self.counters["speculative_calls"] else 0.0,
+                # Share of all LLM calls made on routing turns that produced nothing
+                "wasted_call_ratio": round(self.counters["wasted"] / routing_llm_calls, 3) if routing_llm_calls else 0.0,
+                "time_to_first_triage_question": triage,
+            }
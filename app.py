@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 from flask_socketio import SocketIO, emit
 import json
 import threading
@@ -7,8 +7,10 @@ from datetime import datetime
 import uuid
 import queue
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import os
 import requests
+import atexit
 
 # Add the current directory to Python path to import modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -17,28 +19,64 @@ from agents.routing_agent import run_routing_agent
 from agents.medical_agent import run_medical_agent
 from agents.crime_agent import run_crime_agent
 from agents.disaster_agent import run_disaster_agent
-from agents.allocator_agent import AllocatorAgent
 from prompts.routing_prompt import routing_system_prompt
 from prompts.medical_prompt import medical_system_prompt
 from prompts.crime_prompt import crime_system_prompt
 from prompts.disaster_prompt import disaster_system_prompt
 from utils.global_history import start_new_session, history_manager, add_agent_transition
 from utils.agent_creation import maps_api_key, api_key
+from utils.warmup import warm_pool
+from agents.dispatch_scheduler import DispatchScheduler
+from agents.sentiment_agent import attach_severity, default_scorer
+from agents.incident_store import IncidentStore
+from agents.incident_extraction import extract_incident_data
+from agents.speculation import SpeculativeSpecialist
+from agents.pipeline import TriagePipeline
+from agents.bulk_intake import BulkIntake, BadBatch, parse_batch
+from utils.single_flight import single_flight_stats
+from utils.rate_limiter import rate_limiter_stats, request_priority
+from utils.circuit_breaker import circuit_breaker_stats
+from tools.gazetteer import shared_gazetteer
+from utils.session_recorder import session_recorder
+from utils.event_stream import EventHub
+from utils.voice_stream import ASRUnavailable, SAMPLE_RATE, VoiceGateway
+from utils.shared_state import SharedState, backend_from_env, sticky_worker
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'emergency_system_secret_key'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
-# Global state for the system
-system_state = {
-    'running': False,
-    'current_agent': 'routing',
-    'session_id': None,
-    'message_queue': queue.Queue(),
-    'log_queue': queue.Queue(),
-    'allocator_agent': None,
-    'start_time': None
-}
+# Session state, history and dashboard membership. With STATE_BACKEND=sqlite:///<path>
+# several workers share them; the default in-memory backend is a single worker.
+# Put a proxy in front that hashes on the swift_worker cookie, e.g. nginx
+# `hash $cookie_swift_worker consistent;`, so a conversation stays with its chat.
+state_backend = backend_from_env()
+WORKER_ID = state_backend.worker_id
+history_manager.backend = state_backend
+atexit.register(state_backend.close)
+
+# Global state for the system; queues and the allocator stay in this worker
+system_state = SharedState(
+    state_backend, 'system',
+    shared={
+        'running': False,
+        'current_agent': 'routing',
+        'session_id': None,
+        'start_time': None
+    },
+    local={
+        'message_queue': queue.Queue(),
+        'log_queue': queue.Queue(),
+        'allocator_agent': None
+    }
+)
+
+def broadcast(event, data):
+    """Emit to this worker's dashboards and relay to the other workers' over the event bus"""
+    socketio.emit(event, data)
+    state_backend.publish('socketio', {'event': event, 'data': data})
+
+state_backend.subscribe('socketio', lambda message: socketio.emit(message['event'], message['data']))
 
 # Agent mapping (same as main.py)
 agents = {
@@ -56,6 +94,69 @@ prompts = {
     "disaster": disaster_system_prompt
 }
 
+# Build models, allocator and connection pools before the first emergency arrives.
+# Runs per worker process, so each gunicorn worker warms itself.
+warm_pool.start(prompts, maps_api_key, api_key)
+
+# While routing decides, the likely specialist answers the same message; set
+# SPECULATIVE_SPECIALIST=0 to go back to strictly sequential turns
+SPECULATE = os.getenv('SPECULATIVE_SPECIALIST', '1') != '0'
+speculator = SpeculativeSpecialist(prompts)
+
+# Pending incidents wait here; the observe loop applies severity updates and
+# publishes the re-ordered queue to connected dashboards.
+dispatch_scheduler = DispatchScheduler()
+dispatch_scheduler.listeners.append(lambda snapshot: socketio.emit('dispatch_queue', snapshot))
+dispatch_scheduler.start()
+
+# Integrations submit report batches here; free text is triaged without a caller on the line
+bulk_intake = BulkIntake(dispatch_scheduler, triage=TriagePipeline(prompts).triage)
+
+# Dispatched incidents; dashboards apply the published deltas and resync with ?since=<seq>
+incident_store = IncidentStore()
+incident_store.listeners.append(lambda delta: socketio.emit('incident_delta', delta))
+
+# Responder UIs subscribe here directly (SSE or the /dispatch Socket.IO namespace)
+dispatch_hub = EventHub()
+
+# The legacy Node bridge (frontend_bridge.js) is an extra hop; set FRONTEND_BRIDGE_URL=http://localhost:3001 to keep feeding it
+FRONTEND_BRIDGE_URL = os.getenv("FRONTEND_BRIDGE_URL", "")
+bridge_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="frontend-bridge")
+
+def publish_incident_delta(delta):
+    """New incidents go out whole as 'dispatch'; later changes as 'incident_delta'"""
+    first = delta['ops'][0]
+    if first['op'] == 'add' and first['path'] == f"/incidents/{delta['incident_id']}":
+        dispatch_hub.publish('dispatch', first['value'])
+    else:
+        dispatch_hub.publish('incident_delta', delta)
+
+incident_store.listeners.append(publish_incident_delta)
+
+# Every worker keeps a replica of the store so its own dashboards and map
+# queries see incidents dispatched elsewhere. Each change ships the whole
+# incident; seq numbers are per worker.
+_replica = threading.local()
+
+def replicate_incident(delta):
+    if getattr(_replica, 'applying', False):
+        return
+    incident_id = delta['incident_id']
+    state_backend.publish('incident', {'id': incident_id, 'incident': incident_store.get(incident_id)})
+
+def apply_replicated_incident(message):
+    _replica.applying = True
+    try:
+        if message['incident'] is None:
+            incident_store.remove(message['id'])
+        else:
+            incident_store.upsert(message['incident'])
+    finally:
+        _replica.applying = False
+
+incident_store.listeners.append(replicate_incident)
+state_backend.subscribe('incident', apply_replicated_incident)
+
 def log_message(message_type, content, agent=None):
     """Log a message to be displayed in the orchestration logs"""
     timestamp = datetime.now().strftime("%H:%M:%S")
@@ -68,57 +169,30 @@ def log_message(message_type, content, agent=None):
     system_state['log_queue'].put(log_entry)
     
     # Emit to all connected clients
-    socketio.emit('new_log', log_entry)
+    broadcast('new_log', log_entry)
 
 def process_user_message(message):
     """Process user message through the multi-agent system"""
+    speculation = None
     try:
         current_agent = system_state['current_agent']
+        # The session may have been started on another worker
+        history_manager.adopt_session(system_state['session_id'])
+        speculator.note_message(history_manager.current_session_id)
         
         log_message('user', f"You: {message}", current_agent)
         
         if current_agent.lower() in agents:
-            # Create a modified version of the agent that works with our UI
-            result = run_agent_with_ui(current_agent.lower(), message)
-            
-            if isinstance(result, dict) and "incident_type" in result:
-                # Forward to allocator agent
-                log_message('system', "\nForwarding incident summary to Allocator Agent...", 'allocator')
-                
-                if system_state['allocator_agent'] is None:
-                    system_state['allocator_agent'] = AllocatorAgent(maps_api_key, api_key)
-                
-                allocation_result = system_state['allocator_agent'].process_incident(result)
-                
-                log_message('dispatch', f"\n DISPATCH REPORT:\n{json.dumps(allocation_result, indent=2)}", 'allocator')
-                
-                # Send dispatch report to React frontend
-                send_dispatch_to_frontend(allocation_result)
-                
-                # End the session
-                system_state['current_agent'] = None
-                system_state['running'] = False
-                
-                # Emit final dispatch report
-                socketio.emit('dispatch_report', allocation_result)
-                
-            else:
-                # Agent wants to transition to another agent
-                new_agent = result.lower() if result else None
-                if new_agent and new_agent != current_agent:
-                    add_agent_transition(current_agent, new_agent, "System routing")
-                    system_state['current_agent'] = new_agent
-                    
-                    log_message('system', f"\nRouting complete. Handing off to {new_agent} agent...\n", 'system')
-                    socketio.emit('agent_changed', {
-                        'old_agent': current_agent,
-                        'new_agent': new_agent,
-                        'transitions': len(history_manager.agent_transitions)
-                    })
-                elif new_agent is None:
-                    # Agent is continuing conversation (no transition needed)
-                    log_message('system', f"Continuing conversation with {current_agent} agent...", 'system')
-                    # Keep the current agent and system running
+            # A caller on the line outranks background enrichment for Gemini quota
+            priority = 'critical' if history_manager.severity.severity >= 8 else 'high'
+            with request_priority(priority):
+                if SPECULATE and current_agent == 'routing':
+                    # The likely specialist answers in parallel with the routing decision
+                    speculation = speculator.start(message, history_manager.chat_history())
+                # Create a modified version of the agent that works with our UI
+                result = run_agent_with_ui(current_agent.lower(), message)
+            broadcast('severity_update', history_manager.severity.summary())
+            apply_agent_result(current_agent, result, message, speculation)
         else:
             log_message('error', f"Unknown agent: {current_agent}", 'system')
             system_state['running'] = False
@@ -126,6 +200,108 @@ def process_user_message(message):
     except Exception as e:
         log_message('error', f"Error processing message: {str(e)}", 'system')
         print(f"Error in process_user_message: {e}")
+    finally:
+        # Anything not adopted by now was a wasted call
+        speculator.resolve(speculation, None)
+
+def apply_agent_result(current_agent, result, message, speculation=None):
+    """Act on what an agent turn produced: queue an incident, hand off, or keep talking"""
+    if isinstance(result, dict) and "incident_type" in result:
+        # Queue for the allocator; the dispatch worker takes the most urgent incident first
+        incident_id = result.setdefault('id', uuid.uuid4().int & (1<<31)-1)
+        attach_severity(result, history_manager.severity)
+        severity = dispatch_scheduler.submit(incident_id, result)
+        log_message('system', f"\nIncident {incident_id} queued for Allocator Agent (severity {severity:.1f}, {len(dispatch_scheduler)} pending)", 'allocator')
+        
+        # End the session
+        system_state.update(current_agent=None, running=False)
+        
+    else:
+        # Agent wants to transition to another agent
+        new_agent = result.lower() if result else None
+        if new_agent and new_agent != current_agent:
+            add_agent_transition(current_agent, new_agent, "System routing")
+            system_state['current_agent'] = new_agent
+            
+            log_message('system', f"\nRouting complete. Handing off to {new_agent} agent...\n", 'system')
+            broadcast('agent_changed', {
+                'old_agent': current_agent,
+                'new_agent': new_agent,
+                'transitions': len(history_manager.agent_transitions)
+            })
+            adopted = speculator.resolve(speculation, new_agent)
+            if adopted:
+                # The specialist already answered this message on its own chat
+                chat, agent_response = adopted
+                history_manager.adopt_chat(chat, new_agent)
+                history_manager.add_message("assistant", agent_response, new_agent)
+                log_message('system', f"Speculative {new_agent} answer adopted", 'system')
+                next_result = handle_agent_response(new_agent, agent_response, message, speculative=True)
+                apply_agent_result(new_agent, next_result, message)
+        elif new_agent is None:
+            # Agent is continuing conversation (no transition needed)
+            log_message('system', f"Continuing conversation with {current_agent} agent...", 'system')
+            # Keep the current agent and system running
+
+# A backlog is allocated together: joint unit assignment and one batched recommendation call
+DISPATCH_BATCH_MAX = 8
+
+def allocate_entries(entries):
+    """One result per queued entry; an incident that fails gets {"id", "error"} without failing the others"""
+    allocator = system_state['allocator_agent']
+    if len(entries) == 1:
+        try:
+            return [allocator.process_incident(entries[0]['incident'])]
+        except Exception as e:
+            return [{'id': entries[0]['incident_id'], 'error': str(e)}]
+    try:
+        return allocator.process_incidents([entry['incident'] for entry in entries])
+    except Exception as e:
+        # Joint assignment failed as a whole; give every incident its own chance
+        log_message('error', f"Batch allocation failed ({e}); allocating {len(entries)} incidents one at a time", 'allocator')
+        return [result for entry in entries for result in allocate_entries([entry])]
+
+def dispatch_worker():
+    """Allocate queued incidents, most urgent first"""
+    while True:
+        entries = [dispatch_scheduler.next()]
+        while len(entries) < DISPATCH_BATCH_MAX:
+            entry = dispatch_scheduler.next(timeout=0)
+            if entry is None:
+                break
+            entries.append(entry)
+        ids = ", ".join(str(entry['incident_id']) for entry in entries)
+        try:
+            if system_state['allocator_agent'] is None:
+                system_state['allocator_agent'] = warm_pool.get_allocator(maps_api_key, api_key)
+            
+            for entry in entries:
+                log_message('system', f"Allocating incident {entry['incident_id']} (severity {entry['severity']:.1f}, waited {entry['waited_s']}s)", 'allocator')
+            allocation_results = allocate_entries(entries)
+            
+            for allocation_result in allocation_results:
+                if 'error' in allocation_result:
+                    log_message('error', f"Error allocating incident {allocation_result['id']}: {allocation_result['error']}", 'allocator')
+                    bulk_intake.mark_failed(allocation_result['id'], allocation_result['error'])
+                    continue
+                log_message('dispatch', f"\n DISPATCH REPORT:\n{json.dumps(allocation_result, indent=2)}", 'allocator')
+                # Storing it publishes the dispatch to every connected responder UI
+                incident_store.upsert(allocation_result)
+                bulk_intake.mark_dispatched(allocation_result['id'], allocation_result)
+                
+                # Legacy Node bridge, opt-in with FRONTEND_BRIDGE_URL; posted off this loop so a slow bridge cannot hold the queue
+                if FRONTEND_BRIDGE_URL:
+                    bridge_pool.submit(send_dispatch_to_frontend, allocation_result)
+                
+                # Emit final dispatch report
+                broadcast('dispatch_report', allocation_result)
+        except Exception as e:
+            log_message('error', f"Error allocating incident {ids}: {str(e)}", 'allocator')
+            for entry in entries:
+                bulk_intake.mark_failed(entry['incident_id'], str(e))
+            print(f"Error in dispatch_worker: {e}")
+
+threading.Thread(target=dispatch_worker, daemon=True, name='dispatch-worker').start()
 
 def run_agent_with_ui(agent_name, user_message):
     """Run an agent with UI integration instead of terminal input"""
@@ -146,16 +322,20 @@ def run_agent_with_ui(agent_name, user_message):
     }
     
     response = mesh_bridge(user_json, chat.send_message, agent_name)
-    agent_response = response['data']
-    
+    return handle_agent_response(agent_name, response['data'], user_message)
+
+def handle_agent_response(agent_name, agent_response, user_message, speculative=False):
+    """Show an agent's reply and work out whether it routes, reports an incident, or continues"""
     log_message('agent', f"{agent_name.title()} Agent: {agent_response}", agent_name)
     
     # Send agent response to chat interface
-    socketio.emit('agent_response', {
+    broadcast('agent_response', {
         'agent': agent_name,
         'message': agent_response,
         'timestamp': datetime.now().strftime("%H:%M:%S")
     })
+    if agent_name != 'routing':
+        speculator.note_triage(history_manager.current_session_id, speculative)
     
     # Check if this agent wants to route to another agent
     if "ROUTE:" in agent_response:
@@ -177,41 +357,13 @@ def run_agent_with_ui(agent_name, user_message):
     
     return None
 
-def extract_incident_data(agent_response, agent_type, user_message):
-    """Extract incident data from agent response"""
-    # This is a simplified extraction - in reality, you might want more sophisticated parsing
-    incident_types = {
-        'medical': 'Medical',
-        'crime': 'Crime', 
-        'disaster': 'Disaster'
-    }
-    
-    # Try to extract location from user message (simple keyword matching)
-    location_keywords = ['at', 'on', 'near', 'in']
-    location = "Unknown location"
-    for keyword in location_keywords:
-        if keyword in user_message.lower():
-            parts = user_message.lower().split(keyword)
-            if len(parts) > 1:
-                location = parts[1].strip().title()
-                break
-    
-    incident_data = {
-        "incident_type": incident_types.get(agent_type, "Unknown"),
-        "location": location,
-        "summary": f"{agent_type.title()} incident: {agent_response}",
-        "details": user_message
-    }
-    
-    return incident_data
-
 def send_dispatch_to_frontend(dispatch_data):
-    """Send dispatch report to React frontend"""
+    """Send dispatch report to the legacy Node bridge (UIs can use /api/dispatch/stream instead)"""
+    # The bridge server relays to the deployed React app; only used when FRONTEND_BRIDGE_URL is set
+    frontend_url = FRONTEND_BRIDGE_URL
+    if not frontend_url:
+        return
     try:
-        # Frontend bridge server URL - use local bridge server
-        # The bridge server will handle sending to the deployed React app
-        frontend_url = "http://localhost:3001"
-        
         # Prepare data in the format expected by React frontend
         emergency_data = {
             "success": True,
@@ -251,6 +403,17 @@ def index():
 def debug():
     return render_template('debug.html')
 
+@app.route('/health/live')
+def health_live():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness probe: only report ready once warm-up has finished"""
+    status = warm_pool.status()
+    return jsonify(status), (200 if status['ready'] else 503)
+
 @app.route('/api/system/start', methods=['POST'])
 def start_system():
     """Start the multi-agent system"""
@@ -260,10 +423,12 @@ def start_system():
     try:
         # Initialize new session
         start_new_session()
-        system_state['session_id'] = history_manager.current_session_id
-        system_state['running'] = True
-        system_state['current_agent'] = 'routing'
-        system_state['start_time'] = time.time()
+        system_state.update(
+            session_id=history_manager.current_session_id,
+            running=True,
+            current_agent='routing',
+            start_time=time.time()
+        )
         
         log_message('system', "Multi-Agent Emergency System Started", 'system')
         log_message('system', "Centralized history management active", 'system')
@@ -272,12 +437,16 @@ def start_system():
         # Get initial stats
         stats = history_manager.get_stats()
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'session_id': system_state['session_id'],
             'current_agent': system_state['current_agent'],
+            'worker': WORKER_ID,
             'stats': stats
         })
+        # The proxy routes the rest of this conversation to the worker holding its chat
+        response.set_cookie('swift_worker', WORKER_ID, samesite='Lax')
+        return response
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -289,8 +458,7 @@ def stop_system():
         return jsonify({'success': False, 'error': 'System not running'})
     
     try:
-        system_state['running'] = False
-        system_state['current_agent'] = None
+        system_state.update(running=False, current_agent=None)
         
         # Print final session summary
         log_message('system', "\n" + "="*60, 'system')
@@ -343,7 +511,8 @@ def send_dummy_data():
         log_message('test', f"Sending dummy emergency data to frontend", 'system')
         log_message('test', f"Dummy emergency ID: {dummy_data['data']['emergencies'][0]['id']}", 'system')
         
-        # Send to frontend bridge server
+        # Publish on the dispatch stream (and the legacy bridge if configured)
+        incident_store.upsert(dummy_data['data']['emergencies'][0])
         send_dispatch_to_frontend(dummy_data['data']['emergencies'][0])
         
         return jsonify({
@@ -393,10 +562,70 @@ def export_messages():
     
     return jsonify(export_data)
 
+@app.route('/api/resources', methods=['GET'])
+def get_resources():
+    """Facility capacity and open unit reservations"""
+    allocator = warm_pool.get_allocator(maps_api_key, api_key)
+    return jsonify(allocator.ledger.snapshot())
+
+@app.route('/api/incidents/<incident_id>/release', methods=['POST'])
+def release_incident(incident_id):
+    """Return the unit reserved for a resolved incident to its facility"""
+    allocator = warm_pool.get_allocator(maps_api_key, api_key)
+    if allocator.release_incident(incident_id):
+        log_message('system', f"Released resources for incident {incident_id}", 'allocator')
+        if incident_store.get(incident_id):
+            incident_store.update(incident_id, status='resolved')
+        return jsonify({'success': True})
+    return jsonify({'success': False, 'error': 'No reservation for incident'}), 404
+
+# Callers can speak instead of type: /voice streams PCM frames, each utterance's transcript is a message
+def handle_voice_transcript(sid, text, info):
+    socketio.emit('voice_transcript', {'text': text, **info}, to=sid, namespace='/voice')
+    if not system_state['running']:
+        socketio.emit('voice_error', {'error': 'System not running'}, to=sid, namespace='/voice')
+        return
+    log_message('system', f"Voice transcript ready {info['eos_to_transcript_ms']:.0f} ms after end of speech", 'system')
+    threading.Thread(target=process_user_message, args=(text,)).start()
+
+voice_gateway = VoiceGateway(
+    on_transcript=handle_voice_transcript,
+    on_partial=lambda sid, text: socketio.emit('voice_partial', {'text': text}, to=sid, namespace='/voice'),
+)
+
+@socketio.on('voice_start', namespace='/voice')
+def handle_voice_start(data=None):
+    """Open an audio stream: {sample_rate} of the 16-bit mono PCM frames that follow"""
+    sample_rate = (data or {}).get('sample_rate', SAMPLE_RATE) if isinstance(data, dict) else SAMPLE_RATE
+    if not isinstance(sample_rate, int) or not 8000 <= sample_rate <= 48000:
+        return {'success': False, 'error': 'sample_rate must be an integer from 8000 to 48000'}
+    try:
+        voice_gateway.open(request.sid, sample_rate)
+    except ASRUnavailable as e:
+        return {'success': False, 'error': str(e)}
+    return {'success': True, 'sample_rate': sample_rate}
+
+@socketio.on('voice_frame', namespace='/voice')
+def handle_voice_frame(data):
+    """Raw PCM bytes, or {seq, audio} so chunks handled on different threads stay in order"""
+    audio, seq = (data.get('audio'), data.get('seq')) if isinstance(data, dict) else (data, None)
+    if isinstance(audio, (bytes, bytearray)):
+        voice_gateway.feed(request.sid, bytes(audio), seq if isinstance(seq, int) else None)
+
+@socketio.on('voice_stop', namespace='/voice')
+def handle_voice_stop():
+    """End of the stream; whatever the caller was saying is transcribed now"""
+    voice_gateway.close(request.sid)
+
+@socketio.on('disconnect', namespace='/voice')
+def handle_voice_disconnect():
+    voice_gateway.close(request.sid, flush=False)
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    emit('connected', {'message': 'Connected to emergency system'})
+    emit('connected', {'message': 'Connected to emergency system', 'worker': WORKER_ID})
+    state_backend.join_room('dashboard', request.sid)
     
     # Send current system status
     stats = history_manager.get_stats()
@@ -416,12 +645,206 @@ def handle_test(data):
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
+    state_backend.leave_room('dashboard', request.sid)
     print('Client disconnected')
 
+@app.route('/api/v1/emergencies', methods=['GET'])
+def get_emergencies():
+    """All dispatched incidents, or only the deltas after ?since=<seq>"""
+    since = request.args.get('since', type=int)
+    if since is None:
+        snapshot = incident_store.snapshot()
+        return jsonify({'success': True, 'data': {'emergencies': snapshot['incidents'], 'seq': snapshot['seq']}})
+    return jsonify({'success': True, 'data': incident_store.since(since)})
+
+@app.route('/api/v1/emergencies/<incident_id>/acknowledge', methods=['POST'])
+def acknowledge_emergency(incident_id):
+    """Mark an incident as being responded to"""
+    if not incident_store.get(incident_id):
+        return jsonify({'success': False, 'message': 'Emergency not found'}), 404
+    delta = incident_store.update(incident_id, status='responding')
+    return jsonify({'success': True, 'message': 'Emergency acknowledged', 'seq': delta['seq'] if delta else incident_store.seq})
+
+def _last_event_id(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/api/dispatch/stream', methods=['GET'])
+def dispatch_stream():
+    """Server-sent dispatch events; reconnects resume from the Last-Event-ID header"""
+    last_event_id = _last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    subscriber = dispatch_hub.subscribe(last_event_id)
+    return Response(
+        stream_with_context(dispatch_hub.sse(subscriber)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'Connection': 'keep-alive'},
+    )
+
+# Socket.IO clients on /dispatch get the same events; each has a pump task draining its buffer
+dispatch_clients = {}
+
+def pump_dispatch_events(sid, subscriber):
+    while not subscriber.closed:
+        event = subscriber.next(timeout=dispatch_hub.heartbeat_s)
+        if event is None:
+            if not subscriber.closed:
+                socketio.emit('heartbeat', {'last_id': dispatch_hub.last_id, 'time': time.time()}, to=sid, namespace='/dispatch')
+            continue
+        socketio.emit(event['event'], {'id': event['id'], 'data': event['data']}, to=sid, namespace='/dispatch')
+
+@socketio.on('connect', namespace='/dispatch')
+def handle_dispatch_connect(auth=None):
+    """Subscribe to dispatches; pass {last_event_id} as auth or query to resume"""
+    last_event_id = _last_event_id((auth or {}).get('last_event_id') if isinstance(auth, dict) else None)
+    if last_event_id is None:
+        last_event_id = _last_event_id(request.args.get('last_event_id'))
+    subscriber = dispatch_hub.subscribe(last_event_id)
+    dispatch_clients[request.sid] = subscriber
+    state_backend.join_room('dispatch', request.sid)
+    socketio.start_background_task(pump_dispatch_events, request.sid, subscriber)
+
+@socketio.on('disconnect', namespace='/dispatch')
+def handle_dispatch_disconnect():
+    subscriber = dispatch_clients.pop(request.sid, None)
+    state_backend.leave_room('dispatch', request.sid)
+    if subscriber:
+        dispatch_hub.unsubscribe(subscriber)
+
+@app.route('/api/incidents', methods=['GET'])
+def list_incidents():
+    """Incidents filtered by ?status= and ?priority=, paged newest first with ?limit= and ?cursor="""
+    return jsonify(incident_store.query(
+        status=request.args.get('status'),
+        priority=request.args.get('priority'),
+        limit=request.args.get('limit', 100, type=int),
+        cursor=request.args.get('cursor', type=int),
+    ))
+
+@app.route('/api/incidents/bulk', methods=['POST'])
+def bulk_incidents():
+    """Queue a batch of reports (JSON array or NDJSON; structured incidents or free text); one tracking id per report"""
+    try:
+        result = bulk_intake.submit(parse_batch(request.get_data()))
+    except (BadBatch, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    log_message('system', f"Bulk batch {result['batch_id']}: {result['accepted']} accepted, {result['rejected']} rejected", 'system')
+    return jsonify({'success': True, **result}), 202
+
+@app.route('/api/incidents/bulk/<tracking_id>', methods=['GET'])
+def bulk_incident_status(tracking_id):
+    """Where a bulk report is: triaging, queued, dispatched, unrouted or error"""
+    record = bulk_intake.status(tracking_id)
+    if record is None:
+        return jsonify({'success': False, 'error': 'Unknown tracking id'}), 404
+    return jsonify({'success': True, **record})
+
+@app.route('/api/incidents/bbox', methods=['GET'])
+def incidents_in_box():
+    """Incidents inside ?min_lat=&min_lng=&max_lat=&max_lng= (the map viewport), paged like /api/incidents"""
+    bounds = [request.args.get(name, type=float) for name in ('min_lat', 'min_lng', 'max_lat', 'max_lng')]
+    if any(value is None for value in bounds):
+        return jsonify({'success': False, 'error': 'min_lat, min_lng, max_lat and max_lng are required'}), 400
+    try:
+        return jsonify(incident_store.in_box(
+            *bounds,
+            status=request.args.get('status'),
+            priority=request.args.get('priority'),
+            limit=request.args.get('limit', 100, type=int),
+            cursor=request.args.get('cursor', type=int),
+        ))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/incidents/nearest', methods=['GET'])
+def nearest_incidents():
+    """The ?k= incidents closest to ?lat=&lng= within ?max_km=, paged with ?offset="""
+    lat, lng = request.args.get('lat', type=float), request.args.get('lng', type=float)
+    if lat is None or lng is None:
+        return jsonify({'success': False, 'error': 'lat and lng are required'}), 400
+    return jsonify(incident_store.nearest(
+        lat, lng,
+        k=request.args.get('k', 10, type=int),
+        status=request.args.get('status'),
+        priority=request.args.get('priority'),
+        max_km=request.args.get('max_km', 50.0, type=float),
+        offset=request.args.get('offset', 0, type=int),
+    ))
+
+@app.route('/api/severity/score', methods=['POST'])
+def score_severity():
+    """Batch-score caller text: {"texts": [...]} or history entries {"messages": [...]} across sessions"""
+    data = request.get_json() or {}
+    if isinstance(data.get('messages'), list):
+        return jsonify({'sessions': default_scorer.score_sessions(data['messages'])})
+    if isinstance(data.get('texts'), list):
+        return jsonify({'scores': default_scorer.score_batch(str(text) for text in data['texts'])})
+    return jsonify({'success': False, 'error': 'Provide a texts or messages list'}), 400
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Counters for external-call deduplication, caching, quota throttling and circuit breakers"""
+    allocator = system_state['allocator_agent'] or warm_pool.allocator
+    return jsonify({
+        'single_flight': single_flight_stats(),
+        'rate_limits': rate_limiter_stats(),
+        'circuit_breakers': circuit_breaker_stats(),
+        'gazetteer': shared_gazetteer().stats(),
+        'session_recorder': session_recorder.stats(),
+        'dispatch_stream': dispatch_hub.stats(),
+        'places_cache': allocator.places_cache.stats() if allocator else None,
+        'road_router': allocator.router.stats() if allocator else None,
+        'speculation': speculator.stats(),
+        'recommendations': allocator.recommender.stats() if allocator else None,
+        'bulk_intake': bulk_intake.stats(),
+        'voice': voice_gateway.stats(),
+    })
+
+@app.route('/api/dispatch/queue', methods=['GET'])
+def get_dispatch_queue():
+    """Pending incidents in dispatch order"""
+    return jsonify({'pending': dispatch_scheduler.snapshot()})
+
+@app.route('/api/incidents/<incident_id>/severity', methods=['POST'])
+def update_incident_severity(incident_id):
+    """Feed a new severity signal for a pending incident into the reprioritize loop"""
+    data = request.get_json() or {}
+    severity = data.get('severity')
+    if not isinstance(severity, (int, float)):
+        return jsonify({'success': False, 'error': 'severity must be a number'}), 400
+    try:
+        incident_id = int(incident_id)
+    except ValueError:
+        pass
+    dispatch_scheduler.observe(incident_id, float(severity))
+    return jsonify({'success': True})
+
+@app.route('/api/scale/status', methods=['GET'])
+def get_scale_status():
+    """Live workers, which one owns the current session, and connected clients per worker"""
+    workers = state_backend.live_workers()
+    session_id = system_state['session_id']
+    rooms = {}
+    for room in ('dashboard', 'dispatch'):
+        per_worker = {}
+        for member in state_backend.room_members(room):
+            per_worker[member['worker']] = per_worker.get(member['worker'], 0) + 1
+        rooms[room] = per_worker
+    return jsonify({
+        'backend': type(state_backend).__name__,
+        'worker': WORKER_ID,
+        'workers': workers,
+        'session_id': session_id,
+        'session_owner': sticky_worker(session_id, workers) if session_id else None,
+        'clients': rooms
+    })
+
 if __name__ == '__main__':
     print("Starting Emergency Multi-Agent Web System")
-    print("Web UI will be available at http://localhost:5000")
+    port = int(os.getenv('PORT', 5000))
+    print(f"Web UI will be available at http://localhost:{port} (worker {WORKER_ID})")
     print("Chat interface on the left, orchestration logs on the right")
     print("="*60)
     
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    socketio.run(app, debug=True, host='0.0.0.0', port=port, allow_unsafe_werkzeug=True)
@@ -0,0 +1,177 @@
+"""
+Asyncio serving mode for the agent pipeline.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+app.py runs every turn on its own OS thread and blocks it for the whole
+Gemini round-trip. Here each Socket.IO connection is an independent
+conversation (its own history and chat), and turns are coroutines: Gemini
+via send_message_async, the mesh hops via mesh_bridge_async, Maps via
+aiohttp. A handful of threads then carries thousands of open conversations.
+
+Client events: emit 'chat_message' {message}; receive 'agent_response',
+'agent_changed', 'severity_update' and 'dispatch_report'.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import socketio
+
+from agents.incident_extraction import extract_incident_data
+from agents.sentiment_agent import attach_severity
+from mesh.async_bridge import mesh_bridge_async
+from prompts.routing_prompt import routing_system_prompt
+from prompts.medical_prompt import medical_system_prompt
+from prompts.crime_prompt import crime_system_prompt
+from prompts.disaster_prompt import disaster_system_prompt
+from utils.agent_creation import maps_api_key, api_key
+from utils.global_history import GlobalHistoryManager
+from utils.warmup import warm_pool
+
+prompts = {
+    "routing": routing_system_prompt,
+    "medical": medical_system_prompt,
+    "crime": crime_system_prompt,
+    "disaster": disaster_system_prompt
+}
+SPECIALISTS = ("medical", "crime", "disaster")
+
+warm_pool.start(prompts, maps_api_key, api_key)
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+
+
+class Conversation:
+    """One caller's session; turns of the same conversation run one at a time."""
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.history = GlobalHistoryManager()
+        self.history.start_session(f"session_{uuid.uuid4().hex[:12]}")
+        self.current_agent = "routing"
+        self.lock = asyncio.Lock()
+
+
+conversations = {}
+stats = {"turns": 0, "turns_in_flight": 0, "turn_errors": 0, "dispatches": 0, "turn_s_total": 0.0}
+
+
+async def run_turn(conversation, message):
+    agent = conversation.current_agent
+    history = conversation.history
+    # A caller on the line outranks background enrichment for Gemini quota
+    priority = 'critical' if history.severity.severity >= 8 else 'high'
+
+    chat = await history.get_or_create_shared_chat_async(prompts[agent], agent)
+    response = await mesh_bridge_async({"data": message}, chat.send_message_async, agent,
+                                       history=history, priority=priority)
+    agent_response = response['data']
+    await sio.emit('agent_response', {
+        'agent': agent,
+        'message': agent_response,
+        'timestamp': datetime.now().strftime("%H:%M:%S")
+    }, to=conversation.sid)
+    await sio.emit('severity_update', history.severity.summary(), to=conversation.sid)
+
+    if "ROUTE:" in agent_response:
+        new_agent = agent_response.split("ROUTE:")[-1].strip().lower()
+        if new_agent in prompts and new_agent != agent:
+            history.add_agent_transition(agent, new_agent, "System routing")
+            conversation.current_agent = new_agent
+            await sio.emit('agent_changed', {
+                'old_agent': agent,
+                'new_agent': new_agent,
+                'transitions': len(history.agent_transitions)
+            }, to=conversation.sid)
+        return
+
+    if agent in SPECIALISTS:
+        incident = extract_incident_data(agent_response, agent, message)
+        incident['id'] = uuid.uuid4().int & (1<<31)-1
+        attach_severity(incident, history.severity)
+        conversation.current_agent = None
+        allocator = warm_pool.get_allocator(maps_api_key, api_key)
+        dispatch = await allocator.process_incident_async(incident)
+        stats["dispatches"] += 1
+        await sio.emit('dispatch_report', dispatch, to=conversation.sid)
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    conversations[sid] = Conversation(sid)
+    await sio.emit('connected', {'message': 'Connected to emergency system', 'mode': 'async'}, to=sid)
+
+
+@sio.event
+async def disconnect(sid):
+    conversations.pop(sid, None)
+
+
+@sio.on('chat_message')
+async def chat_message(sid, data):
+    conversation = conversations.get(sid)
+    message = ((data or {}).get('message') or '').strip()
+    if conversation is None or not message:
+        return {'success': False, 'error': 'Empty message'}
+    if conversation.current_agent is None:
+        return {'success': False, 'error': 'Conversation has ended'}
+
+    async with conversation.lock:
+        stats["turns_in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            await run_turn(conversation, message)
+            stats["turns"] += 1
+        except Exception as e:
+            stats["turn_errors"] += 1
+            print(f"Error processing message for {sid}: {e}")
+            await sio.emit('agent_error', {'error': str(e)}, to=sid)
+        finally:
+            stats["turns_in_flight"] -= 1
+            stats["turn_s_total"] += time.perf_counter() - started
+    return {'success': True}
+
+
+def server_stats():
+    return {
+        **stats,
+        "turn_s_total": round(stats["turn_s_total"], 3),
+        "conversations": len(conversations),
+        "threads": threading.active_count(),
+        "warm_pool": warm_pool.status(),
+    }
+
+
+async def http_app(scope, receive, send):
+    """Plain HTTP next to Socket.IO: liveness and serving stats."""
+    if scope['type'] == 'lifespan':
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] == 'websocket':
+        # Only Socket.IO takes websockets; refuse the handshake (HTTP 403)
+        await receive()
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+    routes = {
+        '/health/live': lambda: {'status': 'alive'},
+        '/api/async/stats': server_stats,
+    }
+    handler = routes.get(scope.get('path'))
+    status, body = (200, handler()) if handler else (404, {'error': 'Not found'})
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body, default=str).encode()})
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app)
@@ -0,0 +1,171 @@
+"""
+Concurrent conversations: asyncio bridge vs. thread-per-turn bridge.
+
+    python -m benchmarks.async_conversations [--conversations 2000] [--turns 3] [--llm-latency 0.8]
+
+Every conversation sends its turns one after another through the mesh, all
+conversations at once. Gemini is replaced by a call that takes --llm-latency
+seconds (jittered), so the numbers show what the serving path itself costs:
+wall time, turn latency, and how many OS threads it took. "threaded" uses
+the same thread layout as mesh_bridge (a caller thread plus relay and C-Node
+threads per turn); "async" runs mesh_bridge_async on one event loop.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import queue
+import random
+import threading
+import time
+
+# Measure the serving path, not the Gemini quota
+os.environ.setdefault("RATE_LIMIT_GEMINI_RPS", "1000000")
+os.environ.setdefault("RATE_LIMIT_GEMINI_BURST", "1000000")
+
+from mesh.agent_logic import VNode, run_relay_worker, run_c_worker
+from mesh.async_bridge import mesh_bridge_async
+
+TURNS = [
+    "Help, there is a fire in the building next to us",
+    "Two people injured, one is bleeding from the head",
+    "We are in Gulshan-e-Iqbal block 13, Karachi",
+    "Yes he is conscious but not talking much",
+]
+
+
+class _History:
+    """Stands in for a conversation's GlobalHistoryManager."""
+
+    def __init__(self):
+        self.messages = []
+
+    def add_message(self, role, content, agent_name=None):
+        self.messages.append((role, content))
+
+
+class _PeakThreads:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self):
+        while not self._stop.wait(0.02):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _summary(latencies, elapsed, peak_threads):
+    latencies.sort()
+    return {
+        "turns": len(latencies),
+        "elapsed_s": elapsed,
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "peak_threads": peak_threads,
+    }
+
+
+def run_async(n_conversations: int, n_turns: int, llm_latency_s: float) -> dict:
+    latencies = []
+
+    async def conversation(index):
+        history = _History()
+
+        async def llm(message):
+            await asyncio.sleep(llm_latency_s * random.uniform(0.5, 1.5))
+            return f"Received: {message}. Help is being arranged, please stay on the line."
+
+        for turn in range(n_turns):
+            started = time.perf_counter()
+            await mesh_bridge_async({"data": TURNS[(index + turn) % len(TURNS)]}, llm, "routing",
+                                    history=history, priority="high")
+            latencies.append(time.perf_counter() - started)
+
+    async def main():
+        await asyncio.gather(*(conversation(i) for i in range(n_conversations)))
+
+    with contextlib.redirect_stdout(io.StringIO()), _PeakThreads() as threads:
+        started = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - started
+    return _summary(latencies, elapsed, threads.peak)
+
+
+def _threaded_turn(message: str, llm) -> dict:
+    """One turn over mesh_bridge's bluetooth thread layout."""
+    v_to_relay, relay_to_c, c_to_relay, relay_to_v = (queue.Queue() for _ in range(4))
+    threads = [
+        threading.Thread(target=run_relay_worker, args=(v_to_relay, relay_to_c, c_to_relay, relay_to_v),
+                         kwargs={"poll_interval": 0.05}),
+        threading.Thread(target=run_c_worker, args=(relay_to_c, c_to_relay, llm, False)),
+    ]
+    for thread in threads:
+        thread.start()
+    v_node = VNode("V-NODE")
+    v_to_relay.put(v_node.send({"data": message, "network_type": "bluetooth"}))
+    response = v_node.receive(relay_to_v.get(timeout=30))
+    v_to_relay.put(None)
+    c_to_relay.put(None)
+    for thread in threads:
+        thread.join(timeout=2)
+    return response
+
+
+def run_threaded(n_conversations: int, n_turns: int, llm_latency_s: float) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def llm(message):
+        time.sleep(llm_latency_s * random.uniform(0.5, 1.5))
+        return f"Received: {message}. Help is being arranged, please stay on the line."
+
+    def conversation(index):
+        for turn in range(n_turns):
+            started = time.perf_counter()
+            _threaded_turn(TURNS[(index + turn) % len(TURNS)], llm)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    callers = [threading.Thread(target=conversation, args=(i,)) for i in range(n_conversations)]
+    with contextlib.redirect_stdout(io.StringIO()), _PeakThreads() as threads:
+        started = time.perf_counter()
+        for thread in callers:
+            thread.start()
+        for thread in callers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return _summary(latencies, elapsed, threads.peak)
+
+
+def run(n_conversations: int = 2000, n_turns: int = 3, llm_latency_s: float = 0.8, threaded: bool = True):
+    print(f"{n_conversations} concurrent conversations x {n_turns} turns, "
+          f"simulated LLM latency {llm_latency_s * 1000:.0f} ms\n")
+    results = {"async": run_async(n_conversations, n_turns, llm_latency_s)}
+    if threaded:
+        results["threaded"] = run_threaded(n_conversations, n_turns, llm_latency_s)
+    print(f"{'mode':<10}{'turns':>8}{'elapsed s':>11}{'turns/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'threads':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['turns']:>8}{r['elapsed_s']:>11.2f}{r['turns_per_s']:>10.0f}"
+              f"{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['peak_threads']:>10}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="simulated Gemini seconds per turn")
+    parser.add_argument("--async-only", action="store_true", help="skip the thread-per-turn baseline")
+    args = parser.parse_args()
+    run(args.conversations, args.turns, args.llm_latency, threaded=not args.async_only)
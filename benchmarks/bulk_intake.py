@@ -0,0 +1,143 @@
+"""
+Bulk intake under load: how fast batches are validated, tracked and queued.
+
+    python -m benchmarks.bulk_intake [--batches 200] [--batch-size 500] [--clients 8] [--text-share 0.2] [--llm-latency 0.8]
+    python -m benchmarks.bulk_intake --url http://localhost:5000 [--batches 50] ...
+
+Each client posts NDJSON batches mixing structured incidents, free-text
+reports and a few invalid lines. In-process, the batches go through
+BulkIntake with a real DispatchScheduler and a dispatch loop draining it;
+free-text triage is replaced by a call that takes --llm-latency seconds, so
+the numbers are the intake's own cost. With --url the same batches are
+POSTed to /api/incidents/bulk on a running server. Reported: accepted
+reports per second, batch latency, and for free text the time from
+submission to queued.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.bulk_intake import BulkIntake, parse_batch
+from agents.dispatch_scheduler import DispatchScheduler
+
+STRUCTURED = [
+    {"incident_type": "Fire", "location": "Clifton block 5, Karachi", "summary": "Kitchen fire on the third floor, smoke in the stairwell"},
+    {"incident_type": "Medical", "location": "Johar Town, Lahore", "summary": "Elderly man collapsed, not responding", "priority": "Critical"},
+    {"incident_type": "Accident", "location": "Shahrah-e-Faisal near Nursery", "summary": "Two cars collided, one driver injured"},
+    {"incident_type": "Crime", "location": "F-7 Markaz, Islamabad", "summary": "Shop robbed at gunpoint", "severity": 7},
+    {"incident_type": "Disaster", "location": "Hayatabad Peshawar", "summary": "Roof collapsed after heavy rain, people trapped"},
+]
+TEXT = [
+    "Help, there is a fire in the building next to us in Gulshan-e-Iqbal",
+    "my father has chest pain and can't breathe, we are in Saddar Rawalpindi",
+    "someone snatched my phone near the bus stop in North Nazimabad",
+    "water is rising fast in our street in Latifabad unit 7",
+]
+INVALID = [
+    '{"incident_type": "Parade", "location": "Mall Road"}',
+    '{"incident_type": "Fire"}',
+    '{"message": ""}',
+    '{not json',
+]
+
+
+def make_batch(size: int, text_share: float, rng: random.Random) -> bytes:
+    lines = []
+    for index in range(size):
+        roll = rng.random()
+        if roll < 0.02:
+            lines.append(rng.choice(INVALID))
+            continue
+        report = dict(rng.choice(STRUCTURED)) if roll >= text_share else {"message": rng.choice(TEXT)}
+        report["id"] = f"ref-{index}"
+        lines.append(json.dumps(report))
+    return "\n".join(lines).encode("utf-8")
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def run(batches: int = 200, batch_size: int = 500, clients: int = 8, text_share: float = 0.2,
+        llm_latency: float = 0.8, url: str = None, seed: int = 7):
+    rng = random.Random(seed)
+    bodies = [make_batch(batch_size, text_share, rng) for _ in range(batches)]
+    latencies, accepted, rejected = [], [0], [0]
+    lock = threading.Lock()
+
+    if url:
+        import requests
+        http = requests.Session()
+
+        def post(body):
+            began = time.perf_counter()
+            response = http.post(f"{url.rstrip('/')}/api/incidents/bulk", data=body,
+                                 headers={"Content-Type": "application/x-ndjson"}, timeout=60)
+            return time.perf_counter() - began, response.json()
+        intake = None
+    else:
+        scheduler = DispatchScheduler()
+        queued_after = []
+
+        def triage(message, tracking_id, jitter=random.Random(seed)):
+            time.sleep(llm_latency * jitter.uniform(0.7, 1.3))
+            return {"status": "triaged", "route": "medical",
+                    "incident": {"incident_type": "Medical", "location": "Karachi", "summary": message, "severity": 6.0}}
+
+        intake = BulkIntake(scheduler, triage=triage, max_items=batch_size)
+
+        def drain():
+            while True:
+                entry = scheduler.next()
+                incident = entry["incident"]
+                if incident.get("summary") in TEXT:
+                    record = intake.status(incident["tracking_id"])
+                    queued_after.append(entry["enqueued_at"] - record["submitted_at"])
+                intake.mark_dispatched(entry["incident_id"], {"priority": "HIGH"})
+        threading.Thread(target=drain, daemon=True).start()
+
+        def post(body):
+            began = time.perf_counter()
+            result = intake.submit(parse_batch(body))
+            return time.perf_counter() - began, result
+
+    def client(body):
+        elapsed, result = post(body)
+        with lock:
+            latencies.append(elapsed)
+            accepted[0] += result.get("accepted", 0)
+            rejected[0] += result.get("rejected", 0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, bodies))
+    wall_s = time.perf_counter() - started
+
+    print(f"{batches} batches of {batch_size} from {clients} clients ({'HTTP ' + url if url else 'in-process'})")
+    print(f"  accepted {accepted[0]}, rejected {rejected[0]} in {wall_s:.2f}s: {accepted[0] / wall_s:,.0f} reports/s")
+    print(f"  batch latency p50 {1000 * _percentile(latencies, 0.5):.1f} ms, p95 {1000 * _percentile(latencies, 0.95):.1f} ms, "
+          f"max {1000 * max(latencies):.1f} ms")
+    if intake is not None:
+        text_total = intake.stats()["text"]
+        deadline = time.time() + max(30.0, 4 * llm_latency * text_total / intake._pool._max_workers)
+        while len(queued_after) < text_total and time.time() < deadline:
+            time.sleep(0.1)
+        print(f"  free text: {len(queued_after)}/{text_total} triaged and queued, submit -> queued "
+              f"p50 {_percentile(queued_after, 0.5):.2f}s p95 {_percentile(queued_after, 0.95):.2f}s")
+        print(f"  {intake.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=8, help="batches posted concurrently")
+    parser.add_argument("--text-share", type=float, default=0.2, help="fraction of free-text reports")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per stand-in triage (in-process)")
+    parser.add_argument("--url", help="load-test a running server instead")
+    args = parser.parse_args()
+    run(args.batches, args.batch_size, args.clients, args.text_share, args.llm_latency, args.url)
@@ -0,0 +1,213 @@
+"""
+Dispatch delivery latency: Flask-side stream vs. the Node bridge hop.
+
+    python -m benchmarks.dispatch_stream [--dispatches 200] [--clients 5]
+
+"direct" publishes on an EventHub and streams it as SSE from this process,
+which is what /api/dispatch/stream does. "bridge" POSTs each dispatch to
+frontend_bridge.js (started with node, or an equivalent Python stand-in when
+the bridge cannot run) and reads its SSE broadcast, which is the old path.
+Latency is publish -> parsed by a listening client.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.event_stream import EventHub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRIDGE_PORT = 3001
+
+
+def _dispatch(index: int) -> dict:
+    return {
+        "id": index,
+        "title": "Medical at Gulshan-e-Iqbal block 13",
+        "priority": "High",
+        "location": {"lat": 24.9204, "lng": 67.0932},
+        "status": "active",
+        "assignedUnits": ["Ambulance 2 (Liaquat National Hospital)"],
+        "sent_at": time.time(),
+    }
+
+
+def _listen(url: str, expected: int, latencies: list, ready: threading.Event, unwrap):
+    with urllib.request.urlopen(url, timeout=30) as stream:
+        ready.set()
+        received = 0
+        for raw in stream:
+            line = raw.decode().rstrip("\n")
+            if not line.startswith("data: "):
+                continue
+            dispatch = unwrap(json.loads(line[6:]))
+            if dispatch is None:
+                continue
+            latencies.append(time.time() - dispatch["sent_at"])
+            received += 1
+            if received >= expected:
+                return
+
+
+def _measure(stream_url: str, send, unwrap, n_dispatches: int, n_clients: int, interval_s: float) -> dict:
+    latencies = []
+    listeners = []
+    for _ in range(n_clients):
+        ready = threading.Event()
+        thread = threading.Thread(target=_listen, args=(stream_url, n_dispatches, latencies, ready, unwrap), daemon=True)
+        thread.start()
+        ready.wait(5)
+        listeners.append(thread)
+    time.sleep(0.2)
+    for i in range(n_dispatches):
+        send(_dispatch(i))
+        time.sleep(interval_s)
+    for thread in listeners:
+        thread.join(timeout=30)
+    latencies.sort()
+    return {
+        "delivered": len(latencies),
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else float("nan"),
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float("nan"),
+    }
+
+
+def _serve_sse(handler: BaseHTTPRequestHandler, hub: EventHub):
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/event-stream")
+    handler.end_headers()
+    try:
+        for chunk in hub.sse(hub.subscribe()):
+            handler.wfile.write(chunk.encode())
+            handler.wfile.flush()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+
+
+def run_direct(n_dispatches: int, n_clients: int, interval_s: float) -> dict:
+    hub = EventHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            _serve_sse(self, hub)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        return _measure(f"http://127.0.0.1:{server.server_port}/", lambda d: hub.publish("dispatch", d),
+                        lambda payload: payload, n_dispatches, n_clients, interval_s)
+    finally:
+        server.shutdown()
+
+
+def _start_node_bridge():
+    """Start frontend_bridge.js; None if node or its modules are unavailable."""
+    if not shutil.which("node"):
+        return None
+    bridge = subprocess.Popen(["node", "frontend_bridge.js"], cwd=REPO_ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(50):
+        if bridge.poll() is not None:
+            return None
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{BRIDGE_PORT}/health", timeout=1).read()
+            return bridge
+        except OSError:
+            time.sleep(0.1)
+    bridge.terminate()
+    return None
+
+
+def _start_standin_bridge():
+    """
+    Same hop as frontend_bridge.js (POST in, JSON parse, SSE broadcast of
+    {type: new-emergency}) for machines where the Node bridge cannot run.
+    """
+    hub = EventHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            hub.publish("message", {"type": "new-emergency", "data": body["data"]["emergencies"][0]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"success": true}')
+
+        def do_GET(self):
+            _serve_sse(self, hub)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_bridge(n_dispatches: int, n_clients: int, interval_s: float) -> dict:
+    bridge = _start_node_bridge()
+    standin = None
+    if bridge is not None:
+        base, stream_url, kind = f"http://127.0.0.1:{BRIDGE_PORT}", f"http://127.0.0.1:{BRIDGE_PORT}/api/emergencies/stream", "node"
+    else:
+        standin = _start_standin_bridge()
+        base = f"http://127.0.0.1:{standin.server_port}"
+        stream_url, kind = f"{base}/", "python stand-in"
+    print(f"bridge path uses the {kind} bridge\n")
+    # The bridge awaits its own upstream forward before answering, so
+    # posts are fired from a pool the way app.py's worker threads would
+    pool = ThreadPoolExecutor(max_workers=32)
+
+    def post(dispatch):
+        body = json.dumps({"success": True, "data": {"emergencies": [dispatch]}}).encode()
+        req = urllib.request.Request(f"{base}/api/emergencies/receive-dispatch", data=body,
+                                     headers={"Content-Type": "application/json"})
+        pool.submit(lambda: urllib.request.urlopen(req, timeout=10).read())
+
+    def unwrap(payload):
+        return payload.get("data") if payload.get("type") == "new-emergency" else None
+
+    try:
+        return _measure(stream_url, post, unwrap, n_dispatches, n_clients, interval_s)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if bridge is not None:
+            bridge.terminate()
+            bridge.wait(timeout=5)
+        if standin is not None:
+            standin.shutdown()
+
+
+def run(n_dispatches: int = 200, n_clients: int = 5, interval_s: float = 0.005):
+    print(f"{n_dispatches} dispatches to {n_clients} listening clients\n")
+    results = {
+        "direct": run_direct(n_dispatches, n_clients, interval_s),
+        "bridge": run_bridge(n_dispatches, n_clients, interval_s),
+    }
+    print(f"{'path':<8}{'delivered':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for path, r in results.items():
+        print(f"{path:<8}{r['delivered']:>10}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+    saved = results["bridge"]["p50_ms"] - results["direct"]["p50_ms"]
+    print(f"\nmedian latency removed by dropping the bridge hop: {saved:.2f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dispatches", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between dispatches")
+    args = parser.parse_args()
+    run(args.dispatches, args.clients, args.interval)
@@ -0,0 +1,77 @@
+"""
+Offline gazetteer: how often and how fast caller locations resolve without Google.
+
+    python -m benchmarks.gazetteer [--table pk.gaz] [--iterations 2000]
+
+Runs location strings the way callers and extract_incident_data produce them
+(canonical names, transliteration variants, misspellings, and text naming no
+known place) through a fresh gazetteer. Cold lookups fold and search the
+trie; warm lookups are repeats served from the result cache.
+"""
+import argparse
+import time
+
+from tools.gazetteer import Gazetteer
+
+LOCATIONS = {
+    "canonical": [
+        "Gulshan-e-Iqbal, Karachi", "Clifton block 5", "Johar Town, Lahore", "F-7 Markaz, Islamabad",
+        "Saddar Rawalpindi", "Hayatabad Peshawar", "North Nazimabad block H", "Model Town Lahore",
+        "Shahrah-e-Faisal near Nursery", "Latifabad unit 7, Hyderabad",
+    ],
+    "variants": [
+        "gulshan e iqbal block 13", "Gulshan Iqbal", "Gulistan-e-Johar", "Nazeemabad", "Nazim Abad no 3",
+        "G 9/4", "f7", "FB Area block 16", "Pindi saddar", "DHA phase 6 karachi",
+    ],
+    "misspelt": [
+        "Gulshne Iqbal", "Peshawer", "Defense, Karachi", "Johr Town", "Abotabad", "Cliftn",
+        "Korangee", "Hyderbad", "Multaan", "Rawalpndi",
+    ],
+    "unknown": [
+        "behind the big mosque", "main road near the petrol pump", "our street", "Unknown location",
+        "next to the school", "random colony xyz", "the bus stop", "opposite the bank",
+        "village near the canal", "house number 12",
+    ],
+}
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run(table: str = None, iterations: int = 2000):
+    started = time.perf_counter()
+    gazetteer = Gazetteer.from_seed()
+    if table:
+        gazetteer.load(table)
+    print(f"{len(gazetteer)} places, {gazetteer.trie.keys} keys, built in {1000 * (time.perf_counter() - started):.1f} ms\n")
+
+    print(f"{'kind':<11}{'resolved':>10}{'cold p50 us':>13}{'cold p95 us':>13}{'warm us':>10}")
+    for kind, texts in LOCATIONS.items():
+        resolved, cold = 0, []
+        for text in texts:
+            began = time.perf_counter()
+            place = gazetteer.find(text)
+            cold.append(1e6 * (time.perf_counter() - began))
+            resolved += place is not None
+        began = time.perf_counter()
+        for _ in range(iterations):
+            for text in texts:
+                gazetteer.find(text)
+        warm = 1e6 * (time.perf_counter() - began) / (iterations * len(texts))
+        print(f"{kind:<11}{resolved:>6}/{len(texts):<3}{_percentile(cold, 0.5):>13.0f}{_percentile(cold, 0.95):>13.0f}{warm:>10.1f}")
+
+    print("\nResolved locations:")
+    for text in LOCATIONS["variants"] + LOCATIONS["misspelt"]:
+        place = gazetteer.find(text)
+        print(f"  {text:<28} -> {place['name'] + (' (fuzzy)' if place['fuzzy'] else '') if place else '-'}")
+    print(f"\n{gazetteer.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--table", help="compiled GeoNames table (tools.gazetteer build)")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.table, args.iterations)
@@ -0,0 +1,87 @@
+"""
+Compare the binary mesh wire format against the JSON dicts it replaced.
+
+    python -m benchmarks.mesh_wire [--iterations 20000]
+"""
+import argparse
+import json
+import time
+import uuid
+
+from mesh import wire
+
+SAMPLE_TURNS = [
+    "Help",
+    "There has been an accident on Shahrah-e-Faisal near Nursery, two cars",
+    "My father collapsed and is not breathing properly, we are in Gulshan-e-Iqbal block 13, Karachi",
+    "Water is entering the houses in our street, around 30 families are stuck on rooftops "
+    "in Saddar, Hyderabad. Children and elderly people are with us and we have no boats.",
+]
+
+SAMPLE_RESPONSE = (
+    "I understand. Please stay calm. Is the person conscious and responsive? "
+    "Are there any visible injuries or severe bleeding? Please tell me the area and city."
+)
+
+
+def sample_messages():
+    """Requests and responses exactly as VNode/RelayNode/CNode produce them."""
+    messages = []
+    for turn in SAMPLE_TURNS:
+        mesh_id = str(uuid.uuid4())[:8]
+        messages.append({
+            "data": turn,
+            "mesh_id": mesh_id,
+            "timestamp": time.time(),
+            "path": ["V-Node", "Relay-Node", "C-Node"],
+            "network_type": "bluetooth",
+        })
+        messages.append({
+            "message_type": "response",
+            "network_type": "bluetooth",
+            "data": SAMPLE_RESPONSE,
+            "original_mesh_id": mesh_id,
+            "response_id": str(uuid.uuid4())[:8],
+            "timestamp": time.time(),
+            "path": ["V-Node", "Relay-Node", "C-Node", "C-Node-Response", "Relay-Node-Return"],
+        })
+    return messages
+
+
+def _throughput(fn, items, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            fn(item)
+    elapsed = time.perf_counter() - started
+    return iterations * len(items) / elapsed
+
+
+def run(iterations: int = 20000):
+    messages = sample_messages()
+    json_frames = [json.dumps(m).encode("utf-8") for m in messages]
+    wire_frames = [wire.encode(m) for m in messages]
+
+    for message, frame in zip(messages, wire_frames):
+        decoded = wire.decode(frame)
+        assert decoded["data"] == message["data"] and decoded["path"] == message["path"]
+
+    print(f"{'message':<10}{'json B':>10}{'wire B':>10}{'ratio':>8}")
+    for i, (j, w) in enumerate(zip(json_frames, wire_frames)):
+        kind = "response" if i % 2 else "request"
+        print(f"{kind:<10}{len(j):>10}{len(w):>10}{len(w) / len(j):>8.2f}")
+    total_json = sum(map(len, json_frames))
+    total_wire = sum(map(len, wire_frames))
+    print(f"{'total':<10}{total_json:>10}{total_wire:>10}{total_wire / total_json:>8.2f}")
+
+    print(f"\nThroughput over {iterations} iterations of {len(messages)} messages (msgs/s):")
+    print(f"  json encode  {_throughput(lambda m: json.dumps(m).encode('utf-8'), messages, iterations):>12,.0f}")
+    print(f"  wire encode  {_throughput(wire.encode, messages, iterations):>12,.0f}")
+    print(f"  json decode  {_throughput(json.loads, json_frames, iterations):>12,.0f}")
+    print(f"  wire decode  {_throughput(wire.decode, wire_frames, iterations):>12,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    run(parser.parse_args().iterations)
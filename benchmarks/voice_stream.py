@@ -0,0 +1,166 @@
+"""
+Streaming voice input: end-of-speech to transcript latency, chunked vs. whole-utterance.
+
+    python -m benchmarks.voice_stream [--streams 20] [--utterances 3] [--rtf 0.15]
+    python -m benchmarks.voice_stream --model /path/to/vosk-model --wav call.wav [--streams 4]
+
+Every stream plays a caller in real time: 20 ms PCM frames of background
+noise with spoken bursts between pauses, through VoiceGateway exactly as the
+/voice namespace feeds it. Without --model the recognizer is a stand-in that
+spends --rtf seconds of CPU per second of audio. With --model and a 16 kHz
+mono WAV, real Vosk decodes the recording. "upload" is what a caller would
+wait if the whole utterance were sent and decoded only after they stopped
+talking: the same hangover, plus decoding all of it.
+"""
+import argparse
+import json
+import math
+import random
+import struct
+import threading
+import time
+import wave
+
+import utils.voice_stream as voice_stream
+from utils.voice_stream import FRAME_MS, HANGOVER_MS, SAMPLE_RATE, VoiceGateway
+
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+
+class _Recognizer:
+    """Stands in for a KaldiRecognizer: burns rtf seconds of CPU per audio second."""
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+        self.audio_s = 0.0
+
+    def _burn(self, audio_s: float):
+        deadline = time.perf_counter() + self.rtf * audio_s
+        while time.perf_counter() < deadline:
+            pass
+
+    def AcceptWaveform(self, data: bytes) -> bool:
+        seconds = len(data) / (2 * SAMPLE_RATE)
+        self._burn(seconds)
+        self.audio_s += seconds
+        return False
+
+    def PartialResult(self) -> str:
+        return json.dumps({"partial": f"{self.audio_s:.1f} seconds of speech"})
+
+    def FinalResult(self) -> str:
+        text, self.audio_s = f"caller spoke for {self.audio_s:.1f} seconds", 0.0
+        return json.dumps({"text": text})
+
+
+class _Engine:
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def recognizer(self, sample_rate: int):
+        return _Recognizer(self.rtf)
+
+
+def synthetic_call(utterances: int, rng: random.Random):
+    """20 ms frames: 0.6 s of noise, then per utterance 1-4 s of voiced tone and a 1.2 s pause."""
+    def frame(amplitude, pitch):
+        return struct.pack(f"<{FRAME_SAMPLES}h", *(
+            int(amplitude * math.sin(2 * math.pi * pitch * n / SAMPLE_RATE) + rng.gauss(0, 80))
+            for n in range(FRAME_SAMPLES)))
+    noise = [frame(0, 0) for _ in range(8)]
+    frames = [rng.choice(noise) for _ in range(30)]
+    for _ in range(utterances):
+        voiced = [frame(rng.uniform(3000, 8000), rng.uniform(120, 260)) for _ in range(8)]
+        frames += [rng.choice(voiced) for _ in range(int(rng.uniform(1, 4) * 1000 / FRAME_MS))]
+        frames += [rng.choice(noise) for _ in range(int(1200 / FRAME_MS))]
+    return frames
+
+
+def wav_frames(path: str):
+    with wave.open(path, "rb") as source:
+        if source.getnchannels() != 1 or source.getsampwidth() != 2 or source.getframerate() != SAMPLE_RATE:
+            raise SystemExit(f"{path}: need 16-bit mono {SAMPLE_RATE} Hz PCM")
+        data = source.readframes(source.getnframes())
+    size = 2 * FRAME_SAMPLES
+    # Trailing silence so the last utterance ends
+    data += b"\0" * (size * (2 * HANGOVER_MS // FRAME_MS))
+    return [data[i:i + size] for i in range(0, len(data) - size + 1, size)]
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def run(streams: int = 20, utterances: int = 3, rtf: float = 0.15, model: str = None, wav: str = None, seed: int = 7):
+    if model:
+        import os
+        os.environ["VOSK_MODEL_PATH"] = model
+        engine_factory = voice_stream.shared_asr_engine
+        engine_factory()
+    else:
+        engine = _Engine(rtf)
+        engine_factory = lambda: engine
+
+    transcripts = []
+    lock = threading.Lock()
+
+    def on_transcript(sid, text, info):
+        with lock:
+            transcripts.append(info)
+
+    gateway = VoiceGateway(on_transcript, engine_factory=engine_factory)
+    rng = random.Random(seed)
+    calls = [wav_frames(wav) if wav else synthetic_call(utterances, rng) for _ in range(streams)]
+
+    streams_opened = []
+
+    def caller(index, frames):
+        sid = f"caller-{index}"
+        streams_opened.append(gateway.open(sid))
+        started = time.perf_counter()
+        for number, frame in enumerate(frames):
+            # Real time: a frame every FRAME_MS, like a microphone
+            delay = started + number * FRAME_MS / 1000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            gateway.feed(sid, frame, seq=number)
+        gateway.close(sid)
+
+    threads = [threading.Thread(target=caller, args=item) for item in enumerate(calls)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # close() only queues the stop; each worker still has its last utterance to decode
+    deadline = time.time() + 30
+    unfinished = sum(not stream.join(max(0.0, deadline - time.time())) for stream in streams_opened)
+    if unfinished:
+        print(f"{unfinished} streams still decoding after 30s; their utterances are missing below")
+    wall_s = time.perf_counter() - started
+
+    stats = gateway.stats()
+    eos = [info["eos_to_transcript_ms"] for info in transcripts]
+    final = [info["final_decode_ms"] for info in transcripts]
+    decode_per_s = stats["realtime_factor"] or 0.0
+    upload = [HANGOVER_MS + 1000 * decode_per_s * info["utterance_s"] for info in transcripts]
+    print(f"{streams} live streams, {stats['utterances']} utterances, {stats['audio_s']:.0f}s of audio "
+          f"({stats['speech_s']:.0f}s speech decoded) in {wall_s:.1f}s; recognizer realtime factor {decode_per_s}")
+    print(f"{'':<26}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'final decode':<26}{_percentile(final, 0.5):>10.1f}{_percentile(final, 0.95):>10.1f}")
+    print(f"{'end of speech -> text':<26}{_percentile(eos, 0.5):>10.1f}{_percentile(eos, 0.95):>10.1f}"
+          f"   (hangover {HANGOVER_MS} ms included)")
+    print(f"{'whole-utterance upload':<26}{_percentile(upload, 0.5):>10.1f}{_percentile(upload, 0.95):>10.1f}")
+    print(f"\n{stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, default=20, help="callers speaking at once")
+    parser.add_argument("--utterances", type=int, default=3, help="per synthetic call")
+    parser.add_argument("--rtf", type=float, default=0.15, help="stand-in recognizer CPU seconds per audio second")
+    parser.add_argument("--model", help="Vosk model directory (real recognition)")
+    parser.add_argument("--wav", help="16 kHz mono WAV to stream (with --model)")
+    args = parser.parse_args()
+    run(args.streams, args.utterances, args.rtf, args.model, args.wav)
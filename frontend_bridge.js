@@ -4,6 +4,7 @@ const cors = require('cors');
 const axios = require('axios');
 const app = express();
 const port = 3001; // Different port from React dev server
+// Flask only posts here when started with FRONTEND_BRIDGE_URL=http://localhost:3001
 
 // Middleware
 app.use(cors());
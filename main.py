@@ -1,3 +1,8 @@
+import argparse
+import contextlib
+import os
+import sys
+
 from agents.routing_agent import run_routing_agent
 from agents.medical_agent import run_medical_agent
 from agents.crime_agent import run_crime_agent
@@ -10,6 +15,7 @@ from prompts.disaster_prompt import disaster_system_prompt
 from utils.global_history import start_new_session, history_manager, add_agent_transition
 
 from utils.agent_creation import maps_api_key, api_key
+from utils.warmup import warm_pool
 
 
 def main_multi_agent_system():
@@ -91,5 +97,48 @@ def main_multi_agent_system():
     print("\n👋 Emergency system session ended.")
     print("="*60)
 
+def main_batch(source_path: str, output_path: str = None, workers: int = 8, network_type: str = "wifi",
+               log_path: str = None):
+    """
+    Headless mode: triage every report in a JSONL file (or stdin, "-") and
+    stream one dispatch result per line to output_path (or stdout).
+    Progress and throughput go to stderr; agent chatter to log_path.
+    """
+    from agents.pipeline import TriagePipeline, read_reports, run_batch
+
+    prompts = {
+        "routing": routing_system_prompt,
+        "medical": medical_system_prompt,
+        "crime": crime_system_prompt,
+        "disaster": disaster_system_prompt
+    }
+    source = sys.stdin if source_path == "-" else open(source_path, encoding="utf-8")
+    sink = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    log = open(log_path or os.devnull, "a", encoding="utf-8")
+    try:
+        # stdout may be the result stream; keep agent prints out of it
+        with contextlib.redirect_stdout(log):
+            warm_pool.warm_up(prompts, maps_api_key, api_key)
+            pipeline = TriagePipeline(prompts, warm_pool.get_allocator(maps_api_key, api_key), network_type)
+            summary = run_batch(pipeline, read_reports(source), sink, workers)
+    finally:
+        for handle in (source, sink, log):
+            if handle not in (sys.stdin, sys.stdout):
+                handle.close()
+    print(f"[batch] {summary}", file=sys.stderr)
+    return summary
+
+
 if __name__ == "__main__":
-    main_multi_agent_system()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Multi-agent emergency system")
+    parser.add_argument("--batch", metavar="JSONL", help="triage reports from a JSONL file ('-' for stdin) instead of chatting")
+    parser.add_argument("--output", help="write dispatch results here instead of stdout")
+    parser.add_argument("--workers", type=int, default=8, help="reports processed in parallel")
+    parser.add_argument("--network", choices=("wifi", "bluetooth"), default="wifi", help="mesh route for batch reports")
+    parser.add_argument("--log", help="append agent output here (batch mode; discarded by default)")
+    args = parser.parse_args()
+
+    if args.batch:
+        main_batch(args.batch, args.output, args.workers, args.network, args.log)
+    else:
+        main_multi_agent_system()
\ No newline at end of file
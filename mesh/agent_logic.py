@@ -1,9 +1,19 @@
 import uuid
 import time
+import queue
+import threading
 
+from mesh import wire
+from mesh.store_forward import StoreAndForwardBuffer
+
+
+class ProcessorError(RuntimeError):
+    """The C-Node's processor failed; raised at the V-Node end of the bridge."""
 
 
 class VNode:
+    kind = "vnode"
+
     def __init__(self, node_id):
         self.node_id = node_id
     
@@ -18,10 +28,26 @@ class VNode:
         print(f"[V-Node] Processed and forwarding to Relay")
         return message_json
 
+    def send(self, message_json):
+        """Process an outgoing message and encode it as a wire frame."""
+        return wire.encode(self.process_message(message_json))
+
+    def receive(self, frame):
+        """Decode a response frame arriving back from the mesh."""
+        return wire.decode(frame)
+
+    @staticmethod
+    def raise_for_error(response_json):
+        if response_json.get("error"):
+            raise ProcessorError(response_json["error"])
+
 
 class RelayNode:
-    def __init__(self, node_id):
+    kind = "relay"
+
+    def __init__(self, node_id, buffer_capacity=256, ttl_s=300.0):
         self.node_id = node_id
+        self.buffer = StoreAndForwardBuffer(capacity=buffer_capacity, ttl_s=ttl_s)
     
     def process_message(self, message_json):
         print(f"[Relay-Node] Received: {message_json}")
@@ -41,12 +67,37 @@ class RelayNode:
         print(f"[Relay-Node] Forwarding response to V-Node")
         return response_json
 
+    def forward_frame(self, frame):
+        return wire.encode(self.process_message(wire.decode(frame)))
+
+    def return_frame(self, frame):
+        return wire.encode(self.process_response(wire.decode(frame)))
+
+    def store(self, frame):
+        """Buffer a request frame until the C-Node is reachable."""
+        message_json = wire.decode(frame)
+        result = self.buffer.offer(
+            frame,
+            mesh_id=message_json.get("mesh_id"),
+            priority=message_json.get("priority"),
+            ttl_s=message_json.get("ttl"),
+        )
+        if result != "accepted":
+            print(f"[Relay-Node] Dropped {message_json.get('mesh_id')}: {result}")
+        return result
+
+    def drain_frames(self):
+        """Forward every buffered request, most urgent first."""
+        return [self.forward_frame(frame) for frame in self.buffer.drain()]
+
 
 class CNode:
+    kind = "cnode"
+
     def __init__(self, node_id):
         self.node_id = node_id
     
-    def process_message(self, message_json, processor_function, use_direct_route=False):
+    def _arrive(self, message_json, use_direct_route):
         if use_direct_route:
             print(f"[C-Node] DIRECT WiFi route - bypassing relay")
         else:
@@ -56,13 +107,20 @@ class CNode:
         # Update path
         message_json["path"].append("C-Node")
 
-        user_message = message_json.get("data", "")
-
-
         # Call the user's processor function
         print(f"[C-Node] Calling user processor function...")
-        response_data = processor_function(user_message)
+        return message_json.get("data", "")
+
+    def process_message(self, message_json, processor_function, use_direct_route=False):
+        user_message = self._arrive(message_json, use_direct_route)
+        return self._respond(message_json, processor_function(user_message))
+
+    async def process_message_async(self, message_json, processor_function, use_direct_route=False):
+        """process_message() with a coroutine processor (e.g. chat.send_message_async)."""
+        user_message = self._arrive(message_json, use_direct_route)
+        return self._respond(message_json, await processor_function(user_message))
 
+    def _respond(self, message_json, response_data):
         if hasattr(response_data, "text"):
             response_text = response_data.text
         else:
@@ -83,25 +141,79 @@ class CNode:
         print(f"[C-Node] Generated response: {response_json}")
         return response_json
 
-
-def run_relay_worker(input_queue, output_queue, response_input_queue, response_output_queue):
-    relay = RelayNode("RELAY-1")
-    
-    # Handle forward message
-    message = input_queue.get()
-    processed_message = relay.process_message(message)
-    output_queue.put(processed_message)
-    
-    # Handle response message
-    response = response_input_queue.get()
-    processed_response = relay.process_response(response)
-    response_output_queue.put(processed_response)
-
-
-def run_c_worker(input_queue, output_queue, processor_function):
+    def process_frame(self, frame, processor_function, use_direct_route=False):
+        """Decode a request frame, run the processor and encode the response frame."""
+        message_json = wire.decode(frame)
+        return wire.encode(self.process_message(message_json, processor_function, use_direct_route))
+
+    async def process_frame_async(self, frame, processor_function, use_direct_route=False):
+        message_json = wire.decode(frame)
+        return wire.encode(await self.process_message_async(message_json, processor_function, use_direct_route))
+
+    def serve_frame(self, frame, processor_function, use_direct_route=False):
+        """process_frame(), but a failing processor answers with an error frame instead of no frame."""
+        try:
+            return self.process_frame(frame, processor_function, use_direct_route)
+        except Exception as e:
+            return self.error_frame(frame, e)
+
+    def error_frame(self, frame, error):
+        """Response frame carrying the processor's failure back to the V-Node."""
+        message_json = wire.decode(frame)
+        print(f"[C-Node] Processor failed: {error}")
+        return wire.encode({
+            "message_type": "response",
+            "network_type": message_json.get("network_type", "wifi"),
+            "data": "",
+            "error": f"{type(error).__name__}: {error}",
+            "original_mesh_id": message_json["mesh_id"],
+            "response_id": str(uuid.uuid4())[:8],
+            "timestamp": time.time(),
+            "path": message_json["path"] + ["C-Node", "C-Node-Response"]
+        })
+
+
+def run_relay_worker(input_queue, output_queue, response_input_queue, response_output_queue,
+                     relay=None, c_reachable=None, poll_interval=0.5):
+    """
+    Serve a relay until a None sentinel arrives on input_queue.
+
+    Requests are stored in the relay's priority buffer and forwarded whenever
+    c_reachable (a threading.Event, None = always reachable) is set, so
+    messages survive a temporary partition. Responses are handled on a
+    second thread and stop on their own None sentinel.
+    """
+    relay = relay or RelayNode("RELAY-1")
+
+    def return_loop():
+        while True:
+            response_frame = response_input_queue.get()
+            if response_frame is None:
+                break
+            response_output_queue.put(relay.return_frame(response_frame))
+
+    return_thread = threading.Thread(target=return_loop, daemon=True)
+    return_thread.start()
+
+    while True:
+        try:
+            frame = input_queue.get(timeout=poll_interval)
+        except queue.Empty:
+            frame = b""
+        if frame is None:
+            break
+        if frame:
+            relay.store(frame)
+        if len(relay.buffer) and (c_reachable is None or c_reachable.is_set()):
+            for forwarded in relay.drain_frames():
+                output_queue.put(forwarded)
+
+    return_thread.join(timeout=2)
+
+
+def run_c_worker(input_queue, output_queue, processor_function, use_direct_route=False):
     c_node = CNode("C-NODE")
     
     # Handle incoming message and generate response
-    message = input_queue.get()
-    response = c_node.process_message(message, processor_function)
-    output_queue.put(response)
\ No newline at end of file
+    frame = input_queue.get()
+    output_queue.put(c_node.serve_frame(frame, processor_function, use_direct_route))
\ No newline at end of file
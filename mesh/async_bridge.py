@@ -0,0 +1,85 @@
+"""
+asyncio version of mesh_bridge for the ASGI server (asgi_app.py).
+
+The threaded bridge starts relay and C-Node threads per turn and blocks on
+queue.get(timeout=30) while Gemini answers, so every in-flight turn pins OS
+threads. Here the hops are plain calls on the same frames and the only wait
+is the awaited LLM call, so one event loop carries thousands of turns.
+"""
+import asyncio
+import time
+
+from mesh.agent_logic import VNode, RelayNode, CNode
+from utils.rate_limiter import call_with_quota_async, current_priority
+from utils.single_flight import single_flight
+from utils.session_recorder import session_recorder
+
+TURN_TIMEOUT_S = 30.0
+
+
+def _with_gemini_quota_async(processor_function, level):
+    async def limited(message):
+        return await call_with_quota_async("gemini", lambda: processor_function(message), priority=level)
+    return limited
+
+
+async def mesh_bridge_async(input_json, processor_function, agent_name: str = "unknown", network_type: str = None,
+                            history=None, priority=None, timeout: float = TURN_TIMEOUT_S):
+    """
+    Args:
+        input_json (dict): Input message
+        processor_function (callable): Coroutine function that processes the message
+            (e.g. chat.send_message_async)
+        agent_name (str): Agent name for history tracking
+        network_type (str): "wifi" for direct route, "bluetooth" for relay route.
+            Defaults to input_json["network_type"], then "bluetooth".
+        history: GlobalHistoryManager of this conversation (defaults to the global one)
+        priority: Gemini admission priority (defaults to the calling thread's)
+        timeout (float): Seconds to wait for the response to come back
+    """
+    # A double-submitted turn shares the first one's reply and history entries
+    chat = getattr(processor_function, "__self__", processor_function)
+    key = (id(chat), input_json.get("data", ""))
+    return dict(await single_flight("agent_llm").do_async(key, lambda: _mesh_turn_async(
+        input_json, processor_function, agent_name, network_type, history, priority, timeout
+    )))
+
+
+async def _mesh_turn_async(input_json, processor_function, agent_name, network_type, history, priority, timeout):
+    if history is None:
+        from utils.global_history import history_manager as history
+
+    turn_started = time.time()
+    user_message = input_json.get("data", "")
+    history.add_message("user", user_message, agent_name)
+
+    level = current_priority() if priority is None else priority
+    processor_function = _with_gemini_quota_async(processor_function, level)
+
+    network_type = network_type or input_json.get("network_type", "bluetooth")
+    use_direct_route = network_type == "wifi"
+
+    v_node = VNode("V-NODE")
+    c_node = CNode("C-NODE")
+    outgoing = input_json.copy()
+    outgoing["network_type"] = network_type
+    frame = v_node.send(outgoing)
+
+    async def through_mesh():
+        if use_direct_route:
+            return await c_node.process_frame_async(frame, processor_function, True)
+        relay = RelayNode("RELAY-1")
+        relay.store(frame)
+        response_frame = None
+        for forwarded in relay.drain_frames():
+            response_frame = await c_node.process_frame_async(forwarded, processor_function, False)
+        if response_frame is None:
+            raise RuntimeError("Relay dropped the message")
+        return relay.return_frame(response_frame)
+
+    response_json = v_node.receive(await asyncio.wait_for(through_mesh(), timeout))
+    VNode.raise_for_error(response_json)
+    history.add_message("assistant", response_json.get("data", ""), agent_name)
+    session_recorder.record_turn(history.current_session_id, agent_name, network_type, input_json,
+                                 response_json.get("data", ""), time.time() - turn_started)
+    return response_json
@@ -0,0 +1,238 @@
+import threading
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from mesh import wire
+from mesh.agent_logic import VNode, RelayNode, CNode
+from mesh.topology import Link
+
+
+class FrameAggregator:
+    """
+    Collects frames for one hop and releases them as a batch once either the
+    size window (max_batch_bytes) fills up or the oldest waiting frame has
+    waited max_delay_s. max_batch_bytes=0 disables batching: every frame is
+    released on its own immediately.
+    """
+
+    def __init__(self, max_batch_bytes: int = 2048, max_delay_s: float = 0.020, max_frames: int = 128):
+        self.max_batch_bytes = max_batch_bytes
+        self.max_delay_s = max_delay_s
+        self.max_frames = max_frames
+        self._frames = []
+        self._bytes = 0
+        self._oldest = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def add(self, frame: bytes):
+        with self._cond:
+            if not self._frames:
+                self._oldest = time.monotonic()
+            self._frames.append(frame)
+            self._bytes += len(frame)
+            if self._full():
+                self._cond.notify()
+            elif len(self._frames) == 1:
+                # Wake the flusher so it starts timing the delay window
+                self._cond.notify()
+
+    def _full(self) -> bool:
+        return (self._bytes >= self.max_batch_bytes or len(self._frames) >= self.max_frames)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def next_batch(self) -> Optional[List[bytes]]:
+        """Block until a batch is due; returns None once closed and empty."""
+        with self._cond:
+            while True:
+                if self._frames:
+                    if self._full() or self._closed:
+                        return self._take()
+                    remaining = self._oldest + self.max_delay_s - time.monotonic()
+                    if remaining <= 0:
+                        return self._take()
+                    self._cond.wait(remaining)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _take(self) -> List[bytes]:
+        limit = self.max_frames if self.max_batch_bytes else 1
+        frames = self._frames[:limit]
+        self._frames = self._frames[limit:]
+        self._bytes = sum(len(frame) for frame in self._frames)
+        self._oldest = time.monotonic() if self._frames else None
+        return frames
+
+
+class EmulatedLink:
+    """
+    Serializes frames over one radio hop, sleeping for the time the link would
+    be occupied. Per-frame cost is what batching amortizes.
+    """
+
+    def __init__(self, link: Optional[Link] = None, frame_overhead_bytes: int = 20):
+        self.link = link or Link("relay", "cnode", "bluetooth")
+        self.frame_overhead_bytes = frame_overhead_bytes
+        self._lock = threading.Lock()
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+    def transmit(self, frame: bytes):
+        size = len(frame) + self.frame_overhead_bytes
+        with self._lock:
+            self.frames_sent += 1
+            self.bytes_sent += size
+            time.sleep(self.link.transmit_time(size))
+
+
+class ResponseCorrelator:
+    """Maps original_mesh_id back to the waiting V-Node."""
+
+    def __init__(self):
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def register(self, mesh_id: str, vnode_id: str) -> queue.Queue:
+        slot = queue.Queue(maxsize=1)
+        with self._lock:
+            self._waiting[mesh_id] = (vnode_id, slot)
+        return slot
+
+    def resolve(self, response_frame: bytes, original_mesh_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._waiting.pop(original_mesh_id, None)
+        if entry is None:
+            print(f"[Relay-Node] Uncorrelated response for {original_mesh_id}")
+            return None
+        vnode_id, slot = entry
+        slot.put(response_frame)
+        return vnode_id
+
+    def forget(self, mesh_id: str):
+        with self._lock:
+            self._waiting.pop(mesh_id, None)
+
+
+class BatchingMeshPath:
+    """
+    Shared V-Node -> Relay -> C-Node path where the relay aggregates requests
+    into batch frames on the relay->C hop and the C-Node aggregates responses
+    on the way back. The relay de-aggregates responses and hands each one to
+    the V-Node that sent the request, matched by original_mesh_id.
+
+    Many V-Nodes (caller threads) share one instance via request().
+    """
+
+    def __init__(self, max_batch_bytes: int = 2048, max_delay_s: float = 0.020, c_workers: int = 32,
+                 uplink: Optional[EmulatedLink] = None, downlink: Optional[EmulatedLink] = None):
+        self.relay = RelayNode("RELAY-BATCH")
+        self.c_node = CNode("C-NODE")
+        self.uplink = uplink
+        self.downlink = downlink
+        self.up_aggregator = FrameAggregator(max_batch_bytes, max_delay_s)
+        self.down_aggregator = FrameAggregator(max_batch_bytes, max_delay_s)
+        self.correlator = ResponseCorrelator()
+        self._processors = {}
+        self._processors_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=c_workers, thread_name_prefix="c-node")
+        self._threads = []
+        self.batches_up = 0
+        self.batches_down = 0
+
+    def start(self):
+        for target in (self._uplink_loop, self._downlink_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self.up_aggregator.close()
+        self.down_aggregator.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._executor.shutdown(wait=False)
+
+    def request(self, message_json: Dict, processor_function: Callable, vnode_id: str = "V-NODE",
+                timeout: float = 30) -> Dict:
+        """Send one user turn through the batched path and wait for its response."""
+        v_node = VNode(vnode_id)
+        message = v_node.process_message(message_json)
+        mesh_id = message["mesh_id"]
+        slot = self.correlator.register(mesh_id, vnode_id)
+        with self._processors_lock:
+            self._processors[mesh_id] = processor_function
+
+        # V-Node -> Relay hop is a single frame; the relay stamps its hop and batches
+        self.up_aggregator.add(self.relay.forward_frame(wire.encode(message)))
+        try:
+            response_frame = slot.get(timeout=timeout)
+        finally:
+            # On a timeout the C-Node may never have picked the message up
+            self.correlator.forget(mesh_id)
+            with self._processors_lock:
+                self._processors.pop(mesh_id, None)
+        return v_node.receive(response_frame)
+
+    @staticmethod
+    def _pack(frames: List[bytes]) -> bytes:
+        # A lone frame goes out as-is; the batch header would only add bytes
+        return frames[0] if len(frames) == 1 else wire.encode_batch(frames)
+
+    @staticmethod
+    def _unpack(frame: bytes) -> List[bytes]:
+        return wire.decode_batch(frame) if wire.is_batch(frame) else [frame]
+
+    def _uplink_loop(self):
+        while True:
+            frames = self.up_aggregator.next_batch()
+            if frames is None:
+                return
+            packed = self._pack(frames)
+            self.batches_up += 1
+            if self.uplink:
+                self.uplink.transmit(packed)
+            for frame in self._unpack(packed):
+                self._executor.submit(self._process_at_c, frame)
+
+    def _process_at_c(self, frame: bytes):
+        mesh_id = wire.decode(frame)["mesh_id"]
+        with self._processors_lock:
+            processor_function = self._processors.pop(mesh_id, None)
+        if processor_function is None:
+            return
+        self.down_aggregator.add(self.c_node.serve_frame(frame, processor_function))
+
+    def _downlink_loop(self):
+        while True:
+            frames = self.down_aggregator.next_batch()
+            if frames is None:
+                return
+            packed = self._pack(frames)
+            self.batches_down += 1
+            if self.downlink:
+                self.downlink.transmit(packed)
+            for frame in self._unpack(packed):
+                returned = self.relay.return_frame(frame)
+                self.correlator.resolve(returned, wire.decode(returned)["original_mesh_id"])
+
+
+_shared_path = None
+_shared_lock = threading.Lock()
+
+
+def shared_batching_path() -> BatchingMeshPath:
+    """Process-wide batched mesh path used by mesh_bridge(batched=True)."""
+    global _shared_path
+    with _shared_lock:
+        if _shared_path is None:
+            _shared_path = BatchingMeshPath().start()
+    return _shared_path
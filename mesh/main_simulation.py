@@ -1,22 +1,70 @@
 import threading
 import queue
+import time
 from mesh.agent_logic import VNode, run_relay_worker, run_c_worker
-from utils.global_history import add_user, add_model
+from mesh.batching import shared_batching_path
+from utils.global_history import history_manager
+from utils.session_recorder import session_recorder
+from utils.single_flight import single_flight
+from utils.rate_limiter import call_with_quota, current_priority, request_priority
 
 
-def mesh_bridge(input_json, processor_function, agent_name: str = "unknown"):
+def _with_gemini_quota(processor_function, level):
+    """Run the LLM call under the Gemini rate limiter at the caller's priority (it runs on the C-Node thread)."""
+    def limited(message):
+        with request_priority(level):
+            return call_with_quota("gemini", lambda: processor_function(message))
+    return limited
+
+
+def mesh_bridge(input_json, processor_function, agent_name: str = "unknown", network_type: str = None,
+                batched: bool = False, history=None):
     """
     Args:
         input_json (dict): Input message 
         processor_function (callable): Function that processes the message
-        network_type (str): "wifi" for direct route, "bluetooth" for relay route
+        agent_name (str): Agent name for history tracking
+        network_type (str): "wifi" for direct route, "bluetooth" for relay route.
+            Defaults to input_json["network_type"], then "bluetooth".
+        batched (bool): Send through the shared relay that aggregates many
+            V-Nodes' messages into batch frames (bluetooth route only).
+        history: GlobalHistoryManager of this conversation (defaults to the global one)
     """
+    # The same turn submitted twice to the same chat while the first is still
+    # in flight (double submit, retried delivery) gets the first turn's reply,
+    # and only that turn is written to the history
+    chat = getattr(processor_function, "__self__", processor_function)
+    key = (id(chat), input_json.get("data", ""))
+    return dict(single_flight("agent_llm").do(
+        key, lambda: _mesh_turn(input_json, processor_function, agent_name, network_type, batched, history)
+    ))
+
+
+def _mesh_turn(input_json, processor_function, agent_name, network_type, batched, history):
     print("\n" + "="*50)
     print("MESH BRIDGE - Message Processing Started")
     print("="*50)
 
+    history = history or history_manager
+    turn_started = time.time()
     user_message = input_json.get("data", "")
-    add_user(user_message, agent_name)
+    history.add_message("user", user_message, agent_name)
+
+    processor_function = _with_gemini_quota(processor_function, current_priority())
+
+    network_type = network_type or input_json.get("network_type", "bluetooth")
+    use_direct_route = network_type == "wifi"
+
+    if batched and not use_direct_route:
+        outgoing = input_json.copy()
+        outgoing["network_type"] = network_type
+        response_json = shared_batching_path().request(outgoing, processor_function)
+        VNode.raise_for_error(response_json)
+        history.add_message("assistant", response_json.get("data", ""), agent_name)
+        session_recorder.record_turn(history.current_session_id, agent_name, network_type, input_json,
+                                     response_json.get("data", ""), time.time() - turn_started)
+        print("MESH BRIDGE - Processing Complete (batched)")
+        return response_json
     
     # Create communication queues
     v_to_relay = queue.Queue()
@@ -27,34 +75,53 @@ def mesh_bridge(input_json, processor_function, agent_name: str = "unknown"):
     # Initialize V-Node
     v_node = VNode("V-NODE")
     
-    # Start Relay and C-Node processes
-    relay_thread = threading.Thread(
-        target=run_relay_worker,
-        args=(v_to_relay, relay_to_c, c_to_relay, relay_to_v)
-    )
+    threads = []
+    if use_direct_route:
+        # WiFi: V-Node talks to the C-Node directly, no relay hop
+        threads.append(threading.Thread(
+            target=run_c_worker,
+            args=(v_to_relay, relay_to_v, processor_function, True),
+            daemon=True,
+        ))
+    else:
+        # Bluetooth: V-Node -> Relay -> C-Node and back
+        threads.append(threading.Thread(
+            target=run_relay_worker,
+            args=(v_to_relay, relay_to_c, c_to_relay, relay_to_v),
+            daemon=True,
+        ))
+        threads.append(threading.Thread(
+            target=run_c_worker,
+            args=(relay_to_c, c_to_relay, processor_function, False),
+            daemon=True,
+        ))
     
-    c_thread = threading.Thread(
-        target=run_c_worker,
-        args=(relay_to_c, c_to_relay, processor_function)
-    )
+    for thread in threads:
+        thread.start()
     
-    relay_thread.start()
-    c_thread.start()
-    
-    # V-Node processes input and sends to relay
-    processed_input = v_node.process_message(input_json.copy())
-    v_to_relay.put(processed_input)
+    # V-Node processes input and sends it into the mesh as a binary frame
+    outgoing = input_json.copy()
+    outgoing["network_type"] = network_type
+    v_to_relay.put(v_node.send(outgoing))
     
     # Wait for response to come back through the mesh
     print("[V-Node] Waiting for response from mesh...")
-    response_json = relay_to_v.get(timeout=30)
+    try:
+        response_json = v_node.receive(relay_to_v.get(timeout=30))
+    finally:
+        # Clean up processes (the relay serves until it sees a sentinel), also after a timeout
+        if not use_direct_route:
+            v_to_relay.put(None)
+            c_to_relay.put(None)
+        for thread in threads:
+            thread.join(timeout=2)
+    # A failed LLM call comes back as an error frame at once instead of a 30 s timeout
+    VNode.raise_for_error(response_json)
 
     assistant_message = response_json.get("data", "")
-    add_model(assistant_message, agent_name)
-    
-    # Clean up processes
-    relay_thread.join(timeout=2)
-    c_thread.join(timeout=2)
+    history.add_message("assistant", assistant_message, agent_name)
+    session_recorder.record_turn(history.current_session_id, agent_name, network_type, input_json,
+                                 assistant_message, time.time() - turn_started)
     
     
     print("[V-Node] Response received from mesh")
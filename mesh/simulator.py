@@ -0,0 +1,340 @@
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, List, Optional
+
+from mesh.topology import MeshTopology, build_random_mesh
+from mesh.store_forward import PRIORITY_LEVELS, merge_stats
+
+
+class MeshSimulator:
+    """
+    Discrete-event simulator for message delivery over a MeshTopology.
+
+    Each hop costs serialization + propagation time on the link, frames queue
+    behind each other on a busy link (bandwidth contention) and lost frames are
+    retransmitted up to max_retries times. Relay nodes store-and-forward:
+    gateway-bound messages wait in the relay's priority buffer while no route
+    exists (e.g. during a partition) and are forwarded most-urgent-first when
+    the relay's radio is free. Everything runs in-process on a single event
+    heap, so thousands of nodes simulate in seconds.
+    """
+
+    def __init__(self, topology: MeshTopology, metric: str = "etx", max_retries: int = 3,
+                 ack_timeout_s: float = 0.050, seed: int = 0):
+        self.topology = topology
+        self.metric = metric
+        self.max_retries = max_retries
+        self.ack_timeout_s = ack_timeout_s
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self._events = []
+        self._seq = 0
+        self._ids = itertools.count(1)
+        self._link_busy_until = {}
+        self._relay_busy = set()
+        self._gateways = set()
+        self.delivered = []
+        self.dropped = []
+        self.suppressed = 0
+        self.transmissions = 0
+
+    def _schedule(self, at: float, action, *args):
+        self._seq += 1
+        heapq.heappush(self._events, (at, self._seq, action, args))
+
+    def send(self, source: str, size_bytes: int = 256, at: float = 0.0, destination: Optional[str] = None,
+             priority: str = "medium", ttl_s: Optional[float] = None, mesh_id: Optional[int] = None):
+        """Queue a message from source to destination (nearest C-Node if None)."""
+        message = {
+            "mesh_id": mesh_id if mesh_id is not None else next(self._ids),
+            "source": source,
+            "destination": destination,
+            "priority": priority,
+            "ttl_s": ttl_s,
+            "size": size_bytes,
+            "sent_at": at,
+            "path": [source],
+            "transmissions": 0,
+            "queued_s": 0.0,
+        }
+        self._schedule(at, self._at_node, message)
+        return message
+
+    def schedule_link_state(self, at: float, a: str, b: str, up: bool):
+        """Bring a link down or up at simulated time `at`."""
+        self._schedule(at, self._set_link_state, a, b, up)
+
+    def schedule_partition(self, at: float, duration_s: float, node_ids: List[str]):
+        """Cut every link of the given nodes for duration_s seconds."""
+        for node_id in node_ids:
+            for neighbour in list(self.topology.adjacency[node_id]):
+                self.schedule_link_state(at, node_id, neighbour, False)
+                self.schedule_link_state(at + duration_s, node_id, neighbour, True)
+
+    def _set_link_state(self, a: str, b: str, up: bool):
+        self.topology.set_link_state(a, b, up)
+        if up:
+            # Routes may have come back: let every relay with backlog try again
+            for node_id in self.topology.nodes_of_kind("relay"):
+                if len(self.topology.nodes[node_id].buffer):
+                    self._service_relay(node_id)
+
+    def _next_hop(self, node_id: str, message) -> Optional[str]:
+        if message["destination"] is None:
+            entry = self.topology.gateway_table(self.metric).get(node_id)
+        else:
+            entry = self.topology.routing_table(node_id, self.metric).get(message["destination"])
+        return entry[0] if entry else None
+
+    def _at_node(self, message):
+        node_id = message["path"][-1]
+        arrived = node_id == message["destination"] or (
+            message["destination"] is None and node_id in self._gateways
+        )
+        if arrived:
+            message["latency_s"] = self.now - message["sent_at"]
+            message["direct_route"] = self.topology.is_direct_route(message["path"])
+            self.delivered.append(message)
+            return
+
+        if message["destination"] is None and self.topology.nodes[node_id].kind == "relay":
+            self._store(node_id, message, dedup=True)
+            return
+
+        next_hop = self._next_hop(node_id, message)
+        if next_hop is None and message["destination"] is None:
+            next_hop = self._custody_relay(node_id)
+        if next_hop is None:
+            self._drop(message, "no_route")
+            return
+        self._transmit(message, node_id, next_hop, attempt=0)
+
+    def _custody_relay(self, node_id: str) -> Optional[str]:
+        """Best reachable neighbouring relay to hand a message to when no gateway route exists."""
+        candidates = [
+            link for link in self.topology.adjacency[node_id].values()
+            if link.up and self.topology.nodes[link.dst].kind == "relay"
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda link: self.topology.link_cost(link, self.metric)).dst
+
+    # --- relay store-and-forward ---------------------------------------
+
+    def _store(self, node_id: str, message, dedup: bool):
+        relay = self.topology.nodes[node_id]
+        message["enqueued_at"] = self.now
+        result = relay.buffer.offer(
+            message,
+            mesh_id=message["mesh_id"] if dedup else None,
+            priority=message["priority"],
+            ttl_s=self._remaining_ttl(message),
+            now=self.now,
+        )
+        if result == "accepted":
+            self._service_relay(node_id)
+        elif result == "overflow":
+            self._drop(message, "overflow")
+        else:
+            self.suppressed += 1
+
+    def _remaining_ttl(self, message) -> Optional[float]:
+        if message["ttl_s"] is None:
+            return None
+        return max(0.0, message["sent_at"] + message["ttl_s"] - self.now)
+
+    def _service_relay(self, node_id: str):
+        if node_id in self._relay_busy:
+            return
+        if self.topology.gateway_table(self.metric).get(node_id, (None,))[0] is None:
+            return  # partitioned: keep storing
+        relay = self.topology.nodes[node_id]
+        message = relay.buffer.pop(now=self.now)
+        if message is None:
+            return
+        message["queued_s"] += self.now - message.pop("enqueued_at")
+        next_hop = self._next_hop(node_id, message)
+        done = self._transmit(message, node_id, next_hop, attempt=0)
+        self._relay_busy.add(node_id)
+        self._schedule(done, self._relay_idle, node_id)
+
+    def _relay_idle(self, node_id: str):
+        self._relay_busy.discard(node_id)
+        self._service_relay(node_id)
+
+    # --- links ---------------------------------------------------------
+
+    def _transmit(self, message, src: str, dst: str, attempt: int) -> float:
+        link = self.topology.link(src, dst)
+        start = max(self.now, self._link_busy_until.get((src, dst), 0.0))
+        done = start + link.transmit_time(message["size"])
+        self._link_busy_until[(src, dst)] = done
+        self.transmissions += 1
+        message["transmissions"] += 1
+
+        if link.up and self.rng.random() >= link.loss:
+            self._schedule(done, self._arrive, message, dst)
+        elif attempt < self.max_retries:
+            self._schedule(done + self.ack_timeout_s, self._retry, message, src, dst, attempt + 1)
+        else:
+            self._schedule(done, self._give_up, message, src)
+        return done
+
+    def _retry(self, message, src: str, dst: str, attempt: int):
+        if not self.topology.link(src, dst).up:
+            self._give_up(message, src)
+            return
+        self._transmit(message, src, dst, attempt)
+
+    def _give_up(self, message, src: str):
+        if message["destination"] is None and self.topology.nodes[src].kind == "relay":
+            # Keep custody of the message instead of losing it
+            self._store(src, message, dedup=False)
+        else:
+            self._drop(message, "link_loss")
+
+    def _arrive(self, message, node_id: str):
+        message["path"].append(node_id)
+        self._at_node(message)
+
+    def _drop(self, message, reason: str):
+        message["drop_reason"] = reason
+        self.dropped.append(message)
+
+    # --- running -------------------------------------------------------
+
+    def run(self, until: Optional[float] = None):
+        """Process events until the heap is empty (or simulated time reaches until)."""
+        self._gateways = set(self.topology.nodes_of_kind("cnode"))
+        while self._events:
+            at, _, action, args = self._events[0]
+            if until is not None and at > until:
+                break
+            heapq.heappop(self._events)
+            self.now = at
+            action(*args)
+        return self.stats()
+
+    def relay_stats(self) -> Dict[str, int]:
+        """Store-and-forward counters summed over every relay."""
+        relays = [self.topology.nodes[node_id] for node_id in self.topology.nodes_of_kind("relay")]
+        return merge_stats([relay.buffer.stats() for relay in relays])
+
+    def stats(self) -> Dict[str, float]:
+        def pct(values, p):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+
+        latencies = sorted(m["latency_s"] for m in self.delivered)
+        total = len(self.delivered) + len(self.dropped)
+        hops = [len(m["path"]) - 1 for m in self.delivered]
+
+        drop_reasons = {}
+        for message in self.dropped:
+            drop_reasons[message["drop_reason"]] = drop_reasons.get(message["drop_reason"], 0) + 1
+
+        by_priority = {}
+        for name in PRIORITY_LEVELS:
+            done = [m for m in self.delivered if m["priority"] == name]
+            if not done:
+                continue
+            by_priority[name] = {
+                "delivered": len(done),
+                "latency_p95_ms": pct(sorted(m["latency_s"] for m in done), 0.95),
+                "queue_delay_p50_ms": pct(sorted(m["queued_s"] for m in done), 0.50),
+                "queue_delay_p95_ms": pct(sorted(m["queued_s"] for m in done), 0.95),
+            }
+
+        return {
+            "messages": total,
+            "delivered": len(self.delivered),
+            "dropped": len(self.dropped),
+            "drop_reasons": drop_reasons,
+            "duplicates_suppressed": self.suppressed,
+            "delivery_ratio": round(len(self.delivered) / total, 4) if total else None,
+            "throughput_msgs_per_s": round(len(self.delivered) / self.now, 2) if self.now else None,
+            "direct_routes": sum(1 for m in self.delivered if m["direct_route"]),
+            "transmissions": self.transmissions,
+            "avg_hops": round(sum(hops) / len(hops), 2) if hops else None,
+            "latency_p50_ms": pct(latencies, 0.50),
+            "latency_p95_ms": pct(latencies, 0.95),
+            "latency_p99_ms": pct(latencies, 0.99),
+            "by_priority": by_priority,
+            "relays": self.relay_stats(),
+            "simulated_time_s": round(self.now, 3),
+        }
+
+
+def run_capacity_plan(n_vnodes: int = 2000, n_relays: int = 300, n_cnodes: int = 10, area_m: float = 1500.0,
+                      messages_per_vnode: int = 1, size_bytes: int = 256, window_s: float = 10.0,
+                      metric: str = "etx", seed: int = 0, ttl_s: Optional[float] = 60.0,
+                      critical_fraction: float = 0.1, duplicate_fraction: float = 0.0,
+                      partition_at: Optional[float] = None, partition_s: float = 5.0,
+                      partition_fraction: float = 0.5) -> Dict[str, float]:
+    """
+    Build a random mesh, send traffic from every V-Node and report delivery
+    stats. With partition_at set, that fraction of C-Nodes loses every link
+    for partition_s seconds, exercising relay store-and-forward.
+    """
+    build_started = time.perf_counter()
+    topology = build_random_mesh(n_vnodes, n_relays, n_cnodes, area_m=area_m, seed=seed)
+    build_s = time.perf_counter() - build_started
+
+    simulator = MeshSimulator(topology, metric=metric, seed=seed)
+    rng = random.Random(seed)
+    for vnode in topology.nodes_of_kind("vnode"):
+        for _ in range(messages_per_vnode):
+            roll = rng.random()
+            priority = "critical" if roll < critical_fraction else ("low" if roll > 0.7 else "medium")
+            at = rng.uniform(0, window_s)
+            message = simulator.send(vnode, size_bytes=size_bytes, at=at, priority=priority, ttl_s=ttl_s)
+            if rng.random() < duplicate_fraction:
+                # Application-level retry of the same message
+                simulator.send(vnode, size_bytes=size_bytes, at=at + 0.5, priority=priority, ttl_s=ttl_s,
+                               mesh_id=message["mesh_id"])
+
+    if partition_at is not None:
+        cnodes = topology.nodes_of_kind("cnode")
+        cut = cnodes[:max(1, int(len(cnodes) * partition_fraction))]
+        simulator.schedule_partition(partition_at, partition_s, cut)
+
+    sim_started = time.perf_counter()
+    stats = simulator.run()
+    stats["nodes"] = len(topology.nodes)
+    stats["links"] = sum(len(edges) for edges in topology.adjacency.values())
+    stats["build_wall_s"] = round(build_s, 3)
+    stats["sim_wall_s"] = round(time.perf_counter() - sim_started, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Capacity-plan a degraded mesh deployment")
+    parser.add_argument("--vnodes", type=int, default=2000)
+    parser.add_argument("--relays", type=int, default=300)
+    parser.add_argument("--cnodes", type=int, default=10)
+    parser.add_argument("--area", type=float, default=1500.0, help="side of the square area in metres")
+    parser.add_argument("--messages", type=int, default=1, help="messages per V-Node")
+    parser.add_argument("--size", type=int, default=256, help="message size in bytes")
+    parser.add_argument("--window", type=float, default=10.0, help="seconds over which messages are sent")
+    parser.add_argument("--metric", choices=["etx", "latency", "hops"], default="etx")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ttl", type=float, default=60.0, help="message time-to-live in seconds")
+    parser.add_argument("--critical", type=float, default=0.1, help="fraction of critical messages")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of messages sent twice")
+    parser.add_argument("--partition-at", type=float, default=None, help="start of a C-Node partition")
+    parser.add_argument("--partition-duration", type=float, default=5.0)
+    parser.add_argument("--partition-fraction", type=float, default=0.5, help="fraction of C-Nodes cut off")
+    args = parser.parse_args()
+
+    print(json.dumps(run_capacity_plan(
+        args.vnodes, args.relays, args.cnodes, args.area, args.messages,
+        args.size, args.window, args.metric, args.seed, args.ttl,
+        args.critical, args.duplicates, args.partition_at, args.partition_duration,
+        args.partition_fraction,
+    ), indent=2))
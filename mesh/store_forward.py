@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque, OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Lower number = more urgent. Anything unknown is treated as "medium".
+PRIORITY_LEVELS = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+DEFAULT_PRIORITY = "medium"
+_LEVEL_NAMES = sorted(PRIORITY_LEVELS, key=PRIORITY_LEVELS.get)
+
+
+def priority_level(priority: Optional[str]) -> int:
+    return PRIORITY_LEVELS.get((priority or DEFAULT_PRIORITY).lower(), PRIORITY_LEVELS[DEFAULT_PRIORITY])
+
+
+class StoreAndForwardBuffer:
+    """
+    Bounded store-and-forward buffer with strict priority scheduling.
+
+    One FIFO per priority level keeps offer/pop O(1). When the buffer is full,
+    the newest message of the least urgent non-empty level is evicted to make
+    room for a more urgent one; otherwise the incoming message is dropped.
+    Messages past their TTL are discarded when popped or swept, and mesh_ids
+    seen recently are remembered so duplicates (retransmits, multi-path
+    floods) are suppressed.
+    """
+
+    def __init__(self, capacity: int = 256, ttl_s: float = 300.0, dedup_window: int = 4096, clock=time.time):
+        self.capacity = capacity
+        self.ttl_s = ttl_s
+        self.dedup_window = dedup_window
+        self.clock = clock
+        self._levels = [deque() for _ in PRIORITY_LEVELS]
+        self._size = 0
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {
+            "accepted": 0,
+            "forwarded": 0,
+            "dropped_overflow": 0,
+            "dropped_expired": 0,
+            "duplicates": 0,
+            "evicted": 0,
+        }
+        self._delays = {level: [] for level in PRIORITY_LEVELS}
+
+    def __len__(self):
+        return self._size
+
+    def _is_duplicate(self, mesh_id) -> bool:
+        if mesh_id is None or mesh_id not in self._seen:
+            return False
+        self._seen.move_to_end(mesh_id)
+        return True
+
+    def _remember(self, mesh_id):
+        if mesh_id is None:
+            return
+        self._seen[mesh_id] = True
+        if len(self._seen) > self.dedup_window:
+            self._seen.popitem(last=False)
+
+    def offer(self, item: Any, mesh_id=None, priority: Optional[str] = None, ttl_s: Optional[float] = None,
+              now: Optional[float] = None) -> str:
+        """
+        Store an item for later forwarding. Returns "accepted", "duplicate"
+        or "overflow".
+        """
+        now = self.clock() if now is None else now
+        level = priority_level(priority)
+        with self._lock:
+            if self._is_duplicate(mesh_id):
+                self.metrics["duplicates"] += 1
+                return "duplicate"
+
+            if self._size >= self.capacity:
+                victim_level = next(
+                    (lvl for lvl in range(len(self._levels) - 1, level, -1) if self._levels[lvl]),
+                    None,
+                )
+                if victim_level is None:
+                    self.metrics["dropped_overflow"] += 1
+                    return "overflow"
+                self._levels[victim_level].pop()
+                self._size -= 1
+                self.metrics["evicted"] += 1
+                self.metrics["dropped_overflow"] += 1
+
+            expires_at = now + (ttl_s if ttl_s is not None else self.ttl_s)
+            self._levels[level].append((now, expires_at, item))
+            self._remember(mesh_id)
+            self._size += 1
+            self.metrics["accepted"] += 1
+            return "accepted"
+
+    def pop(self, now: Optional[float] = None) -> Optional[Any]:
+        """Return the most urgent unexpired item, or None when empty."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            for level, fifo in enumerate(self._levels):
+                while fifo:
+                    stored_at, expires_at, item = fifo.popleft()
+                    self._size -= 1
+                    if expires_at < now:
+                        self.metrics["dropped_expired"] += 1
+                        continue
+                    self.metrics["forwarded"] += 1
+                    self._record_delay(level, now - stored_at)
+                    return item
+        return None
+
+    def drain(self, now: Optional[float] = None) -> List[Any]:
+        """Pop everything that is still deliverable, most urgent first."""
+        items = []
+        while True:
+            item = self.pop(now)
+            if item is None:
+                return items
+            items.append(item)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Sweep expired items without forwarding anything."""
+        now = self.clock() if now is None else now
+        removed = 0
+        with self._lock:
+            for i, fifo in enumerate(self._levels):
+                kept = deque(entry for entry in fifo if entry[1] >= now)
+                removed += len(fifo) - len(kept)
+                self._levels[i] = kept
+            self._size -= removed
+            self.metrics["dropped_expired"] += removed
+        return removed
+
+    def _record_delay(self, level: int, delay: float):
+        samples = self._delays[_LEVEL_NAMES[level]]
+        samples.append(delay)
+        if len(samples) > 10000:
+            del samples[:5000]
+
+    def stats(self) -> Dict[str, Any]:
+        def pct(samples, p):
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+        stats = dict(self.metrics)
+        stats["queued"] = self._size
+        stats["queue_delay_ms"] = {
+            name: {"p50": pct(samples, 0.50), "p95": pct(samples, 0.95), "count": len(samples)}
+            for name, samples in self._delays.items()
+        }
+        return stats
+
+
+def merge_stats(all_stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum counters across several buffers (e.g. every relay in a simulation)."""
+    merged = {}
+    for stats in all_stats:
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                merged[key] = merged.get(key, 0) + value
+    return merged
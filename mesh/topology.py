@@ -0,0 +1,255 @@
+import heapq
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+
+from mesh.agent_logic import VNode, RelayNode, CNode
+
+# Typical link characteristics per radio. Bandwidth is effective throughput,
+# not PHY rate; latency is one-way per hop including MAC scheduling.
+LINK_PROFILES = {
+    "bluetooth": {"bandwidth_bps": 200_000, "latency_s": 0.030, "loss": 0.05, "range_m": 60.0},
+    "wifi": {"bandwidth_bps": 20_000_000, "latency_s": 0.005, "loss": 0.01, "range_m": 150.0},
+}
+
+ROUTE_METRICS = ("etx", "latency", "hops")
+
+
+class Link:
+    """One direction of a radio link between two mesh nodes."""
+
+    __slots__ = ("src", "dst", "medium", "bandwidth_bps", "latency_s", "loss", "up")
+
+    def __init__(self, src: str, dst: str, medium: str = "bluetooth", bandwidth_bps: float = None,
+                 latency_s: float = None, loss: float = None):
+        profile = LINK_PROFILES[medium]
+        self.src = src
+        self.dst = dst
+        self.medium = medium
+        self.bandwidth_bps = bandwidth_bps if bandwidth_bps is not None else profile["bandwidth_bps"]
+        self.latency_s = latency_s if latency_s is not None else profile["latency_s"]
+        self.loss = loss if loss is not None else profile["loss"]
+        self.up = True
+
+    def transmit_time(self, size_bytes: int) -> float:
+        """Seconds to push one frame over the link (serialization + propagation)."""
+        return size_bytes * 8 / self.bandwidth_bps + self.latency_s
+
+    def __repr__(self):
+        return f"Link({self.src}->{self.dst}, {self.medium}, loss={self.loss:.2f}, up={self.up})"
+
+
+class MeshTopology:
+    """
+    Arbitrary graph of VNode/RelayNode/CNode instances with per-link quality.
+
+    Routing tables are computed lazily per (metric, source) and cached until the
+    topology changes. Routes towards the gateway layer (any C-Node) use a single
+    multi-source Dijkstra from all C-Nodes, so every node gets its next hop in
+    one O(E log V) pass instead of one search per node.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.positions = {}
+        self.adjacency = {}
+        self.version = 0
+        self._tables = {}
+        self._gateway_tables = {}
+
+    # --- construction -------------------------------------------------
+
+    def add_node(self, node, position: Optional[Tuple[float, float]] = None):
+        self.nodes[node.node_id] = node
+        self.adjacency.setdefault(node.node_id, {})
+        if position is not None:
+            self.positions[node.node_id] = position
+        self._invalidate()
+        return node
+
+    def add_link(self, a: str, b: str, medium: str = "bluetooth", bidirectional: bool = True, **overrides):
+        self.adjacency[a][b] = Link(a, b, medium, **overrides)
+        if bidirectional:
+            self.adjacency[b][a] = Link(b, a, medium, **overrides)
+        self._invalidate()
+
+    def link(self, a: str, b: str) -> Optional[Link]:
+        return self.adjacency.get(a, {}).get(b)
+
+    def set_link_state(self, a: str, b: str, up: bool, bidirectional: bool = True):
+        """Bring a link up or down (e.g. to simulate a partition)."""
+        for src, dst in ((a, b), (b, a)) if bidirectional else ((a, b),):
+            link = self.link(src, dst)
+            if link is not None and link.up != up:
+                link.up = up
+        self._invalidate()
+
+    def _invalidate(self):
+        self.version += 1
+        self._tables.clear()
+        self._gateway_tables.clear()
+
+    def nodes_of(self, cls) -> List[str]:
+        return [node_id for node_id, node in self.nodes.items() if isinstance(node, cls)]
+
+    def nodes_of_kind(self, kind: str) -> List[str]:
+        return [node_id for node_id, node in self.nodes.items() if node.kind == kind]
+
+    # --- metrics ------------------------------------------------------
+
+    def link_cost(self, link: Link, metric: str = "etx") -> float:
+        if metric == "etx":
+            # ETX = 1 / (df * dr): expected transmissions including the ACK
+            reverse = self.link(link.dst, link.src)
+            df = 1.0 - link.loss
+            dr = 1.0 - reverse.loss if reverse is not None and reverse.up else df
+            return math.inf if df <= 0 or dr <= 0 else 1.0 / (df * dr)
+        if metric == "latency":
+            return link.latency_s / max(1e-9, 1.0 - link.loss)
+        if metric == "hops":
+            return 1.0
+        raise ValueError(f"Unsupported route metric: {metric}")
+
+    # --- routing ------------------------------------------------------
+
+    def _dijkstra(self, sources: List[str], metric: str, reverse: bool = False):
+        """Return (cost, parent) maps; with reverse=True, edges are followed backwards."""
+        cost = {source: 0.0 for source in sources}
+        parent = {source: None for source in sources}
+        heap = [(0.0, source) for source in sources]
+        heapq.heapify(heap)
+        incoming = self._incoming() if reverse else None
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > cost.get(node, math.inf):
+                continue
+            edges = incoming[node] if reverse else self.adjacency[node].values()
+            for link in edges:
+                if not link.up:
+                    continue
+                nxt = link.src if reverse else link.dst
+                nd = d + self.link_cost(link, metric)
+                if nd < cost.get(nxt, math.inf):
+                    cost[nxt] = nd
+                    parent[nxt] = node
+                    heapq.heappush(heap, (nd, nxt))
+        return cost, parent
+
+    def _incoming(self) -> Dict[str, List[Link]]:
+        incoming = {node_id: [] for node_id in self.adjacency}
+        for edges in self.adjacency.values():
+            for link in edges.values():
+                incoming[link.dst].append(link)
+        return incoming
+
+    def routing_table(self, source: str, metric: str = "etx") -> Dict[str, Tuple[str, float]]:
+        """Cached table of destination -> (next hop, path cost) for one source."""
+        key = (metric, source)
+        table = self._tables.get(key)
+        if table is None:
+            cost, parent = self._dijkstra([source], metric)
+            table = {}
+            # Visiting in cost order guarantees a parent's first hop is known
+            for dst in sorted(cost, key=cost.get):
+                if dst == source:
+                    continue
+                hop = dst if parent[dst] == source else table[parent[dst]][0]
+                table[dst] = (hop, cost[dst])
+            self._tables[key] = table
+        return table
+
+    def gateway_table(self, metric: str = "etx") -> Dict[str, Tuple[Optional[str], float]]:
+        """Cached table of node -> (next hop towards nearest C-Node, cost)."""
+        table = self._gateway_tables.get(metric)
+        if table is None:
+            cost, parent = self._dijkstra(self.nodes_of(CNode), metric, reverse=True)
+            table = {node_id: (parent[node_id], cost[node_id]) for node_id in cost}
+            self._gateway_tables[metric] = table
+        return table
+
+    def route(self, source: str, destination: Optional[str] = None, metric: str = "etx") -> Optional[List[str]]:
+        """
+        Full hop list from source to destination, or to the nearest C-Node when
+        destination is None. Returns None if unreachable.
+        """
+        if destination is None:
+            table = self.gateway_table(metric)
+            if source not in table:
+                return None
+            path = [source]
+            while table[path[-1]][0] is not None:
+                path.append(table[path[-1]][0])
+            return path
+
+        if source == destination:
+            return [source]
+        path = [source]
+        while path[-1] != destination:
+            entry = self.routing_table(path[-1], metric).get(destination)
+            if entry is None:
+                return None
+            path.append(entry[0])
+        return path
+
+    def path_cost(self, path: List[str], metric: str = "etx") -> float:
+        return sum(self.link_cost(self.link(a, b), metric) for a, b in zip(path, path[1:]))
+
+    def is_direct_route(self, path: Optional[List[str]]) -> bool:
+        """True when the path is a single WiFi hop straight to a C-Node."""
+        if not path or len(path) != 2:
+            return False
+        link = self.link(path[0], path[1])
+        return link is not None and link.medium == "wifi" and isinstance(self.nodes[path[1]], CNode)
+
+
+def _distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def build_random_mesh(n_vnodes: int, n_relays: int, n_cnodes: int, area_m: float = 1000.0,
+                      seed: int = 0) -> MeshTopology:
+    """
+    Random geometric mesh: nodes are scattered over a square area and linked to
+    every neighbour within radio range. Links to a C-Node within WiFi range are
+    WiFi (the direct route); everything else is Bluetooth. Neighbour search uses a spatial grid, so building meshes with
+    thousands of nodes stays roughly linear.
+    """
+    rng = random.Random(seed)
+    topology = MeshTopology()
+
+    def place(node):
+        topology.add_node(node, (rng.uniform(0, area_m), rng.uniform(0, area_m)))
+
+    for i in range(n_cnodes):
+        place(CNode(f"C-{i}"))
+    for i in range(n_relays):
+        place(RelayNode(f"R-{i}"))
+    for i in range(n_vnodes):
+        place(VNode(f"V-{i}"))
+
+    cell = max(profile["range_m"] for profile in LINK_PROFILES.values())
+    grid = {}
+    for node_id, (x, y) in topology.positions.items():
+        grid.setdefault((int(x // cell), int(y // cell)), []).append(node_id)
+
+    for node_id, pos in topology.positions.items():
+        cx, cy = int(pos[0] // cell), int(pos[1] // cell)
+        node = topology.nodes[node_id]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other_id in grid.get((cx + dx, cy + dy), ()):
+                    if other_id <= node_id:
+                        continue
+                    other = topology.nodes[other_id]
+                    d = _distance(pos, topology.positions[other_id])
+                    wifi_capable = not (isinstance(node, VNode) and isinstance(other, VNode))
+                    if wifi_capable and d <= LINK_PROFILES["wifi"]["range_m"] and \
+                            (isinstance(node, CNode) or isinstance(other, CNode)):
+                        topology.adjacency[node_id][other_id] = Link(node_id, other_id, "wifi")
+                        topology.adjacency[other_id][node_id] = Link(other_id, node_id, "wifi")
+                    elif d <= LINK_PROFILES["bluetooth"]["range_m"]:
+                        topology.adjacency[node_id][other_id] = Link(node_id, other_id, "bluetooth")
+                        topology.adjacency[other_id][node_id] = Link(other_id, node_id, "bluetooth")
+
+    topology._invalidate()
+    return topology
@@ -0,0 +1,317 @@
+"""
+Compact binary framing for mesh messages.
+
+Frame layout (all integers are unsigned LEB128 varints unless noted):
+
+    header   4 bytes fixed: magic (0x5C), version, message type, flags
+    ids      mesh_id                      (requests)
+             original_mesh_id, response_id (responses)
+    ts       timestamp in milliseconds
+    ttl      seconds, only when FLAG_TTL
+    path     hop count, then one node reference per hop
+    payload  length, then UTF-8 "data" (zlib-compressed when FLAG_ZLIB)
+    extras   length, then JSON of any other keys (only when FLAG_EXTRAS)
+
+Ids and node names are "tagged" varints: an even value 2n is a number
+(ids: the 8-hex-digit mesh id as an integer; nodes: index n in the intern
+table), an odd value 2n+1 is followed by an n-byte UTF-8 literal. Anything
+that is not a short hex id or a known node name still round-trips.
+
+A batch frame (TYPE_BATCH) carries several complete frames for one hop:
+the fixed header (flags bit 0 = zlib over the body), then a count and one
+length-prefixed frame per entry.
+"""
+import json
+import re
+import struct
+import zlib
+from typing import Dict, Any, List, Tuple
+
+MAGIC = 0x5C
+VERSION = 1
+
+TYPE_REQUEST = 0
+TYPE_RESPONSE = 1
+TYPE_BATCH = 2
+
+FLAG_ZLIB = 0x01
+FLAG_EXTRAS = 0x02
+FLAG_TTL = 0x80
+# Bits 2-3 carry the network type
+NETWORK_SHIFT = 2
+NETWORK_MASK = 0x0C
+NETWORK_CODES = {None: 0, "wifi": 1, "bluetooth": 2}
+NETWORK_NAMES = {code: name for name, code in NETWORK_CODES.items()}
+# Bits 4-6 carry the priority so relays can schedule without parsing extras
+PRIORITY_SHIFT = 4
+PRIORITY_MASK = 0x70
+PRIORITY_CODES = {None: 0, "critical": 1, "high": 2, "medium": 3, "low": 4}
+PRIORITY_NAMES = {code: name for name, code in PRIORITY_CODES.items()}
+
+COMPRESS_THRESHOLD = 96
+
+_HEADER = struct.Struct("!BBBB")
+_HEX_ID = re.compile(r"^[0-9a-f]{8}$")
+
+# Node names every mesh hop knows about; order is part of the wire format.
+NODE_TABLE = [
+    "V-Node",
+    "Relay-Node",
+    "Relay-Node-Return",
+    "C-Node",
+    "C-Node-Response",
+]
+_NODE_INDEX = {name: i for i, name in enumerate(NODE_TABLE)}
+
+_REQUEST_KEYS = {"data", "mesh_id", "timestamp", "path", "network_type", "priority", "ttl"}
+_RESPONSE_KEYS = {"message_type", "data", "original_mesh_id", "response_id", "timestamp", "path", "network_type",
+                  "priority", "ttl"}
+
+
+class WireFormatError(ValueError):
+    """Raised when a frame cannot be decoded."""
+
+
+def intern_node(name: str) -> int:
+    """Add a node name to the shared intern table (both ends must agree)."""
+    if name not in _NODE_INDEX:
+        _NODE_INDEX[name] = len(NODE_TABLE)
+        NODE_TABLE.append(name)
+    return _NODE_INDEX[name]
+
+
+# --- varints -----------------------------------------------------------
+
+def _put_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise WireFormatError("truncated varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _put_bytes(out: bytearray, data: bytes):
+    _put_varint(out, len(data))
+    out += data
+
+
+def _get_bytes(buf: bytes, pos: int) -> Tuple[bytes, int]:
+    length, pos = _get_varint(buf, pos)
+    end = pos + length
+    if end > len(buf):
+        raise WireFormatError("truncated field")
+    return bytes(buf[pos:end]), end
+
+
+def _put_literal(out: bytearray, text: str):
+    raw = text.encode("utf-8")
+    _put_varint(out, (len(raw) << 1) | 1)
+    out += raw
+
+
+def _get_tagged(buf: bytes, pos: int) -> Tuple[int, str, int]:
+    """Return (number, literal, pos); exactly one of number/literal is meaningful."""
+    tag, pos = _get_varint(buf, pos)
+    if tag & 1:
+        length = tag >> 1
+        end = pos + length
+        if end > len(buf):
+            raise WireFormatError("truncated literal")
+        return -1, bytes(buf[pos:end]).decode("utf-8"), end
+    return tag >> 1, None, pos
+
+
+# --- ids and node references ------------------------------------------
+
+def _put_id(out: bytearray, value):
+    if isinstance(value, str) and _HEX_ID.match(value):
+        _put_varint(out, int(value, 16) << 1)
+    else:
+        _put_literal(out, "" if value is None else str(value))
+
+
+def _get_id(buf: bytes, pos: int) -> Tuple[str, int]:
+    number, literal, pos = _get_tagged(buf, pos)
+    return (literal if literal is not None else f"{number:08x}"), pos
+
+
+def _put_node(out: bytearray, name: str):
+    index = _NODE_INDEX.get(name)
+    if index is None:
+        _put_literal(out, name)
+    else:
+        _put_varint(out, index << 1)
+
+
+def _get_node(buf: bytes, pos: int) -> Tuple[str, int]:
+    number, literal, pos = _get_tagged(buf, pos)
+    if literal is not None:
+        return literal, pos
+    if number >= len(NODE_TABLE):
+        raise WireFormatError(f"unknown interned node {number}")
+    return NODE_TABLE[number], pos
+
+
+# --- frames ------------------------------------------------------------
+
+def encode(message: Dict[str, Any], compress_threshold: int = COMPRESS_THRESHOLD) -> bytes:
+    """Encode a mesh request or response dict into a binary frame."""
+    is_response = message.get("message_type") == "response"
+    known = _RESPONSE_KEYS if is_response else _REQUEST_KEYS
+    extras = {key: value for key, value in message.items() if key not in known}
+
+    data = message.get("data", "")
+    if not isinstance(data, str):
+        extras["data"] = data
+        data = ""
+
+    network = message.get("network_type")
+    if network in NETWORK_CODES:
+        flags = NETWORK_CODES[network] << NETWORK_SHIFT
+    else:
+        flags = 0
+        extras["network_type"] = network
+
+    priority = message.get("priority")
+    if priority in PRIORITY_CODES:
+        flags |= PRIORITY_CODES[priority] << PRIORITY_SHIFT
+    else:
+        extras["priority"] = priority
+
+    ttl = message.get("ttl")
+    if isinstance(ttl, int) and ttl >= 0:
+        flags |= FLAG_TTL
+    elif ttl is not None:
+        extras["ttl"] = ttl
+
+    payload = data.encode("utf-8")
+    if len(payload) >= compress_threshold:
+        compressed = zlib.compress(payload, 6)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_ZLIB
+    if extras:
+        flags |= FLAG_EXTRAS
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, TYPE_RESPONSE if is_response else TYPE_REQUEST, flags))
+    if is_response:
+        _put_id(out, message.get("original_mesh_id"))
+        _put_id(out, message.get("response_id"))
+    else:
+        _put_id(out, message.get("mesh_id"))
+    _put_varint(out, int(round(message.get("timestamp", 0) * 1000)))
+    if flags & FLAG_TTL:
+        _put_varint(out, ttl)
+
+    path = message.get("path", [])
+    _put_varint(out, len(path))
+    for hop in path:
+        _put_node(out, hop)
+
+    _put_bytes(out, payload)
+    if extras:
+        _put_bytes(out, json.dumps(extras, separators=(",", ":")).encode("utf-8"))
+    return bytes(out)
+
+
+def decode(frame: bytes) -> Dict[str, Any]:
+    """Decode a binary frame back into the mesh message dict."""
+    if len(frame) < _HEADER.size:
+        raise WireFormatError("frame shorter than header")
+    magic, version, msg_type, flags = _HEADER.unpack_from(frame, 0)
+    if magic != MAGIC:
+        raise WireFormatError(f"bad magic 0x{magic:02x}")
+    if version != VERSION:
+        raise WireFormatError(f"unsupported wire version {version}")
+    pos = _HEADER.size
+
+    message = {}
+    if msg_type == TYPE_RESPONSE:
+        message["message_type"] = "response"
+        message["original_mesh_id"], pos = _get_id(frame, pos)
+        message["response_id"], pos = _get_id(frame, pos)
+    elif msg_type == TYPE_REQUEST:
+        message["mesh_id"], pos = _get_id(frame, pos)
+    else:
+        raise WireFormatError(f"unknown message type {msg_type}")
+
+    ts_ms, pos = _get_varint(frame, pos)
+    message["timestamp"] = ts_ms / 1000.0
+    if flags & FLAG_TTL:
+        message["ttl"], pos = _get_varint(frame, pos)
+
+    hops, pos = _get_varint(frame, pos)
+    path: List[str] = []
+    for _ in range(hops):
+        hop, pos = _get_node(frame, pos)
+        path.append(hop)
+    message["path"] = path
+
+    payload, pos = _get_bytes(frame, pos)
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    message["data"] = payload.decode("utf-8")
+
+    network = NETWORK_NAMES.get((flags & NETWORK_MASK) >> NETWORK_SHIFT)
+    if network is not None:
+        message["network_type"] = network
+    priority = PRIORITY_NAMES.get((flags & PRIORITY_MASK) >> PRIORITY_SHIFT)
+    if priority is not None:
+        message["priority"] = priority
+
+    if flags & FLAG_EXTRAS:
+        raw, pos = _get_bytes(frame, pos)
+        message.update(json.loads(raw.decode("utf-8")))
+    return message
+
+
+
+def is_batch(frame: bytes) -> bool:
+    return len(frame) >= _HEADER.size and frame[0] == MAGIC and frame[2] == TYPE_BATCH
+
+
+def encode_batch(frames: List[bytes], compress_threshold: int = COMPRESS_THRESHOLD) -> bytes:
+    """Pack several frames into one batch frame for a single hop."""
+    body = bytearray()
+    _put_varint(body, len(frames))
+    for frame in frames:
+        _put_bytes(body, frame)
+
+    flags = 0
+    if len(body) >= compress_threshold:
+        compressed = zlib.compress(bytes(body), 6)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FLAG_ZLIB
+    return _HEADER.pack(MAGIC, VERSION, TYPE_BATCH, flags) + bytes(body)
+
+
+def decode_batch(frame: bytes) -> List[bytes]:
+    """Split a batch frame back into its member frames."""
+    if not is_batch(frame):
+        raise WireFormatError("not a batch frame")
+    magic, version, msg_type, flags = _HEADER.unpack_from(frame, 0)
+    if version != VERSION:
+        raise WireFormatError(f"unsupported wire version {version}")
+    body = frame[_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    count, pos = _get_varint(body, 0)
+    frames = []
+    for _ in range(count):
+        member, pos = _get_bytes(body, pos)
+        frames.append(member)
+    return frames
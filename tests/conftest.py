@@ -0,0 +1,16 @@
+import pytest
+
+
+class FakeClock:
+    """Stands in for time.time / time.monotonic; tests move it by setting now."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
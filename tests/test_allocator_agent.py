@@ -0,0 +1,190 @@
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("requests")
+
+import utils.circuit_breaker as circuit_breakers
+from agents.allocator_agent import AllocatorAgent
+from utils.circuit_breaker import CLOSED, OPEN, circuit_breaker
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": "0.01"}
+        self._body = body or {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        import requests
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self):
+        return self._body
+
+
+class _Http:
+    """Answers every request with the next canned response."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def _next(self, *args, **kwargs):
+        self.calls += 1
+        return self.responses[min(self.calls, len(self.responses)) - 1]
+
+    get = post = _next
+
+
+@pytest.fixture
+def allocator():
+    for name in ("geocoding", "places", "gemini"):
+        circuit_breakers._breakers.pop(name, None)
+    yield AllocatorAgent("maps-key", "gemini-key")
+    for name in ("geocoding", "places", "gemini"):
+        circuit_breakers._breakers.pop(name, None)
+
+
+def test_geocoding_server_errors_trip_the_breaker(allocator):
+    allocator.http = _Http(_Response(503))
+    for street in range(5):
+        assert allocator._request_geocode(f"House {street}, Unmapped Street") is None
+    assert circuit_breaker("geocoding").state == OPEN
+
+
+@pytest.mark.parametrize("status", ["REQUEST_DENIED", "UNKNOWN_ERROR", "INVALID_REQUEST"])
+def test_geocoding_error_statuses_trip_the_breaker(allocator, status):
+    allocator.http = _Http(_Response(200, {"status": status, "results": []}))
+    for street in range(5):
+        allocator._request_geocode(f"House {street}, Unmapped Street")
+    assert circuit_breaker("geocoding").state == OPEN
+
+
+def test_geocoding_zero_results_is_an_answer(allocator):
+    allocator.http = _Http(_Response(200, {"status": "ZERO_RESULTS", "results": []}))
+    for street in range(10):
+        assert allocator._request_geocode(f"House {street}, Unmapped Street") is None
+    assert circuit_breaker("geocoding").state == CLOSED
+
+
+def test_places_server_errors_trip_the_breaker(allocator):
+    allocator.http = _Http(_Response(503))
+    for _ in range(10):
+        assert allocator._search_places_nearby("hospital", {"lat": 24.86, "lng": 67.0}, "Saddar") == []
+    assert circuit_breaker("places").state == OPEN
+    # Once open, the remaining searches never reached the API
+    assert allocator.http.calls == 5
+
+
+def test_known_places_resolve_without_google(allocator):
+    allocator.http = _Http(_Response(500))
+    location = allocator._geocode_location("Gulshan-e-Iqbal, Karachi")
+    assert location == {"lat": 24.9204, "lng": 67.0932}
+    assert allocator.http.calls == 0
+
+
+def test_street_in_a_known_city_is_geocoded_with_a_bias(allocator):
+    answer = {"status": "OK", "results": [{"geometry": {"location": {"lat": 31.55, "lng": 74.33}}}]}
+    http = allocator.http = _Http(_Response(200, answer))
+    sent = []
+    http.get = lambda url, params=None, **kwargs: sent.append(params) or _Response(200, answer)
+
+    assert allocator._geocode_location("Jail Road Lahore") == {"lat": 31.55, "lng": 74.33}
+    assert sent and sent[0]["address"].startswith("Jail Road Lahore")
+    assert "bounds" in sent[0]
+
+
+def test_gazetteer_stands_in_when_google_has_no_answer(allocator):
+    allocator.http = _Http(_Response(200, {"status": "ZERO_RESULTS", "results": []}))
+    assert allocator._geocode_location("Kohat Road, Peshawar") == {"lat": 34.0151, "lng": 71.5249}
+
+
+def test_one_failing_incident_does_not_fail_the_burst(allocator, monkeypatch):
+    geocode = allocator._geocode_location
+
+    def flaky_geocode(text):
+        if text == "Broken Street":
+            raise RuntimeError("geocoder exploded")
+        return geocode(text)
+
+    monkeypatch.setattr(allocator, "_geocode_location", flaky_geocode)
+    monkeypatch.setattr(allocator, "_search_places_nearby", lambda *args: [])
+    monkeypatch.setattr(allocator.recommender, "recommend_many", lambda requests: ["Send a unit"] * len(requests))
+    incidents = [
+        {"id": 1, "incident_type": "Fire", "location": "Gulshan-e-Iqbal, Karachi", "summary": "Fire"},
+        {"id": 2, "incident_type": "Medical", "location": "Broken Street", "summary": "Collapse"},
+        {"id": 3, "incident_type": "Crime", "location": "Clifton, Karachi", "summary": "Robbery"},
+    ]
+    results = allocator.process_incidents(incidents)
+
+    assert [result["id"] for result in results] == [1, 2, 3]
+    assert results[1] == {"id": 2, "error": "geocoder exploded"}
+    assert "error" not in results[0] and "error" not in results[2]
+
+
+def test_saturated_burst_falls_back_to_the_quickest_place(allocator, monkeypatch):
+    place = {"displayName": {"text": "Jinnah Hospital"}, "formattedAddress": "Rafiqui Shaheed Road",
+             "location": {"latitude": 24.85, "longitude": 67.04}}
+    monkeypatch.setattr(allocator, "_geocode_location", lambda text: {"lat": 24.86, "lng": 67.01})
+    monkeypatch.setattr(allocator, "_search_places_nearby", lambda *args: [place])
+    monkeypatch.setattr(allocator.ledger, "reserve_batch", lambda batch: {})
+    sent = []
+    monkeypatch.setattr(allocator.recommender, "recommend_many",
+                        lambda requests: sent.extend(requests) or ["Send a unit"] * len(requests))
+    incidents = [{"id": n, "incident_type": "Medical", "location": "Saddar, Karachi", "summary": "Collapse"}
+                 for n in (1, 2)]
+    results = allocator.process_incidents(incidents)
+
+    assert [result["address"] for result in results] == ["Rafiqui Shaheed Road"] * 2
+    assert [request["facility_info"]["capacity_status"] for request in sent] == ["saturated"] * 2
+
+
+def test_llm_flight_key_ignores_live_unit_counts(allocator):
+    facility = {"name": "Civil Hospital", "available_units": 3}
+    busier = dict(facility, available_units=1)
+    assert allocator._flight_key("Fire", "Kitchen fire", "Saddar, Karachi", facility) == \
+        allocator._flight_key("Fire", "Kitchen fire", " saddar, karachi", busier)
+    assert allocator._flight_key("Fire", "Kitchen fire", "Saddar, Karachi", facility) != \
+        allocator._flight_key("Medical", "Kitchen fire", "Saddar, Karachi", facility)
+    assert allocator._flight_key("Fire", "Kitchen fire", "Saddar, Karachi", dict(facility, assigned_unit="Engine 1")) != \
+        allocator._flight_key("Fire", "Kitchen fire", "Saddar, Karachi", dict(facility, assigned_unit="Engine 2"))
+
+
+def test_different_incidents_at_one_place_get_their_own_recommendation(allocator):
+    import threading
+    import time
+
+    class _Text:
+        def __init__(self, text):
+            self.text = text
+
+    prompts = []
+
+    def generate_content(prompt):
+        prompts.append(prompt)
+        time.sleep(0.05)
+        return _Text(prompt.split("*Details:* ")[1].splitlines()[0])
+
+    allocator.llm_model.generate_content = generate_content
+    facility = {"name": "Civil Hospital", "address": "Saddar", "distance_km": 1.0}
+    pending = [allocator._recommendation_request("Medical", summary, "Saddar, Karachi", facility, 1)
+                for summary in ("Cardiac arrest", "Sprained ankle")]
+    results = [None, None]
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, allocator._single_recommendation(pending[i])))
+               for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["Cardiac arrest", "Sprained ankle"]
+    assert len(prompts) == 2
+
+
+def test_unmapped_incident_type_falls_back_to_emergency_services(allocator):
+    assert allocator._service_keyword("Gas Leak") == "emergency services"
+    assert allocator._service_keyword("Fire") == "fire station brigade"
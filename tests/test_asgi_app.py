@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("socketio")
+pytest.importorskip("google.generativeai")
+
+from asgi_app import http_app
+
+
+def _call(scope, *incoming):
+    sent = []
+    queue = list(incoming)
+
+    async def receive():
+        return queue.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(http_app(scope, receive, send))
+    return sent
+
+
+def test_http_routes_answer_json():
+    sent = _call({"type": "http", "path": "/health/live"})
+    assert sent[0]["status"] == 200
+    assert json.loads(sent[1]["body"]) == {"status": "alive"}
+    assert _call({"type": "http", "path": "/nope"})[0]["status"] == 404
+
+
+def test_plain_websockets_are_refused_not_answered_with_http():
+    sent = _call({"type": "websocket", "path": "/ws"}, {"type": "websocket.connect"})
+    assert sent == [{"type": "websocket.close", "code": 1008}]
+
+
+def test_lifespan_completes_startup_and_shutdown():
+    sent = _call({"type": "lifespan"}, {"type": "lifespan.startup"}, {"type": "lifespan.shutdown"})
+    assert [message["type"] for message in sent] == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+def test_unknown_scope_types_are_rejected():
+    with pytest.raises(ValueError):
+        _call({"type": "webtransport"})
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from agents.bulk_intake import BadBatch, BulkIntake, parse_batch, validate_report
+from agents.dispatch_scheduler import DispatchScheduler
+
+
+def test_parse_batch_reads_arrays_and_ndjson_and_flags_bad_lines():
+    assert [report for report, _ in parse_batch(b'[{"message": "a"}, "b"]')] == [{"message": "a"}, "b"]
+    parsed = list(parse_batch(b'{"message": "a"}\n\n{not json\n"b"'))
+    assert parsed[0] == ({"message": "a"}, None)
+    assert parsed[1][0] is None and parsed[1][1].startswith("Invalid JSON")
+    assert parsed[2] == ("b", None)
+    with pytest.raises(BadBatch):
+        parse_batch(b"   ")
+    with pytest.raises(BadBatch):
+        parse_batch(b"[{broken")
+
+
+def test_validate_report_normalizes_structured_incidents():
+    kind, incident, errors = validate_report(
+        {"incident_type": "fire", "location": " Clifton ", "priority": "high", "severity": 7})
+    assert (kind, errors) == ("structured", [])
+    assert incident["incident_type"] == "Fire"
+    assert incident["location"] == "Clifton"
+    assert incident["priority"] == "High"
+    assert incident["severity"] == 7.0
+    assert incident["summary"] == "Fire incident at Clifton"
+
+
+@pytest.mark.parametrize("report", [
+    {"incident_type": "Parade", "location": "Mall Road"},
+    {"incident_type": "Fire"},
+    {"incident_type": "Fire", "location": "x", "severity": 11},
+    {"incident_type": "Fire", "location": "x", "severity": True},
+    {"message": ""},
+    42,
+])
+def test_validate_report_rejects_bad_reports(report):
+    kind, value, errors = validate_report(report)
+    assert kind is None and value is None and errors
+
+
+def test_validate_report_accepts_free_text():
+    assert validate_report("help, fire") == ("text", "help, fire", [])
+
+
+def test_submit_rejects_bad_reports_without_failing_the_batch():
+    scheduler = DispatchScheduler()
+    intake = BulkIntake(scheduler, max_items=3)
+    body = b'\n'.join([
+        b'{"incident_type": "Fire", "location": "Clifton", "id": "r1"}',
+        b'{"incident_type": "Fire"}',
+        b'{"message": "free text is refused without a triage callable"}',
+        b'{"incident_type": "Medical", "location": "Saddar"}',
+    ])
+    result = intake.submit(parse_batch(body))
+    assert (result["accepted"], result["rejected"]) == (1, 3)
+    statuses = [item["status"] for item in result["items"]]
+    assert statuses == ["queued", "rejected", "rejected", "rejected"]
+    assert "limit" in result["items"][3]["errors"][0]
+    assert result["items"][0]["ref"] == "r1"
+    assert len(scheduler) == 1
+
+
+def test_structured_report_moves_from_queued_to_dispatched():
+    scheduler = DispatchScheduler()
+    intake = BulkIntake(scheduler)
+    item = intake.submit(parse_batch(b'[{"incident_type": "Fire", "location": "Clifton"}]'))["items"][0]
+    entry = scheduler.next(timeout=1)
+    assert entry["incident"]["tracking_id"] == item["tracking_id"]
+    intake.mark_dispatched(entry["incident_id"], {"priority": "HIGH", "assignedUnits": 2})
+    record = intake.status(item["tracking_id"])
+    assert record["status"] == "dispatched"
+    assert record["units"] == 2
+    assert intake.stats()["pending"] == 0
+
+
+def test_mark_failed_records_the_error():
+    scheduler = DispatchScheduler()
+    intake = BulkIntake(scheduler)
+    item = intake.submit(parse_batch(b'[{"incident_type": "Fire", "location": "Clifton"}]'))["items"][0]
+    intake.mark_failed(item["incident_id"], "geocoding failed")
+    record = intake.status(item["tracking_id"])
+    assert (record["status"], record["error"]) == ("error", "geocoding failed")
+
+
+def _wait_for(intake, tracking_id, status):
+    for _ in range(200):
+        if intake.status(tracking_id)["status"] == status:
+            return intake.status(tracking_id)
+        threading.Event().wait(0.01)
+    raise AssertionError(f"{tracking_id} never reached {status}: {intake.status(tracking_id)}")
+
+
+def test_free_text_is_triaged_then_queued():
+    scheduler = DispatchScheduler()
+
+    def triage(message, tracking_id):
+        return {"status": "triaged", "route": "medical",
+                "incident": {"incident_type": "Medical", "location": "Saddar", "summary": message, "severity": 6.0}}
+
+    intake = BulkIntake(scheduler, triage=triage, workers=1)
+    item = intake.submit(parse_batch(b'["chest pain in Saddar"]'))["items"][0]
+    assert item["status"] == "triaging"
+    record = _wait_for(intake, item["tracking_id"], "queued")
+    assert record["route"] == "medical"
+    assert scheduler.next(timeout=1)["incident"]["summary"] == "chest pain in Saddar"
+
+
+def test_free_text_triage_failures_are_tracked():
+    def triage(message, tracking_id):
+        if "nothing" in message:
+            return {"status": "unrouted", "reply": "Please describe the emergency"}
+        raise RuntimeError("quota exhausted")
+
+    intake = BulkIntake(DispatchScheduler(), triage=triage, workers=1)
+    unrouted, failed = intake.submit(parse_batch(b'["nothing happening", "fire"]'))["items"]
+    assert _wait_for(intake, unrouted["tracking_id"], "unrouted")["reply"] == "Please describe the emergency"
+    assert _wait_for(intake, failed["tracking_id"], "error")["error"] == "quota exhausted"
@@ -0,0 +1,106 @@
+import uuid
+
+import pytest
+
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, circuit_breaker
+from utils.rate_limiter import call_with_quota
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": "0.01"}
+        self.body = body or {}
+
+
+class HTTPError(Exception):
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} Error")
+        self.response = response
+
+
+def _api():
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+def _raise_for_status(response):
+    if response.status_code >= 400:
+        raise HTTPError(response)
+    return response.body
+
+
+def test_opens_after_threshold_and_probes_after_open_period(clock):
+    breaker = CircuitBreaker("maps", failure_threshold=3, window_s=60, open_s=30, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now = 31
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failures_outside_the_window_are_forgotten(clock):
+    breaker = CircuitBreaker("maps", failure_threshold=3, window_s=10, open_s=30, clock=clock)
+    for second in (0, 5, 20, 25):
+        clock.now = second
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("gemini", failure_threshold=2, slow_call_s=1.0)
+    breaker.record_success(5.0)
+    breaker.record_success(5.0)
+    assert breaker.state == OPEN
+
+
+def test_server_errors_raised_inside_send_trip_the_breaker():
+    api = _api()
+    for _ in range(5):
+        with pytest.raises(HTTPError):
+            call_with_quota(api, lambda: _raise_for_status(_Response(503)))
+    assert circuit_breaker(api).state == OPEN
+    with pytest.raises(CircuitOpen):
+        call_with_quota(api, lambda: "not sent")
+
+
+def test_server_error_responses_returned_by_send_trip_the_breaker():
+    api = _api()
+    for _ in range(5):
+        assert call_with_quota(api, lambda: _Response(503)).status_code == 503
+    stats = circuit_breaker(api).stats()
+    assert stats["state"] == OPEN
+    assert stats["failures"] == 5
+    with pytest.raises(CircuitOpen):
+        call_with_quota(api, lambda: _Response(503))
+
+
+def test_error_answers_flagged_by_is_failure_trip_the_breaker():
+    api = _api()
+    denied = {"status": "REQUEST_DENIED", "results": []}
+    for _ in range(5):
+        call_with_quota(api, lambda: denied, is_failure=lambda data: data["status"] not in ("OK", "ZERO_RESULTS"))
+    assert circuit_breaker(api).state == OPEN
+
+
+def test_rate_limiting_that_outlasts_the_retries_is_a_failure():
+    api = _api()
+    with pytest.raises(HTTPError):
+        call_with_quota(api, lambda: _raise_for_status(_Response(429)), retries=1)
+    assert circuit_breaker(api).stats()["failures"] == 1
+
+
+def test_successful_answers_keep_the_breaker_closed():
+    api = _api()
+    for _ in range(10):
+        call_with_quota(api, lambda: {"status": "ZERO_RESULTS"},
+                        is_failure=lambda data: data["status"] not in ("OK", "ZERO_RESULTS"))
+    stats = circuit_breaker(api).stats()
+    assert stats["state"] == CLOSED and stats["failures"] == 0
@@ -0,0 +1,80 @@
+import random
+import threading
+
+from agents.dispatch_scheduler import AGING_PER_MINUTE, DispatchScheduler, severity_score
+from utils.indexed_heap import IndexedHeap
+
+
+def test_indexed_heap_keeps_order_through_updates_and_removals():
+    rng = random.Random(4)
+    heap, keys = IndexedHeap(), {}
+    for item in range(200):
+        keys[item] = rng.random()
+        heap.push(item, keys[item])
+    for item in rng.sample(range(200), 50):
+        keys[item] = rng.random()
+        heap.update(item, keys[item])
+    for item in rng.sample(sorted(keys), 30):
+        heap.remove(item)
+        del keys[item]
+    popped = [heap.pop()[0] for _ in range(len(heap))]
+    assert popped == sorted(keys, key=keys.get)
+
+
+def test_severity_score_prefers_explicit_severity_then_priority_then_type():
+    assert severity_score({"severity": 14}) == 10.0
+    assert severity_score({"priority": "high", "incident_type": "Crime"}) == 7.5
+    assert severity_score({"incident_type": "Fire"}) == 7.0
+    assert severity_score({"incident_type": "Parade"}) == 5.0
+
+
+def test_most_severe_incident_is_dispatched_first(clock):
+    scheduler = DispatchScheduler(clock=clock)
+    scheduler.submit(1, {"incident_type": "Crime"})
+    scheduler.submit(2, {"incident_type": "Medical", "severity": 9})
+    scheduler.submit(3, {"incident_type": "Fire"})
+    assert [scheduler.next(timeout=0)["incident_id"] for _ in range(3)] == [2, 3, 1]
+    assert scheduler.next(timeout=0) is None
+
+
+def test_waiting_incidents_age_past_newer_urgent_ones(clock):
+    scheduler = DispatchScheduler(clock=clock)
+    scheduler.submit("old", {}, severity=5.0)
+    # After 20 minutes the old report has gained 4 points
+    clock.now = 20 * 60
+    scheduler.submit("new", {}, severity=8.0)
+    assert scheduler.snapshot()[0]["incident_id"] == "old"
+    assert scheduler.snapshot()[0]["effective_priority"] == 5.0 + 20 * AGING_PER_MINUTE
+    entry = scheduler.next(timeout=0)
+    assert entry["incident_id"] == "old" and entry["waited_s"] == 1200
+
+
+def test_reprioritize_and_cancel_apply_to_pending_incidents(clock):
+    scheduler = DispatchScheduler(clock=clock)
+    scheduler.submit("a", {}, severity=3.0)
+    scheduler.submit("b", {}, severity=6.0)
+    assert scheduler.reprioritize("a", 9.0)
+    assert not scheduler.reprioritize("missing", 9.0)
+    assert scheduler.cancel("b")["incident_id"] == "b"
+    assert scheduler.next(timeout=0)["incident_id"] == "a"
+    assert len(scheduler) == 0
+
+
+def test_observed_signals_are_applied_and_published_in_the_background(clock):
+    scheduler = DispatchScheduler(clock=clock)
+    published = threading.Event()
+    scheduler.listeners.append(lambda snapshot: published.set() if snapshot[0]["incident_id"] == "a" else None)
+    scheduler.submit("a", {}, severity=2.0)
+    scheduler.submit("b", {}, severity=6.0)
+    scheduler.start(publish_interval=0.05)
+    try:
+        scheduler.observe("a", 9.5)
+        assert published.wait(2)
+    finally:
+        scheduler.stop()
+
+
+def test_next_blocks_until_an_incident_arrives():
+    scheduler = DispatchScheduler()
+    threading.Timer(0.05, scheduler.submit, args=(7, {"incident_type": "Fire"})).start()
+    assert scheduler.next(timeout=2)["incident_id"] == 7
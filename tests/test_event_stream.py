@@ -0,0 +1,80 @@
+import threading
+
+from utils.event_stream import EventHub, Subscriber
+
+
+def test_publish_fans_out_with_increasing_ids():
+    hub = EventHub()
+    first, second = hub.subscribe(), hub.subscribe()
+    assert [hub.publish("allocation", {"n": n}) for n in range(3)] == [1, 2, 3]
+    for subscriber in (first, second):
+        assert [subscriber.next(timeout=0)["id"] for _ in range(3)] == [1, 2, 3]
+        assert subscriber.next(timeout=0) is None
+    assert hub.stats()["clients"] == 2
+
+
+def test_slow_client_is_told_to_resync_instead_of_buffering_without_bound():
+    subscriber = Subscriber(capacity=3)
+    for n in range(5):
+        subscriber.push({"id": n, "event": "x", "data": n})
+    assert subscriber.next(timeout=0)["event"] == "resync"
+    assert [subscriber.next(timeout=0)["id"] for _ in range(2)] == [3, 4]
+    assert subscriber.dropped == 3
+
+
+def test_resume_replays_only_missed_events():
+    hub = EventHub()
+    for n in range(5):
+        hub.publish("allocation", n)
+    subscriber = hub.subscribe(last_event_id=3)
+    assert [subscriber.next(timeout=0)["id"] for _ in range(2)] == [4, 5]
+    assert subscriber.next(timeout=0) is None
+    assert hub.stats()["resumes"] == 1
+
+
+def test_resume_from_before_the_history_asks_for_resync():
+    hub = EventHub(history_size=3)
+    for n in range(6):
+        hub.publish("allocation", n)
+    subscriber = hub.subscribe(last_event_id=1)
+    assert subscriber.next(timeout=0)["event"] == "resync"
+    assert [subscriber.next(timeout=0)["id"] for _ in range(3)] == [4, 5, 6]
+
+
+def test_resume_with_more_missed_than_the_client_buffer_asks_for_resync():
+    hub = EventHub(history_size=10, client_buffer=2)
+    for n in range(6):
+        hub.publish("allocation", n)
+    subscriber = hub.subscribe(last_event_id=1)
+    assert subscriber.next(timeout=0)["event"] == "resync"
+    assert [subscriber.next(timeout=0)["id"] for _ in range(2)] == [5, 6]
+
+
+def test_sse_formats_events_and_unsubscribes_when_closed():
+    hub = EventHub(heartbeat_s=0.01)
+    subscriber = hub.subscribe()
+    stream = hub.sse(subscriber)
+    assert next(stream).startswith("retry: 3000")
+    hub.publish("allocation", {"units": 2})
+    assert next(stream) == 'id: 1\nevent: allocation\ndata: {"units": 2}\n\n'
+    assert next(stream).startswith(": heartbeat")
+    stream.close()
+    assert subscriber.closed and hub.stats()["clients"] == 0
+
+
+def test_next_wakes_on_publish():
+    hub = EventHub()
+    subscriber = hub.subscribe()
+    timer = threading.Timer(0.05, hub.publish, args=("allocation", 1))
+    timer.start()
+    assert subscriber.next(timeout=5)["id"] == 1
+    timer.join()
+
+
+def test_resume_from_an_id_this_hub_never_issued_asks_for_resync():
+    hub = EventHub()
+    hub.publish("allocation", 1)
+    subscriber = hub.subscribe(last_event_id=500)
+    assert subscriber.next(timeout=0.1)["event"] == "resync"
+    hub.publish("allocation", 2)
+    assert subscriber.next(timeout=0)["id"] == 2
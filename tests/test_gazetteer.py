@@ -0,0 +1,64 @@
+import pytest
+
+from tools.gazetteer import Gazetteer, RadixTrie, fold
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.from_seed()
+
+
+def test_fold_collapses_transliteration_variants():
+    assert fold("Gulshan-e-Iqbal") == fold("gulshan e iqbal") == fold("Gulshan Iqbal")
+    assert fold("Nazim Abad") == fold("Nazimabad") == fold("Nazeemabad")
+    assert fold("F-7") == fold("f 7") == fold("F7")
+
+
+def test_fuzzy_trie_matches_within_edit_distance():
+    trie = RadixTrie()
+    for entry, key in enumerate(["clifton", "korangi", "karachi"]):
+        trie.insert(key, entry)
+    assert [entries for edits, entries in trie.fuzzy("cliftn", 1)] == [[0]]
+    assert trie.fuzzy("lahore", 2) == []
+
+
+@pytest.mark.parametrize("text, name", [
+    ("Gulshan-e-Iqbal, Karachi", "Gulshan-e-Iqbal, Karachi"),
+    ("Nazeemabad", "Nazimabad, Karachi"),
+    ("Peshawer", "Peshawar"),
+])
+def test_find_resolves_spellings_and_the_named_city(gazetteer, text, name):
+    assert gazetteer.find(text)["name"] == name
+
+
+def test_find_misses_text_naming_no_place(gazetteer):
+    assert gazetteer.find("behind the big mosque") is None
+
+
+def test_text_that_is_only_known_places_has_nothing_unmatched(gazetteer):
+    place = gazetteer.find("Gulshan-e-Iqbal, Karachi")
+    assert place["unmatched"] == [] and not place["fuzzy"]
+
+
+@pytest.mark.parametrize("text, city, address", [
+    ("accident outside Jinnah Hospital on Jail Road Lahore", "Lahore", ["jail", "road"]),
+    ("There was a shooting near Kohat Road, Peshawar", "Peshawar", ["road"]),
+    ("skardu road", "Skardu", ["road"]),
+    ("Help! swat team", "Swat", ["team"]),
+])
+def test_street_addresses_are_left_unmatched(gazetteer, text, city, address):
+    place = gazetteer.find(text)
+    assert place["name"] == city and place["kind"] == "city"
+    assert set(address) <= set(place["unmatched"])
+
+
+def test_words_naming_a_rejected_place_stay_unmatched(gazetteer):
+    # Saddar in Karachi is not the one meant; only Rawalpindi is known for sure
+    place = gazetteer.find("Pindi saddar")
+    assert place["name"] == "Rawalpindi"
+    assert place["unmatched"] == ["sadar"]
+
+
+def test_fuzzy_matches_keep_the_misspelt_word_unmatched(gazetteer):
+    place = gazetteer.find("Defense karachi")
+    assert place["fuzzy"] and place["unmatched"]
@@ -0,0 +1,20 @@
+import pytest
+
+from agents.incident_extraction import extract_incident_data
+
+
+@pytest.mark.parametrize("message, location", [
+    ("accident outside Jinnah Hospital on Jail Road Lahore", "Jail Road Lahore"),
+    ("There was a shooting near Kohat Road, Peshawar", "Kohat Road, Peshawar"),
+    # Keywords only count as whole words ("swat", "station")
+    ("Help! swat team", "Unknown location"),
+    ("skardu road", "Unknown location"),
+])
+def test_the_callers_address_text_is_kept(message, location):
+    assert extract_incident_data("Dispatching help", "crime", message)["location"] == location
+
+
+def test_a_named_area_stands_in_when_there_is_no_address():
+    incident = extract_incident_data("Dispatching help", "medical", "fire! gulshan e iqbal block 13 karachi")
+    assert incident["location"] == "Gulshan-e-Iqbal, Karachi"
+    assert incident["incident_type"] == "Medical"
@@ -0,0 +1,120 @@
+import pytest
+
+from agents.incident_store import IncidentStore
+
+
+def _incident(incident_id=1, **fields):
+    incident = {"id": incident_id, "status": "active", "priority": "HIGH",
+                "location": {"lat": 24.92, "lng": 67.09}, "assignedUnits": ["Ambulance 3"]}
+    incident.update(fields)
+    return incident
+
+
+def test_upsert_merges_instead_of_dropping_fields():
+    store = IncidentStore()
+    store.upsert(_incident(notes="gate code 4411"))
+    delta = store.upsert({"id": 1, "priority": "CRITICAL"})
+
+    stored = store.get(1)
+    assert stored["priority"] == "CRITICAL"
+    assert stored["notes"] == "gate code 4411"
+    assert stored["assignedUnits"] == ["Ambulance 3"]
+    assert not any(op["op"] == "remove" for op in delta["ops"])
+    assert stored["version"] == 2
+
+
+def test_status_only_moves_forward():
+    store = IncidentStore()
+    store.upsert(_incident())
+    store.update(1, status="responding")
+    # A replayed dispatch report must not reopen it
+    assert store.upsert(_incident()) is None
+    assert store.get(1)["status"] == "responding"
+
+    store.update(1, status="resolved")
+    store.update(1, status="responding")
+    assert store.get(1)["status"] == "resolved"
+    assert store.query(status="resolved")["total"] == 1
+    assert store.query(status="responding")["total"] == 0
+
+
+def test_regressed_status_keeps_the_other_changes():
+    store = IncidentStore()
+    store.upsert(_incident(status="responding"))
+    store.upsert(_incident(status="active", priority="LOW"))
+    stored = store.get(1)
+    assert stored["status"] == "responding"
+    assert stored["priority"] == "LOW"
+
+
+def test_unknown_statuses_are_not_ordered():
+    store = IncidentStore()
+    store.upsert(_incident(status="responding"))
+    store.update(1, status="on_hold")
+    store.update(1, status="responding")
+    assert store.get(1)["status"] == "responding"
+
+
+def test_since_replays_deltas_and_resets_when_too_old():
+    store = IncidentStore(log_size=2)
+    store.upsert(_incident(1))
+    seq = store.seq
+    store.update(1, status="responding")
+    changes = store.since(seq)
+    assert not changes["reset"]
+    assert [delta["incident_id"] for delta in changes["deltas"]] == ["1"]
+
+    for incident_id in range(2, 8):
+        store.upsert(_incident(incident_id))
+    assert store.since(0)["reset"]
+    assert len(store.since(0)["incidents"]) == 7
+
+
+def test_box_and_nearest_queries_use_coordinates():
+    store = IncidentStore()
+    store.upsert(_incident(1, location={"lat": 24.92, "lng": 67.09}))
+    store.upsert(_incident(2, location={"lat": 31.52, "lng": 74.35}))
+    store.upsert(_incident(3, location={"lat": 0.0, "lng": 0.0}))
+
+    in_karachi = store.in_box(24.7, 66.9, 25.1, 67.3)
+    assert [incident["id"] for incident in in_karachi["incidents"]] == [1]
+    nearest = store.nearest(24.9, 67.1, k=5)
+    assert [incident["id"] for incident in nearest["incidents"]] == [1]
+
+
+def test_query_pages_newest_first_and_follows_index_updates():
+    store = IncidentStore()
+    for incident_id in range(1, 8):
+        store.upsert(_incident(incident_id, priority="HIGH" if incident_id % 2 else "LOW"))
+    store.update(5, status="resolved")
+
+    first = store.query(status="active", priority="HIGH", limit=2)
+    assert [incident["id"] for incident in first["incidents"]] == [7, 3]
+    assert first["total"] == 3
+    second = store.query(status="active", priority="HIGH", limit=2, cursor=first["next_cursor"])
+    assert [incident["id"] for incident in second["incidents"]] == [1]
+    assert second["next_cursor"] is None
+    assert [incident["id"] for incident in store.query(status="resolved")["incidents"]] == [5]
+
+
+def test_nearest_orders_by_distance_and_pages_by_offset():
+    store = IncidentStore()
+    for incident_id, lng in enumerate([67.10, 67.20, 67.05, 67.40], 1):
+        store.upsert(_incident(incident_id, location={"lat": 24.9, "lng": lng}))
+
+    page = store.nearest(24.9, 67.0, k=2)
+    assert [incident["id"] for incident in page["incidents"]] == [3, 1]
+    assert page["incidents"][0]["distance_km"] < page["incidents"][1]["distance_km"]
+    rest = store.nearest(24.9, 67.0, k=2, offset=page["next_offset"])
+    assert [incident["id"] for incident in rest["incidents"]] == [2, 4]
+    assert store.nearest(24.9, 67.0, k=5, max_km=25)["incidents"][-1]["id"] == 2
+
+
+def test_box_queries_span_large_viewports_and_reject_inverted_boxes():
+    store = IncidentStore()
+    store.upsert(_incident(1, location={"lat": 24.92, "lng": 67.09}))
+    store.upsert(_incident(2, location={"lat": 31.52, "lng": 74.35}))
+    whole_country = store.in_box(23.0, 60.0, 37.0, 78.0)
+    assert sorted(incident["id"] for incident in whole_country["incidents"]) == [1, 2]
+    with pytest.raises(ValueError):
+        store.in_box(25.0, 67.0, 24.0, 68.0)
@@ -0,0 +1,62 @@
+import queue
+import threading
+
+import pytest
+
+from mesh import wire
+from mesh.batching import BatchingMeshPath, FrameAggregator
+
+
+@pytest.fixture
+def path():
+    path = BatchingMeshPath(max_batch_bytes=4096, max_delay_s=0.01).start()
+    yield path
+    path.stop()
+
+
+def test_aggregator_releases_a_full_window_at_once():
+    aggregator = FrameAggregator(max_batch_bytes=30, max_delay_s=10)
+    for _ in range(3):
+        aggregator.add(b"x" * 10)
+    assert aggregator.next_batch() == [b"x" * 10] * 3
+
+
+def test_aggregator_releases_after_the_delay_and_ends_when_closed():
+    aggregator = FrameAggregator(max_batch_bytes=4096, max_delay_s=0.01)
+    aggregator.add(b"one")
+    assert aggregator.next_batch() == [b"one"]
+    aggregator.close()
+    assert aggregator.next_batch() is None
+
+
+def test_batch_frames_round_trip():
+    frames = [wire.encode({"mesh_id": str(n), "data": "x" * n}) for n in range(5)]
+    packed = wire.encode_batch(frames)
+    assert wire.is_batch(packed)
+    assert wire.decode_batch(packed) == frames
+
+
+def test_concurrent_requests_get_their_own_responses(path):
+    replies = {}
+
+    def vnode(n):
+        response = path.request({"data": f"turn {n}", "network_type": "bluetooth"},
+                                lambda message: message.upper(), vnode_id=f"V-{n}")
+        replies[n] = response["data"]
+
+    threads = [threading.Thread(target=vnode, args=(n,)) for n in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert replies == {n: f"TURN {n}" for n in range(30)}
+    assert path.batches_up < 30
+
+
+def test_timed_out_request_leaves_nothing_behind(path):
+    # The C-Node never sees the frame, so only the requester can clean up
+    path.up_aggregator.add = lambda frame: None
+    with pytest.raises(queue.Empty):
+        path.request({"data": "lost", "network_type": "bluetooth"}, lambda message: message, timeout=0.05)
+    assert path._processors == {}
+    assert path.correlator._waiting == {}
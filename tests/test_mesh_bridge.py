@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("requests")
+
+from mesh.async_bridge import mesh_bridge_async
+from mesh.main_simulation import mesh_bridge
+
+
+class _History:
+    current_session_id = "session-1"
+
+    def __init__(self):
+        self.messages = []
+
+    def add_message(self, role, content, agent_name=None):
+        self.messages.append((role, content))
+
+
+class _Chat:
+    def __init__(self):
+        self.calls = 0
+
+    def send_message(self, message):
+        self.calls += 1
+        time.sleep(0.1)
+        return f"reply to {message}"
+
+    async def send_message_async(self, message):
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return f"reply to {message}"
+
+
+@pytest.mark.parametrize("network_type", ["wifi", "bluetooth"])
+def test_a_double_submitted_turn_is_answered_and_recorded_once(network_type):
+    chat, history = _Chat(), _History()
+    replies = []
+
+    def submit():
+        replies.append(mesh_bridge({"data": "fire in Saddar"}, chat.send_message, "disaster", network_type,
+                                   history=history)["data"])
+
+    threads = [threading.Thread(target=submit) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert replies == ["reply to fire in Saddar"] * 2
+    assert chat.calls == 1
+    assert history.messages == [("user", "fire in Saddar"), ("assistant", "reply to fire in Saddar")]
+
+
+def test_async_double_submit_is_recorded_once():
+    chat, history = _Chat(), _History()
+
+    async def main():
+        return await asyncio.gather(*(
+            mesh_bridge_async({"data": "fire in Saddar"}, chat.send_message_async, "disaster", "wifi", history=history)
+            for _ in range(2)
+        ))
+
+    assert [reply["data"] for reply in asyncio.run(main())] == ["reply to fire in Saddar"] * 2
+    assert chat.calls == 1
+    assert history.messages == [("user", "fire in Saddar"), ("assistant", "reply to fire in Saddar")]
@@ -0,0 +1,65 @@
+from mesh.agent_logic import CNode, RelayNode, VNode
+from mesh.simulator import MeshSimulator, run_capacity_plan
+from mesh.topology import MeshTopology, build_random_mesh
+
+
+def _line():
+    """V - R1 - R2 - C over Bluetooth, plus a lossy shortcut V - C."""
+    topology = MeshTopology()
+    for node in (VNode("V"), RelayNode("R1"), RelayNode("R2"), CNode("C")):
+        topology.add_node(node)
+    topology.add_link("V", "R1")
+    topology.add_link("R1", "R2")
+    topology.add_link("R2", "C")
+    topology.add_link("V", "C", loss=0.9)
+    return topology
+
+
+def test_etx_avoids_the_lossy_shortcut_but_hop_count_takes_it():
+    topology = _line()
+    assert topology.route("V", metric="etx") == ["V", "R1", "R2", "C"]
+    assert topology.route("V", metric="hops") == ["V", "C"]
+    assert topology.route("V", "C", metric="etx") == ["V", "R1", "R2", "C"]
+
+
+def test_routes_follow_link_failures():
+    topology = _line()
+    topology.set_link_state("R1", "R2", up=False)
+    assert topology.route("V") == ["V", "C"]
+    topology.set_link_state("V", "C", up=False)
+    assert topology.route("V") is None
+    topology.set_link_state("R1", "R2", up=True)
+    assert topology.route("V") == ["V", "R1", "R2", "C"]
+
+
+def test_direct_route_is_one_wifi_hop_to_a_c_node():
+    topology = _line()
+    topology.add_link("V", "C", medium="wifi")
+    assert topology.route("V") == ["V", "C"]
+    assert topology.is_direct_route(["V", "C"])
+    assert not topology.is_direct_route(["V", "R1"])
+
+
+def test_simulator_delivers_over_relays_and_counts_hops():
+    simulator = MeshSimulator(_line(), seed=1)
+    for n in range(20):
+        simulator.send("V", at=n * 0.1)
+    stats = simulator.run()
+    assert stats["delivered"] + stats["dropped"] == 20
+    assert stats["delivery_ratio"] >= 0.9
+    assert stats["avg_hops"] == 3.0
+
+
+def test_random_mesh_is_deterministic_per_seed():
+    first = build_random_mesh(50, 10, 2, area_m=300, seed=3)
+    second = build_random_mesh(50, 10, 2, area_m=300, seed=3)
+    assert first.positions == second.positions
+    assert {node: set(links) for node, links in first.adjacency.items()} == \
+        {node: set(links) for node, links in second.adjacency.items()}
+
+
+def test_relays_store_messages_through_a_partition():
+    stats = run_capacity_plan(n_vnodes=60, n_relays=20, n_cnodes=2, area_m=300, window_s=2.0,
+                              partition_at=0.5, partition_s=1.0, partition_fraction=1.0, seed=2)
+    assert stats["delivered"] > 0
+    assert stats["relays"]["accepted"] > 0
@@ -0,0 +1,76 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("google.generativeai")
+
+from agents.pipeline import TriagePipeline, parse_incident, read_reports, run_batch
+
+INCIDENT = {"incident_type": "Fire", "location": "Clifton", "summary": "Kitchen fire"}
+
+
+def test_parse_incident_accepts_bare_fenced_or_dict_json():
+    assert parse_incident(INCIDENT) == INCIDENT
+    assert parse_incident(json.dumps(INCIDENT)) == INCIDENT
+    assert parse_incident(f"Sending help.\n```json\n{json.dumps(INCIDENT)}\n```") == INCIDENT
+    assert parse_incident("Where are you?") is None
+    assert parse_incident('{"incident_type": "Fire"}') is None
+    assert parse_incident(None) is None
+
+
+def test_read_reports_takes_json_or_plain_lines():
+    source = io.StringIO('{"id": 7, "message": "fire"}\n\nplain text\n{"text": "flood"}\n{broken\n')
+    assert list(read_reports(source)) == [(1, 7, "fire"), (3, None, "plain text"), (4, None, "flood"),
+                                          (5, None, "{broken")]
+
+
+class _ScriptedPipeline(TriagePipeline):
+    """Answers each agent's turn from a script instead of the mesh and Gemini."""
+
+    def __init__(self, replies):
+        super().__init__({agent: agent for agent in ("routing", "medical", "crime", "disaster")})
+        self.replies = replies
+        self.turns = []
+
+    def _turn(self, history, agent, message):
+        self.turns.append(agent)
+        return self.replies[agent]
+
+
+def test_triage_routes_then_parses_the_specialist_incident():
+    pipeline = _ScriptedPipeline({"routing": "ROUTE: disaster", "disaster": json.dumps(INCIDENT)})
+    result = pipeline.triage("fire in Clifton", report_id=3)
+    assert (result["status"], result["route"], result["id"]) == ("triaged", "disaster", 3)
+    assert pipeline.turns == ["routing", "disaster"]
+    assert result["incident"]["incident_type"] == "Fire"
+    assert "id" in result["incident"] and "severity" in result["incident"]
+
+
+def test_triage_falls_back_to_keywords_when_routing_asks_a_question():
+    pipeline = _ScriptedPipeline({"routing": "Can you tell me more?", "medical": json.dumps(INCIDENT)})
+    result = pipeline.triage("he is unconscious and bleeding")
+    assert (result["route"], result["routed_by"]) == ("medical", "keywords")
+
+
+def test_triage_without_a_route_is_unrouted():
+    pipeline = _ScriptedPipeline({"routing": "Can you tell me more?"})
+    result = pipeline.triage("hello")
+    assert (result["status"], result["reply"]) == ("unrouted", "Can you tell me more?")
+
+
+class _EchoPipeline:
+    def run(self, message, report_id=None):
+        if message == "boom":
+            return {"id": report_id, "status": "error", "error": "boom"}
+        return {"id": report_id, "status": "dispatched" if message else "unrouted"}
+
+
+def test_run_batch_writes_one_line_per_report_and_counts_outcomes():
+    reports = [(number, number, message) for number, message in enumerate(["a", "", "boom", "b"] * 5, 1)]
+    sink = io.StringIO()
+    summary = run_batch(_EchoPipeline(), iter(reports), sink, workers=2, progress=None)
+    assert (summary["reports"], summary["dispatched"], summary["unrouted"], summary["error"]) == (20, 10, 5, 5)
+    lines = [json.loads(line) for line in sink.getvalue().splitlines()]
+    assert sorted(line["line"] for line in lines) == list(range(1, 21))
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+from utils.places_cache import PlacesCache, geohash
+from utils.single_flight import SingleFlight
+
+
+def _cache(clock):
+    return PlacesCache(fresh_ttl_s=60, stale_ttl_s=3600, clock=clock, flight=SingleFlight("test-places"))
+
+
+def test_geohash_matches_the_reference_encoding():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_fresh_entries_are_served_without_fetching(clock):
+    cache = _cache(clock)
+    calls = []
+    fetch = lambda: calls.append(1) or [{"name": "Civil Hospital"}]
+    assert cache.get("hospital", 24.86, 67.01, fetch) == [{"name": "Civil Hospital"}]
+    assert cache.get("Hospital ", 24.8601, 67.0101, fetch) == [{"name": "Civil Hospital"}]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_empty_results_are_not_cached(clock):
+    cache = _cache(clock)
+    calls = []
+    for _ in range(3):
+        cache.get("hospital", 24.86, 67.01, lambda: calls.append(1) or [])
+    assert len(calls) == 3
+
+
+def test_concurrent_stale_hits_start_one_refresh(clock):
+    cache = _cache(clock)
+    cache.get("hospital", 24.86, 67.01, lambda: [{"name": "old"}])
+    clock.now += 120
+
+    release = threading.Event()
+    refreshes = []
+
+    def slow_fetch():
+        refreshes.append(1)
+        release.wait(5)
+        return [{"name": "new"}]
+
+    readers = [threading.Thread(target=cache.get, args=("hospital", 24.86, 67.01, slow_fetch)) for _ in range(20)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    # Every reader got the stale entry at once; only one refresh was started
+    assert cache.stats()["refreshes"] == 1
+    release.set()
+
+    deadline = time.time() + 5
+    while cache.get("hospital", 24.86, 67.01, slow_fetch) != [{"name": "new"}] and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(refreshes) == 1
+    assert not cache._refreshing
+
+
+def test_failed_refresh_can_be_retried(clock):
+    cache = _cache(clock)
+    cache.get("hospital", 24.86, 67.01, lambda: [{"name": "old"}])
+    clock.now += 120
+
+    def failing():
+        raise RuntimeError("places down")
+
+    assert cache.get("hospital", 24.86, 67.01, failing) == [{"name": "old"}]
+    deadline = time.time() + 5
+    while cache._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get("hospital", 24.86, 67.01, failing) == [{"name": "old"}]
+    assert cache.stats()["refreshes"] == 2
+
+
+def test_entries_past_the_stale_ttl_are_fetched_again(clock):
+    cache = _cache(clock)
+    calls = []
+    fetch = lambda: calls.append(1) or [{"name": f"result {len(calls)}"}]
+    cache.get("hospital", 24.86, 67.01, fetch)
+    clock.now += 3601
+    assert cache.get("hospital", 24.86, 67.01, fetch) == [{"name": "result 2"}]
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_cells_are_evicted(clock):
+    cache = PlacesCache(max_entries=2, clock=clock, flight=SingleFlight("test-places"))
+    fetch = lambda: [{"name": "x"}]
+    cache.get("hospital", 24.86, 67.01, fetch)
+    cache.get("hospital", 31.52, 74.35, fetch)
+    cache.get("hospital", 24.86, 67.01, fetch)      # touch Karachi, Lahore is now oldest
+    cache.get("hospital", 33.68, 73.04, fetch)
+    assert cache.stats()["evictions"] == 1
+    assert cache.key_for("hospital", 24.86, 67.01) in cache._entries
+    assert cache.key_for("hospital", 31.52, 74.35) not in cache._entries
+
+
+def test_invalidate_drops_one_keyword_or_everything(clock):
+    cache = _cache(clock)
+    fetch = lambda: [{"name": "x"}]
+    cache.get("hospital", 24.86, 67.01, fetch)
+    cache.get("police", 24.86, 67.01, fetch)
+    cache.invalidate(" Hospital")
+    assert cache.stats()["entries"] == 1
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_async_lookups_share_the_cache(clock):
+    cache = _cache(clock)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return [{"name": "Jinnah Hospital"}]
+
+    async def main():
+        first = await cache.get_async("hospital", 24.86, 67.01, fetch)
+        second = await cache.get_async("hospital", 24.86, 67.01, fetch)
+        return first, second
+
+    assert asyncio.run(main()) == ([{"name": "Jinnah Hospital"}], [{"name": "Jinnah Hospital"}])
+    assert len(calls) == 1
@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+from utils.rate_limiter import RateLimiter, QuotaExceeded, call_with_quota, is_rate_limit_error, rate_limiter
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class _Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class HTTPError(Exception):
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
+
+
+class ClientResponseError(Exception):
+    def __init__(self, status):
+        super().__init__(f"{status}, message='error'")
+        self.status = status
+        self.headers = None
+
+
+def _api():
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+def test_rate_limit_errors_are_recognised_by_type_and_status():
+    assert is_rate_limit_error(ResourceExhausted("quota"))
+    assert is_rate_limit_error(HTTPError("Too Many Requests", _Response(429)))
+    assert is_rate_limit_error(ClientResponseError(429))
+
+
+def test_messages_that_merely_contain_429_are_not_rate_limits():
+    assert not is_rate_limit_error(ValueError("No place with id ChIJ429xYz"))
+    assert not is_rate_limit_error(RuntimeError("location 24.8429, 67.0011 not found"))
+    assert not is_rate_limit_error(HTTPError("Server Error: 503 for incident 4290", _Response(503)))
+
+
+def test_lower_priorities_leave_a_reserve(clock):
+    limiter = RateLimiter("reserve", rate_per_s=1.0, burst=10, clock=clock)
+    for _ in range(7):
+        assert limiter.acquire("critical", timeout=0)
+    # 3 tokens left: low must leave 4 untouched, critical may take them
+    assert not limiter.acquire("low", timeout=0)
+    assert limiter.acquire("critical", timeout=0)
+
+
+def test_rate_limited_calls_are_retried_after_retry_after():
+    attempts = []
+
+    def send():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise HTTPError("Too Many Requests", _Response(429, {"Retry-After": "0.01"}))
+        return "ok"
+
+    api = _api()
+    assert call_with_quota(api, send) == "ok"
+    assert len(attempts) == 2
+    assert rate_limiter(api).stats()["rate_limited_responses"] == 1
+
+
+def test_no_quota_within_timeout_raises():
+    api = _api()
+    limiter = rate_limiter(api)
+    limiter.penalize(60)
+    with pytest.raises(QuotaExceeded):
+        call_with_quota(api, lambda: "never", timeout=0.01)
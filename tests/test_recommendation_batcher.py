@@ -0,0 +1,76 @@
+import contextvars
+import threading
+
+from agents.recommendation_batcher import RecommendationBatcher
+from utils.rate_limiter import current_priority, priority_level, request_priority
+
+caller = contextvars.ContextVar("caller", default=None)
+
+
+def _batcher(generate_batch=None, generate_single=None, **kwargs):
+    return RecommendationBatcher(
+        generate_batch or (lambda requests: {str(request["id"]): f"batch {request['id']}" for request in requests}),
+        generate_single or (lambda request: f"single {request['id']}"),
+        window_s=0.02, **kwargs)
+
+
+def test_lone_request_uses_a_single_call():
+    batcher = _batcher()
+    assert batcher.recommend({"id": 1}) == "single 1"
+    assert batcher.stats()["single_calls"] == 1
+
+
+def test_requests_submitted_together_share_one_call():
+    batcher = _batcher()
+    assert batcher.recommend_many([{"id": n} for n in range(5)]) == [f"batch {n}" for n in range(5)]
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["llm_calls"] == 1
+
+
+def test_requests_the_batch_missed_fall_back_to_single_calls():
+    batcher = _batcher(generate_batch=lambda requests: {"0": "batch 0"})
+    assert batcher.recommend_many([{"id": 0}, {"id": 1}]) == ["batch 0", "single 1"]
+    assert batcher.stats()["fallbacks"] == 1
+
+
+def test_a_failed_batch_falls_back_for_everyone():
+    def broken(requests):
+        raise RuntimeError("model overloaded")
+    batcher = _batcher(generate_batch=broken)
+    assert batcher.recommend_many([{"id": 0}, {"id": 1}]) == ["single 0", "single 1"]
+
+
+def test_single_calls_see_the_submitters_context_and_priority():
+    seen = {}
+
+    def generate_single(request):
+        seen[request["id"]] = (caller.get(), current_priority())
+        return "ok"
+
+    batcher = _batcher(generate_single=generate_single)
+
+    def submit(name, priority):
+        caller.set(name)
+        with request_priority(priority):
+            batcher.recommend({"id": name})
+
+    threads = [threading.Thread(target=submit, args=(name, priority))
+               for name, priority in (("a", "critical"), ("b", "low"))]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    assert seen == {"a": ("a", priority_level("critical")), "b": ("b", priority_level("low"))}
+
+
+def test_batch_runs_in_the_most_urgent_submitters_context():
+    seen = []
+
+    def generate_batch(requests):
+        seen.append(caller.get())
+        return {str(request["id"]): "ok" for request in requests}
+
+    batcher = _batcher(generate_batch=generate_batch)
+    caller.set("dispatch")
+    with request_priority("high"):
+        batcher.recommend_many([{"id": 1}, {"id": 2}])
+    assert seen == ["dispatch"]
@@ -0,0 +1,102 @@
+import pytest
+
+from agents.resource_ledger import DEFAULT_UNITS, ResourceLedger, min_cost_assignment
+
+
+def _place(name, lat, lng, address="Karachi"):
+    return {"displayName": {"text": name}, "formattedAddress": address,
+            "location": {"latitude": lat, "longitude": lng}}
+
+
+def test_min_cost_assignment_finds_the_optimum():
+    cost = [[4, 1, 3], [2, 0, 5], [3, 2, 2]]
+    assignment = min_cost_assignment(cost)
+    assert sorted(assignment) == [0, 1, 2]
+    assert sum(cost[row][column] for row, column in enumerate(assignment)) == 5
+
+
+def test_min_cost_assignment_rejects_more_rows_than_columns():
+    with pytest.raises(ValueError):
+        min_cost_assignment([[1], [2]])
+
+
+def test_a_place_serving_two_incident_types_gets_a_roster_for_each():
+    ledger = ResourceLedger()
+    station = _place("Saddar Police Station", 24.86, 67.02)
+    crime = ledger.upsert_facility(station, "Crime")
+    accident = ledger.upsert_facility(station, "Accident")
+
+    assert crime != accident
+    assert ledger.facilities[crime]["capacity"] == DEFAULT_UNITS["Crime"][1]
+    assert ledger.facilities[accident]["capacity"] == DEFAULT_UNITS["Accident"][1]
+    # Registering again is a no-op
+    assert ledger.upsert_facility(station, "Crime") == crime
+    assert len(ledger.facilities) == 2
+
+    assert ledger.reserve("1", 24.86, 67.02, "Accident")["facility_id"] == accident
+    assert ledger.reserve("2", 24.86, 67.02, "Crime")["facility_id"] == crime
+
+
+def test_reserve_skips_saturated_facilities_and_release_frees_the_unit():
+    ledger = ResourceLedger()
+    near = ledger.upsert_facility(_place("Near", 24.860, 67.020), "Disaster", capacity=1)
+    far = ledger.upsert_facility(_place("Far", 24.900, 67.060), "Disaster", capacity=1)
+
+    assert ledger.reserve("1", 24.86, 67.02, "Disaster")["facility_id"] == near
+    assert ledger.reserve("2", 24.86, 67.02, "Disaster")["facility_id"] == far
+    assert ledger.reserve("3", 24.86, 67.02, "Disaster") is None
+
+    assert ledger.release("1")
+    assert not ledger.release("1")
+    assert ledger.reserve("3", 24.86, 67.02, "Disaster")["facility_id"] == near
+
+
+def test_reserve_batch_never_double_books_the_last_unit():
+    ledger = ResourceLedger()
+    ledger.upsert_facility(_place("Only", 24.86, 67.02), "Medical", capacity=1)
+    ledger.upsert_facility(_place("Backup", 24.95, 67.10), "Medical", capacity=1)
+    results = ledger.reserve_batch([
+        {"id": "a", "lat": 24.861, "lng": 67.021, "incident_type": "Medical"},
+        {"id": "b", "lat": 24.859, "lng": 67.019, "incident_type": "Medical"},
+        {"id": "c", "lat": 24.860, "lng": 67.020, "incident_type": "Medical"},
+    ])
+    booked = [result["unit_id"] for result in results.values() if result]
+    assert len(booked) == 2 and len(set(booked)) == 2
+    assert sum(result is None for result in results.values()) == 1
+    assert ledger.snapshot()["open_reservations"] == 2
+
+
+def test_drive_times_are_computed_without_holding_the_ledger_lock():
+    import threading
+
+    acquired = []
+
+    def travel_time(lat, lng, f_lat, f_lng):
+        # Another thread must be able to use the ledger while a route is being computed
+        probe = threading.Thread(target=lambda: acquired.append(ledger._lock.acquire(timeout=1) and ledger._lock.release() is None))
+        probe.start()
+        probe.join()
+        return 5.0
+
+    ledger = ResourceLedger(travel_time_fn=travel_time)
+    ledger.upsert_facility(_place("Near", 24.86, 67.02), "Medical", capacity=2)
+    assert ledger.reserve("1", 24.86, 67.02, "Medical")
+    assert ledger.reserve_batch([{"id": "2", "lat": 24.86, "lng": 67.02, "incident_type": "Medical"}])["2"]
+    assert acquired and all(acquired)
+
+
+def test_a_unit_taken_while_ranking_is_not_booked_twice():
+    taken = []
+
+    def travel_time(lat, lng, f_lat, f_lng):
+        if not taken:
+            taken.append(None)
+            taken[0] = ledger.reserve("other", 24.86, 67.02, "Medical")
+        return 1.0 if f_lat == 24.86 else 9.0
+
+    ledger = ResourceLedger(travel_time_fn=travel_time)
+    near = ledger.upsert_facility(_place("Near", 24.86, 67.02), "Medical", capacity=1)
+    far = ledger.upsert_facility(_place("Far", 24.90, 67.06), "Medical", capacity=1)
+    reservation = ledger.reserve("1", 24.86, 67.02, "Medical")
+    assert taken[0]["facility_id"] == near
+    assert reservation["facility_id"] == far
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from agents.resource_ledger import straight_line_eta
+from tools.road_graph import RoadGraph, RoadRouter
+
+OSM = """<?xml version="1.0"?>
+<osm>
+  <node id="1" lat="24.8600" lon="67.0000"/>
+  <node id="2" lat="24.8600" lon="67.0100"/>
+  <node id="3" lat="24.8700" lon="67.0100"/>
+  <node id="4" lat="24.8700" lon="67.0000"/>
+  <node id="9" lat="24.9000" lon="67.0500"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="primary"/></way>
+  <way id="11"><nd ref="2"/><nd ref="3"/><tag k="highway" v="residential"/><tag k="oneway" v="yes"/></way>
+  <way id="12"><nd ref="3"/><nd ref="4"/><nd ref="1"/><tag k="highway" v="secondary"/><tag k="maxspeed" v="20"/></way>
+  <way id="13"><nd ref="4"/><nd ref="9"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+
+
+@pytest.fixture
+def graph(tmp_path):
+    path = tmp_path / "karachi.osm"
+    path.write_text(OSM)
+    return RoadGraph.open(str(path))
+
+
+def _node(graph, lat, lng):
+    return graph.nearest_node(lat, lng)[0]
+
+
+def test_osm_extract_keeps_drivable_ways_only(graph):
+    # The footway's far node never becomes a graph node
+    assert len(graph) == 4
+    assert graph.nearest_node(24.9, 67.05) is None
+
+
+def test_one_way_streets_are_respected(graph):
+    one, two, three = _node(graph, 24.86, 67.0), _node(graph, 24.86, 67.01), _node(graph, 24.87, 67.01)
+    forward = graph.shortest_time(two, three)
+    backward = graph.shortest_time(three, two)
+    # Against the one-way the trip goes round via nodes 4 and 1
+    assert backward > forward
+    assert graph.shortest_time(one, one) == 0.0
+
+
+def test_compiled_graph_is_cached_and_reloads_identically(graph, tmp_path):
+    assert (tmp_path / "karachi.csr").exists()
+    reloaded = RoadGraph.open(str(tmp_path / "karachi.csr"))
+    assert list(reloaded.targets) == list(graph.targets)
+    assert reloaded.top_speed_kmh == graph.top_speed_kmh
+
+
+def test_router_caches_routes_and_falls_back_off_the_graph(graph):
+    router = RoadRouter(graph)
+    eta = router.eta_minutes(24.86, 67.0, 24.87, 67.01)
+    assert router.eta_minutes(24.86, 67.0, 24.87, 67.01) == eta
+    assert router.stats()["hits"] == 1
+    assert math.isclose(router.eta_minutes(25.5, 68.0, 25.6, 68.1), straight_line_eta(25.5, 68.0, 25.6, 68.1))
+    assert router.stats()["fallbacks"] == 1
+
+
+def test_router_without_a_graph_is_straight_line():
+    assert RoadRouter().eta_minutes(24.86, 67.0, 24.9, 67.1) == straight_line_eta(24.86, 67.0, 24.9, 67.1)
@@ -0,0 +1,52 @@
+from agents.sentiment_agent import SentimentScorer, SessionSeverity, attach_severity
+
+scorer = SentimentScorer()
+
+
+def test_life_threats_outscore_calm_reports():
+    critical = scorer.score("HELP he is not breathing and there is blood everywhere!!")
+    calm = scorer.score("minor scratch, everyone is okay and safe")
+    assert critical["severity"] >= 7
+    assert calm["severity"] <= 3
+    assert "not breathing" in critical["terms"]
+
+
+def test_negated_injuries_lower_the_score():
+    assert scorer.score("no blood, not injured")["severity"] < scorer.score("blood, injured")["severity"]
+
+
+def test_roman_urdu_terms_count():
+    assert scorer.score("bachao jaldi, woh behosh hai")["severity"] > scorer.score("woh theek hai")["severity"]
+
+
+def test_scoring_is_deterministic():
+    text = "Fire in the building, children trapped on the third floor"
+    assert scorer.score(text) == scorer.score(text)
+
+
+def test_session_remembers_its_worst_turn():
+    session = SessionSeverity(scorer)
+    alarming = session.update("he collapsed and is unconscious")
+    session.update("ok")
+    assert session.peak >= alarming
+    assert session.severity > scorer.score("ok")["severity"]
+    assert session.turns == 2
+
+
+def test_attach_severity_blends_type_and_caller():
+    assert attach_severity({"incident_type": "Fire"}, None)["severity"] == 7.0
+    session = SessionSeverity(scorer)
+    session.update("people trapped, fire spreading, please hurry")
+    incident = attach_severity({"incident_type": "Fire"}, session)
+    assert 1 <= incident["severity"] <= 10
+    assert incident["severity_signal"]["turns"] == 1
+
+
+def test_score_sessions_groups_user_turns():
+    summaries = scorer.score_sessions([
+        {"role": "user", "session_id": "a", "content": "shooting outside, someone is shot"},
+        {"role": "assistant", "session_id": "a", "content": "Stay inside"},
+        {"role": "user", "session_id": "b", "content": "small kitchen fire, it's under control"},
+    ])
+    assert summaries["a"]["severity"] > summaries["b"]["severity"]
+    assert summaries["a"]["turns"] == 1
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from tools.replay import StageTimings, compare, group_sessions, load_events
+from utils.session_recorder import ReplayMiss, SessionRecorder
+
+
+def test_off_by_default_and_calls_pass_through():
+    recorder = SessionRecorder()
+    assert recorder.mode is None
+    assert recorder.call("maps.geocode", "Clifton", lambda: 1) == 1
+    with recorder.allocation([{"id": 1}]):
+        pass
+    assert recorder.stats()["events"] == 0
+
+
+def test_records_calls_under_their_allocation(tmp_path):
+    path = tmp_path / "sessions.jsonl"
+    recorder = SessionRecorder(str(path))
+    recorder.record_turn("s1", "routing", "4g", {"message": "fire"}, "disaster", 0.2)
+    with recorder.allocation([{"id": 7}], unit="u1"):
+        assert recorder.call("maps.geocode", "Clifton", lambda: {"lat": 24.8}) == {"lat": 24.8}
+    recorder.record_call("maps.geocode", "outside", 1)
+
+    events = load_events(str(path))
+    assert [event["kind"] for event in events] == ["turn", "call", "allocation", "call"]
+    assert events[1]["unit"] == "u1"
+    assert events[2]["incidents"] == [{"id": 7}]
+    assert events[3]["unit"] is None
+    conversations, allocations = group_sessions(events)
+    assert list(conversations) == ["s1"] and len(allocations) == 1
+
+
+def test_replay_serves_answers_per_unit_in_call_order():
+    recorder = SessionRecorder()
+    recorder.start_replay([
+        {"kind": "call", "unit": "u1", "boundary": "gemini", "key": "k", "value": "first"},
+        {"kind": "call", "unit": "u1", "boundary": "gemini", "key": "k", "value": "second"},
+        {"kind": "call", "unit": "u2", "boundary": "gemini", "key": "k", "value": "other"},
+        {"kind": "turn", "session": "s1"},
+    ])
+    with recorder.allocation([], unit="u1"):
+        answers = [recorder.call("gemini", "k", lambda: pytest.fail("went to the network")) for _ in range(3)]
+    assert answers == ["first", "second", "first"]
+    with recorder.allocation([], unit="u2"):
+        assert recorder.call("gemini", "k", lambda: None) == "other"
+
+
+def test_replay_falls_back_to_any_unit_then_misses():
+    recorder = SessionRecorder()
+    recorder.start_replay([{"kind": "call", "unit": "u1", "boundary": "maps.geocode", "key": "Clifton", "value": 1}])
+    with recorder.allocation([], unit="u9"):
+        assert recorder.call("maps.geocode", "Clifton", lambda: None) == 1
+        with pytest.raises(ReplayMiss):
+            recorder.call("maps.geocode", "Saddar", lambda: None)
+    assert asyncio.run(recorder.call_async("maps.geocode", "Clifton", None)) == 1
+    assert recorder.stats()["replay_misses"] == 1
+
+
+def test_load_events_skips_unreadable_lines(tmp_path):
+    path = tmp_path / "sessions.jsonl"
+    path.write_text('{"kind": "turn"}\n{broken\n\n{"kind": "call"}\n')
+    assert [event["kind"] for event in load_events(str(path))] == ["turn", "call"]
+
+
+def _report(build, p50, p95):
+    return {"build": build, "stages": {"allocation": {"p50_ms": p50, "p95_ms": p95}}}
+
+
+def test_compare_flags_only_regressions_past_threshold_and_floor():
+    assert compare(_report("a", 10, 20), _report("b", 11, 21)) == []
+    assert compare(_report("a", 0.1, 0.2), _report("b", 0.5, 0.6)) == []
+    regressions = compare(_report("a", 10, 20), _report("b", 10, 40))
+    assert len(regressions) == 1 and regressions[0].startswith("allocation: p95")
+
+
+def test_stage_timings_summary():
+    timings = StageTimings()
+    for ms in range(1, 101):
+        timings.add("turn.routing", ms / 1000)
+    summary = timings.summary()["turn.routing"]
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 51.0
+    assert summary["max_ms"] == 100.0
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from utils.shared_state import MemoryBackend, SharedState, SQLiteBackend, StateBackend, sticky_worker
+
+
+@pytest.fixture
+def sqlite_pair(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = SQLiteBackend(path, worker_id="w1", poll_s=0.01)
+    second = SQLiteBackend(path, worker_id="w2", poll_s=0.01)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_state_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+    class Partial(StateBackend):
+        def get_state(self, key):
+            return {}
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_sticky_worker_is_stable_and_moves_only_when_its_worker_leaves():
+    workers = ["w1", "w2", "w3"]
+    owners = {key: sticky_worker(key, workers) for key in map(str, range(200))}
+    assert owners == {key: sticky_worker(key, list(reversed(workers))) for key in owners}
+    remaining = {key: sticky_worker(key, ["w1", "w3"]) for key in owners}
+    assert all(remaining[key] == owner for key, owner in owners.items() if owner != "w2")
+    assert sticky_worker("anything", []) is None
+
+
+def test_shared_state_keeps_local_values_in_process():
+    backend = MemoryBackend("w1")
+    state = SharedState(backend, "system", shared={"active_agent": None}, local={"queue": []})
+    state.update(active_agent="medical", queue=[1])
+    assert backend.get_state("system") == {"active_agent": "medical"}
+    assert state["queue"] == [1]
+
+
+def test_sqlite_workers_share_state_and_events(sqlite_pair):
+    first, second = sqlite_pair
+    received = threading.Event()
+    second.subscribe("incident", lambda payload: received.set() if payload == {"id": 7} else None)
+
+    first.update_state("system", active_agent="crime")
+    first.append_history("s1", {"role": "user", "content": "help"})
+    first.join_room("dispatch", "sid-1")
+    first.publish("incident", {"id": 7})
+
+    assert second.get_state("system") == {"active_agent": "crime"}
+    assert second.get_history("s1") == [{"role": "user", "content": "help"}]
+    assert second.room_members("dispatch") == [{"sid": "sid-1", "worker": "w1"}]
+    assert second.live_workers() == ["w1", "w2"]
+    assert received.wait(2)
+
+
+def test_sqlite_connections_are_pooled_across_threads(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "state.db"), worker_id="w1", pool_size=2)
+    try:
+        threads = [threading.Thread(target=backend.append_history, args=("s", {"n": n})) for n in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(backend.get_history("s")) == 50
+        assert backend.idle_connections() <= 2
+    finally:
+        backend.close()
+    assert backend.idle_connections() == 0
+
+
+def test_close_removes_the_worker_and_its_rooms(sqlite_pair):
+    first, second = sqlite_pair
+    first.join_room("dispatch", "sid-1")
+    first.close()
+    assert second.room_members("dispatch") == []
+    assert second.live_workers() == ["w2"]
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer"] * 10
+    assert len(calls) == 1
+    assert flight.stats()["deduplicated"] == 9
+
+
+def test_followers_get_the_leaders_exception_and_nothing_is_cached():
+    flight = SingleFlight("test")
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("quota")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert errors == ["quota", "quota"]
+    assert flight.do("key", lambda: "fresh") == "fresh"
+    assert not flight.in_flight("key")
+
+
+def test_wrap_scopes_keys_per_instance():
+    flight = SingleFlight("test")
+    first = flight.wrap(lambda text: f"first {text}", scope="a")
+    second = flight.wrap(lambda text: f"second {text}", scope="b")
+    assert first("x") == "first x"
+    assert second("x") == "second x"
+
+
+def test_async_calls_share_one_task():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [42] * 5
+    assert len(calls) == 1
+
+
+def test_a_cancelled_follower_does_not_cancel_the_shared_call():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", fetch))
+        follower = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("google.generativeai")
+
+import agents.speculation as speculation
+from agents.speculation import SpeculativeSpecialist, guess_specialist
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(speculation.time, "time", lambda: now[0])
+    return now
+
+
+def test_guess_needs_a_clear_keyword_lead():
+    assert guess_specialist("there is a fire and thick smoke in our building") == "disaster"
+    assert guess_specialist("my phone was snatched at gunpoint, call the police") == "crime"
+    # One keyword each: too close to call
+    assert guess_specialist("fire and someone is injured") is None
+    assert guess_specialist("hello") is None
+
+
+def test_triage_time_is_measured_once_per_session(clock):
+    speculator = SpeculativeSpecialist({})
+    speculator.note_message("s1")
+    clock[0] += 4
+    speculator.note_triage("s1", speculative=True)
+    speculator.note_message("s1")
+    speculator.note_triage("s1", speculative=False)
+    stats = speculator.stats()["time_to_first_triage_question"]
+    assert stats["speculative"]["sessions"] == 1 and stats["sequential"]["sessions"] == 0
+    assert not speculator._first_message_at
+
+
+def test_abandoned_sessions_expire(clock):
+    speculator = SpeculativeSpecialist({})
+    for n in range(100):
+        speculator.note_message(f"hung-up-{n}")
+    clock[0] += speculation.TRIAGE_CLOCK_TTL_S + 1
+    speculator.note_message("new")
+    assert list(speculator._first_message_at) == ["new"]
+
+
+def test_session_maps_are_capped(clock, monkeypatch):
+    monkeypatch.setattr(speculation, "MAX_TRACKED_SESSIONS", 10)
+    speculator = SpeculativeSpecialist({})
+    for n in range(50):
+        speculator.note_message(f"s{n}")
+        speculator.note_triage(f"s{n}", speculative=False)
+        speculator.note_message(f"open-{n}")
+    assert len(speculator._first_message_at) <= 10
+    assert len(speculator._triaged) <= 10
@@ -0,0 +1,40 @@
+from mesh.store_forward import StoreAndForwardBuffer
+
+
+def test_pops_most_urgent_first_and_fifo_within_a_level():
+    buffer = StoreAndForwardBuffer()
+    buffer.offer("low", priority="low", now=0)
+    buffer.offer("medium-1", now=0)
+    buffer.offer("critical", priority="critical", now=0)
+    buffer.offer("medium-2", priority="MEDIUM", now=0)
+    assert buffer.drain(now=1) == ["critical", "medium-1", "medium-2", "low"]
+
+
+def test_full_buffer_evicts_less_urgent_messages_only():
+    buffer = StoreAndForwardBuffer(capacity=2)
+    buffer.offer("low", priority="low", now=0)
+    buffer.offer("high", priority="high", now=0)
+    assert buffer.offer("critical", priority="critical", now=0) == "accepted"
+    assert buffer.offer("another low", priority="low", now=0) == "overflow"
+    assert buffer.drain(now=0) == ["critical", "high"]
+    assert buffer.stats()["evicted"] == 1
+
+
+def test_expired_messages_are_never_forwarded():
+    buffer = StoreAndForwardBuffer(ttl_s=10)
+    buffer.offer("stale", now=0)
+    buffer.offer("fresh", ttl_s=100, now=0)
+    assert buffer.drain(now=50) == ["fresh"]
+    buffer.offer("stale again", now=0)
+    assert buffer.expire(now=50) == 1
+    assert len(buffer) == 0
+
+
+def test_duplicates_are_suppressed_within_the_window():
+    buffer = StoreAndForwardBuffer(dedup_window=2)
+    assert buffer.offer("a", mesh_id=1, now=0) == "accepted"
+    assert buffer.offer("a again", mesh_id=1, now=0) == "duplicate"
+    buffer.offer("b", mesh_id=2, now=0)
+    buffer.offer("c", mesh_id=3, now=0)
+    # 1 has left the window
+    assert buffer.offer("a late", mesh_id=1, now=0) == "accepted"
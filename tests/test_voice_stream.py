@@ -0,0 +1,112 @@
+import json
+import math
+import struct
+import threading
+
+from utils.voice_stream import FRAME_MS, HANGOVER_MS, SAMPLE_RATE, EnergyVAD, VoiceGateway, frame_rms
+
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def _frame(amplitude, pitch=200):
+    return struct.pack(f"<{FRAME_SAMPLES}h", *(int(amplitude * math.sin(2 * math.pi * pitch * n / SAMPLE_RATE))
+                                               for n in range(FRAME_SAMPLES)))
+
+
+SILENCE, VOICE = _frame(0), _frame(6000)
+
+
+class _Recognizer:
+    def __init__(self):
+        self.audio_s = 0.0
+
+    def AcceptWaveform(self, data):
+        self.audio_s += len(data) / (2 * SAMPLE_RATE)
+        return False
+
+    def PartialResult(self):
+        return json.dumps({"partial": "..."})
+
+    def FinalResult(self):
+        text, self.audio_s = f"spoke {self.audio_s:.1f}s", 0.0
+        return json.dumps({"text": text})
+
+
+class _Engine:
+    def recognizer(self, sample_rate):
+        return _Recognizer()
+
+
+def _gateway():
+    transcripts = []
+    lock = threading.Lock()
+
+    def on_transcript(sid, text, info):
+        with lock:
+            transcripts.append((sid, text, info))
+    return VoiceGateway(on_transcript, engine_factory=_Engine), transcripts
+
+
+def test_vad_separates_voice_from_silence():
+    vad = EnergyVAD()
+    assert frame_rms(SILENCE) == 0.0
+    assert not vad.is_speech(SILENCE)
+    assert vad.is_speech(VOICE)
+
+
+def test_an_utterance_ends_after_the_hangover():
+    gateway, transcripts = _gateway()
+    stream = gateway.open("caller")
+    for frame in [SILENCE] * 10 + [VOICE] * 50 + [SILENCE] * (HANGOVER_MS // FRAME_MS + 5):
+        gateway.feed("caller", frame)
+    gateway.close("caller")
+    assert stream.join(5)
+    assert len(transcripts) == 1
+    sid, text, info = transcripts[0]
+    assert sid == "caller" and text.startswith("spoke")
+    assert info["utterance_s"] >= 1.0
+
+
+def test_close_flushes_speech_in_progress_and_join_waits_for_it():
+    gateway, transcripts = _gateway()
+    streams = [gateway.open(f"caller-{n}") for n in range(5)]
+    for n in range(5):
+        for frame in [VOICE] * 40:
+            gateway.feed(f"caller-{n}", frame)
+        gateway.close(f"caller-{n}")
+    # close() removes the stream from the gateway at once; only join() says the decode is done
+    assert gateway.stats()["active"] == 0
+    assert all(stream.join(5) for stream in streams)
+    assert sorted(sid for sid, _, _ in transcripts) == [f"caller-{n}" for n in range(5)]
+
+
+def test_out_of_order_chunks_are_put_back_in_order():
+    gateway, transcripts = _gateway()
+    stream = gateway.open("caller")
+    frames = [VOICE] * 30 + [SILENCE] * (HANGOVER_MS // FRAME_MS + 5)
+    order = list(range(len(frames)))
+    order[3], order[4] = order[4], order[3]
+    for seq in order:
+        gateway.feed("caller", frames[seq], seq=seq)
+    gateway.close("caller")
+    assert stream.join(5)
+    assert len(transcripts) == 1
+    assert gateway.stats()["lost_chunks"] == 0
+
+
+def test_a_failing_final_decode_still_ends_the_worker():
+    class _Broken(_Recognizer):
+        def FinalResult(self):
+            raise RuntimeError("decoder crashed")
+
+    class _BrokenEngine:
+        def recognizer(self, sample_rate):
+            return _Broken()
+
+    gateway = VoiceGateway(lambda sid, text, info: None, engine_factory=_BrokenEngine)
+    stream = gateway.open("caller")
+    for frame in [VOICE] * 40:
+        gateway.feed("caller", frame)
+    gateway.close("caller")
+    assert stream.join(5)
+    assert gateway.stats()["errors"] == 1
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("google.generativeai")
+
+import utils.warmup as warmup
+from utils.warmup import WarmPool
+
+
+class _Model:
+    def __init__(self, model_name, system_instruction):
+        self.prompt = system_instruction
+
+    def count_tokens(self, text):
+        return 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(warmup.genai, "GenerativeModel", _Model)
+    pool = WarmPool()
+    pool.allocator = object()       # not the real AllocatorAgent
+    monkeypatch.setattr(pool.get_http_session("maps"), "head", lambda host, timeout: None)
+    return pool
+
+
+def test_models_and_sessions_are_built_once(pool):
+    assert pool.get_model("routing prompt") is pool.get_model("routing prompt")
+    assert pool.get_model("routing prompt") is not pool.get_model("medical prompt")
+    assert pool.get_http_session("maps") is pool.get_http_session("maps")
+
+
+def test_warm_up_marks_every_component_and_becomes_ready(pool):
+    assert not pool.is_ready()
+    pool.warm_up({"routing": "routing prompt", "medical": "medical prompt"}, "maps-key", "api-key")
+    status = pool.status()
+    assert status["ready"] and status["warm_up_complete"]
+    assert {"model:routing", "model:medical", "allocator", "gemini:channel"} <= set(status["components"])
+    assert all(f"http:{host}" in status["components"] for host in warmup.MAPS_HOSTS)
+
+
+def test_failed_network_probes_do_not_block_readiness(pool, monkeypatch):
+    def unreachable(host, timeout):
+        raise OSError("no route to host")
+    monkeypatch.setattr(pool.get_http_session("maps"), "head", unreachable)
+    pool.warm_up({"routing": "routing prompt"}, "maps-key", "api-key")
+    assert pool.components[f"http:{warmup.MAPS_HOSTS[0]}"]["status"] == "failed"
+    assert pool.is_ready()
+
+
+def test_a_model_that_cannot_be_built_blocks_readiness(pool, monkeypatch):
+    def broken(model_name, system_instruction):
+        raise ValueError("bad API key")
+    monkeypatch.setattr(warmup.genai, "GenerativeModel", broken)
+    pool.warm_up({"routing": "routing prompt"}, "maps-key", "api-key")
+    assert pool.components["model:routing"]["error"] == "bad API key"
+    assert pool.ready_event.is_set() and not pool.is_ready()
+
+
+def test_start_runs_warm_up_once_in_the_background(pool):
+    thread = pool.start({"routing": "routing prompt"}, "maps-key", "api-key")
+    assert pool.start({"routing": "routing prompt"}, "maps-key", "api-key") is thread
+    thread.join(5)
+    assert pool.is_ready()
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from mesh import wire
+
+
+def _request(**fields):
+    message = {"data": "Fire at Clifton block 5", "mesh_id": "0a1b2c3d", "timestamp": 1792390000.123,
+               "path": ["V-Node", "Relay-Node"], "network_type": "bluetooth", "priority": "high"}
+    message.update(fields)
+    return message
+
+
+def test_request_round_trips_and_is_smaller_than_json():
+    message = _request(ttl=30)
+    frame = wire.encode(message)
+    assert wire.decode(frame) == message
+    assert len(frame) < len(json.dumps(message))
+
+
+def test_response_round_trips():
+    message = {"message_type": "response", "data": "Ambulance 2 dispatched", "original_mesh_id": "0a1b2c3d",
+               "response_id": "ffee0011", "timestamp": 1792390001.5,
+               "path": ["V-Node", "Relay-Node", "C-Node", "C-Node-Response"], "network_type": "wifi"}
+    assert wire.decode(wire.encode(message)) == message
+
+
+def test_unusual_values_survive_as_literals_and_extras():
+    message = _request(mesh_id="not-a-hex-id", path=["V-Node", "Relay-7"], network_type="lora",
+                       priority="urgent", data={"structured": True}, session="abc")
+    assert wire.decode(wire.encode(message)) == message
+
+
+def test_long_payloads_are_compressed():
+    message = _request(data="smoke on the third floor " * 40)
+    frame = wire.encode(message)
+    assert frame[3] & wire.FLAG_ZLIB
+    assert wire.decode(frame)["data"] == message["data"]
+
+
+@pytest.mark.parametrize("frame", [b"\x5c\x01", b"\x00\x01\x00\x00", b"\x5c\x09\x00\x00", b"\x5c\x01\x07\x00"])
+def test_malformed_frames_raise_wire_format_error(frame):
+    with pytest.raises(wire.WireFormatError):
+        wire.decode(frame)
+
+
+def test_decode_batch_rejects_single_frames():
+    with pytest.raises(wire.WireFormatError):
+        wire.decode_batch(wire.encode(_request()))
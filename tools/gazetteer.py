@@ -0,0 +1,511 @@
+"""
+Offline Pakistan gazetteer for resolving caller locations without Google.
+
+    python -m tools.gazetteer build PK.txt pk.gaz [--min-population 10000]
+    python -m tools.gazetteer query pk.gaz "gulshan e iqbal block 13, karachi"
+
+Place names come from the built-in seed below plus, optionally, a GeoNames
+country dump (PK.txt from download.geonames.org) compiled once into a small
+gzipped table. Every name is folded to a spelling-insensitive key before it
+goes into a radix trie: izafat ("-e-", "-i-"), hyphens, doubled letters and
+common transliteration vowels collapse, so "Gulshan-e-Iqbal", "gulshan e
+iqbal" and "Gulshan Iqbal" share one key. A lookup scans the caller's text
+for the most specific known place; only when nothing matches exactly does it
+search the trie within a small edit distance. The answer lists the words no
+known place accounts for (street names, house numbers, misspellings). Only
+text with none left is resolved without Google. Otherwise the place biases
+Google's geocoding and stands in when Google has no answer.
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.resource_ledger import haversine_km
+
+# city -> (lat, lng, {area: (lat, lng)}). Coordinates are area centroids,
+# good enough to pick the nearest facility.
+SEED = {
+    "Karachi": (24.8607, 67.0011, {
+        "Gulshan-e-Iqbal": (24.9204, 67.0932), "Gulistan-e-Jauhar": (24.9180, 67.1300), "Clifton": (24.8138, 67.0300),
+        "Defence": (24.8120, 67.0650), "DHA Karachi": (24.8120, 67.0650), "Saddar": (24.8556, 67.0271),
+        "North Nazimabad": (24.9420, 67.0430), "Nazimabad": (24.9120, 67.0300), "Korangi": (24.8290, 67.1260),
+        "Malir": (24.8930, 67.2040), "Lyari": (24.8600, 66.9900), "Orangi Town": (24.9500, 66.9900),
+        "Federal B Area": (24.9320, 67.0730), "Tariq Road": (24.8710, 67.0600), "Landhi": (24.8420, 67.2090),
+        "Kemari": (24.8190, 66.9800), "New Karachi": (24.9870, 67.0670), "Shah Faisal Colony": (24.8800, 67.1500),
+        "North Karachi": (24.9750, 67.0650), "Gulberg Karachi": (24.9300, 67.0700), "Liaquatabad": (24.9070, 67.0440),
+        "PECHS": (24.8700, 67.0650), "Bahadurabad": (24.8820, 67.0690), "Baldia Town": (24.9250, 66.9700),
+        "Shahrah-e-Faisal": (24.8650, 67.0900), "Gulshan-e-Hadeed": (24.8710, 67.3610), "Surjani Town": (25.0300, 67.0550),
+        "Keamari": (24.8190, 66.9800), "Garden East": (24.8780, 67.0300), "Boat Basin": (24.8200, 67.0300),
+    }),
+    "Lahore": (31.5204, 74.3587, {
+        "Gulberg": (31.5120, 74.3460), "Model Town": (31.4840, 74.3250), "Johar Town": (31.4690, 74.2720),
+        "DHA Lahore": (31.4720, 74.4080), "Iqbal Town": (31.5100, 74.2870), "Anarkali": (31.5640, 74.3110),
+        "Shadman": (31.5400, 74.3300), "Township": (31.4520, 74.3040), "Wapda Town": (31.4370, 74.2640),
+        "Faisal Town": (31.4800, 74.3050), "Garden Town": (31.5000, 74.3200), "Samanabad": (31.5330, 74.2990),
+        "Shahdara": (31.6220, 74.2830), "Cantt Lahore": (31.5170, 74.3900), "Allama Iqbal Town": (31.5100, 74.2870),
+        "Bahria Town Lahore": (31.3660, 74.1840), "Mall Road": (31.5560, 74.3330), "Raiwind Road": (31.4200, 74.2600),
+    }),
+    "Islamabad": (33.6844, 73.0479, {
+        "Blue Area": (33.7100, 73.0600), "F-6": (33.7290, 73.0760), "F-7": (33.7200, 73.0560),
+        "F-8": (33.7100, 73.0370), "F-10": (33.6950, 73.0130), "F-11": (33.6850, 72.9900),
+        "G-6": (33.7130, 73.0870), "G-9": (33.6880, 73.0300), "G-10": (33.6760, 73.0130), "G-11": (33.6700, 72.9970),
+        "I-8": (33.6680, 73.0750), "I-9": (33.6550, 73.0550), "E-11": (33.6980, 72.9720),
+        "Bani Gala": (33.7220, 73.1540), "Bahria Town": (33.5320, 73.1100), "DHA Islamabad": (33.5350, 73.1300),
+    }),
+    "Rawalpindi": (33.5651, 73.0169, {
+        "Saddar Rawalpindi": (33.5940, 73.0530), "Satellite Town": (33.6390, 73.0680), "Raja Bazar": (33.6150, 73.0650),
+        "Chaklala": (33.5900, 73.0900), "Westridge": (33.5900, 73.0200), "Murree Road": (33.6200, 73.0700),
+    }),
+    "Faisalabad": (31.4504, 73.1350, {"Madina Town": (31.4300, 73.1100), "People's Colony": (31.4150, 73.0950)}),
+    "Multan": (30.1575, 71.5249, {"Gulgasht": (30.2150, 71.4750), "Cantt Multan": (30.1900, 71.4500)}),
+    "Peshawar": (34.0151, 71.5249, {"Hayatabad": (33.9930, 71.4400), "University Town": (34.0050, 71.4950),
+                                    "Saddar Peshawar": (34.0050, 71.5400)}),
+    "Quetta": (30.1798, 66.9750, {"Satellite Town Quetta": (30.2000, 66.9900), "Jinnah Road": (30.1950, 67.0100)}),
+    "Hyderabad": (25.3960, 68.3578, {"Latifabad": (25.3700, 68.3700), "Qasimabad": (25.3950, 68.3300)}),
+    "Gujranwala": (32.1877, 74.1945, {}), "Sialkot": (32.4945, 74.5229, {}), "Sukkur": (27.7052, 68.8574, {}),
+    "Bahawalpur": (29.3956, 71.6836, {}), "Abbottabad": (34.1688, 73.2215, {}), "Mardan": (34.1986, 72.0404, {}),
+    "Larkana": (27.5570, 68.2264, {}), "Sargodha": (32.0836, 72.6711, {}), "Gwadar": (25.1264, 62.3225, {}),
+    "Sheikhupura": (31.7131, 73.9783, {}), "Rahim Yar Khan": (28.4202, 70.2952, {}), "Jhang": (31.2681, 72.3181, {}),
+    "Dera Ghazi Khan": (30.0561, 70.6348, {}), "Gujrat": (32.5731, 74.0789, {}), "Kasur": (31.1187, 74.4508, {}),
+    "Mirpur Khas": (25.5276, 69.0111, {}), "Nawabshah": (26.2442, 68.4100, {}), "Muzaffarabad": (34.3700, 73.4711, {}),
+    "Swat": (35.2227, 72.4258, {}), "Mingora": (34.7717, 72.3600, {}), "Murree": (33.9070, 73.3943, {}),
+    "Jhelum": (32.9405, 73.7276, {}), "Okara": (30.8138, 73.4534, {}), "Sahiwal": (30.6682, 73.1114, {}),
+    "Chiniot": (31.7200, 72.9789, {}), "Kohat": (33.5869, 71.4429, {}), "Dera Ismail Khan": (31.8314, 70.9019, {}),
+    "Gilgit": (35.9208, 74.3089, {}), "Skardu": (35.2971, 75.6333, {}), "Turbat": (26.0023, 63.0440, {}),
+}
+
+# Everyday and abbreviated names -> the seed name they stand for
+ALIASES = {
+    "Pindi": "Rawalpindi", "Isb": "Islamabad", "Khi": "Karachi", "Lhr": "Lahore", "Pesh": "Peshawar",
+    "DI Khan": "Dera Ismail Khan", "DG Khan": "Dera Ghazi Khan", "RYK": "Rahim Yar Khan",
+    "FB Area": "Federal B Area", "Gulistan-e-Johar": "Gulistan-e-Jauhar", "Johar": "Gulistan-e-Jauhar",
+    "Gulshan": "Gulshan-e-Iqbal", "Nazimabad No 1": "Nazimabad", "Faisal Colony": "Shah Faisal Colony",
+    "DHA": "Defence", "Sharea Faisal": "Shahrah-e-Faisal", "Orangi": "Orangi Town",
+}
+
+# Folded single words that are never taken as a place on their own
+STOPWORDS = {
+    "near", "main", "road", "street", "block", "sector", "phase", "market", "bazar", "chowk", "colony", "town",
+    "city", "area", "house", "the", "there", "here", "help", "fire", "police", "hospital", "school", "park",
+    "garden", "model", "new", "old", "north", "south", "east", "west", "central", "station",
+}
+
+CITY_RADIUS_KM = 40.0     # an area belongs to a city named in the same text within this distance
+MAX_SPAN_TOKENS = 4       # longest place name tried for fuzzy matches
+MIN_FUZZY_CHARS = 5       # shorter spans only match exactly
+CACHE_SIZE = 4096         # recently resolved texts
+
+# GeoNames feature codes for cities (anything else populated is an area)
+CITY_CODES = {"PPLC", "PPLA", "PPLA2", "PPLA3"}
+CITY_MIN_POPULATION = 100_000
+
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+_DOUBLED = re.compile(r"(.)\1+")
+_SPELLING = (("ee", "i"), ("oo", "u"), ("aa", "a"), ("au", "o"), ("q", "k"), ("ph", "f"))
+_IZAFAT = {"e", "i"}
+
+
+def fold(text: str) -> str:
+    """Spelling-insensitive key: izafat, hyphens, doubled letters and vowel spellings collapsed."""
+    tokens = _SEPARATORS.sub(" ", text.lower()).split()
+    folded: List[str] = []
+    for i, token in enumerate(tokens):
+        # Sector names: "F-7", "f 7" and "F7" are one token
+        if len(token) == 1 and token.isalpha() and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            tokens[i + 1] = token + tokens[i + 1]
+            continue
+        if token in _IZAFAT or token == "pakistan":
+            continue
+        if token.isalpha():
+            for spelling, canonical in _SPELLING:
+                token = token.replace(spelling, canonical)
+            token = _DOUBLED.sub(r"\1", token)
+            # "Nazim Abad" is "Nazimabad"
+            if token == "abad" and folded:
+                folded[-1] += token
+                continue
+        folded.append(token)
+    return " ".join(folded)
+
+
+# Words that say nothing about where. Any other word that no known place
+# accounts for ("Jail Road", "block 5") is part of an address only Google knows.
+FILLER = set(fold(
+    "near at on in of to and the a by from outside inside behind opposite next beside front across "
+    "city district area pakistan please help emergency"
+).split())
+
+
+class _Node:
+    __slots__ = ("edges", "entries")
+
+    def __init__(self):
+        self.edges: Dict[str, Tuple[str, "_Node"]] = {}   # first char -> (edge label, child)
+        self.entries: Optional[List[int]] = None
+
+
+class RadixTrie:
+    """Path-compressed trie from folded keys to lists of entry ids."""
+
+    def __init__(self):
+        self.root = _Node()
+        self.keys = 0
+
+    def insert(self, key: str, entry: int):
+        node = self.root
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None:
+                child = _Node()
+                node.edges[key[0]] = (key, child)
+                node, key = child, ""
+                break
+            label, child = edge
+            common = 0
+            while common < len(label) and common < len(key) and label[common] == key[common]:
+                common += 1
+            if common < len(label):
+                # Split the edge where the new key diverges
+                middle = _Node()
+                middle.edges[label[common]] = (label[common:], child)
+                node.edges[key[0]] = (label[:common], middle)
+                child = middle
+            node, key = child, key[common:]
+        if node.entries is None:
+            node.entries = []
+            self.keys += 1
+        if entry not in node.entries:
+            node.entries.append(entry)
+
+    def prefixes_at(self, text: str, start: int) -> List[Tuple[int, List[int]]]:
+        """(end, entries) for every key equal to text[start:end] where end is a word boundary."""
+        found = []
+        node, pos = self.root, start
+        while True:
+            if node.entries and (pos == len(text) or text[pos] == " "):
+                found.append((pos, node.entries))
+            if pos == len(text):
+                return found
+            edge = node.edges.get(text[pos])
+            if edge is None:
+                return found
+            label, child = edge
+            if not text.startswith(label, pos):
+                return found
+            node, pos = child, pos + len(label)
+
+    def fuzzy(self, query: str, max_edits: int) -> List[Tuple[int, List[int]]]:
+        """
+        (edits, entries) for keys within max_edits (Levenshtein) of query that
+        share its first letter. Only the diagonal band of each DP row is
+        computed, and a branch is dropped as soon as no key below can match.
+        """
+        found = []
+        anchor = self.root.edges.get(query[:1])
+        if anchor is None:
+            return found
+        size = len(query)
+        too_far = max_edits + 1
+        first_row = [min(col, too_far) for col in range(size + 1)]
+
+        def walk(edges, row: List[int], depth: int):
+            for label, child in edges:
+                current, level = row, depth
+                for char in label:
+                    level += 1
+                    previous, current = current, [min(level, too_far)] + [too_far] * size
+                    best = current[0]
+                    for col in range(max(1, level - max_edits), min(size, level + max_edits) + 1):
+                        cost = min(current[col - 1] + 1, previous[col] + 1,
+                                   previous[col - 1] + (query[col - 1] != char), too_far)
+                        current[col] = cost
+                        if cost < best:
+                            best = cost
+                    if best > max_edits:
+                        break
+                else:
+                    if child.entries and current[-1] <= max_edits:
+                        found.append((current[-1], child.entries))
+                    walk(child.edges.values(), current, level)
+
+        walk([anchor], first_row, 0)
+        return found
+
+
+class Gazetteer:
+    """
+    Place names -> coordinates. Entries are (name, kind, city, lat, lng)
+    with kind "city" or "area"; an area's city disambiguates names that
+    exist in several cities ("Saddar").
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str, Optional[str], float, float]] = []
+        self.trie = RadixTrie()
+        self._lock = threading.Lock()
+        self.counters = {"lookups": 0, "exact": 0, "fuzzy": 0, "misses": 0}
+        self._cache: "OrderedDict[Tuple[str, bool], Tuple[Optional[int], bool, List[str]]]" = OrderedDict()
+        self._lookup_s = 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --- building ------------------------------------------------------------
+
+    def add(self, name: str, kind: str, city: Optional[str], lat: float, lng: float, aliases=()) -> int:
+        entry = len(self.entries)
+        self.entries.append((name, kind, city, lat, lng))
+        for spelling in (name, *aliases):
+            key = fold(spelling)
+            if key and key not in STOPWORDS:
+                self.trie.insert(key, entry)
+        return entry
+
+    @classmethod
+    def from_seed(cls) -> "Gazetteer":
+        gazetteer = cls()
+        gazetteer.add_seed()
+        return gazetteer
+
+    def add_seed(self):
+        aliases: Dict[str, List[str]] = {}
+        for alias, name in ALIASES.items():
+            aliases.setdefault(name, []).append(alias)
+        for city, (lat, lng, areas) in SEED.items():
+            self.add(city, "city", None, lat, lng, aliases.get(city, ()))
+            for area, (area_lat, area_lng) in areas.items():
+                self.add(area, "area", city, area_lat, area_lng, aliases.get(area, ()))
+
+    @staticmethod
+    def compile_geonames(path: str, output: str, min_population: int = 10_000):
+        """GeoNames country dump -> gzipped name/kind/city/lat/lng/aliases table."""
+        started = time.time()
+        places = []
+        with open(path, encoding="utf-8") as source:
+            for line in source:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 15 or cols[6] != "P":
+                    continue
+                code, population = cols[7], int(cols[14] or 0)
+                # Sections of cities are kept whatever their size; villages only when sizeable
+                if code != "PPLX" and population < min_population:
+                    continue
+                kind = "city" if code in CITY_CODES or population >= CITY_MIN_POPULATION else "area"
+                aliases = {alt for alt in cols[3].split(",") if alt and alt.isascii() and alt != cols[1]}
+                if cols[2] and cols[2] != cols[1]:
+                    aliases.add(cols[2])
+                places.append([cols[1], kind, "", float(cols[4]), float(cols[5]), sorted(aliases)])
+        cities = [place for place in places if place[1] == "city"]
+        for place in places:
+            if place[1] == "area" and cities:
+                nearest = min(cities, key=lambda city: haversine_km(place[3], place[4], city[3], city[4]))
+                if haversine_km(place[3], place[4], nearest[3], nearest[4]) <= CITY_RADIUS_KM:
+                    place[2] = nearest[0]
+        with gzip.open(output, "wt", encoding="utf-8") as sink:
+            for name, kind, city, lat, lng, aliases in places:
+                sink.write(f"{name}\t{kind}\t{city}\t{lat:.5f}\t{lng:.5f}\t{'|'.join(aliases)}\n")
+        print(f"Gazetteer    - Compiled {len(places)} places from {path} in {time.time() - started:.1f}s")
+
+    def load(self, path: str):
+        """Add the places of a compiled table (see compile_geonames)."""
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            for line in source:
+                name, kind, city, lat, lng, aliases = line.rstrip("\n").split("\t")
+                self.add(name, kind, city or None, float(lat), float(lng), aliases.split("|") if aliases else ())
+
+    # --- queries -------------------------------------------------------------
+
+    def _exact_matches(self, text: str) -> List[Tuple[int, List[int]]]:
+        """(key length, entries) for every known place named in the folded text."""
+        matches = []
+        start = 0
+        while start < len(text):
+            for end, entries in self.trie.prefixes_at(text, start):
+                matches.append((end - start, entries))
+            start = text.find(" ", start)
+            if start < 0:
+                break
+            start += 1
+        return matches
+
+    def _fuzzy_matches(self, text: str) -> List[Tuple[int, List[int]]]:
+        """
+        Misspellings of known names among the 1..MAX_SPAN_TOKENS word spans of
+        the text; only the fewest-edit (and never exact) matches are kept.
+        """
+        tokens = text.split()
+        best_edits, matches = None, []
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + MAX_SPAN_TOKENS, len(tokens)) + 1):
+                span = " ".join(tokens[start:end])
+                if len(span) < MIN_FUZZY_CHARS:
+                    continue
+                for edits, entries in self.trie.fuzzy(span, 1 if len(span) < 12 else 2):
+                    if edits == 0:
+                        continue
+                    if best_edits is None or edits < best_edits:
+                        best_edits, matches = edits, []
+                    if edits == best_edits:
+                        matches.append((len(span), entries))
+        return matches
+
+    def _resolve(self, matches: List[Tuple[int, List[int]]]) -> Optional[int]:
+        """Most specific entry: an area (inside a city also named, if any) over a city, longer names first."""
+        cities = [self.entries[entry] for _, entries in matches for entry in entries if self.entries[entry][1] == "city"]
+        city_names = {city[0] for city in cities}
+        best, best_rank = None, None
+        for length, entries in matches:
+            for entry in entries:
+                name, kind, city, lat, lng = self.entries[entry]
+                # An area elsewhere than the city the caller named is the wrong one ("Pindi saddar")
+                consistent = kind == "city" or not city_names or city in city_names or any(
+                    haversine_km(lat, lng, c[3], c[4]) <= CITY_RADIUS_KM for c in cities)
+                rank = (consistent, kind == "area", length, -entry)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = entry, rank
+        return best
+
+    def _unmatched(self, text: str, entry: int) -> List[str]:
+        """
+        Folded words of the text that are neither filler nor part of the
+        exact name of the resolved place or its city. Words naming some other
+        place ("saddar" when Rawalpindi won) stay unmatched.
+        """
+        city = self.entries[entry][2]
+        tokens = text.split()
+        starts, position = [], 0
+        for token in tokens:
+            starts.append(text.index(token, position))
+            position = starts[-1] + len(token)
+        covered = [False] * len(tokens)
+        for i, start in enumerate(starts):
+            for end, entries in self.trie.prefixes_at(text, start):
+                if not any(e == entry or (self.entries[e][1] == "city" and self.entries[e][0] == city) for e in entries):
+                    continue
+                j = i
+                while j < len(tokens) and starts[j] < end:
+                    covered[j] = True
+                    j += 1
+        return [token for token, known in zip(tokens, covered) if not known and token not in FILLER]
+
+    def _match(self, text: str, fuzzy: bool) -> Tuple[Optional[int], bool]:
+        """(entry, matched fuzzily) for folded text."""
+        exact = self._exact_matches(text)
+        entry = self._resolve(exact)
+        # A misspelt area ("Defense, Karachi") is more specific than the city spelt right
+        if fuzzy and (entry is None or self.entries[entry][1] == "city"):
+            closest = self._resolve(exact + self._fuzzy_matches(text))
+            if closest != entry:
+                return closest, True
+        return entry, False
+
+    def find(self, location_text: str, fuzzy: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        The most specific known place named in the text, else None. Pass
+        fuzzy=False for long free text, where trying every word span for
+        misspellings costs milliseconds.
+        """
+        started = time.perf_counter()
+        key = (location_text or "", fuzzy)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            entry, fuzzily, unmatched = cached
+        else:
+            text = fold(key[0])
+            entry, fuzzily = self._match(text, fuzzy) if text else (None, False)
+            unmatched = self._unmatched(text, entry) if entry is not None else []
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if cached is None:
+                self._cache[key] = (entry, fuzzily, unmatched)
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            self.counters["lookups"] += 1
+            self.counters["misses" if entry is None else "fuzzy" if fuzzily else "exact"] += 1
+            self._lookup_s += elapsed
+        if entry is None:
+            return None
+        name, kind, city, lat, lng = self.entries[entry]
+        return {
+            "name": f"{name}, {city}" if city else name,
+            "kind": kind,
+            "lat": lat,
+            "lng": lng,
+            "fuzzy": fuzzily,
+            # Words the place does not account for: street names, house and block numbers, misspellings
+            "unmatched": list(unmatched),
+        }
+
+    def lookup(self, location_text: str) -> Optional[Dict[str, float]]:
+        """{'lat', 'lng'} of the most specific known place named in the text, else None."""
+        place = self.find(location_text)
+        return {"lat": place["lat"], "lng": place["lng"]} if place else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            total_s = self._lookup_s
+        counters["places"] = len(self.entries)
+        counters["keys"] = self.trie.keys
+        counters["hit_ratio"] = round((counters["exact"] + counters["fuzzy"]) / counters["lookups"], 3) if counters["lookups"] else 0.0
+        counters["avg_lookup_us"] = round(1e6 * total_s / counters["lookups"], 1) if counters["lookups"] else 0.0
+        return counters
+
+
+_shared_gazetteer = None
+_shared_lock = threading.Lock()
+
+
+def shared_gazetteer() -> Gazetteer:
+    """Process-wide gazetteer: the seed plus the table at GAZETTEER_PATH if set."""
+    global _shared_gazetteer
+    with _shared_lock:
+        if _shared_gazetteer is None:
+            gazetteer = Gazetteer.from_seed()
+            path = os.getenv("GAZETTEER_PATH")
+            if path:
+                try:
+                    gazetteer.load(path)
+                except Exception as e:
+                    print(f"Gazetteer    - Could not load {path}: {e}")
+            _shared_gazetteer = gazetteer
+    return _shared_gazetteer
+
+
+def lookup(location_text: str) -> Optional[Dict[str, float]]:
+    return shared_gazetteer().lookup(location_text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a GeoNames country dump into a .gaz table")
+    build.add_argument("dump")
+    build.add_argument("output")
+    build.add_argument("--min-population", type=int, default=10_000)
+    query = commands.add_parser("query", help="resolve a location string")
+    query.add_argument("table", help="compiled table, or 'seed' for the built-in names only")
+    query.add_argument("text")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        Gazetteer.compile_geonames(args.dump, args.output, args.min_population)
+        sys.exit(0)
+    started = time.perf_counter()
+    gazetteer = Gazetteer.from_seed()
+    if args.table != "seed":
+        gazetteer.load(args.table)
+    loaded = time.perf_counter()
+    place = gazetteer.find(args.text)
+    done = time.perf_counter()
+    print(f"{place or 'No match'}; {len(gazetteer)} places, load {1000 * (loaded - started):.1f} ms, "
+          f"query {1e6 * (done - loaded):.0f} us")
@@ -0,0 +1,271 @@
+"""
+Replay recorded sessions offline and flag latency regressions between builds.
+
+    SESSION_RECORD_PATH=sessions.jsonl python app.py       # record (see utils/session_recorder.py)
+    python -m tools.replay run sessions.jsonl [--repeat 10] [--workers 16] [--report build.json] [--baseline prev.json]
+    python -m tools.replay compare prev.json build.json [--threshold 0.2] [--min-ms 0.5]
+
+Every recorded conversation is played back through mesh_bridge turn by turn,
+with the recorded LLM reply standing in for Gemini. Every recorded
+allocation goes back through AllocatorAgent, and its Maps and Gemini calls
+are answered from the recording. Nothing leaves the process, so sessions run
+at full speed and the timings are the cost of this build's own code: mesh
+hops, history, scoring, gazetteer, ledger and routing. Per-stage timings go
+to a JSON report. Given a baseline report from an earlier build, stages whose
+p50 or p95 grew by more than --threshold (and by at least --min-ms) are
+flagged as regressions and the command exits 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+DEFAULT_THRESHOLD = 0.2     # 20% slower
+DEFAULT_MIN_MS = 0.5        # ignore sub-millisecond noise
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    events = []
+    with open(path, encoding="utf-8") as source:
+        for number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                print(f"Replay       - Skipping unreadable line {number}", file=sys.stderr)
+    return events
+
+
+def group_sessions(events: List[Dict[str, Any]]):
+    """(conversations {session: [turn, ...]}, allocations [allocation, ...]) in recorded order."""
+    conversations: Dict[str, List[Dict[str, Any]]] = {}
+    allocations = []
+    for event in events:
+        if event.get("kind") == "turn":
+            conversations.setdefault(str(event.get("session")), []).append(event)
+        elif event.get("kind") == "allocation":
+            allocations.append(event)
+    return conversations, allocations
+
+
+class StageTimings:
+    def __init__(self):
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+
+        def at(ordered, q):
+            return round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+        return {
+            stage: {
+                "count": len(ordered),
+                "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+                "p50_ms": at(ordered, 0.50),
+                "p95_ms": at(ordered, 0.95),
+                "p99_ms": at(ordered, 0.99),
+                "max_ms": round(1000 * ordered[-1], 3),
+            }
+            for stage, ordered in sorted(samples.items())
+        }
+
+
+def recorded_timings(events: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """The same summary over the latencies production saw (LLM and Maps included)."""
+    timings = StageTimings()
+    for event in events:
+        if "elapsed_s" not in event:
+            continue
+        if event.get("kind") == "turn":
+            timings.add(f"turn.{event.get('agent')}", event["elapsed_s"])
+        elif event.get("kind") == "allocation":
+            timings.add("allocation.batch" if len(event.get("incidents", [])) > 1 else "allocation", event["elapsed_s"])
+        elif event.get("kind") == "call":
+            timings.add(f"call.{event.get('boundary')}", event["elapsed_s"])
+    return timings.summary()
+
+
+def build_label() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run(path: str, repeat: int = 1, workers: int = 8, label: Optional[str] = None) -> Dict[str, Any]:
+    # Replaying must not record, and must not wait on quota meant for the real APIs
+    os.environ.pop("SESSION_RECORD_PATH", None)
+    for api in ("GEMINI", "GEOCODING", "PLACES"):
+        os.environ.setdefault(f"RATE_LIMIT_{api}_RPS", "1000000")
+        os.environ.setdefault(f"RATE_LIMIT_{api}_BURST", "1000000")
+
+    from mesh.main_simulation import mesh_bridge
+    from agents.allocator_agent import AllocatorAgent
+    from utils.session_recorder import session_recorder
+
+    events = load_events(path)
+    conversations, allocations = group_sessions(events)
+    session_recorder.start_replay(events)
+    timings = StageTimings()
+    mismatches = []
+    failures = []
+
+    def replay_conversation(turns: List[Dict[str, Any]]):
+        for turn in turns:
+            recorded = turn.get("response", "")
+            started = time.perf_counter()
+            try:
+                response = mesh_bridge(dict(turn.get("input") or {}), lambda message, reply=recorded: reply,
+                                       turn.get("agent", "unknown"), turn.get("network_type"))
+            except Exception as e:
+                failures.append(f"turn {turn.get('session')}/{turn.get('agent')}: {e}")
+                return
+            timings.add(f"turn.{turn.get('agent')}", time.perf_counter() - started)
+            if response.get("data") != recorded:
+                mismatches.append(f"turn {turn.get('session')}/{turn.get('agent')}")
+
+    allocator = AllocatorAgent("replay", "replay") if allocations else None
+
+    def replay_allocation(allocation: Dict[str, Any]):
+        incidents = [dict(incident) for incident in allocation.get("incidents", [])]
+        if not incidents:
+            return
+        started = time.perf_counter()
+        try:
+            with session_recorder.allocation(incidents, unit=allocation.get("unit")):
+                if len(incidents) > 1:
+                    results = allocator.process_incidents(incidents)
+                else:
+                    results = [allocator.process_incident(incidents[0])]
+        except Exception as e:
+            failures.append(f"allocation {allocation.get('unit')}: {e}")
+            return
+        timings.add("allocation.batch" if len(incidents) > 1 else "allocation", time.perf_counter() - started)
+        # Every replay starts from a free fleet, as the recording did
+        for result in results:
+            allocator.release_incident(result["id"])
+
+    jobs = []
+    for _ in range(repeat):
+        jobs.extend((replay_conversation, turns) for turns in conversations.values())
+        jobs.extend((replay_allocation, allocation) for allocation in allocations)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(fn, item) for fn, item in jobs]:
+            future.result()
+    wall_s = time.perf_counter() - started
+
+    units = repeat * (len(conversations) + len(allocations))
+    return {
+        "build": label or build_label(),
+        "recording": os.path.abspath(path),
+        "sessions": repeat * len(conversations),
+        "turns": repeat * sum(len(turns) for turns in conversations.values()),
+        "allocations": repeat * len(allocations),
+        "workers": workers,
+        "wall_s": round(wall_s, 3),
+        "units_per_s": round(units / wall_s, 1) if wall_s else 0.0,
+        "replay": session_recorder.stats(),
+        "mismatches": mismatches[:50],
+        "failures": failures[:50],
+        "stages": timings.summary(),
+        "recorded": recorded_timings(events),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD,
+            min_ms: float = DEFAULT_MIN_MS) -> List[str]:
+    """Print stage-by-stage changes; returns the regressions."""
+    regressions = []
+    print(f"{'stage':<22}{'base p50':>10}{'p50':>10}{'base p95':>10}{'p95':>10}  {baseline.get('build')} -> {current.get('build')}")
+    for stage, now in current.get("stages", {}).items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None:
+            print(f"{stage:<22}{'-':>10}{now['p50_ms']:>10.2f}{'-':>10}{now['p95_ms']:>10.2f}  new")
+            continue
+        flags = []
+        for metric in ("p50_ms", "p95_ms"):
+            grown = now[metric] - before[metric]
+            if grown > min_ms and now[metric] > before[metric] * (1 + threshold):
+                flags.append(f"{metric[:3]} +{100 * grown / max(before[metric], 1e-9):.0f}%")
+        print(f"{stage:<22}{before['p50_ms']:>10.2f}{now['p50_ms']:>10.2f}{before['p95_ms']:>10.2f}{now['p95_ms']:>10.2f}"
+              f"  {'REGRESSION ' + ', '.join(flags) if flags else 'ok'}")
+        if flags:
+            regressions.append(f"{stage}: {', '.join(flags)}")
+    return regressions
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"Build {report['build']}: {report['sessions']} sessions ({report['turns']} turns) and "
+          f"{report['allocations']} allocations in {report['wall_s']}s on {report['workers']} workers "
+          f"({report['units_per_s']}/s)")
+    replay = report["replay"]
+    print(f"Boundary calls replayed: {replay['replayed']}, not in the recording: {replay['replay_misses']}; "
+          f"reply mismatches: {len(report['mismatches'])}, failures: {len(report['failures'])}")
+    for failure in report["failures"][:5]:
+        print(f"  failed: {failure}")
+    print(f"\n{'stage':<22}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}   ms   (recorded p50/p95)")
+    for stage, summary in report["stages"].items():
+        recorded = report["recorded"].get(stage)
+        production = f"({recorded['p50_ms']:.0f}/{recorded['p95_ms']:.0f})" if recorded else ""
+        print(f"{stage:<22}{summary['count']:>8}{summary['mean_ms']:>9.2f}{summary['p50_ms']:>9.2f}"
+              f"{summary['p95_ms']:>9.2f}{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}        {production}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("run", help="replay a recording and report per-stage timings")
+    replay.add_argument("recording")
+    replay.add_argument("--repeat", type=int, default=1, help="play every session this many times")
+    replay.add_argument("--workers", type=int, default=8)
+    replay.add_argument("--label", help="build name for the report (default: git describe)")
+    replay.add_argument("--report", help="write the JSON report here")
+    replay.add_argument("--baseline", help="report of an earlier build to compare against")
+    replay.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    replay.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS)
+    diff = commands.add_parser("compare", help="compare two replay reports")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    diff.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args.recording, args.repeat, args.workers, args.label)
+        _print_report(report)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as sink:
+                json.dump(report, sink, indent=2)
+        if not args.baseline:
+            sys.exit(0)
+        with open(args.baseline, encoding="utf-8") as source:
+            baseline = json.load(source)
+        current = report
+        print()
+    else:
+        with open(args.baseline, encoding="utf-8") as source:
+            baseline = json.load(source)
+        with open(args.current, encoding="utf-8") as source:
+            current = json.load(source)
+    regressions = compare(baseline, current, args.threshold, args.min_ms)
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed beyond {100 * args.threshold:.0f}%")
+        sys.exit(1)
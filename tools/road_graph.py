@@ -0,0 +1,364 @@
+"""
+Offline road graph for drive-time estimates.
+
+    python -m tools.road_graph build karachi.osm karachi.csr
+    python -m tools.road_graph query karachi.csr 24.8607 67.0011 24.9180 67.0971
+
+An OSM XML extract (.osm, .osm.gz or .osm.bz2) is compiled once into
+compressed-sparse-row arrays and saved as a flat binary file that loads in
+milliseconds. Queries snap both ends to the nearest graph node and run A*
+with a straight-line-at-top-speed heuristic. Recent origin->destination
+results are kept in an LRU, so repeated dispatches from the same area to the
+same facilities cost a dictionary lookup.
+"""
+import argparse
+import bz2
+import gzip
+import heapq
+import math
+import os
+import struct
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from agents.resource_ledger import DISPATCH_OVERHEAD_MIN, haversine_km, straight_line_eta
+
+# Typical free-flow speeds (km/h) in Karachi traffic, by OSM highway class
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 60, "trunk": 45, "primary": 35, "secondary": 30, "tertiary": 25,
+    "unclassified": 20, "residential": 18, "living_street": 10, "service": 12, "road": 20,
+    "motorway_link": 40, "trunk_link": 35, "primary_link": 28, "secondary_link": 24, "tertiary_link": 20,
+}
+
+SNAP_SPEED_KMH = 10.0        # off-graph leg from the caller to the nearest road node
+MAX_SNAP_KM = 2.0            # beyond this the extract does not cover the point
+SNAP_GRID_DEG = 0.01         # ~1.1 km node index cells
+LRU_SIZE = 4096
+
+_MAGIC = b"RGCSR1\x00\x00"
+_HEADER = struct.Struct("<8sIIf")    # magic, node count, edge count, top speed km/h
+
+
+def _open_extract(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _way_speed(tags: Dict[str, str]) -> Optional[float]:
+    highway = tags.get("highway")
+    if highway not in HIGHWAY_SPEEDS_KMH:
+        return None
+    speed = HIGHWAY_SPEEDS_KMH[highway]
+    maxspeed = tags.get("maxspeed", "").split(" ")[0]
+    if maxspeed.isdigit():
+        speed = min(speed, int(maxspeed))
+    return float(speed)
+
+
+def _oneway(tags: Dict[str, str]) -> int:
+    value = tags.get("oneway", "")
+    if value in ("yes", "true", "1") or tags.get("junction") == "roundabout" or tags.get("highway") == "motorway":
+        return 1
+    if value == "-1":
+        return -1
+    return 0
+
+
+class RoadGraph:
+    """
+    Directed road graph in CSR form: edges leaving node u are
+    targets[offsets[u]:offsets[u + 1]] with travel times in seconds in the
+    same slice of weights. Node coordinates are parallel lat/lng arrays.
+    """
+
+    def __init__(self, lat: array, lng: array, offsets: array, targets: array, weights: array,
+                 top_speed_kmh: float):
+        self.lat = lat
+        self.lng = lng
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.top_speed_kmh = top_speed_kmh
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for node in range(len(lat)):
+            self._grid.setdefault(self._cell(lat[node], lng[node]), []).append(node)
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    # --- building ------------------------------------------------------------
+
+    @classmethod
+    def from_edges(cls, coords: List[Tuple[float, float]], edges: List[Tuple[int, int, float]],
+                   top_speed_kmh: float) -> "RoadGraph":
+        """Build from node coordinates and (u, v, seconds) directed edges."""
+        edges.sort()
+        offsets = array("i", [0]) * (len(coords) + 1)
+        for u, _, _ in edges:
+            offsets[u + 1] += 1
+        for i in range(len(coords)):
+            offsets[i + 1] += offsets[i]
+        return cls(
+            array("d", (c[0] for c in coords)),
+            array("d", (c[1] for c in coords)),
+            offsets,
+            array("i", (v for _, v, _ in edges)),
+            array("f", (w for _, _, w in edges)),
+            top_speed_kmh,
+        )
+
+    @classmethod
+    def from_osm(cls, path: str) -> "RoadGraph":
+        """Parse an OSM XML extract, keeping only drivable ways."""
+        started = time.time()
+        node_coords: Dict[int, Tuple[float, float]] = {}
+        ways = []
+        with _open_extract(path) as source:
+            way_nodes, way_tags = [], {}
+            for event, elem in ET.iterparse(source, events=("end",)):
+                if elem.tag == "node":
+                    node_coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                elif elem.tag == "nd":
+                    way_nodes.append(int(elem.get("ref")))
+                    continue
+                elif elem.tag == "tag":
+                    way_tags[elem.get("k")] = elem.get("v")
+                    continue
+                elif elem.tag == "way":
+                    speed = _way_speed(way_tags)
+                    if speed is not None and len(way_nodes) > 1:
+                        ways.append((way_nodes, speed, _oneway(way_tags)))
+                way_nodes, way_tags = [], {}
+                elem.clear()
+
+        # Compact ids: only nodes referenced by drivable ways become graph nodes
+        index: Dict[int, int] = {}
+        coords: List[Tuple[float, float]] = []
+        edges: List[Tuple[int, int, float]] = []
+        top_speed = 0.0
+        for refs, speed, oneway in ways:
+            top_speed = max(top_speed, speed)
+            mps = speed / 3.6
+            previous = None
+            for ref in refs:
+                if ref not in node_coords:
+                    previous = None
+                    continue
+                if ref not in index:
+                    index[ref] = len(coords)
+                    coords.append(node_coords[ref])
+                current = index[ref]
+                if previous is not None and previous != current:
+                    (lat1, lng1), (lat2, lng2) = coords[previous], coords[current]
+                    seconds = haversine_km(lat1, lng1, lat2, lng2) * 1000 / mps
+                    if oneway >= 0:
+                        edges.append((previous, current, seconds))
+                    if oneway <= 0:
+                        edges.append((current, previous, seconds))
+                previous = current
+        graph = cls.from_edges(coords, edges, top_speed or max(HIGHWAY_SPEEDS_KMH.values()))
+        print(f"RoadGraph    - Built {len(graph)} nodes, {graph.edge_count} edges from {path} "
+              f"in {time.time() - started:.1f}s")
+        return graph
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(self.lat), len(self.targets), self.top_speed_kmh))
+            for arr in (self.lat, self.lng, self.offsets, self.targets, self.weights):
+                arr.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with open(path, "rb") as f:
+            magic, n_nodes, n_edges, top_speed = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a compiled road graph")
+            arrays = []
+            for typecode, count in (("d", n_nodes), ("d", n_nodes), ("i", n_nodes + 1), ("i", n_edges), ("f", n_edges)):
+                arr = array(typecode)
+                arr.fromfile(f, count)
+                arrays.append(arr)
+        return cls(*arrays, top_speed)
+
+    @classmethod
+    def open(cls, path: str) -> "RoadGraph":
+        """Load a compiled graph, compiling (and caching) an OSM extract if needed."""
+        if not path.endswith((".osm", ".osm.gz", ".osm.bz2")):
+            return cls.load(path)
+        compiled = path.rsplit(".osm", 1)[0] + ".csr"
+        if os.path.exists(compiled) and os.path.getmtime(compiled) >= os.path.getmtime(path):
+            return cls.load(compiled)
+        graph = cls.from_osm(path)
+        graph.save(compiled)
+        return graph
+
+    # --- queries -------------------------------------------------------------
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / SNAP_GRID_DEG)), int(math.floor(lng / SNAP_GRID_DEG))
+
+    def nearest_node(self, lat: float, lng: float, max_km: float = MAX_SNAP_KM) -> Optional[Tuple[int, float]]:
+        """(node, km) of the closest graph node within max_km, searching grid rings outward."""
+        cy, cx = self._cell(lat, lng)
+        best, best_km = None, max_km
+        max_rings = int(max_km / (SNAP_GRID_DEG * 111.0)) + 1
+        for ring in range(max_rings + 1):
+            for dy in range(-ring, ring + 1):
+                for dx in range(-ring, ring + 1):
+                    if max(abs(dy), abs(dx)) != ring:
+                        continue
+                    for node in self._grid.get((cy + dy, cx + dx), ()):
+                        km = haversine_km(lat, lng, self.lat[node], self.lng[node])
+                        if km < best_km:
+                            best, best_km = node, km
+            # Nodes beyond this ring are at least ring cells away from the point
+            if best is not None and ring * SNAP_GRID_DEG * 111.0 * math.cos(math.radians(lat)) >= best_km:
+                break
+        return None if best is None else (best, best_km)
+
+    def shortest_time(self, source: int, target: int) -> Optional[float]:
+        """A* travel time in seconds from source to target node; None if unreachable."""
+        if source == target:
+            return 0.0
+        lat, lng, offsets, targets, weights = self.lat, self.lng, self.offsets, self.targets, self.weights
+        # Admissible heuristic: equirectangular distance at top speed, scaled down slightly
+        top_mps = self.top_speed_kmh / 3.6
+        target_lat, target_lng = lat[target], lng[target]
+        cos_lat = math.cos(math.radians(target_lat))
+        metres_per_deg = 111_195.0 * 0.995
+
+        def heuristic(node):
+            dy = lat[node] - target_lat
+            dx = (lng[node] - target_lng) * cos_lat
+            return math.sqrt(dx * dx + dy * dy) * metres_per_deg / top_mps
+
+        best = {source: 0.0}
+        frontier = [(heuristic(source), 0.0, source)]
+        closed = set()
+        while frontier:
+            _, cost, node = heapq.heappop(frontier)
+            if node == target:
+                return cost
+            if node in closed:
+                continue
+            closed.add(node)
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[i]
+                new_cost = cost + weights[i]
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    heapq.heappush(frontier, (new_cost + heuristic(neighbour), new_cost, neighbour))
+        return None
+
+
+class RoadRouter:
+    """
+    Drive-time estimates over a RoadGraph with an LRU of recent
+    origin->destination results. Falls back to the straight-line estimate
+    when no graph is loaded, a point is off the extract, or no route exists.
+    eta_minutes has the same signature as straight_line_eta, so it plugs into
+    ResourceLedger as its travel_time_fn.
+    """
+
+    def __init__(self, graph: Optional[RoadGraph] = None, lru_size: int = LRU_SIZE):
+        self.graph = graph
+        self.lru_size = lru_size
+        self._cache: "OrderedDict[Tuple[int, int], Optional[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def _route_seconds(self, source: int, target: int) -> Optional[float]:
+        key = (source, target)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        seconds = self.graph.shortest_time(source, target)
+        with self._lock:
+            self._cache[key] = seconds
+            if len(self._cache) > self.lru_size:
+                self._cache.popitem(last=False)
+        return seconds
+
+    def eta_minutes(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        """Estimated minutes to drive from (lat1, lng1) to (lat2, lng2), turnout included."""
+        if self.graph is not None:
+            start = self.graph.nearest_node(lat1, lng1)
+            end = self.graph.nearest_node(lat2, lng2)
+            if start and end:
+                seconds = self._route_seconds(start[0], end[0])
+                if seconds is not None:
+                    snap_minutes = (start[1] + end[1]) / SNAP_SPEED_KMH * 60
+                    return DISPATCH_OVERHEAD_MIN + seconds / 60 + snap_minutes
+        self.fallbacks += 1
+        return straight_line_eta(lat1, lng1, lat2, lng2)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "graph_nodes": len(self.graph) if self.graph else 0,
+            "graph_edges": self.graph.edge_count if self.graph else 0,
+            "cached_routes": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+        }
+
+
+_shared_router = None
+_shared_lock = threading.Lock()
+
+
+def shared_router() -> RoadRouter:
+    """Process-wide router over the graph at ROAD_GRAPH_PATH (straight-line only if unset)."""
+    global _shared_router
+    with _shared_lock:
+        if _shared_router is None:
+            path = os.getenv("ROAD_GRAPH_PATH")
+            graph = None
+            if path:
+                try:
+                    graph = RoadGraph.open(path)
+                except Exception as e:
+                    print(f"RoadGraph    - Could not load {path}: {e}")
+            _shared_router = RoadRouter(graph)
+    return _shared_router
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile an OSM extract into a .csr graph")
+    build.add_argument("extract")
+    build.add_argument("output")
+    query = commands.add_parser("query", help="drive time between two points")
+    query.add_argument("graph")
+    query.add_argument("coords", nargs=4, type=float, metavar=("LAT1", "LNG1", "LAT2", "LNG2"))
+    args = parser.parse_args()
+
+    if args.command == "build":
+        RoadGraph.from_osm(args.extract).save(args.output)
+        sys.exit(0)
+    started = time.perf_counter()
+    router = RoadRouter(RoadGraph.open(args.graph))
+    loaded = time.perf_counter()
+    eta = router.eta_minutes(*args.coords)
+    done = time.perf_counter()
+    print(f"ETA {eta:.1f} min (straight line {straight_line_eta(*args.coords):.1f} min); "
+          f"load {1000 * (loaded - started):.1f} ms, query {1000 * (done - loaded):.1f} ms")
@@ -3,6 +3,7 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 
 from utils.global_history import get_shared_chat, history_manager
+from utils.warmup import get_model
 
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -31,10 +32,7 @@ def create_agent(prompt: str, agent_name: str = "unknown"):
     return chat
 
 def create_fresh_agent(prompt: str):
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        system_instruction=prompt  # system prompt goes here
-    )
+    model = get_model(prompt)  # system prompt is baked into the cached model
 
     chat = model.start_chat()
     return chat
\ No newline at end of file
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# (failures in the window that trip the breaker, window seconds, seconds open
+# before a probe, calls slower than this count as failures).
+# Override with BREAKER_<NAME>_THRESHOLD / _OPEN_S / _SLOW_S.
+DEFAULT_POLICIES = {
+    "gemini": (5, 60.0, 20.0, 20.0),
+    "geocoding": (5, 60.0, 30.0, 8.0),
+    "places": (5, 60.0, 30.0, 8.0),
+}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-dependency breaker. Closed: calls go through and failures (errors or
+    calls slower than slow_call_s) are counted over window_s; reaching
+    failure_threshold opens it. Open: calls fail immediately with
+    CircuitOpen for open_s. Half-open: one probe call is let through; its
+    success closes the breaker, its failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, window_s: float = 60.0, open_s: float = 30.0,
+                 slow_call_s: Optional[float] = None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window_s = window_s
+        self.open_s = open_s
+        self.slow_call_s = slow_call_s
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.metrics = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0, "probes": 0}
+
+    def allow(self) -> bool:
+        """May a call go out now? In half-open, True is a claim on the single probe."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self._opened_at >= self.open_s:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self.metrics["probes"] += 1
+                return True
+            self.metrics["rejected"] += 1
+            return False
+
+    def release(self):
+        """The allowed call never reached the dependency (e.g. no quota); free the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self, elapsed_s: float = 0.0):
+        if self.slow_call_s is not None and elapsed_s > self.slow_call_s:
+            with self._lock:
+                self.metrics["slow_calls"] += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self.metrics["calls"] += 1
+            if self.state == HALF_OPEN:
+                print(f"Breaker      - {self.name} probe succeeded, closing")
+                self.state = CLOSED
+                self._failures.clear()
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            now = self.clock()
+            self.metrics["calls"] += 1
+            self.metrics["failures"] += 1
+            self._probing = False
+            if self.state == HALF_OPEN:
+                self._trip(now)
+                return
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window_s:
+                self._failures.popleft()
+            if self.state == CLOSED and len(self._failures) >= self.failure_threshold:
+                self._trip(now)
+
+    def _trip(self, now: float):
+        print(f"Breaker      - {self.name} open for {self.open_s:.0f}s")
+        self.state = OPEN
+        self._opened_at = now
+        self._failures.clear()
+        self.metrics["opened"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_failures": len(self._failures),
+                "failure_threshold": self.failure_threshold,
+                **self.metrics,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for one dependency, configured from DEFAULT_POLICIES and the environment."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            threshold, window, open_s, slow_s = DEFAULT_POLICIES.get(name, (5, 60.0, 30.0, None))
+            threshold = int(os.getenv(f"BREAKER_{name.upper()}_THRESHOLD", threshold))
+            open_s = float(os.getenv(f"BREAKER_{name.upper()}_OPEN_S", open_s))
+            slow_s = os.getenv(f"BREAKER_{name.upper()}_SLOW_S", slow_s)
+            breaker = _breakers[name] = CircuitBreaker(name, threshold, window, open_s,
+                                                       float(slow_s) if slow_s is not None else None)
+    return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+HISTORY_SIZE = 2000       # events kept for Last-Event-ID resume
+CLIENT_BUFFER = 256       # events queued per client before it is considered lagging
+HEARTBEAT_S = 15.0
+
+
+class Subscriber:
+    """
+    One connected client's bounded buffer. When a slow client falls more
+    than `capacity` events behind, its buffer is dropped and the next read
+    returns a resync event telling it to refetch state instead of
+    replaying an unbounded backlog.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._resync = False
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+
+    def push(self, event: Dict[str, Any]) -> bool:
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._events) >= self.capacity:
+                self.dropped += len(self._events)
+                self._events.clear()
+                self._resync = True
+            self._events.append(event)
+            self._cond.notify()
+            return True
+
+    def request_resync(self):
+        with self._cond:
+            self._resync = True
+            self._cond.notify()
+
+    def next(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None after timeout (time for a heartbeat) or once closed."""
+        with self._cond:
+            if not self._events and not self._resync and not self.closed:
+                self._cond.wait(timeout)
+            if self._resync:
+                self._resync = False
+                # The client should refetch, then keep consuming from here
+                return {"id": None, "event": "resync", "data": {"reason": "client fell behind or resumed too far back"}}
+            if self._events:
+                self.delivered += 1
+                return self._events.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class EventHub:
+    """
+    Fan-out of dispatch events to SSE and Socket.IO clients. Every event gets
+    a monotonically increasing id; the last HISTORY_SIZE events are kept so a
+    reconnecting client can resume from its Last-Event-ID.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE, client_buffer: int = CLIENT_BUFFER,
+                 heartbeat_s: float = HEARTBEAT_S):
+        self.client_buffer = client_buffer
+        self.heartbeat_s = heartbeat_s
+        self._history = deque(maxlen=history_size)
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self.last_id = 0
+        self.published = 0
+        self.resumes = 0
+
+    def publish(self, event_type: str, data: Any) -> int:
+        with self._lock:
+            self.last_id += 1
+            event = {"id": self.last_id, "event": event_type, "data": data, "published_at": time.time()}
+            self._history.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(event)
+        return event["id"]
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscriber:
+        """Register a client; with last_event_id, events it missed are queued first."""
+        subscriber = Subscriber(self.client_buffer)
+        with self._lock:
+            if last_event_id is not None and last_event_id > self.last_id:
+                # Ids from before a server restart: nothing here lines up with the client's state
+                self.resumes += 1
+                subscriber.request_resync()
+            elif last_event_id is not None and last_event_id < self.last_id:
+                self.resumes += 1
+                oldest = self._history[0]["id"] if self._history else self.last_id + 1
+                missed = [event for event in self._history if event["id"] > last_event_id]
+                # Part of the gap is gone from history or will not fit the client's buffer
+                if last_event_id + 1 < oldest or len(missed) > self.client_buffer:
+                    subscriber.request_resync()
+                for event in missed[-self.client_buffer:]:
+                    subscriber.push(event)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.close()
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def sse(self, subscriber: Subscriber) -> Iterator[str]:
+        """text/event-stream body for one client; sends a comment line as heartbeat."""
+        try:
+            yield f"retry: 3000\n: connected, last event {self.last_id}\n\n"
+            while not subscriber.closed:
+                event = subscriber.next(timeout=self.heartbeat_s)
+                if event is None:
+                    yield f": heartbeat {int(time.time())}\n\n"
+                    continue
+                lines = [] if event["id"] is None else [f"id: {event['id']}"]
+                lines.append(f"event: {event['event']}")
+                lines.append(f"data: {json.dumps(event['data'], default=str)}")
+                yield "\n".join(lines) + "\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "last_id": self.last_id,
+            "published": self.published,
+            "clients": len(subscribers),
+            "resumes": self.resumes,
+            "dropped_for_slow_clients": sum(s.dropped for s in subscribers),
+        }
@@ -1,8 +1,8 @@
-import json
-import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-import google.generativeai as genai
+
+from utils.warmup import get_model
+from agents.sentiment_agent import SessionSeverity
 
 class GlobalHistoryManager:
     """
@@ -14,6 +14,9 @@ class GlobalHistoryManager:
         self.agent_transitions = []
         self.current_session_id = None
         self.shared_chat = None  # Single chat instance shared across agents
+        self.severity = SessionSeverity()  # Running caller severity, scored locally per user turn
+        self.backend = None  # Shared StateBackend in scale-out mode (see utils/shared_state.py)
+        self.chat_agent = None  # Set when the chat was created for its current agent (speculative adoption)
         
     def start_session(self, session_id: str = None):
         """Start a new conversation session"""
@@ -21,6 +24,8 @@ class GlobalHistoryManager:
         self.conversation_history = []
         self.agent_transitions = []
         self.shared_chat = None
+        self.chat_agent = None
+        self.severity.reset()
         print(f"Started new session: {self.current_session_id}")
     
     def add_message(self, role: str, content: str, agent_name: str = None):
@@ -33,11 +38,33 @@ class GlobalHistoryManager:
             "session_id": self.current_session_id
         }
         self.conversation_history.append(message)
+        if self.backend is not None:
+            self.backend.append_history(self.current_session_id, message)
+        if role == "user":
+            self.severity.update(content)
         
         # Print for debugging
         role_label = f"{role.title()}" + (f" ({agent_name})" if agent_name else "")
         print(f"History: {role_label}: {content[:50]}...")
     
+    def adopt_session(self, session_id: str):
+        """
+        Take over a session started on another worker: load its shared history
+        so the next chat is rebuilt with the full conversation as context.
+        """
+        if not session_id or session_id == self.current_session_id:
+            return
+        self.current_session_id = session_id
+        self.conversation_history = self.backend.get_history(session_id) if self.backend is not None else []
+        self.agent_transitions = []
+        self.shared_chat = None
+        self.chat_agent = None
+        self.severity.reset()
+        for message in self.conversation_history:
+            if message["role"] == "user":
+                self.severity.update(message["content"])
+        print(f"Adopted session {session_id} with {len(self.conversation_history)} messages")
+
     def add_agent_transition(self, from_agent: str, to_agent: str, reason: str = None):
         """Record agent transitions"""
         transition = {
@@ -50,26 +77,31 @@ class GlobalHistoryManager:
         self.agent_transitions.append(transition)
         print(f"Agent transition: {from_agent} -> {to_agent}")
     
-    def get_or_create_shared_chat(self, base_prompt: str, current_agent: str):
-        """
-        Get the shared chat instance or create it with full context
-        """
-        if self.shared_chat is None:
-            # Create new chat with base prompt
-            model = genai.GenerativeModel(
-                model_name="gemini-2.0-flash",
-                system_instruction=base_prompt
-            )
-            self.shared_chat = model.start_chat()
-            self.initial_agent = current_agent
-            print(f"Created shared chat for {current_agent}")
-        else:
-            # Handle agent transition with proper role switching
-            if len(self.agent_transitions) > 0:
-                last_transition = self.agent_transitions[-1]
-                if last_transition['to_agent'] == current_agent and last_transition['from_agent'] != current_agent:
-                    # Send a clear role transition message
-                    transition_message = f"""IMPORTANT ROLE CHANGE: 
+    def chat_history(self) -> List[Dict[str, Any]]:
+        """The conversation so far in Gemini start_chat(history=...) form"""
+        return [
+            {"role": "user" if msg["role"] == "user" else "model", "parts": [msg["content"]]}
+            for msg in self.conversation_history if msg.get("content")
+        ]
+
+    def _create_chat(self, base_prompt: str, current_agent: str):
+        # Create new chat with base prompt (model is pre-built during warm-up)
+        model = get_model(base_prompt)
+        # Non-empty only when this worker adopted a session already under way
+        self.shared_chat = model.start_chat(history=self.chat_history())
+        self.chat_agent = None
+        self.initial_agent = current_agent
+        print(f"Created shared chat for {current_agent}")
+
+    def _role_change_message(self, base_prompt: str, current_agent: str) -> Optional[str]:
+        """Instruction to send when the chat has just been handed to a new agent, else None"""
+        if self.chat_agent == current_agent:
+            return None
+        if len(self.agent_transitions) > 0:
+            last_transition = self.agent_transitions[-1]
+            if last_transition['to_agent'] == current_agent and last_transition['from_agent'] != current_agent:
+                # Send a clear role transition message
+                return f"""IMPORTANT ROLE CHANGE: 
 
 You are now acting as the {current_agent.upper()} AGENT, not the {last_transition['from_agent']} agent. 
 
@@ -77,16 +109,47 @@ Your new role and instructions:
 {base_prompt}
 
 Please acknowledge this role change and continue the conversation as the {current_agent} agent, maintaining the context of our previous discussion but following your new role guidelines."""
-                    
-                    try:
-                        response = self.shared_chat.send_message(transition_message)
-                        print(f"Successfully transitioned to {current_agent} agent")
-                        # Log this transition (but don't count it as user/assistant conversation)
-                        print(f"Transition response: {response.text[:100]}...")
-                    except Exception as e:
-                        print(f"Could not send transition message: {e}")
+        return None
+
+    def adopt_chat(self, chat, agent_name: str):
+        """Continue the session on a chat already created with agent_name's prompt"""
+        self.shared_chat = chat
+        self.chat_agent = agent_name
+        print(f"Adopted {agent_name} chat as the shared chat")
+
+    def get_or_create_shared_chat(self, base_prompt: str, current_agent: str):
+        """
+        Get the shared chat instance or create it with full context
+        """
+        if self.shared_chat is None:
+            self._create_chat(base_prompt, current_agent)
+        else:
+            # Handle agent transition with proper role switching
+            transition_message = self._role_change_message(base_prompt, current_agent)
+            if transition_message:
+                try:
+                    response = self.shared_chat.send_message(transition_message)
+                    print(f"Successfully transitioned to {current_agent} agent")
+                    # Log this transition (but don't count it as user/assistant conversation)
+                    print(f"Transition response: {response.text[:100]}...")
+                except Exception as e:
+                    print(f"Could not send transition message: {e}")
         
         return self.shared_chat
+
+    async def get_or_create_shared_chat_async(self, base_prompt: str, current_agent: str):
+        """get_or_create_shared_chat() for the asyncio serving mode"""
+        if self.shared_chat is None:
+            self._create_chat(base_prompt, current_agent)
+        else:
+            transition_message = self._role_change_message(base_prompt, current_agent)
+            if transition_message:
+                try:
+                    await self.shared_chat.send_message_async(transition_message)
+                    print(f"Successfully transitioned to {current_agent} agent")
+                except Exception as e:
+                    print(f"Could not send transition message: {e}")
+        return self.shared_chat
     
     def get_history_summary(self, last_n_messages: int = 10):
         """Get a summary of recent conversation"""
@@ -112,7 +175,8 @@ Please acknowledge this role change and continue the conversation as the {curren
             "total_messages": len(self.conversation_history),
             "agent_transitions": len(self.agent_transitions),
             "agents_used": list(set(msg.get("agent") for msg in self.conversation_history if msg.get("agent"))),
-            "has_shared_chat": self.shared_chat is not None
+            "has_shared_chat": self.shared_chat is not None,
+            "severity": self.severity.severity
         }
     
     def print_history_debug(self, last_n: int = 5):
@@ -0,0 +1,114 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class IndexedHeap:
+    """
+    Binary min-heap that also indexes entries by id, so an entry's key can be
+    changed (decrease- or increase-key) or the entry removed in O(log n).
+    Ties on key are broken by insertion order.
+    """
+
+    def __init__(self):
+        self._heap: List[List[Any]] = []   # [key, seq, item_id, value]
+        self._index: Dict[Hashable, int] = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item_id):
+        return item_id in self._index
+
+    def _less(self, i: int, j: int) -> bool:
+        a, b = self._heap[i], self._heap[j]
+        return (a[0], a[1]) < (b[0], b[1])
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._index[heap[i][2]] = i
+        self._index[heap[j][2]] = j
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not self._less(i, parent):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        n = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._less(child, smallest):
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def push(self, item_id: Hashable, key, value: Any = None):
+        """Insert a new entry, or update the key/value if item_id already exists."""
+        if item_id in self._index:
+            self.update(item_id, key, value)
+            return
+        self._seq += 1
+        self._heap.append([key, self._seq, item_id, value])
+        self._index[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, item_id: Hashable, key, value: Any = None):
+        """Change an entry's key (either direction); keeps the value unless one is given."""
+        i = self._index[item_id]
+        entry = self._heap[i]
+        old_key = entry[0]
+        entry[0] = key
+        if value is not None:
+            entry[3] = value
+        if key < old_key:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def peek(self) -> Optional[Tuple[Hashable, Any, Any]]:
+        if not self._heap:
+            return None
+        key, _, item_id, value = self._heap[0]
+        return item_id, key, value
+
+    def pop(self) -> Tuple[Hashable, Any, Any]:
+        """Remove and return (item_id, key, value) with the smallest key."""
+        if not self._heap:
+            raise IndexError("pop from empty IndexedHeap")
+        top = self._heap[0]
+        self._remove_at(0)
+        return top[2], top[0], top[3]
+
+    def remove(self, item_id: Hashable) -> Any:
+        """Remove an entry by id and return its value."""
+        i = self._index[item_id]
+        value = self._heap[i][3]
+        self._remove_at(i)
+        return value
+
+    def _remove_at(self, i: int):
+        last = len(self._heap) - 1
+        if i != last:
+            self._swap(i, last)
+        entry = self._heap.pop()
+        del self._index[entry[2]]
+        if i < len(self._heap):
+            self._sift_up(i)
+            self._sift_down(i)
+
+    def key_of(self, item_id: Hashable):
+        return self._heap[self._index[item_id]][0]
+
+    def value_of(self, item_id: Hashable) -> Any:
+        return self._heap[self._index[item_id]][3]
+
+    def items(self) -> List[Tuple[Hashable, Any, Any]]:
+        """All (item_id, key, value) in priority order (O(n log n), for display)."""
+        return [(entry[2], entry[0], entry[3]) for entry in sorted(self._heap, key=lambda e: (e[0], e[1]))]
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.single_flight import SingleFlight, single_flight
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Precision 6 cells are ~1.2 x 0.6 km at Karachi's latitude
+CELL_PRECISION = 6
+FRESH_TTL_S = 15 * 60        # serve without revalidating
+STALE_TTL_S = 6 * 60 * 60    # serve immediately, refresh in the background
+MAX_ENTRIES = 2048
+
+
+def geohash(lat: float, lng: float, precision: int = CELL_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+class PlacesCache:
+    """
+    Places search results keyed by (service keyword, geohash cell).
+
+    Fresh entries are returned directly. Entries past fresh_ttl_s but within
+    stale_ttl_s are returned immediately while one background refresh runs.
+    Concurrent misses for the same key share a single upstream call. Empty
+    results (API errors, nothing nearby) are not cached.
+    """
+
+    def __init__(self, fresh_ttl_s: float = FRESH_TTL_S, stale_ttl_s: float = STALE_TTL_S,
+                 max_entries: int = MAX_ENTRIES, precision: int = CELL_PRECISION, clock=time.time,
+                 flight: Optional[SingleFlight] = None):
+        self.fresh_ttl_s = fresh_ttl_s
+        self.stale_ttl_s = stale_ttl_s
+        self.max_entries = max_entries
+        self.precision = precision
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[Dict]]]" = OrderedDict()
+        self.flight = flight or single_flight("places")
+        self._lock = threading.Lock()
+        self._refreshing: set = set()   # keys with a background refresh started, guarded by _lock
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0,
+                         "refreshes": 0, "evictions": 0, "fetch_errors": 0}
+
+    def key_for(self, service_keyword: str, lat: float, lng: float) -> Tuple[str, str]:
+        return service_keyword.strip().lower(), geohash(lat, lng, self.precision)
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[Optional[List[Dict]], bool]:
+        """(cached results or None on a miss, whether a background refresh should start)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self.clock() - entry[0]
+                if age <= self.fresh_ttl_s:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[1], False
+                if age <= self.stale_ttl_s:
+                    self._entries.move_to_end(key)
+                    self.counters["stale_hits"] += 1
+                    # Checked and claimed under one lock, so only one caller starts the refresh
+                    refresh = key not in self._refreshing and not self.flight.in_flight(key)
+                    if refresh:
+                        self._refreshing.add(key)
+                        self.counters["refreshes"] += 1
+                    return entry[1], refresh
+            self.counters["misses"] += 1
+            return None, False
+
+    def get(self, service_keyword: str, lat: float, lng: float, fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        """Cached results for this keyword and cell, calling fetch() only when needed."""
+        key = self.key_for(service_keyword, lat, lng)
+        results, refresh = self._lookup(key)
+        if refresh:
+            threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+        if results is not None:
+            return results
+        # Concurrent misses for the same key wait on one fetch
+        return self.flight.do(key, lambda: self._fill(key, fetch))
+
+    async def get_async(self, service_keyword: str, lat: float, lng: float,
+                        fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """get() for coroutines; fetch is an async callable."""
+        key = self.key_for(service_keyword, lat, lng)
+        results, refresh = self._lookup(key)
+        if refresh:
+            asyncio.ensure_future(self._refresh_async(key, fetch))
+        if results is not None:
+            return results
+        return await self.flight.do_async(key, lambda: self._fill_async(key, fetch))
+
+    def _refresh(self, key: Tuple[str, str], fetch: Callable[[], List[Dict]]):
+        try:
+            self.flight.do(key, lambda: self._fill(key, fetch))
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _refresh_async(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[List[Dict]]]):
+        try:
+            await self.flight.do_async(key, lambda: self._fill_async(key, fetch))
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _fill(self, key: Tuple[str, str], fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        results: List[Dict] = []
+        try:
+            results = fetch() or []
+        except Exception as e:
+            self.counters["fetch_errors"] += 1
+            print(f"PlacesCache  - Fetch failed for {key}: {e}")
+        return self._store(key, results)
+
+    async def _fill_async(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        results: List[Dict] = []
+        try:
+            results = await fetch() or []
+        except Exception as e:
+            self.counters["fetch_errors"] += 1
+            print(f"PlacesCache  - Fetch failed for {key}: {e}")
+        return self._store(key, results)
+
+    def _store(self, key: Tuple[str, str], results: List[Dict]) -> List[Dict]:
+        with self._lock:
+            if results:
+                self._entries[key] = (self.clock(), results)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters["evictions"] += 1
+        return results
+
+    def invalidate(self, service_keyword: Optional[str] = None):
+        with self._lock:
+            if service_keyword is None:
+                self._entries.clear()
+                return
+            keyword = service_keyword.strip().lower()
+            for key in [k for k in self._entries if k[0] == keyword]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), **self.counters}
@@ -0,0 +1,355 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.circuit_breaker import CircuitOpen, circuit_breaker
+
+# Same ordering as the mesh store-and-forward buffer: lower is more urgent
+PRIORITY_LEVELS = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Share of the bucket each priority must leave untouched. Low-priority
+# enrichment only runs while there is headroom, so a surge of it cannot
+# drain the quota a critical dispatch is about to need.
+RESERVE_FRACTION = {0: 0.0, 1: 0.0, 2: 0.15, 3: 0.4}
+
+# (requests per second, burst). Override with RATE_LIMIT_<NAME>_RPS / _BURST.
+DEFAULT_LIMITS = {
+    "geocoding": (40.0, 50),   # Geocoding API allows 50 QPS per project
+    "places": (8.0, 10),
+    "gemini": (4.0, 10),
+}
+
+DEFAULT_WAIT_S = 10.0
+DEFAULT_RETRY_AFTER_S = 2.0
+
+_context = threading.local()
+
+
+def priority_level(priority: Any) -> int:
+    if isinstance(priority, int):
+        return min(max(priority, 0), 3)
+    return PRIORITY_LEVELS.get(str(priority).lower(), PRIORITY_LEVELS["medium"])
+
+
+def priority_for_severity(severity: Optional[float]) -> str:
+    """Map a 1-10 incident severity onto an admission priority."""
+    if severity is None:
+        return "medium"
+    if severity >= 8:
+        return "critical"
+    if severity >= 6:
+        return "high"
+    if severity >= 4:
+        return "medium"
+    return "low"
+
+
+@contextmanager
+def request_priority(priority: Any):
+    """Calls made by this thread inside the block are admitted at this priority."""
+    previous = getattr(_context, "level", None)
+    _context.level = priority_level(priority)
+    try:
+        yield
+    finally:
+        _context.level = previous
+
+
+def current_priority() -> int:
+    level = getattr(_context, "level", None)
+    return PRIORITY_LEVELS["medium"] if level is None else level
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call could not be admitted within its wait budget."""
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread calling one API. Waiting callers are
+    served strictly by (priority, arrival), and a caller may only take a
+    token while the bucket stays above its priority's reserve. A 429 from the
+    API empties the bucket and pauses admission for the Retry-After period.
+    """
+
+    def __init__(self, name: str, rate_per_s: float, burst: int, clock=time.monotonic):
+        self.name = name
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.metrics = {
+            "admitted": 0, "deferred": 0, "throttled": 0, "rate_limited_responses": 0,
+            "wait_s_total": 0.0, "wait_s_max": 0.0,
+            "wait_s_by_priority": {level: 0.0 for level in PRIORITY_LEVELS},
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def _shortfall_s(self, level: int, now: float) -> float:
+        """Seconds until a caller at this level could take a token (0 = now)."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        needed = 1.0 + self.burst * RESERVE_FRACTION[level]
+        if self._tokens >= needed:
+            return 0.0
+        return (needed - self._tokens) / self.rate_per_s
+
+    def acquire(self, priority: Any = None, timeout: Optional[float] = DEFAULT_WAIT_S) -> bool:
+        """Take one token, waiting up to timeout seconds. False means deferred."""
+        level = current_priority() if priority is None else priority_level(priority)
+        started = self.clock()
+        ticket = (level, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = self.clock()
+                    self._refill(now)
+                    shortfall = self._shortfall_s(level, now)
+                    if self._waiting[0] == ticket and shortfall == 0.0:
+                        self._tokens -= 1.0
+                        break
+                    remaining = None if timeout is None else started + timeout - now
+                    if remaining is not None and remaining <= 0:
+                        self.metrics["deferred"] += 1
+                        return False
+                    # Someone ahead of us is waiting: wake when they are served
+                    wait = shortfall if self._waiting[0] == ticket else None
+                    if remaining is not None:
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+            waited = self.clock() - started
+            self.metrics["admitted"] += 1
+            if waited > 0.001:
+                self.metrics["throttled"] += 1
+                self.metrics["wait_s_total"] += waited
+                self.metrics["wait_s_max"] = max(self.metrics["wait_s_max"], waited)
+                name = next(n for n, l in PRIORITY_LEVELS.items() if l == level)
+                self.metrics["wait_s_by_priority"][name] += waited
+        return True
+
+    async def acquire_async(self, priority: Any = None, timeout: Optional[float] = DEFAULT_WAIT_S) -> bool:
+        """acquire() for coroutines: waits on the event loop instead of parking a thread."""
+        level = current_priority() if priority is None else priority_level(priority)
+        started = self.clock()
+        ticket = (level, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                with self._cond:
+                    now = self.clock()
+                    self._refill(now)
+                    shortfall = self._shortfall_s(level, now)
+                    if self._waiting[0] == ticket and shortfall == 0.0:
+                        self._tokens -= 1.0
+                        break
+                    remaining = None if timeout is None else started + timeout - now
+                    if remaining is not None and remaining <= 0:
+                        self.metrics["deferred"] += 1
+                        return False
+                # Coroutines cannot wait on the condition; poll at the refill pace
+                wait = shortfall if self._waiting[0] == ticket else 1.0 / self.rate_per_s
+                if remaining is not None:
+                    wait = min(wait, remaining)
+                await asyncio.sleep(max(wait, 0.001))
+        finally:
+            with self._cond:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+        waited = self.clock() - started
+        with self._cond:
+            self.metrics["admitted"] += 1
+            if waited > 0.001:
+                self.metrics["throttled"] += 1
+                self.metrics["wait_s_total"] += waited
+                self.metrics["wait_s_max"] = max(self.metrics["wait_s_max"], waited)
+                name = next(n for n, l in PRIORITY_LEVELS.items() if l == level)
+                self.metrics["wait_s_by_priority"][name] += waited
+        return True
+
+    def penalize(self, retry_after_s: Optional[float] = None):
+        """The API answered 429: stop admitting until it should accept again."""
+        with self._cond:
+            now = self.clock()
+            self._refill(now)
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, now + (retry_after_s or DEFAULT_RETRY_AFTER_S))
+            self.metrics["rate_limited_responses"] += 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(self.clock())
+            metrics = dict(self.metrics)
+            metrics["wait_s_by_priority"] = {k: round(v, 3) for k, v in self.metrics["wait_s_by_priority"].items()}
+            metrics["wait_s_total"] = round(metrics["wait_s_total"], 3)
+            metrics["wait_s_max"] = round(metrics["wait_s_max"], 3)
+            return {
+                "rate_per_s": self.rate_per_s,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiting),
+                **metrics,
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(name: str) -> RateLimiter:
+    """Process-wide limiter for one API, configured from DEFAULT_LIMITS and the environment."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rate, burst = DEFAULT_LIMITS.get(name, (10.0, 10))
+            rate = float(os.getenv(f"RATE_LIMIT_{name.upper()}_RPS", rate))
+            burst = int(os.getenv(f"RATE_LIMIT_{name.upper()}_BURST", burst))
+            limiter = _limiters[name] = RateLimiter(name, rate, burst)
+    return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def _retry_after(response) -> Optional[float]:
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def http_status(error: Exception) -> Optional[int]:
+    """
+    The HTTP status a client error carries: google.api_core's .code, aiohttp's
+    .status, or requests' .response.status_code.
+    """
+    response = getattr(error, "response", None)
+    for value in (getattr(error, "code", None), getattr(error, "status", None), getattr(error, "status_code", None),
+                  getattr(response, "status_code", None)):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return int(value)
+    return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for 429-style errors from HTTP or gRPC clients (e.g. ResourceExhausted)."""
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests") or http_status(error) == 429
+
+
+def _server_error(response) -> bool:
+    status = getattr(response, "status", getattr(response, "status_code", None))
+    return isinstance(status, int) and status >= 500
+
+
+def call_with_quota(api: str, send: Callable[[], Any], is_throttled: Callable[[Any], bool] = None,
+                    retries: int = 2, timeout: Optional[float] = DEFAULT_WAIT_S,
+                    is_failure: Callable[[Any], bool] = None) -> Any:
+    """
+    Run send() under the api's rate limiter at the calling thread's priority.
+    Throttled results (is_throttled(result), default HTTP 429) and rate-limit
+    exceptions penalize the limiter and are retried once it admits again.
+    Exceptions, results for which is_failure(result) holds (default HTTP 5xx)
+    and throttling that outlasts the retries count against the api's circuit
+    breaker. Raises QuotaExceeded if admission is deferred past timeout, and
+    CircuitOpen without waiting while the breaker is open.
+    """
+    limiter = rate_limiter(api)
+    breaker = circuit_breaker(api)
+    is_throttled = is_throttled or (lambda response: getattr(response, "status_code", None) == 429)
+    is_failure = is_failure or _server_error
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpen(f"{api} circuit is open")
+        if not limiter.acquire(timeout=timeout):
+            breaker.release()
+            raise QuotaExceeded(f"{api}: no quota within {timeout}s")
+        started = time.monotonic()
+        try:
+            result = send()
+        except Exception as e:
+            if attempt < retries and is_rate_limit_error(e):
+                print(f"RateLimiter  - {api} rate limited, backing off: {e}")
+                breaker.release()
+                limiter.penalize(_retry_after(getattr(e, "response", None) or e))
+                continue
+            # Out of retries, a rate limit is an outage like any other error
+            breaker.record_failure()
+            raise
+        if attempt < retries and is_throttled(result):
+            print(f"RateLimiter  - {api} answered 429, backing off")
+            breaker.release()
+            limiter.penalize(_retry_after(result))
+            continue
+        if is_throttled(result) or is_failure(result):
+            breaker.record_failure()
+        else:
+            breaker.record_success(time.monotonic() - started)
+        return result
+
+
+async def call_with_quota_async(api: str, send: Callable[[], Awaitable[Any]], is_throttled: Callable[[Any], bool] = None,
+                                retries: int = 2, timeout: Optional[float] = DEFAULT_WAIT_S,
+                                priority: Any = None, is_failure: Callable[[Any], bool] = None) -> Any:
+    """
+    call_with_quota() for coroutines: send is an async callable. The calling
+    thread's priority does not follow a coroutine, so pass priority explicitly.
+    """
+    limiter = rate_limiter(api)
+    breaker = circuit_breaker(api)
+    is_throttled = is_throttled or (lambda response: getattr(response, "status", getattr(response, "status_code", None)) == 429)
+    is_failure = is_failure or _server_error
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpen(f"{api} circuit is open")
+        if not await limiter.acquire_async(priority, timeout=timeout):
+            breaker.release()
+            raise QuotaExceeded(f"{api}: no quota within {timeout}s")
+        started = time.monotonic()
+        try:
+            result = await send()
+        except Exception as e:
+            if attempt < retries and is_rate_limit_error(e):
+                print(f"RateLimiter  - {api} rate limited, backing off: {e}")
+                breaker.release()
+                limiter.penalize(_retry_after(getattr(e, "response", None) or e))
+                continue
+            # Out of retries, a rate limit is an outage like any other error
+            breaker.record_failure()
+            raise
+        if attempt < retries and is_throttled(result):
+            print(f"RateLimiter  - {api} answered 429, backing off")
+            breaker.release()
+            limiter.penalize(_retry_after(result))
+            continue
+        if is_throttled(result) or is_failure(result):
+            breaker.record_failure()
+        else:
+            breaker.record_success(time.monotonic() - started)
+        return result
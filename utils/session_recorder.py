@@ -0,0 +1,162 @@
+"""
+Record what crosses the mesh_bridge and AllocatorAgent boundaries, so that
+production sessions can be replayed offline (tools/replay.py).
+
+Recording is on when SESSION_RECORD_PATH names a JSONL file. Every line is
+one event:
+
+    {"kind": "turn", "session": ..., "agent": ..., "input": {...}, "response": ..., "elapsed_s": ...}
+    {"kind": "allocation", "unit": ..., "incidents": [...], "elapsed_s": ...}
+    {"kind": "call", "unit": ..., "boundary": "maps.geocode", "key": ..., "value": ..., "elapsed_s": ...}
+
+Turns carry the caller's message and the LLM reply. Allocations carry the
+incidents handed to the allocator. Calls carry the raw Maps and Gemini
+answers the allocator received while it worked on them. During replay the
+same call sites are served from the recording and never leave the process.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+RECORD, REPLAY = "record", "replay"
+
+# The allocation a call belongs to (recording) or is replayed for (replay)
+_unit = contextvars.ContextVar("session_recorder_unit", default=None)
+
+
+class ReplayMiss(LookupError):
+    """The replayed build made a call the recording has no answer for."""
+
+
+class SessionRecorder:
+    def __init__(self, path: Optional[str] = None):
+        self.mode = RECORD if path else None
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        self._lock = threading.Lock()
+        self._by_unit: Dict[Tuple[Any, str, str], deque] = {}
+        self._by_key: Dict[Tuple[str, str], List[Any]] = {}
+        self.counters = {"events": 0, "replayed": 0, "replay_misses": 0}
+
+    @classmethod
+    def from_env(cls) -> "SessionRecorder":
+        return cls(os.getenv("SESSION_RECORD_PATH") or None)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    # --- recording -----------------------------------------------------------
+
+    def _write(self, event: Dict[str, Any]):
+        event["t"] = round(time.time(), 3)
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.counters["events"] += 1
+
+    def record_turn(self, session_id: Optional[str], agent_name: str, network_type: str, input_json: Dict[str, Any],
+                    response: Any, elapsed_s: float):
+        if self.recording:
+            self._write({"kind": "turn", "session": session_id, "agent": agent_name, "network_type": network_type,
+                         "input": input_json, "response": response, "elapsed_s": round(elapsed_s, 4)})
+
+    @contextmanager
+    def allocation(self, incidents: List[Dict[str, Any]], unit: Optional[str] = None):
+        """
+        Scope of one process_incident(s) call: boundary calls made inside are
+        tied to it. Replay passes the recorded unit id back in.
+        """
+        # Off, or already inside one (process_incidents -> process_incident, or replay bound the recorded unit)
+        if self.mode is None or _unit.get() is not None:
+            yield
+            return
+        if unit is None:
+            unit = f"{os.getpid()}-{threading.get_ident()}-{time.time_ns()}"
+        token = _unit.set(unit)
+        started = time.time()
+        try:
+            yield
+        finally:
+            _unit.reset(token)
+            if self.recording:
+                self._write({"kind": "allocation", "unit": unit, "incidents": incidents,
+                             "elapsed_s": round(time.time() - started, 4)})
+
+    def call(self, boundary: str, key: str, fn: Callable[[], Any]) -> Any:
+        """fn() while recording it; its recorded value (or ReplayMiss) during replay."""
+        if self.replaying:
+            return self.replayed(boundary, key)
+        if not self.recording:
+            return fn()
+        started = time.time()
+        value = fn()
+        self.record_call(boundary, key, value, time.time() - started)
+        return value
+
+    async def call_async(self, boundary: str, key: str, fn: Callable[[], Any]) -> Any:
+        if self.replaying:
+            return self.replayed(boundary, key)
+        if not self.recording:
+            return await fn()
+        started = time.time()
+        value = await fn()
+        self.record_call(boundary, key, value, time.time() - started)
+        return value
+
+    def record_call(self, boundary: str, key: str, value: Any, elapsed_s: float = 0.0):
+        if self.recording:
+            self._write({"kind": "call", "unit": _unit.get(), "boundary": boundary, "key": key, "value": value,
+                         "elapsed_s": round(elapsed_s, 4)})
+
+    # --- replay --------------------------------------------------------------
+
+    def start_replay(self, events: Iterable[Dict[str, Any]]):
+        """Serve boundary calls from recorded call events instead of the network."""
+        by_unit, by_key = {}, {}
+        for event in events:
+            if event.get("kind") != "call":
+                continue
+            by_unit.setdefault((event.get("unit"), event["boundary"], event["key"]), deque()).append(event["value"])
+            by_key.setdefault((event["boundary"], event["key"]), []).append(event["value"])
+        with self._lock:
+            self.mode = REPLAY
+            self._by_unit, self._by_key = by_unit, by_key
+
+    def replayed(self, boundary: str, key: str) -> Any:
+        """
+        The answer recorded for this call in the current allocation, in call
+        order. If the allocation never made the call (a cache was warm when it
+        was recorded), any recorded answer for the same request is used.
+        """
+        with self._lock:
+            queue = self._by_unit.get((_unit.get(), boundary, key))
+            if queue:
+                self.counters["replayed"] += 1
+                # Repeated replays of the same recording need the answers again
+                value = queue.popleft()
+                queue.append(value)
+                return value
+            answers = self._by_key.get((boundary, key))
+            if answers:
+                self.counters["replayed"] += 1
+                return answers[0]
+            self.counters["replay_misses"] += 1
+        raise ReplayMiss(f"No recorded {boundary} answer for {key!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, **self.counters}
+
+
+session_recorder = SessionRecorder.from_env()
@@ -0,0 +1,358 @@
+"""
+Shared state for running several app workers side by side.
+
+    STATE_BACKEND=sqlite:////var/run/swift/state.db WORKER_ID=w1 PORT=5001 python app.py
+    STATE_BACKEND=sqlite:////var/run/swift/state.db WORKER_ID=w2 PORT=5002 python app.py
+
+Session state, conversation history, Socket.IO room membership and a
+cross-worker event bus live behind a StateBackend. MemoryBackend (the
+default) keeps today's single-process behaviour; SQLiteBackend shares one
+database file between workers on a host. Gemini chat objects cannot be
+shared, so a conversation should stay on the worker that holds its chat: the
+app sets a worker cookie that a front proxy can hash on (nginx:
+`hash $cookie_swift_worker consistent;`), and shared history lets any other
+worker rebuild the chat if that worker goes away.
+"""
+import hashlib
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+BUS_POLL_S = 0.05
+EVENT_RETENTION_S = 120.0
+WORKER_TTL_S = 30.0
+# Idle SQLite connections kept per backend; extra ones opened under load are closed after use
+SQLITE_POOL_SIZE = 4
+
+
+def default_worker_id() -> str:
+    return os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def sticky_worker(key: str, workers: List[str]) -> Optional[str]:
+    """Rendezvous hash: the same key maps to the same worker while it is alive."""
+    if not workers:
+        return None
+    return max(workers, key=lambda worker: hashlib.sha1(f"{worker}|{key}".encode()).digest())
+
+
+class StateBackend(ABC):
+    """Interface for shared session state, history, rooms and the event bus."""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or default_worker_id()
+        self._handlers: Dict[str, List[Callable[[Any], None]]] = {}
+
+    # Session state: one JSON document per key
+    @abstractmethod
+    def get_state(self, key: str) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def update_state(self, key: str, **fields) -> Dict[str, Any]:
+        ...
+
+    # Conversation history
+    @abstractmethod
+    def append_history(self, session_id: str, message: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        ...
+
+    # Socket.IO rooms across workers
+    @abstractmethod
+    def join_room(self, room: str, sid: str):
+        ...
+
+    @abstractmethod
+    def leave_room(self, room: str, sid: str):
+        ...
+
+    @abstractmethod
+    def room_members(self, room: str) -> List[Dict[str, str]]:
+        ...
+
+    # Worker liveness for sticky routing
+    @abstractmethod
+    def heartbeat(self):
+        ...
+
+    @abstractmethod
+    def live_workers(self) -> List[str]:
+        ...
+
+    # Event bus: handlers see events published by *other* workers
+    def subscribe(self, channel: str, handler: Callable[[Any], None]):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    @abstractmethod
+    def publish(self, channel: str, payload: Any):
+        ...
+
+    def _dispatch(self, channel: str, payload: Any):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"StateBackend - Handler error on {channel}: {e}")
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Single-process backend; the bus has no other workers to reach."""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._history: Dict[str, List[Dict[str, Any]]] = {}
+        self._rooms: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def get_state(self, key):
+        with self._lock:
+            return dict(self._state.get(key, {}))
+
+    def update_state(self, key, **fields):
+        with self._lock:
+            state = self._state.setdefault(key, {})
+            state.update(fields)
+            return dict(state)
+
+    def append_history(self, session_id, message):
+        with self._lock:
+            self._history.setdefault(session_id, []).append(message)
+
+    def get_history(self, session_id):
+        with self._lock:
+            return list(self._history.get(session_id, []))
+
+    def join_room(self, room, sid):
+        with self._lock:
+            self._rooms.setdefault(room, {})[sid] = self.worker_id
+
+    def leave_room(self, room, sid):
+        with self._lock:
+            self._rooms.get(room, {}).pop(sid, None)
+
+    def room_members(self, room):
+        with self._lock:
+            return [{"sid": sid, "worker": worker} for sid, worker in self._rooms.get(room, {}).items()]
+
+    def heartbeat(self):
+        pass
+
+    def live_workers(self):
+        return [self.worker_id]
+
+    def publish(self, channel, payload):
+        pass
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Workers on one host share a SQLite file (WAL mode). The event bus is an
+    append-only table each worker polls every BUS_POLL_S; rows older than
+    EVENT_RETENTION_S are pruned. Request threads borrow connections from a
+    small pool instead of each holding one open for the life of the thread.
+    """
+
+    def __init__(self, path: str, worker_id: Optional[str] = None, poll_s: float = BUS_POLL_S,
+                 pool_size: int = SQLITE_POOL_SIZE):
+        super().__init__(worker_id)
+        self.path = path
+        self.poll_s = poll_s
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self._closed = threading.Event()
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, doc TEXT NOT NULL, updated_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS history (seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS history_session ON history (session_id, seq);
+                CREATE TABLE IF NOT EXISTS rooms (room TEXT NOT NULL, sid TEXT NOT NULL, worker TEXT NOT NULL, PRIMARY KEY (room, sid));
+                CREATE TABLE IF NOT EXISTS workers (worker TEXT PRIMARY KEY, seen_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL,
+                                                   payload TEXT NOT NULL, origin TEXT NOT NULL, at REAL NOT NULL);
+            """)
+            self._last_seq = db.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+        self.heartbeat()
+        self._poller = threading.Thread(target=self._poll_loop, daemon=True, name="state-bus")
+        self._poller.start()
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """A connection for one operation; it goes back to the pool (or is closed) afterwards."""
+        try:
+            db = self._idle.get_nowait()
+        except queue.Empty:
+            # Used by one thread at a time, but not always the one that opened it
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA busy_timeout=10000")
+        try:
+            yield db
+        finally:
+            if self._closed.is_set():
+                db.close()
+            else:
+                try:
+                    self._idle.put_nowait(db)
+                except queue.Full:
+                    db.close()
+
+    def get_state(self, key):
+        with self._db() as db:
+            row = db.execute("SELECT doc FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update_state(self, key, **fields):
+        with self._db() as db:
+            # IMMEDIATE takes the write lock up front so read-modify-write is atomic across workers
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT doc FROM state WHERE key = ?", (key,)).fetchone()
+                state = json.loads(row[0]) if row else {}
+                state.update(fields)
+                db.execute("INSERT OR REPLACE INTO state (key, doc, updated_at) VALUES (?, ?, ?)",
+                           (key, json.dumps(state, default=str), time.time()))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return state
+
+    def append_history(self, session_id, message):
+        with self._db() as db:
+            db.execute("INSERT INTO history (session_id, message) VALUES (?, ?)",
+                       (session_id, json.dumps(message, default=str)))
+
+    def get_history(self, session_id):
+        with self._db() as db:
+            rows = db.execute("SELECT message FROM history WHERE session_id = ? ORDER BY seq", (session_id,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def join_room(self, room, sid):
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO rooms (room, sid, worker) VALUES (?, ?, ?)", (room, sid, self.worker_id))
+
+    def leave_room(self, room, sid):
+        with self._db() as db:
+            db.execute("DELETE FROM rooms WHERE room = ? AND sid = ?", (room, sid))
+
+    def room_members(self, room):
+        with self._db() as db:
+            rows = db.execute("SELECT sid, worker FROM rooms WHERE room = ?", (room,)).fetchall()
+        return [{"sid": sid, "worker": worker} for sid, worker in rows]
+
+    def heartbeat(self):
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO workers (worker, seen_at) VALUES (?, ?)", (self.worker_id, time.time()))
+
+    def live_workers(self):
+        with self._db() as db:
+            rows = db.execute("SELECT worker FROM workers WHERE seen_at >= ? ORDER BY worker",
+                              (time.time() - WORKER_TTL_S,)).fetchall()
+        return [row[0] for row in rows]
+
+    def publish(self, channel, payload):
+        with self._db() as db:
+            db.execute("INSERT INTO events (channel, payload, origin, at) VALUES (?, ?, ?, ?)",
+                       (channel, json.dumps(payload, default=str), self.worker_id, time.time()))
+
+    def _poll_loop(self):
+        last_prune = last_beat = time.time()
+        while not self._closed.wait(self.poll_s):
+            try:
+                with self._db() as db:
+                    rows = db.execute(
+                        "SELECT seq, channel, payload, origin FROM events WHERE seq > ? ORDER BY seq", (self._last_seq,)
+                    ).fetchall()
+                for seq, channel, payload, origin in rows:
+                    self._last_seq = seq
+                    if origin != self.worker_id:
+                        self._dispatch(channel, json.loads(payload))
+                now = time.time()
+                if now - last_beat >= WORKER_TTL_S / 3:
+                    self.heartbeat()
+                    last_beat = now
+                if now - last_prune >= EVENT_RETENTION_S / 4:
+                    with self._db() as db:
+                        db.execute("DELETE FROM events WHERE at < ?", (now - EVENT_RETENTION_S,))
+                    last_prune = now
+            except sqlite3.Error as e:
+                print(f"StateBackend - Event bus poll failed: {e}")
+
+    def idle_connections(self) -> int:
+        return self._idle.qsize()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        # From here on, connections are closed when handed back instead of pooled
+        self._closed.set()
+        self._poller.join(timeout=2)
+        with self._db() as db:
+            db.execute("DELETE FROM rooms WHERE worker = ?", (self.worker_id,))
+            db.execute("DELETE FROM workers WHERE worker = ?", (self.worker_id,))
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SharedState:
+    """
+    Dict-like view used as app.py's system_state. Keys listed in `shared`
+    are read from and written to the backend; everything else (queues,
+    agent objects) stays in this process.
+    """
+
+    def __init__(self, backend: StateBackend, key: str, shared: Dict[str, Any], local: Dict[str, Any]):
+        self.backend = backend
+        self.key = key
+        self.shared_keys = set(shared)
+        self._local = dict(local)
+        missing = {name: value for name, value in shared.items() if name not in backend.get_state(key)}
+        if missing:
+            backend.update_state(key, **missing)
+
+    def __getitem__(self, name):
+        if name in self.shared_keys:
+            return self.backend.get_state(self.key).get(name)
+        return self._local[name]
+
+    def __setitem__(self, name, value):
+        if name in self.shared_keys:
+            self.backend.update_state(self.key, **{name: value})
+        else:
+            self._local[name] = value
+
+    def update(self, **fields):
+        """Set several shared fields in one backend write."""
+        shared = {name: value for name, value in fields.items() if name in self.shared_keys}
+        if shared:
+            self.backend.update_state(self.key, **shared)
+        for name, value in fields.items():
+            if name not in self.shared_keys:
+                self._local[name] = value
+
+
+def backend_from_env() -> StateBackend:
+    """STATE_BACKEND=memory (default) or sqlite:///<path>."""
+    spec = os.getenv("STATE_BACKEND", "memory")
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):])
+    if spec != "memory":
+        raise ValueError(f"Unknown STATE_BACKEND: {spec}")
+    return MemoryBackend()
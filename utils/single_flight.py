@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, everyone who arrives while it is in flight waits and gets the
+    same result (or the same exception). Nothing is cached once the call
+    returns; pair with a cache for that.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._tasks: Dict[Hashable, asyncio.Future] = {}  # do_async calls, keyed separately
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.errors = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """do() for coroutines on one event loop: followers await the leader's task."""
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(key)
+            if task is not None:
+                self.shared += 1
+            else:
+                task = self._tasks[key] = asyncio.ensure_future(fn())
+                self.executions += 1
+                task.add_done_callback(lambda done: self._finish_async(key, done))
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key: Hashable, task: asyncio.Future):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            if task.cancelled() or task.exception() is not None:
+                self.errors += 1
+
+    def wrap(self, fn: Callable[[Any], Any], scope: Hashable = None) -> Callable[[Any], Any]:
+        """Single-argument fn whose concurrent identical calls are coalesced within scope."""
+        scope = id(getattr(fn, "__self__", fn)) if scope is None else scope
+
+        def coalesced(arg):
+            return self.do((scope, arg), lambda: fn(arg))
+        return coalesced
+
+    def wrap_async(self, fn: Callable[[Any], Awaitable[Any]], scope: Hashable = None) -> Callable[[Any], Awaitable[Any]]:
+        """wrap() for a single-argument coroutine function."""
+        scope = id(getattr(fn, "__self__", fn)) if scope is None else scope
+
+        async def coalesced(arg):
+            return await self.do_async((scope, arg), lambda: fn(arg))
+        return coalesced
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "deduplicated": self.shared,
+                "errors": self.errors,
+                "in_flight": len(self._calls) + len(self._tasks),
+                "saved_ratio": round(self.shared / self.calls, 3) if self.calls else 0.0,
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def single_flight(name: str) -> SingleFlight:
+    """Process-wide SingleFlight group for one kind of external call."""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+    return group
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,370 @@
+"""
+Streaming voice input: PCM frames in, one transcript per utterance out.
+
+Clients use the /voice Socket.IO namespace (app.py):
+
+    emit 'voice_start' {sample_rate}               16-bit little-endian mono PCM, default 16000
+    emit 'voice_frame' <binary> or {seq, audio}    any chunk size; seq restores order
+    emit 'voice_stop'
+
+and receive 'voice_partial' {text} while the caller speaks and
+'voice_transcript' {text, eos_to_transcript_ms, ...} once an utterance
+ends. The transcript then goes through process_user_message like a typed
+message.
+
+Every stream has an energy VAD with an adaptive noise floor that splits the
+audio into utterances. Only speech, plus a short pre-roll, reaches the
+recognizer. It arrives in CHUNK_MS pieces while the caller is still
+talking, so by the time the VAD sees the end of speech almost all the audio
+is decoded and only the final flush remains. Recognition is local and
+CPU-only with Vosk (pip install vosk; set VOSK_MODEL_PATH to an unpacked
+model). The model is loaded once per process and each stream gets its own
+recognizer.
+"""
+import heapq
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import vosk  # voice input only
+except ImportError:
+    vosk = None
+
+try:
+    import audioop  # C implementation of rms; gone in Python 3.13
+except ImportError:
+    audioop = None
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+CHUNK_MS = 200          # audio handed to the recognizer per call
+PRE_ROLL_MS = 200       # kept from before speech starts, so the first syllable is not clipped
+START_MS = 60           # voiced audio in a row that starts an utterance
+HANGOVER_MS = int(os.getenv("VOICE_HANGOVER_MS", "500"))   # silence that ends one
+MAX_UTTERANCE_S = 30
+MIN_RMS = 300.0         # of 32767; quieter frames are never speech
+SPEECH_RATIO = 3.0      # speech is this many times louder than the noise floor
+MAX_QUEUED_CHUNKS = 1000
+REORDER_WINDOW = 50     # out-of-order chunks held before a missing seq is given up on
+LATENCY_SAMPLES = 1000
+
+
+class ASRUnavailable(RuntimeError):
+    """No local speech recognizer: vosk is not installed or its model is missing."""
+
+
+def frame_rms(frame: bytes) -> float:
+    if audioop is not None:
+        return float(audioop.rms(frame, 2))
+    samples = array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return math.sqrt(sum(s * s for s in samples) / len(samples)) if samples else 0.0
+
+
+class EnergyVAD:
+    """
+    Speech or silence per frame. A frame is speech when its RMS is above
+    max(min_rms, ratio x noise floor). The floor only follows silent frames,
+    so fans and traffic raise it but the caller's voice does not.
+    """
+
+    def __init__(self, min_rms: float = MIN_RMS, ratio: float = SPEECH_RATIO, adapt: float = 0.05):
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.adapt = adapt
+        self.noise_floor = min_rms / ratio
+
+    def is_speech(self, frame: bytes) -> bool:
+        rms = frame_rms(frame)
+        speech = rms > max(self.min_rms, self.ratio * self.noise_floor)
+        if not speech:
+            self.noise_floor += self.adapt * (rms - self.noise_floor)
+        return speech
+
+
+class VoskEngine:
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        vosk.SetLogLevel(-1)
+        self.model = vosk.Model(model_path)
+
+    def recognizer(self, sample_rate: int):
+        return vosk.KaldiRecognizer(self.model, sample_rate)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def shared_asr_engine():
+    """The process-wide recognizer engine; the model is loaded on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            if vosk is None:
+                raise ASRUnavailable("Voice input needs vosk (pip install vosk)")
+            model_path = os.getenv("VOSK_MODEL_PATH")
+            if not model_path or not os.path.isdir(model_path):
+                raise ASRUnavailable("Set VOSK_MODEL_PATH to an unpacked Vosk model directory")
+            started = time.perf_counter()
+            _engine = VoskEngine(model_path)
+            print(f"Voice        - Loaded ASR model {model_path} in {time.perf_counter() - started:.1f}s")
+        return _engine
+
+
+_STOP = object()
+
+
+class VoiceStream:
+    """
+    One caller's audio. feed() only queues, so the socket thread never
+    waits on the recognizer; a worker thread runs the VAD and the ASR in
+    arrival order.
+    """
+
+    def __init__(self, sid: str, engine, sample_rate: int, on_transcript: Callable, on_partial: Optional[Callable],
+                 stats: "VoiceGateway"):
+        self.sid = sid
+        self.sample_rate = sample_rate
+        self.on_transcript = on_transcript
+        self.on_partial = on_partial
+        self.stats = stats
+        self.recognizer = engine.recognizer(sample_rate)
+        self.vad = EnergyVAD()
+        self.frame_bytes = 2 * sample_rate * FRAME_MS // 1000
+        self.chunk_bytes = 2 * sample_rate * CHUNK_MS // 1000
+        self.start_frames = max(1, START_MS // FRAME_MS)
+        self.hangover_frames = max(1, HANGOVER_MS // FRAME_MS)
+        self.max_frames = MAX_UTTERANCE_S * 1000 // FRAME_MS
+
+        self._queue = queue.Queue(maxsize=MAX_QUEUED_CHUNKS)
+        self._next_seq = 0
+        self._held = []
+        self._buffer = bytearray()
+        self._pre_roll = deque(maxlen=max(1, PRE_ROLL_MS // FRAME_MS))
+        self._pending = bytearray()
+        self._reset_utterance()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"voice-{sid[:8]}")
+        self._thread.start()
+
+    def _reset_utterance(self):
+        self.in_speech = False
+        self.voiced_run = 0
+        self.silence_run = 0
+        self.utterance_frames = 0
+        self.last_voiced_at = None
+        self.parts = []
+        self.last_partial = ""
+        self._pending.clear()
+
+    # --- socket side ---------------------------------------------------------
+
+    def feed(self, audio: bytes, seq: Optional[int] = None) -> bool:
+        try:
+            self._queue.put_nowait((time.monotonic(), seq, audio))
+            return True
+        except queue.Full:
+            self.stats.count("dropped_chunks")
+            return False
+
+    def close(self, flush: bool = True):
+        # Blocks only if the worker is a whole queue behind; the stop must not be lost
+        self._queue.put((time.monotonic(), flush, _STOP))
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the worker to finish what was queued before close(); True once it has."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    # --- worker --------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            arrived, seq, audio = self._queue.get()
+            if audio is _STOP:
+                # The worker ends here even if flushing the last utterance fails
+                try:
+                    if seq:  # flush
+                        for _, _, held in sorted(self._held):
+                            self._audio(arrived, held)
+                        if self.in_speech:
+                            self._finish()
+                except Exception as e:
+                    self._failed(e)
+                finally:
+                    self.stats.closed(self)
+                return
+            try:
+                self._ordered(arrived, seq, audio)
+            except Exception as e:
+                self._failed(e)
+
+    def _failed(self, error: Exception):
+        self.stats.count("errors")
+        print(f"Voice        - Stream {self.sid} failed: {error}")
+        self._reset_utterance()
+
+    def _ordered(self, arrived: float, seq: Optional[int], audio: bytes):
+        # Socket.IO runs handlers on their own threads, so chunks can arrive out of order
+        if seq is None:
+            self._audio(arrived, audio)
+            return
+        heapq.heappush(self._held, (seq, arrived, audio))
+        if len(self._held) > REORDER_WINDOW and self._held[0][0] > self._next_seq:
+            self.stats.count("lost_chunks", self._held[0][0] - self._next_seq)
+            self._next_seq = self._held[0][0]
+        while self._held and self._held[0][0] <= self._next_seq:
+            seq, arrived, audio = heapq.heappop(self._held)
+            if seq == self._next_seq:
+                self._audio(arrived, audio)
+                self._next_seq += 1
+
+    def _audio(self, arrived: float, audio: bytes):
+        self._buffer.extend(audio)
+        frames = len(self._buffer) // self.frame_bytes
+        for index in range(frames):
+            self._frame(arrived, bytes(self._buffer[index * self.frame_bytes:(index + 1) * self.frame_bytes]))
+        del self._buffer[:frames * self.frame_bytes]
+        self.stats.count("audio_s", frames * FRAME_MS / 1000)
+
+    def _frame(self, arrived: float, frame: bytes):
+        speech = self.vad.is_speech(frame)
+        if not self.in_speech:
+            self._pre_roll.append(frame)
+            self.voiced_run = self.voiced_run + 1 if speech else 0
+            if self.voiced_run >= self.start_frames:
+                self.in_speech = True
+                self.last_voiced_at = arrived
+                for held in self._pre_roll:
+                    self._accept(held)
+                self._pre_roll.clear()
+            return
+        self._accept(frame)
+        if speech:
+            self.silence_run = 0
+            self.last_voiced_at = arrived
+        else:
+            self.silence_run += 1
+        if self.silence_run >= self.hangover_frames or self.utterance_frames >= self.max_frames:
+            self._finish()
+
+    def _accept(self, frame: bytes):
+        self._pending.extend(frame)
+        self.utterance_frames += 1
+        if len(self._pending) >= self.chunk_bytes:
+            self._decode()
+
+    def _decode(self):
+        started = time.perf_counter()
+        if self.recognizer.AcceptWaveform(bytes(self._pending)):
+            # The recognizer closed a segment of its own inside the utterance
+            self.parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        self.stats.count("speech_s", len(self._pending) / (2 * self.sample_rate))
+        self.stats.count("decode_s", time.perf_counter() - started)
+        self._pending.clear()
+        text = " ".join(part for part in self.parts + [partial] if part)
+        if self.on_partial and text and text != self.last_partial:
+            self.last_partial = text
+            self.on_partial(self.sid, text)
+
+    def _finish(self):
+        started = time.perf_counter()
+        if self._pending:
+            self.recognizer.AcceptWaveform(bytes(self._pending))
+            self.stats.count("speech_s", len(self._pending) / (2 * self.sample_rate))
+        final = json.loads(self.recognizer.FinalResult()).get("text", "")
+        decoded = time.perf_counter() - started
+        self.stats.count("decode_s", decoded)
+        text = " ".join(part for part in self.parts + [final] if part).strip()
+        info = {
+            "eos_to_transcript_ms": round(1000 * (time.monotonic() - self.last_voiced_at), 1),
+            "final_decode_ms": round(1000 * decoded, 1),
+            "utterance_s": round(self.utterance_frames * FRAME_MS / 1000, 2),
+        }
+        self._reset_utterance()
+        self.stats.utterance(text, info)
+        if text:
+            self.on_transcript(self.sid, text, info)
+
+
+class VoiceGateway:
+    """Open voice streams by client sid, and latency counters across them."""
+
+    def __init__(self, on_transcript: Callable[[str, str, Dict[str, Any]], None],
+                 on_partial: Optional[Callable[[str, str], None]] = None, engine_factory=shared_asr_engine):
+        self.on_transcript = on_transcript
+        self.on_partial = on_partial
+        self.engine_factory = engine_factory
+        self._streams: Dict[str, VoiceStream] = {}
+        self._lock = threading.Lock()
+        self._eos_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._final_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {"streams": 0, "utterances": 0, "transcripts": 0, "empty": 0, "audio_s": 0.0,
+                         "speech_s": 0.0, "decode_s": 0.0, "dropped_chunks": 0, "lost_chunks": 0, "errors": 0}
+
+    def open(self, sid: str, sample_rate: int = SAMPLE_RATE) -> VoiceStream:
+        """Start (or restart) sid's stream; raises ASRUnavailable without a recognizer."""
+        engine = self.engine_factory()
+        self.close(sid, flush=False)
+        stream = VoiceStream(sid, engine, sample_rate, self.on_transcript, self.on_partial, self)
+        with self._lock:
+            self._streams[sid] = stream
+            self.counters["streams"] += 1
+        return stream
+
+    def feed(self, sid: str, audio: bytes, seq: Optional[int] = None) -> bool:
+        stream = self._streams.get(sid)
+        return stream.feed(audio, seq) if stream else False
+
+    def close(self, sid: str, flush: bool = True):
+        with self._lock:
+            stream = self._streams.pop(sid, None)
+        if stream:
+            stream.close(flush)
+
+    def closed(self, stream: VoiceStream):
+        with self._lock:
+            if self._streams.get(stream.sid) is stream:
+                del self._streams[stream.sid]
+
+    def count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def utterance(self, text: str, info: Dict[str, Any]):
+        with self._lock:
+            self.counters["utterances"] += 1
+            self.counters["transcripts" if text else "empty"] += 1
+            self._eos_ms.append(info["eos_to_transcript_ms"])
+            self._final_ms.append(info["final_decode_ms"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            eos, final = sorted(self._eos_ms), sorted(self._final_ms)
+            counters = dict(self.counters)
+            active = len(self._streams)
+
+        def at(ordered, q):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+        return {
+            **{name: round(value, 3) if isinstance(value, float) else value for name, value in counters.items()},
+            "active": active,
+            "engine": "vosk" if vosk is not None else None,
+            "hangover_ms": HANGOVER_MS,
+            "realtime_factor": round(counters["decode_s"] / counters["speech_s"], 3) if counters["speech_s"] else None,
+            "eos_to_transcript_ms": {"p50": at(eos, 0.5), "p95": at(eos, 0.95)},
+            "final_decode_ms": {"p50": at(final, 0.5), "p95": at(final, 0.95)},
+        }
@@ -0,0 +1,177 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+import google.generativeai as genai
+
+MODEL_NAME = "gemini-2.0-flash"
+
+# Hosts that sit on the critical path of a dispatch. Connections to these are
+# opened during warm-up so the first emergency does not pay for TLS setup.
+MAPS_HOSTS = [
+    "https://maps.googleapis.com",
+    "https://places.googleapis.com",
+]
+
+
+class WarmPool:
+    """
+    Process-wide pool of pre-built Gemini models, HTTP sessions and the allocator
+    """
+
+    def __init__(self, pool_size: int = 16):
+        self.pool_size = pool_size
+        self.models = {}
+        self.sessions = {}
+        self.allocator = None
+        self.components = {}
+        self.started_at = None
+        self.finished_at = None
+        self.ready_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get_model(self, prompt: str, model_name: str = MODEL_NAME):
+        """Return a cached GenerativeModel for this system prompt, creating it if needed."""
+        key = (model_name, prompt)
+        model = self.models.get(key)
+        if model is None:
+            with self._lock:
+                model = self.models.get(key)
+                if model is None:
+                    model = genai.GenerativeModel(model_name=model_name, system_instruction=prompt)
+                    self.models[key] = model
+        return model
+
+    def get_http_session(self, name: str = "maps") -> requests.Session:
+        """Return a shared, connection-pooled requests session."""
+        session = self.sessions.get(name)
+        if session is None:
+            with self._lock:
+                session = self.sessions.get(name)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=len(MAPS_HOSTS), pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self.sessions[name] = session
+        return session
+
+    def get_allocator(self, maps_api_key, api_key):
+        """Return the shared AllocatorAgent, constructing it on first use."""
+        if self.allocator is None:
+            from agents.allocator_agent import AllocatorAgent
+            with self._lock:
+                if self.allocator is None:
+                    self.allocator = AllocatorAgent(maps_api_key, api_key)
+        return self.allocator
+
+    def _mark(self, component: str, status: str, started: float, error: Optional[str] = None):
+        self.components[component] = {
+            "status": status,
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "error": error,
+        }
+        print(f"Warm-up      - {component}: {status}" + (f" ({error})" if error else ""))
+
+    def _warm_models(self, prompts: Dict[str, str]):
+        for agent_name, prompt in prompts.items():
+            started = time.time()
+            try:
+                self.get_model(prompt)
+                self._mark(f"model:{agent_name}", "ok", started)
+            except Exception as e:
+                self._mark(f"model:{agent_name}", "failed", started, str(e))
+
+    def _warm_gemini_channel(self, prompts: Dict[str, str]):
+        # count_tokens is a cheap round-trip that opens the gRPC channel
+        # without spending generation quota.
+        started = time.time()
+        try:
+            model = self.get_model(next(iter(prompts.values())))
+            model.count_tokens("ping")
+            self._mark("gemini:channel", "ok", started)
+        except Exception as e:
+            self._mark("gemini:channel", "failed", started, str(e))
+
+    def _warm_maps_pool(self):
+        session = self.get_http_session("maps")
+        for host in MAPS_HOSTS:
+            started = time.time()
+            try:
+                # Any response (even 404) means the TCP/TLS connection is now pooled.
+                session.head(host, timeout=5)
+                self._mark(f"http:{host}", "ok", started)
+            except Exception as e:
+                self._mark(f"http:{host}", "failed", started, str(e))
+
+    def _warm_allocator(self, maps_api_key, api_key):
+        started = time.time()
+        try:
+            self.get_allocator(maps_api_key, api_key)
+            self._mark("allocator", "ok", started)
+        except Exception as e:
+            self._mark("allocator", "failed", started, str(e))
+
+    def warm_up(self, prompts: Dict[str, str], maps_api_key, api_key):
+        """Build every critical-path dependency, then mark the pool ready."""
+        self.started_at = time.time()
+        print("Warm-up      - Starting")
+        self._warm_models(prompts)
+        self._warm_allocator(maps_api_key, api_key)
+        self._warm_maps_pool()
+        self._warm_gemini_channel(prompts)
+        self.finished_at = time.time()
+        self.ready_event.set()
+        print(f"Warm-up      - Ready in {self.finished_at - self.started_at:.2f}s")
+
+    def start(self, prompts: Dict[str, str], maps_api_key, api_key) -> threading.Thread:
+        """Run warm_up in a background thread (idempotent)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.warm_up,
+                    args=(prompts, maps_api_key, api_key),
+                    daemon=True,
+                )
+                self._thread.start()
+        return self._thread
+
+    def is_ready(self) -> bool:
+        # Failed network probes do not block readiness, but missing models or
+        # allocator do: those would be rebuilt on the critical path anyway.
+        if not self.ready_event.is_set():
+            return False
+        return all(
+            info["status"] == "ok"
+            for name, info in self.components.items()
+            if name.startswith("model:") or name == "allocator"
+        )
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness summary for the health endpoint."""
+        duration = None
+        if self.started_at and self.finished_at:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {
+            "ready": self.is_ready(),
+            "warm_up_complete": self.ready_event.is_set(),
+            "warm_up_seconds": duration,
+            "components": dict(self.components),
+        }
+
+
+# Global instance
+warm_pool = WarmPool()
+
+
+def get_model(prompt: str, model_name: str = MODEL_NAME):
+    """Get a cached GenerativeModel for a system prompt"""
+    return warm_pool.get_model(prompt, model_name)
+
+
+def get_http_session(name: str = "maps") -> requests.Session:
+    """Get the shared HTTP session for an external API"""
+    return warm_pool.get_http_session(name)